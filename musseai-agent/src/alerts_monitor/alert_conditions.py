@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
+import threading
+import time
 import traceback
-from typing import Dict
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 # Import from existing modules
 from mysql.db import get_db
@@ -14,6 +17,13 @@ from .portfolio_db import (
     get_user_portfolio_summary,
     get_transactions,
 )
+from utils.portfolio_version import get_portfolio_version
+
+# Performance metrics are memoized per user until the user's transactions or
+# positions change; the 30-day window still slides, so entries also expire
+PERFORMANCE_METRICS_MAX_AGE = 3600
+_performance_metrics_cache: Dict[str, Tuple[int, float, Dict]] = {}
+_performance_metrics_lock = threading.Lock()
 
 
 def _get_portfolio_data_for_alerts(
@@ -88,6 +98,42 @@ def _get_portfolio_data_for_alerts(
         return {}
 
 
+def _freeze(value):
+    """Recursively convert dicts to read-only mappings and lists to tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def build_portfolio_snapshot(
+    user_id: str,
+    latest_prices: Dict = None,
+    logger: Logger = logging.getLogger("alert_conditions"),
+) -> Optional[Mapping]:
+    """
+    Build the read-only portfolio data all alerts of a user are evaluated against.
+
+    The snapshot is computed once per user per monitoring cycle and shared by every
+    alert of that user, so it is frozen to keep one evaluation from affecting another.
+
+    Args:
+        user_id (str): User identifier
+        latest_prices: Pre-fetched price data keyed by symbol (optional)
+
+    Returns:
+        Mapping: Frozen portfolio data, or None if the user has no portfolio data
+    """
+    with get_db() as db:
+        portfolio_data = _get_portfolio_data_for_alerts(
+            user_id, db, pre_fetched_prices=latest_prices, logger=logger
+        )
+    if not portfolio_data:
+        return None
+    return _freeze(portfolio_data)
+
+
 def _calculate_portfolio_risk_metrics(
     portfolio_summary: Dict,
     logger: Logger = logging.getLogger("alert_conditions"),
@@ -149,56 +195,23 @@ def _calculate_performance_metrics(
     db,
     logger: Logger = logging.getLogger("alert_conditions"),
 ) -> Dict:
-    """Calculate performance metrics for alert evaluation"""
+    """Calculate performance metrics for alert evaluation, memoized by portfolio version"""
     try:
-        # Get transactions from last 30 days
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-
-        transactions_result = get_transactions(
-            user_id=user_id,
-            start_date=start_date.isoformat(),
-            end_date=end_date.isoformat(),
-            limit=1000,
-        )
-
-        performance_metrics = {
-            "daily_return": 0,
-            "weekly_return": 0,
-            "monthly_return": 0,
-            "volatility": 0,
-            "sharpe_ratio": 0,
-            "max_drawdown": 0,
-        }
-
-        # For now, return simulated metrics (in production, calculate from historical data)
+        version = get_portfolio_version(user_id)
+        now = time.time()
+        with _performance_metrics_lock:
+            cached = _performance_metrics_cache.get(user_id)
         if (
-            isinstance(transactions_result, dict)
-            and "transactions" in transactions_result
+            cached
+            and cached[0] == version
+            and now - cached[1] < PERFORMANCE_METRICS_MAX_AGE
         ):
-            transaction_count = len(transactions_result["transactions"])
-
-            # Simulate performance based on transaction activity
-            performance_metrics.update(
-                {
-                    "daily_return": np.random.normal(
-                        -0.5, 3.0
-                    ),  # Simulated daily return
-                    "weekly_return": np.random.normal(
-                        -2.0, 8.0
-                    ),  # Simulated weekly return
-                    "monthly_return": np.random.normal(
-                        -5.0, 15.0
-                    ),  # Simulated monthly return
-                    "volatility": max(
-                        5, min(50, 15 + transaction_count * 0.5)
-                    ),  # Based on activity
-                    "sharpe_ratio": np.random.normal(0.8, 0.4),
-                    "max_drawdown": abs(np.random.normal(-8.0, 5.0)),
-                }
-            )
+            return dict(cached[2])
 
-        return performance_metrics
+        performance_metrics = _compute_performance_metrics(user_id)
+        with _performance_metrics_lock:
+            _performance_metrics_cache[user_id] = (version, now, performance_metrics)
+        return dict(performance_metrics)
 
     except Exception as e:
         logger.error(f"Error calculating performance metrics: {e}")
@@ -212,6 +225,54 @@ def _calculate_performance_metrics(
         }
 
 
+def _compute_performance_metrics(user_id: str) -> Dict:
+    """Compute performance metrics from the user's recent transactions"""
+    # Get transactions from last 30 days
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+
+    transactions_result = get_transactions(
+        user_id=user_id,
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        limit=1000,
+    )
+    if isinstance(transactions_result, dict) and "error" in transactions_result:
+        # Not memoized, the next check retries
+        raise RuntimeError(transactions_result["error"])
+
+    performance_metrics = {
+        "daily_return": 0,
+        "weekly_return": 0,
+        "monthly_return": 0,
+        "volatility": 0,
+        "sharpe_ratio": 0,
+        "max_drawdown": 0,
+    }
+
+    # For now, return simulated metrics (in production, calculate from historical data)
+    if isinstance(transactions_result, dict) and "transactions" in transactions_result:
+        transaction_count = len(transactions_result["transactions"])
+
+        # Simulate performance based on transaction activity
+        performance_metrics.update(
+            {
+                "daily_return": np.random.normal(-0.5, 3.0),  # Simulated daily return
+                "weekly_return": np.random.normal(-2.0, 8.0),  # Simulated weekly return
+                "monthly_return": np.random.normal(
+                    -5.0, 15.0
+                ),  # Simulated monthly return
+                "volatility": max(
+                    5, min(50, 15 + transaction_count * 0.5)
+                ),  # Based on activity
+                "sharpe_ratio": np.random.normal(0.8, 0.4),
+                "max_drawdown": abs(np.random.normal(-8.0, 5.0)),
+            }
+        )
+
+    return performance_metrics
+
+
 def _calculate_concentration_score(
     portfolio_summary: Dict,
     logger: Logger = logging.getLogger("alert_conditions"),
@@ -274,6 +335,7 @@ def _evaluate_alert_condition(
             "threshold_value": None,
             "message": "",
             "distance_to_trigger": "",
+            "distance_percent": None,
         }
         logger.debug(f"Alert type is {alert_type}")
         if alert_type == "PRICE":
@@ -315,6 +377,7 @@ def _evaluate_alert_condition(
             "threshold_value": None,
             "message": f"Error: {str(e)}",
             "distance_to_trigger": "",
+            "distance_percent": None,
         }
 
 
@@ -372,6 +435,7 @@ def _evaluate_price_alert(
         if not result["triggered"]:
             distance_percent = abs((current_price - target_price) / target_price * 100)
             direction = "above" if current_price > target_price else "below"
+            result["distance_percent"] = distance_percent
             result["distance_to_trigger"] = (
                 f"{distance_percent:.1f}% {direction} target"
             )
@@ -430,6 +494,7 @@ def _evaluate_portfolio_value_alert(
         if not result["triggered"] and condition in ["above", "below"]:
             distance_percent = abs((current_value - target_value) / target_value * 100)
             direction = "above" if current_value > target_value else "below"
+            result["distance_percent"] = distance_percent
             result["distance_to_trigger"] = (
                 f"{distance_percent:.1f}% {direction} target"
             )
@@ -486,6 +551,7 @@ def _evaluate_risk_alert(
             )
         else:
             distance = (threshold - current_value) / threshold * 100
+            result["distance_percent"] = distance
             result["distance_to_trigger"] = f"{distance:.1f}% below threshold"
 
         return result
@@ -558,6 +624,7 @@ def _evaluate_performance_alert(
                     if threshold != 0
                     else 0
                 )
+                result["distance_percent"] = distance
                 result["distance_to_trigger"] = f"{distance:.1f}% above threshold"
             else:
                 distance = (
@@ -565,6 +632,7 @@ def _evaluate_performance_alert(
                     if threshold != 0
                     else 0
                 )
+                result["distance_percent"] = distance
                 result["distance_to_trigger"] = f"{distance:.1f}% below threshold"
 
         return result
@@ -601,6 +669,7 @@ def _evaluate_rebalancing_alert(
                 (current_value / total_value * 100) if total_value > 0 else 0
             )
             deviation = abs(current_percent - target_percent)
+            max_deviation = max(max_deviation, deviation)
 
             if deviation > deviation_threshold:
                 deviating_assets.append(
@@ -611,7 +680,6 @@ def _evaluate_rebalancing_alert(
                         "deviation": deviation,
                     }
                 )
-                max_deviation = max(max_deviation, deviation)
 
         result["current_value"] = max_deviation
         result["threshold_value"] = deviation_threshold
@@ -623,6 +691,10 @@ def _evaluate_rebalancing_alert(
                 f"Rebalancing needed: {', '.join(asset_names)} deviate by up to {max_deviation:.1f}%"
             )
         else:
+            if deviation_threshold > 0:
+                result["distance_percent"] = (
+                    (deviation_threshold - max_deviation) / deviation_threshold * 100
+                )
             result["distance_to_trigger"] = (
                 f"All assets within {deviation_threshold}% of target allocation"
             )
@@ -711,6 +783,7 @@ def _evaluate_volatility_alert(
             )
         else:
             distance = (threshold - current_volatility) / threshold * 100
+            result["distance_percent"] = distance
             result["distance_to_trigger"] = (
                 f"{distance:.1f}% below volatility threshold"
             )
@@ -728,6 +801,7 @@ def check_alert_conditions(
     portfolio_summary: any = None,
     latest_prices: any = None,
     alert_id: str = None,
+    alerts: List[Dict] = None,
     logger: Logger = logging.getLogger("alert_conditions"),
 ) -> Dict:
     """
@@ -735,9 +809,10 @@ def check_alert_conditions(
 
     Args:
         user_id (str): User identifier
-        portfolio_summary: Pre-computed portfolio summary (optional)
+        portfolio_summary: Pre-computed portfolio snapshot, see build_portfolio_snapshot (optional)
         latest_prices: Pre-fetched price data (optional)
         alert_id (str, optional): Specific alert to check, if None checks all active alerts
+        alerts (List[Dict], optional): Alerts to check, all evaluated against one snapshot
 
     Returns:
         Dict: Check results with triggered alerts and current status
@@ -746,16 +821,20 @@ def check_alert_conditions(
         with get_db() as db:
             # Get user's portfolio data for evaluation
             # Pass pre-fetched prices if available
-            portfolio_data = _get_portfolio_data_for_alerts(
-                user_id, db, pre_fetched_prices=latest_prices, logger=logger
-            )
+            portfolio_data = portfolio_summary
+            if portfolio_data is None:
+                portfolio_data = _get_portfolio_data_for_alerts(
+                    user_id, db, pre_fetched_prices=latest_prices, logger=logger
+                )
 
             if not portfolio_data:
                 return {"error": "No portfolio data found for alert evaluation"}
 
             # Get alerts to check
             alerts_to_check = []
-            if alert_id:
+            if alerts is not None:
+                alerts_to_check = alerts
+            elif alert_id:
                 # Check specific alert (simulated)
                 alerts_to_check = [
                     {"alert_id": alert_id, "alert_type": "PRICE", "conditions": {}}
@@ -784,6 +863,7 @@ def check_alert_conditions(
                             "distance_to_trigger": check_result.get(
                                 "distance_to_trigger"
                             ),
+                            "distance_percent": check_result.get("distance_percent"),
                         }
                     )
 
@@ -822,6 +902,7 @@ def check_alert_conditions(
                     "total_value": portfolio_data.get("total_value", 0),
                     "total_pnl": portfolio_data.get("total_pnl", 0),
                     "asset_count": portfolio_data.get("asset_count", 0),
+                    "volatility_score": portfolio_data.get("volatility_score"),
                 },
             }
 
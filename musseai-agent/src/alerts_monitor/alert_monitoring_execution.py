@@ -7,21 +7,38 @@ It includes scheduled checking, notification delivery, and status management.
 
 import json
 import logging
+import math
 import os
 import threading
 import time
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from alerts_monitor.alert_conditions import check_alert_conditions
+from alerts_monitor.alert_scheduler import AlertScheduler
+from alerts_monitor.alert_conditions import (
+    build_portfolio_snapshot,
+    check_alert_conditions,
+)
+from alerts_monitor.monitor_metrics import MetricsServer
 from alerts_monitor.monitor_status_manager import MonitoringStatusManager
+from alerts_monitor.notification_dispatcher import NotificationDispatcher, NotificationJob
 from alerts_monitor.notification_sender import NotificationSender
+from alerts_monitor.portfolio_matrix import (
+    PortfolioMatrix,
+    evaluate_portfolio_alerts,
+    is_batch_evaluable,
+)
+from alerts_monitor.price_trigger_index import PriceTriggerIndex
+from alerts_monitor.shard_coordinator import ShardCoordinator
+from alerts_monitor.symbol_index import UserSymbolIndex
 from alerts_monitor.types import MonitoringConfig, AlertCheckResult, NotificationResult
 import schedule
 from utils.api.cryptocompare import getLatestQuote
-import json
 
 # Import from existing modules
+from sqlalchemy import case, func, insert, update
+
 from mysql.db import get_db
 from mysql.model import (
     PortfolioAlertModel,
@@ -29,9 +46,6 @@ from mysql.model import (
     AlertType,
     NotificationMethod,
     AlertHistoryModel,
-    PortfolioSourceModel,
-    PositionModel,
-    AssetModel,
 )
 
 
@@ -55,10 +69,38 @@ class PortfolioAlertMonitor:
         self.config = config
         self.is_running = False
         self.scheduler_thread: Optional[threading.Thread] = None
+        self.heartbeat_thread: Optional[threading.Thread] = None
+        self._heartbeat_stop = threading.Event()
         self.executor = ThreadPoolExecutor(max_workers=config.max_concurrent_checks)
         self.notification_sender = NotificationSender(config)
         self.status_manager = MonitoringStatusManager()
+        self.symbol_index = UserSymbolIndex(config.symbol_index_full_refresh_seconds)
+        self.price_index = PriceTriggerIndex()
+        self.scheduler = AlertScheduler(
+            config.check_interval_seconds, config.max_check_staleness_seconds
+        )
         self._setup_logging()
+        self.notification_dispatcher = NotificationDispatcher(
+            self.notification_sender,
+            config,
+            on_delivered=self._on_notifications_delivered,
+            logger=self.monitor_logger,
+        )
+        self.shard_coordinator = ShardCoordinator(
+            worker_id=config.worker_id,
+            heartbeat_ttl_seconds=config.worker_heartbeat_ttl_seconds,
+            virtual_nodes=config.shard_virtual_nodes,
+            logger=self.monitor_logger,
+        )
+        self.metrics_server: Optional[MetricsServer] = None
+        if config.metrics_port:
+            self.metrics_server = MetricsServer(
+                config.metrics_port,
+                render_metrics=self.render_metrics,
+                get_status=self.get_monitoring_status,
+                host=config.metrics_host,
+                logger=self.monitor_logger,
+            )
 
     def _setup_logging(self):
         """Setup monitoring specific logging"""
@@ -82,18 +124,46 @@ class PortfolioAlertMonitor:
 
         self.is_running = True
         self.monitor_logger.info("Starting Portfolio Alert Monitor")
+        self.notification_dispatcher.start()
+
+        # Join the shard membership before the first check, then keep it alive
+        # from a thread of its own so long check cycles cannot starve it
+        self._shard_heartbeat()
+        self._heartbeat_stop.clear()
+        self.heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, daemon=True, name="ShardHeartbeat"
+        )
+        self.heartbeat_thread.start()
 
         # Schedule periodic checks
         schedule.every(self.config.check_interval_seconds).seconds.do(
             self._run_scheduled_check
         )
 
+        if self.config.portfolio_value_job_time:
+            schedule.every().day.at(self.config.portfolio_value_job_time).do(
+                self.executor.submit, self._materialize_portfolio_values
+            )
+
+        if self.config.asset_price_refresh_minutes > 0:
+            schedule.every(self.config.asset_price_refresh_minutes).minutes.do(
+                self.executor.submit, self._refresh_asset_prices
+            )
+
+        if self.config.price_rollup_enabled:
+            schedule.every().hour.at(":05").do(
+                self.executor.submit, self._rollup_price_snapshots
+            )
+
         # Start scheduler thread
         self.scheduler_thread = threading.Thread(
             target=self._scheduler_loop, daemon=True, name="AlertScheduler"
         )
         self.scheduler_thread.start()
 
+        if self.metrics_server:
+            self.metrics_server.start()
+
         self.monitor_logger.info(
             f"Alert monitoring started with {self.config.check_interval_seconds}s interval"
         )
@@ -109,8 +179,16 @@ class PortfolioAlertMonitor:
 
         if self.scheduler_thread and self.scheduler_thread.is_alive():
             self.scheduler_thread.join(timeout=5)
+        self._heartbeat_stop.set()
+        if self.heartbeat_thread and self.heartbeat_thread.is_alive():
+            self.heartbeat_thread.join(timeout=5)
 
         self.executor.shutdown(wait=True)
+        self.notification_dispatcher.stop()
+        self.notification_sender.close()
+        self.shard_coordinator.leave()
+        if self.metrics_server:
+            self.metrics_server.stop()
         self.monitor_logger.info("Portfolio Alert Monitor stopped")
 
     def _scheduler_loop(self):
@@ -127,22 +205,122 @@ class PortfolioAlertMonitor:
 
         self.monitor_logger.info("Alert scheduler loop stopped")
 
+    def _heartbeat_loop(self):
+        """Send shard heartbeats at a third of their TTL until stopped"""
+        interval = max(1, self.config.worker_heartbeat_ttl_seconds // 3)
+        while not self._heartbeat_stop.wait(interval):
+            try:
+                self._shard_heartbeat()
+            except Exception as e:
+                self.monitor_logger.error(f"Shard heartbeat error: {e}")
+
+    def _shard_heartbeat(self):
+        """Refresh shard membership and publish this worker's statistics"""
+        self.shard_coordinator.heartbeat(
+            {
+                **self.status_manager.get_status(),
+                "scheduler": self.scheduler.get_stats(),
+            }
+        )
+
+    def _materialize_portfolio_values(self):
+        """Store the previous day's value of every portfolio"""
+        # Imported here so the monitor only loads the price APIs when the job runs
+        from utils.portfolio_value_history import materialize_previous_day
+
+        try:
+            materialize_previous_day()
+        except Exception as e:
+            self.monitor_logger.error(f"Portfolio value history job failed: {e}")
+
+    def _refresh_asset_prices(self):
+        """Store the latest price of every asset held by any user"""
+        from tools.portfolios.tools_price_management import refresh_held_asset_prices
+
+        try:
+            refresh_held_asset_prices()
+        except Exception as e:
+            self.monitor_logger.error(f"Asset price refresh job failed: {e}")
+
+    def _rollup_price_snapshots(self):
+        """Roll price snapshots up into hourly and daily bars and apply retention"""
+        from utils.price_snapshot_rollup import run_price_snapshot_rollup
+
+        try:
+            run_price_snapshot_rollup(
+                self.config.price_snapshot_retention_days,
+                self.config.price_hourly_retention_days,
+            )
+        except Exception as e:
+            self.monitor_logger.error(f"Price snapshot rollup job failed: {e}")
+
     def _run_scheduled_check(self):
         """Execute scheduled alert checking"""
         try:
             self.monitor_logger.info("Starting scheduled alert check")
             start_time = time.time()
+            phases: Dict[str, float] = {}
+            phase_start = start_time
+
+            def end_phase(phase: str):
+                nonlocal phase_start
+                now = time.time()
+                phases[phase] = now - phase_start
+                self.status_manager.record_phase(phase, phases[phase])
+                phase_start = now
 
             # Get all active alerts
             active_alerts = self._get_active_alerts()
+            # Keep only the users assigned to this worker
+            active_alerts = [
+                a for a in active_alerts if self.shard_coordinator.owns(a["user_id"])
+            ]
             if not active_alerts:
+                end_phase("active_alert_load")
                 self.monitor_logger.info("No active alerts to check")
+                self.status_manager.record_check()
+                self.status_manager.record_cycle(0, time.time() - start_time, phases)
+                return
+
+            # Only check alerts whose scheduled check time has come
+            due_alerts = active_alerts
+            if self.config.adaptive_scheduling:
+                self.scheduler.sync(alert["alert_id"] for alert in active_alerts)
+                due_times = self.scheduler.pop_due()
+                due_alerts = [a for a in active_alerts if a["alert_id"] in due_times]
+            else:
+                due_times = self._get_fixed_due_times(active_alerts)
+
+            # Lease due alerts so no other worker checks them during a rebalance
+            leased_ids = self.shard_coordinator.acquire_leases(
+                [a["alert_id"] for a in due_alerts], self.config.check_interval_seconds
+            )
+            due_alerts = [a for a in due_alerts if a["alert_id"] in leased_ids]
+            end_phase("active_alert_load")
+            if not due_alerts:
+                self.monitor_logger.info("No alerts due for checking")
+                self.status_manager.record_check()
+                self.status_manager.record_cycle(0, time.time() - start_time, phases)
                 return
 
-            self.monitor_logger.info(f"Checking {len(active_alerts)} active alerts")
+            self.monitor_logger.info(
+                f"Checking {len(due_alerts)}/{len(active_alerts)} active alerts"
+            )
+
+            # PRICE alerts are evaluated by the threshold index on each price tick,
+            # everything else against per-user portfolio snapshots
+            price_alerts = [a for a in active_alerts if PriceTriggerIndex.parse(a)]
+            due_price_alerts = [a for a in due_alerts if PriceTriggerIndex.parse(a)]
+            portfolio_alerts = [
+                a for a in due_alerts if not PriceTriggerIndex.parse(a)
+            ]
+            self.price_index.sync(price_alerts)
 
             # NEW: Pre-fetch all required asset prices
-            all_symbols = self._get_unique_symbols_from_alerts(active_alerts)
+            all_symbols = sorted(
+                set(self._get_unique_symbols_from_alerts(portfolio_alerts))
+                | {PriceTriggerIndex.parse(a)[0] for a in due_price_alerts}
+            )
             # all_symbols = [
             #     # Top 10 by market cap
             #     "BTC",
@@ -203,65 +381,82 @@ class PortfolioAlertMonitor:
             #     # Pattener
             #     "SWFTC",
             # ]
+            end_phase("symbol_collection")
             global_price_data = self._fetch_batch_prices(all_symbols)
+            end_phase("price_fetch")
 
             # Check alerts concurrently with pre-fetched prices
-            check_results = self._check_alerts_batch(active_alerts, global_price_data)
+            check_results = self._check_price_alerts(
+                due_price_alerts, global_price_data, price_alerts
+            )
+            check_results += self._check_alerts_batch(
+                portfolio_alerts, global_price_data
+            )
+            end_phase("evaluation")
+            for result in check_results:
+                due_at = due_times.get(result.alert_id)
+                if due_at is not None:
+                    self.status_manager.record_due_lag(phase_start - due_at)
+
+            # Write all check results back in a few bulk statements
+            alerts_by_id = {a["alert_id"]: a for a in active_alerts}
+            history_ids = self._write_back_results(check_results)
+            end_phase("write_back")
 
             # Process triggered alerts
             triggered_count = 0
             for result in check_results:
                 if result.triggered:
                     triggered_count += 1
-                    self._handle_triggered_alert(result)
+                    self._handle_triggered_alert(
+                        result,
+                        alerts_by_id.get(result.alert_id),
+                        history_ids.get(result.alert_id),
+                    )
+
+                if self.config.adaptive_scheduling and not result.triggered:
+                    self.scheduler.reschedule(
+                        result.alert_id,
+                        alerts_by_id.get(result.alert_id, {}).get("alert_type"),
+                        result.distance_percent,
+                        result.volatility,
+                    )
 
-                # Update check timestamp
-                self._update_alert_check_timestamp(result.alert_id)
+            end_phase("notification")
 
+            self.status_manager.record_check(triggered_count)
             duration = time.time() - start_time
+            self.status_manager.record_cycle(len(check_results), duration, phases)
             self.monitor_logger.info(
-                f"Alert check completed: {triggered_count}/{len(active_alerts)} triggered in {duration:.2f}s"
+                f"Alert check completed: {triggered_count}/{len(check_results)} triggered in {duration:.2f}s"
             )
 
         except Exception as e:
+            self.status_manager.record_error()
             self.monitor_logger.error(f"Scheduled check failed: {e}")
             self.monitor_logger.error(f"Scheduled alert check error: {e}")
 
-    def _get_unique_symbols_from_alerts(self, alerts: List[Dict]) -> List[str]:
-        """Extract unique asset symbols from all alerts"""
-        symbols = set()
+    def _get_fixed_due_times(self, alerts: List[Dict]) -> Dict[int, float]:
+        """Due times of alerts checked every cycle, one interval after their last check"""
+        due_times = {}
+        for alert in alerts:
+            last_checked_at = alert.get("last_checked_at")
+            if last_checked_at is None:
+                continue
+            if last_checked_at.tzinfo is None:
+                last_checked_at = last_checked_at.replace(tzinfo=timezone.utc)
+            due_times[alert["alert_id"]] = (
+                last_checked_at.timestamp() + self.config.check_interval_seconds
+            )
+        return due_times
 
+    def _get_unique_symbols_from_alerts(self, alerts: List[Dict]) -> List[str]:
+        """Extract unique asset symbols held by the users of all alerts"""
         try:
-            for alert in alerts:
-                user_id = alert["user_id"]
-
-                # Get user's portfolio positions to find all symbols
-                with get_db() as db:
-
-                    user_positions = (
-                        db.query(AssetModel.symbol)
-                        .join(
-                            PositionModel, PositionModel.asset_id == AssetModel.asset_id
-                        )
-                        .join(
-                            PortfolioSourceModel,
-                            PortfolioSourceModel.source_id == PositionModel.source_id,
-                        )
-                        .filter(PortfolioSourceModel.user_id == user_id)
-                        .filter(
-                            PositionModel.quantity > 0
-                        )  # Only positions with actual holdings
-                        .distinct()
-                        .all()
-                    )
-
-                    for (symbol,) in user_positions:
-                        symbols.add(symbol)
-
+            return self.symbol_index.get_symbols(alert["user_id"] for alert in alerts)
         except Exception as e:
             self.monitor_logger.error(f"Error extracting symbols from alerts: {e}")
-
-        return list(symbols)
+            return []
 
     def _fetch_batch_prices(self, symbols: List[str]) -> Dict:
         """Fetch prices for all symbols in one API call"""
@@ -334,97 +529,306 @@ class PortfolioAlertMonitor:
             self.monitor_logger.error(f"Error fetching batch prices: {e}")
             return {}
 
+    def _check_price_alerts(
+        self,
+        alerts: List[Dict],
+        global_price_data: Dict = None,
+        indexed_alerts: List[Dict] = None,
+    ) -> List[AlertCheckResult]:
+        """
+        Check PRICE alerts by feeding the fetched prices to the threshold index
+
+        Results cover the given alerts plus any other indexed alert the same
+        price ticks triggered, as long as this worker can lease it.
+        """
+        if not alerts:
+            return []
+
+        global_price_data = global_price_data or {}
+        prices = {
+            symbol.upper(): price_info for symbol, price_info in global_price_data.items()
+        }
+        triggered = {
+            event["alert_id"]: event
+            for event in self.price_index.on_prices(prices)
+        }
+
+        checked_ids = {alert["alert_id"] for alert in alerts}
+        extra_alerts = [
+            alert
+            for alert in indexed_alerts or []
+            if alert["alert_id"] in triggered and alert["alert_id"] not in checked_ids
+        ]
+        if extra_alerts:
+            # Triggered alerts that were not due are only leased now
+            leased_ids = self.shard_coordinator.acquire_leases(
+                [a["alert_id"] for a in extra_alerts],
+                self.config.check_interval_seconds,
+            )
+            alerts = alerts + [a for a in extra_alerts if a["alert_id"] in leased_ids]
+
+        results = []
+        for alert in alerts:
+            symbol, _, target_price = PriceTriggerIndex.parse(alert)
+            event = triggered.get(alert["alert_id"])
+            if event is not None:
+                direction = "above" if event["condition"].endswith("above") else "below"
+                verb = "crossed" if event["condition"].startswith("crosses") else "is"
+                results.append(
+                    AlertCheckResult(
+                        alert_id=alert["alert_id"],
+                        user_id=alert["user_id"],
+                        triggered=True,
+                        current_value=event["current_value"],
+                        threshold_value=event["threshold_value"],
+                        message=(
+                            f"{symbol} price ${event['current_value']:.2f} {verb} "
+                            f"{direction} target ${event['threshold_value']}"
+                        ),
+                    )
+                )
+            elif symbol in prices:
+                price_info = prices[symbol]
+                current_price = float(price_info["price"])
+                results.append(
+                    AlertCheckResult(
+                        alert_id=alert["alert_id"],
+                        user_id=alert["user_id"],
+                        triggered=False,
+                        current_value=current_price,
+                        threshold_value=target_price,
+                        message="Conditions not met",
+                        distance_percent=abs(current_price - target_price)
+                        / target_price
+                        * 100,
+                        volatility=abs(price_info.get("percent_change_24h") or 0),
+                    )
+                )
+            else:
+                results.append(
+                    AlertCheckResult(
+                        alert_id=alert["alert_id"],
+                        user_id=alert["user_id"],
+                        triggered=False,
+                        message=f"Price data not available for {symbol}",
+                    )
+                )
+
+        return results
+
     def _check_alerts_batch(
         self, alerts: List[Dict], global_price_data: Dict = None
     ) -> List[AlertCheckResult]:
-        """Check multiple alerts concurrently with pre-fetched price data"""
-        results = []
+        """Check multiple alerts concurrently, one task per user with pre-fetched price data"""
+        # Portfolio-level alerts of all users are evaluated at once on a position matrix
+        results = self._check_matrix_alerts(
+            [a for a in alerts if is_batch_evaluable(a)], global_price_data
+        )
+        alerts = [a for a in alerts if not is_batch_evaluable(a)]
 
-        # Submit all alert checks to thread pool
-        future_to_alert = {
+        # Group alerts by user so each portfolio is evaluated once per cycle
+        alerts_by_user: Dict[str, List[Dict]] = defaultdict(list)
+        for alert in alerts:
+            alerts_by_user[alert["user_id"]].append(alert)
+
+        # Submit one check per user to thread pool
+        future_to_user = {
             self.executor.submit(
-                self._check_single_alert, alert, global_price_data
-            ): alert
-            for alert in alerts
+                self._check_user_alerts, user_id, user_alerts, global_price_data
+            ): user_id
+            for user_id, user_alerts in alerts_by_user.items()
         }
 
         # Collect results as they complete
-        for future in as_completed(future_to_alert, timeout=60):
-            alert = future_to_alert[future]
+        for future in as_completed(future_to_user, timeout=60):
+            user_id = future_to_user[future]
             try:
-                result = future.result()
-                results.append(result)
+                results.extend(future.result())
             except Exception as e:
                 self.monitor_logger.error(
-                    f"Alert check failed for {alert['alert_id']}: {e}"
+                    f"Alert check failed for user {user_id}: {e}"
                 )
-                results.append(
+                results.extend(
                     AlertCheckResult(
                         alert_id=alert["alert_id"],
-                        user_id=alert["user_id"],
+                        user_id=user_id,
                         triggered=False,
                         error=str(e),
                     )
+                    for alert in alerts_by_user[user_id]
                 )
 
         return results
 
-    def _check_single_alert(
-        self, alert: Dict, global_price_data: Dict = None
-    ) -> AlertCheckResult:
-        """Check a single alert condition with optional pre-fetched price data"""
+    def _check_matrix_alerts(
+        self, alerts: List[Dict], global_price_data: Dict = None
+    ) -> List[AlertCheckResult]:
+        """Evaluate portfolio-level alerts of all users with array operations"""
+        if not alerts:
+            return []
+
         try:
-            # Pass global price data to the alert checking function
-            check_result = check_alert_conditions(
-                user_id=alert["user_id"],
-                portfolio_summary=None,  # Will be fetched inside with optimized price data
-                latest_prices=global_price_data,  # Pass pre-fetched prices
-                alert_id=str(alert["alert_id"]),
-                logger=self.monitor_logger,
+            matrix = PortfolioMatrix.load(
+                (alert["user_id"] for alert in alerts), global_price_data
             )
+            evaluations = evaluate_portfolio_alerts(alerts, matrix)
+        except Exception as e:
+            self.monitor_logger.error(f"Portfolio matrix evaluation failed: {e}")
+            return [
+                AlertCheckResult(
+                    alert_id=alert["alert_id"],
+                    user_id=alert["user_id"],
+                    triggered=False,
+                    error=f"Check execution failed: {str(e)}",
+                )
+                for alert in alerts
+            ]
 
-            if isinstance(check_result, dict) and "error" not in check_result:
-                triggered_alerts = check_result.get("triggered_alerts", [])
-                if triggered_alerts:
-                    # Alert was triggered
-                    trigger_data = triggered_alerts[0]
-                    return AlertCheckResult(
+        results = []
+        for alert in alerts:
+            evaluation = evaluations.get(alert["alert_id"])
+            if evaluation is None:
+                results.append(
+                    AlertCheckResult(
                         alert_id=alert["alert_id"],
                         user_id=alert["user_id"],
-                        triggered=True,
-                        current_value=trigger_data.get("current_value"),
-                        threshold_value=trigger_data.get("threshold_value"),
-                        message=trigger_data.get("trigger_message", "Alert triggered"),
+                        triggered=False,
+                        error="Alert evaluation failed",
                     )
-                else:
-                    # Alert not triggered
-                    return AlertCheckResult(
+                )
+                continue
+
+            volatility_score = matrix.volatility_scores[
+                matrix.user_index[alert["user_id"]]
+            ]
+            results.append(
+                AlertCheckResult(
+                    alert_id=alert["alert_id"],
+                    user_id=alert["user_id"],
+                    triggered=evaluation["triggered"],
+                    current_value=evaluation["current_value"],
+                    threshold_value=evaluation["threshold_value"],
+                    message=(
+                        evaluation["message"] or "Alert triggered"
+                        if evaluation["triggered"]
+                        else "Conditions not met"
+                    ),
+                    distance_percent=evaluation["distance_percent"],
+                    volatility=float(volatility_score) / math.sqrt(365),
+                )
+            )
+        return results
+
+    def _check_user_alerts(
+        self, user_id: str, alerts: List[Dict], global_price_data: Dict = None
+    ) -> List[AlertCheckResult]:
+        """Check all alerts of one user against a single portfolio snapshot"""
+        try:
+            # Build the portfolio data once, shared by all alerts of this user
+            snapshot = build_portfolio_snapshot(
+                user_id, latest_prices=global_price_data, logger=self.monitor_logger
+            )
+            if snapshot is None:
+                return [
+                    AlertCheckResult(
                         alert_id=alert["alert_id"],
-                        user_id=alert["user_id"],
+                        user_id=user_id,
                         triggered=False,
-                        message="Conditions not met",
+                        error="No portfolio data found for alert evaluation",
                     )
-            else:
+                    for alert in alerts
+                ]
+
+            check_result = check_alert_conditions(
+                user_id=user_id,
+                portfolio_summary=snapshot,
+                alerts=alerts,
+                logger=self.monitor_logger,
+            )
+
+            if not isinstance(check_result, dict) or "error" in check_result:
                 # Error in checking
                 error_msg = (
                     check_result.get("error", "Unknown error")
                     if isinstance(check_result, dict)
                     else str(check_result)
                 )
-                return AlertCheckResult(
+                return [
+                    AlertCheckResult(
+                        alert_id=alert["alert_id"],
+                        user_id=user_id,
+                        triggered=False,
+                        error=error_msg,
+                    )
+                    for alert in alerts
+                ]
+
+            triggered = {
+                trigger_data["alert_id"]: trigger_data
+                for trigger_data in check_result.get("triggered_alerts", [])
+            }
+            checked = {
+                checked_data["alert_id"]: checked_data
+                for checked_data in check_result.get("checked_alerts", [])
+            }
+            # Annualized volatility score as a daily percentage for scheduling
+            volatility_score = snapshot.get("volatility_score")
+            daily_volatility = (
+                volatility_score / math.sqrt(365) if volatility_score else None
+            )
+
+            results = []
+            for alert in alerts:
+                alert_id = alert["alert_id"]
+                if alert_id in triggered:
+                    # Alert was triggered
+                    trigger_data = triggered[alert_id]
+                    results.append(
+                        AlertCheckResult(
+                            alert_id=alert_id,
+                            user_id=user_id,
+                            triggered=True,
+                            current_value=trigger_data.get("current_value"),
+                            threshold_value=trigger_data.get("threshold_value"),
+                            message=trigger_data.get(
+                                "trigger_message", "Alert triggered"
+                            ),
+                        )
+                    )
+                elif alert_id in checked:
+                    # Alert not triggered
+                    results.append(
+                        AlertCheckResult(
+                            alert_id=alert_id,
+                            user_id=user_id,
+                            triggered=False,
+                            current_value=checked[alert_id].get("current_value"),
+                            message="Conditions not met",
+                            distance_percent=checked[alert_id].get("distance_percent"),
+                            volatility=daily_volatility,
+                        )
+                    )
+                else:
+                    results.append(
+                        AlertCheckResult(
+                            alert_id=alert_id,
+                            user_id=user_id,
+                            triggered=False,
+                            error="Alert evaluation failed",
+                        )
+                    )
+            return results
+
+        except Exception as e:
+            return [
+                AlertCheckResult(
                     alert_id=alert["alert_id"],
-                    user_id=alert["user_id"],
+                    user_id=user_id,
                     triggered=False,
-                    error=error_msg,
+                    error=f"Check execution failed: {str(e)}",
                 )
-
-        except Exception as e:
-            return AlertCheckResult(
-                alert_id=alert["alert_id"],
-                user_id=alert["user_id"],
-                triggered=False,
-                error=f"Check execution failed: {str(e)}",
-            )
+                for alert in alerts
+            ]
 
     def _get_active_alerts(self) -> List[Dict]:
         """Retrieve all active alerts from database"""
@@ -452,26 +856,26 @@ class PortfolioAlertMonitor:
             self.monitor_logger.error(f"Failed to get active alerts: {e}")
             return []
 
-    def _handle_triggered_alert(self, result: AlertCheckResult):
-        """Handle a triggered alert by sending notifications and updating status"""
+    def _handle_triggered_alert(
+        self,
+        result: AlertCheckResult,
+        alert: Optional[Dict],
+        history_id: Optional[int] = None,
+    ):
+        """Handle a triggered alert by queueing its notifications"""
         try:
-            # Get full alert details
-            alert_details = self._get_alert_details(result.alert_id)
-            if not alert_details:
+            if not alert:
                 self.monitor_logger.error(
                     f"Could not get details for alert {result.alert_id}"
                 )
                 return
 
-            # Send notifications
-            notification_results = self._send_notifications(alert_details, result)
-
-            # Update alert status and history
-            self._update_triggered_alert(result, notification_results)
+            # Queue notifications, the check cycle never waits for delivery
+            queued = self._send_notifications(alert, result, history_id)
 
             # Log successful trigger handling
             self.monitor_logger.info(
-                f"Alert {result.alert_id} triggered and processed: {result.message}"
+                f"Alert {result.alert_id} triggered, {queued} notifications queued: {result.message}"
             )
 
         except Exception as e:
@@ -479,115 +883,139 @@ class PortfolioAlertMonitor:
                 f"Failed to handle triggered alert {result.alert_id}: {e}"
             )
 
-    def _get_alert_details(self, alert_id: int) -> Optional[Dict]:
-        """Get complete alert details from database"""
-        try:
-            with get_db() as db:
-                alert = (
-                    db.query(PortfolioAlertModel)
-                    .filter(PortfolioAlertModel.alert_id == alert_id)
-                    .first()
+    def _send_notifications(
+        self, alert: Dict, result: AlertCheckResult, history_id: Optional[int] = None
+    ) -> int:
+        """Queue notifications for triggered alert, returns how many were queued"""
+        return self.notification_dispatcher.enqueue(
+            alert=alert,
+            trigger_data={
+                "current_value": result.current_value,
+                "threshold_value": result.threshold_value,
+                "message": result.message,
+                "triggered_at": result.check_timestamp.isoformat(),
+            },
+            methods=alert["notification_methods"],
+            history_id=history_id,
+        )
+
+    def _on_notifications_delivered(
+        self, deliveries: List[Tuple[NotificationJob, NotificationResult]]
+    ):
+        """Record delivery results and mark the history of delivered alerts"""
+        delivered_history_ids = set()
+        now = time.time()
+        for job, notification_result in deliveries:
+            self.status_manager.record_notification(
+                job.method, notification_result.success
+            )
+            self.status_manager.record_notification_latency(now - job.enqueued_at)
+            if notification_result.success and job.history_id is not None:
+                delivered_history_ids.add(job.history_id)
+            elif not notification_result.success:
+                self.monitor_logger.error(
+                    f"Notification failed ({job.method}) for alert {job.alert['alert_id']}: "
+                    f"{notification_result.error}"
                 )
 
-                if alert:
-                    return {
-                        "alert_id": alert.alert_id,
-                        "user_id": alert.user_id,
-                        "alert_type": alert.alert_type.value,
-                        "alert_name": alert.alert_name,
-                        "conditions": alert.conditions,
-                        "notification_methods": alert.notification_methods,
-                        "status": alert.status.value,
-                    }
-                return None
+        if not delivered_history_ids:
+            return
+        try:
+            with get_db() as db:
+                db.query(AlertHistoryModel).filter(
+                    AlertHistoryModel.history_id.in_(delivered_history_ids)
+                ).update({"notification_sent": True}, synchronize_session=False)
+                db.commit()
         except Exception as e:
-            self.monitor_logger.error(f"Failed to get alert details: {e}")
-            return None
+            self.monitor_logger.error(f"Failed to record notification delivery: {e}")
 
-    def _send_notifications(
-        self, alert: Dict, result: AlertCheckResult
-    ) -> List[NotificationResult]:
-        """Send notifications for triggered alert"""
-        notification_results = []
+    def _write_back_results(self, results: List[AlertCheckResult]) -> Dict[int, int]:
+        """
+        Persist a cycle's check results in bulk
 
-        for method in alert["notification_methods"]:
-            try:
-                notification_result = self.notification_sender.send_notification(
-                    method=method,
-                    alert=alert,
-                    trigger_data={
-                        "current_value": result.current_value,
-                        "threshold_value": result.threshold_value,
-                        "message": result.message,
-                        "triggered_at": result.check_timestamp.isoformat(),
-                    },
-                )
-                notification_results.append(notification_result)
+        One UPDATE stamps last_checked_at on every checked alert, one UPDATE marks
+        the triggered alerts and one INSERT adds their history records.
 
-            except Exception as e:
-                self.monitor_logger.error(f"Notification failed ({method}): {e}")
-                notification_results.append(
-                    NotificationResult(method=method, success=False, error=str(e))
-                )
+        Returns:
+            Dict[int, int]: alert_id -> history_id of the alerts triggered this cycle
+        """
+        if not results:
+            return {}
 
-        return notification_results
+        checked_ids = list({result.alert_id for result in results})
+        triggered = {
+            result.alert_id: result for result in results if result.triggered
+        }
 
-    def _update_triggered_alert(
-        self, result: AlertCheckResult, notifications: List[NotificationResult]
-    ):
-        """Update alert status and create history record"""
         try:
             with get_db() as db:
-                # Update alert record
-                alert = (
-                    db.query(PortfolioAlertModel)
-                    .filter(PortfolioAlertModel.alert_id == result.alert_id)
-                    .first()
+                db.execute(
+                    update(PortfolioAlertModel)
+                    .where(PortfolioAlertModel.alert_id.in_(checked_ids))
+                    .values(last_checked_at=datetime.utcnow())
                 )
-
-                if alert:
-                    alert.status = AlertStatus.TRIGGERED
-                    alert.last_triggered_at = result.check_timestamp
-                    alert.trigger_count = (alert.trigger_count or 0) + 1
-
-                    # Create history record
-                    history = AlertHistoryModel(
-                        alert_id=result.alert_id,
-                        triggered_at=result.check_timestamp,
-                        trigger_value={
-                            "current_value": result.current_value,
-                            "threshold_value": result.threshold_value,
-                        },
-                        message=result.message,
-                        notification_sent=any(n.success for n in notifications),
+                if not triggered:
+                    return {}
+
+                db.execute(
+                    update(PortfolioAlertModel)
+                    .where(PortfolioAlertModel.alert_id.in_(list(triggered)))
+                    .values(
+                        status=AlertStatus.TRIGGERED,
+                        last_triggered_at=case(
+                            {
+                                alert_id: result.check_timestamp
+                                for alert_id, result in triggered.items()
+                            },
+                            value=PortfolioAlertModel.alert_id,
+                        ),
+                        trigger_count=func.coalesce(PortfolioAlertModel.trigger_count, 0)
+                        + 1,
                     )
+                )
+                db.execute(
+                    insert(AlertHistoryModel),
+                    [
+                        {
+                            "alert_id": alert_id,
+                            "triggered_at": result.check_timestamp,
+                            "trigger_value": {
+                                "current_value": result.current_value,
+                                "threshold_value": result.threshold_value,
+                            },
+                            "message": result.message,
+                            "notification_sent": False,
+                        }
+                        for alert_id, result in triggered.items()
+                    ],
+                )
 
-                    db.add(history)
-                    db.commit()
-
-                    self.monitor_logger.info(
-                        f"Updated alert {result.alert_id} status and created history"
+                # Read back the new history ids for delivery tracking (no RETURNING on MySQL)
+                earliest = min(r.check_timestamp for r in triggered.values()).replace(
+                    microsecond=0
+                )
+                rows = (
+                    db.query(
+                        AlertHistoryModel.alert_id,
+                        func.max(AlertHistoryModel.history_id),
                     )
-
-        except Exception as e:
-            self.monitor_logger.error(f"Failed to update triggered alert: {e}")
-
-    def _update_alert_check_timestamp(self, alert_id: int):
-        """Update the last_checked_at timestamp for an alert"""
-        try:
-            with get_db() as db:
-                alert = (
-                    db.query(PortfolioAlertModel)
-                    .filter(PortfolioAlertModel.alert_id == alert_id)
-                    .first()
+                    .filter(
+                        AlertHistoryModel.alert_id.in_(list(triggered)),
+                        AlertHistoryModel.triggered_at >= earliest,
+                    )
+                    .group_by(AlertHistoryModel.alert_id)
+                    .all()
                 )
+                db.commit()
 
-                if alert:
-                    alert.last_checked_at = datetime.utcnow()
-                    db.commit()
+                self.monitor_logger.info(
+                    f"Updated {len(checked_ids)} checked and {len(triggered)} triggered alerts"
+                )
+                return {alert_id: history_id for alert_id, history_id in rows}
 
         except Exception as e:
-            self.monitor_logger.error(f"Failed to update check timestamp: {e}")
+            self.monitor_logger.error(f"Failed to write back alert check results: {e}")
+            return {}
 
     # def check_user_alerts(self, user_id: str) -> Dict:
     #     """Manually trigger alert check for a specific user"""
@@ -655,6 +1083,8 @@ class PortfolioAlertMonitor:
             "config": {
                 "check_interval_seconds": self.config.check_interval_seconds,
                 "max_concurrent_checks": self.config.max_concurrent_checks,
+                "adaptive_scheduling": self.config.adaptive_scheduling,
+                "max_check_staleness_seconds": self.config.max_check_staleness_seconds,
                 "enabled_notifications": {
                     "email": self.config.enable_email,
                     "sms": self.config.enable_sms,
@@ -664,4 +1094,79 @@ class PortfolioAlertMonitor:
             },
             "status": self.status_manager.get_status(),
             "last_check": self.status_manager.get_last_check_time(),
+            "scheduler": self.scheduler.get_stats(),
+            "price_index": self.price_index.get_stats(),
+            "shards": self._get_shard_status(),
+            "notifications": self.notification_dispatcher.get_stats(),
+            "performance": {
+                **self.status_manager.get_performance(),
+                "queue_depth": self._get_queue_depths(),
+            },
+        }
+
+    def _get_queue_depths(self) -> Dict[str, int]:
+        """Alerts waiting for a check and notifications waiting for delivery"""
+        depths = {"due_alerts": self.scheduler.get_stats()["due_alerts"]}
+        for method, stats in self.notification_dispatcher.get_stats().items():
+            depths[f"notification_{method}"] = stats["queued"]
+            depths[f"notification_{method}_retry"] = stats["pending_retries"]
+        return depths
+
+    def render_metrics(self) -> str:
+        """Render this worker's metrics in the Prometheus text format"""
+        return self.status_manager.render_metrics(
+            queue_depths=self._get_queue_depths(),
+            labels={"worker": self.shard_coordinator.worker_id},
+        )
+
+    def _get_shard_status(self) -> Dict:
+        """Aggregate the statistics published by all live monitor workers"""
+        statuses = self.shard_coordinator.get_shard_statuses()
+        if not statuses:
+            # Single shard, or Redis unavailable
+            statuses = {
+                self.shard_coordinator.worker_id: {
+                    **self.status_manager.get_status(),
+                    "scheduler": self.scheduler.get_stats(),
+                }
+            }
+
+        totals = {
+            "total_checks": 0,
+            "total_triggered": 0,
+            "total_notifications_sent": 0,
+            "errors_count": 0,
+            "scheduled_alerts": 0,
+            "due_alerts": 0,
+        }
+        notification_stats: Dict[str, Dict[str, int]] = {}
+        for status in statuses.values():
+            for key in totals:
+                if key in status:
+                    totals[key] += status.get(key) or 0
+                else:
+                    totals[key] += status.get("scheduler", {}).get(key) or 0
+            for method, counts in status.get("notification_stats", {}).items():
+                method_stats = notification_stats.setdefault(
+                    method, {"sent": 0, "failed": 0}
+                )
+                method_stats["sent"] += counts.get("sent", 0)
+                method_stats["failed"] += counts.get("failed", 0)
+
+        return {
+            "worker_id": self.shard_coordinator.worker_id,
+            "worker_count": len(statuses),
+            "workers": sorted(statuses),
+            "rebalance_count": self.shard_coordinator.rebalance_count,
+            "aggregate": {**totals, "notification_stats": notification_stats},
+            "by_worker": {
+                worker_id: {
+                    "total_checks": status.get("total_checks", 0),
+                    "total_triggered": status.get("total_triggered", 0),
+                    "errors_count": status.get("errors_count", 0),
+                    "last_check_time": status.get("last_check_time"),
+                    "heartbeat_at": status.get("heartbeat_at"),
+                }
+                for worker_id, status in statuses.items()
+            },
         }
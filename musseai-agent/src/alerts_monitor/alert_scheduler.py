@@ -0,0 +1,140 @@
+"""
+Adaptive alert check scheduling
+
+Alerts are kept in a min-heap by next check time. After each check the next
+time is derived from how far the alert is from triggering, how fast the
+underlying value has been moving and the alert type: alerts close to their
+threshold are checked every cycle, distant ones rarely, but never less often
+than the configured maximum staleness.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SAFETY_SIGMAS = 3.0  # Recheck before a move of this many daily sigmas could trigger
+DEFAULT_DAILY_VOLATILITY = 5.0  # Percent, used when no volatility is known
+MIN_DAILY_VOLATILITY = 0.5  # Percent, floor so quiet assets are still rechecked
+
+# Multiplier on the computed interval; values derived from slow-moving portfolio
+# aggregates can be checked less often than raw prices
+TYPE_INTERVAL_FACTORS = {
+    "PRICE": 1.0,
+    "VOLUME": 1.0,
+    "PORTFOLIO_VALUE": 1.0,
+    "VOLATILITY": 2.0,
+    "RISK": 2.0,
+    "REBALANCING": 2.0,
+    "PERFORMANCE": 4.0,
+}
+
+
+class AlertScheduler:
+    """Min-heap of alert ids ordered by next check time"""
+
+    def __init__(self, min_interval: float, max_staleness: float):
+        self.min_interval = min_interval
+        self.max_staleness = max(min_interval, max_staleness)
+        self._heap: List[Tuple[float, int, int]] = []
+        self._due_at: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def sync(self, alert_ids: Iterable[int], now: Optional[float] = None):
+        """Track exactly the given alerts, new ones are due immediately"""
+        now = time.time() if now is None else now
+        alert_ids = set(alert_ids)
+        with self._lock:
+            # Removed alerts leave stale heap entries that are skipped when popped
+            for alert_id in set(self._due_at) - alert_ids:
+                del self._due_at[alert_id]
+            for alert_id in alert_ids - set(self._due_at):
+                self._push(alert_id, now)
+
+            # Compact once stale entries dominate the heap
+            if len(self._heap) > 2 * len(self._due_at) + 64:
+                self._heap = [
+                    (due, seq, alert_id)
+                    for due, seq, alert_id in self._heap
+                    if self._due_at.get(alert_id) == due
+                ]
+                heapq.heapify(self._heap)
+
+    def pop_due(self, now: Optional[float] = None) -> Dict[int, float]:
+        """
+        Get the alerts due for a check with their due times
+
+        Popped alerts stay due until rescheduled.
+        """
+        now = time.time() if now is None else now
+        due = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_at, _, alert_id = heapq.heappop(self._heap)
+                if self._due_at.get(alert_id) == due_at:
+                    due[alert_id] = due_at
+            # Keep popped alerts at the head until their check result comes back
+            for alert_id in due:
+                self._push(alert_id, now)
+        return due
+
+    def next_interval(
+        self,
+        alert_type: str,
+        distance_percent: Optional[float],
+        daily_volatility: Optional[float],
+    ) -> float:
+        """
+        Seconds until the next check of an alert
+
+        The interval is the time a move of SAFETY_SIGMAS daily sigmas needs to
+        cover the distance to trigger, assuming moves scale with sqrt(time).
+        """
+        if distance_percent is None or not math.isfinite(distance_percent):
+            return self.min_interval
+
+        volatility = (
+            DEFAULT_DAILY_VOLATILITY
+            if daily_volatility is None or not math.isfinite(daily_volatility)
+            else max(abs(daily_volatility), MIN_DAILY_VOLATILITY)
+        )
+        distance = max(distance_percent, 0.0)
+        interval = 86400 * (distance / (SAFETY_SIGMAS * volatility)) ** 2
+        interval *= TYPE_INTERVAL_FACTORS.get(alert_type, 1.0)
+        return min(max(interval, self.min_interval), self.max_staleness)
+
+    def reschedule(
+        self,
+        alert_id: int,
+        alert_type: str,
+        distance_percent: Optional[float] = None,
+        daily_volatility: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> float:
+        """Schedule the next check of a checked alert, returns its due time"""
+        now = time.time() if now is None else now
+        due_at = now + self.next_interval(alert_type, distance_percent, daily_volatility)
+        with self._lock:
+            if alert_id in self._due_at:
+                self._push(alert_id, due_at)
+        return due_at
+
+    def _push(self, alert_id: int, due_at: float):
+        self._due_at[alert_id] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._counter), alert_id))
+
+    def get_stats(self, now: Optional[float] = None) -> Dict:
+        """Get scheduled alert counts"""
+        now = time.time() if now is None else now
+        with self._lock:
+            due_times = list(self._due_at.values())
+        return {
+            "scheduled_alerts": len(due_times),
+            "due_alerts": sum(1 for due in due_times if due <= now),
+            "next_due_in_seconds": (
+                max(0.0, min(due_times) - now) if due_times else None
+            ),
+        }
@@ -28,6 +28,25 @@ def setup_monitoring_from_env() -> MonitoringConfig:
         max_concurrent_checks=int(os.getenv("ALERT_MAX_CONCURRENT", "10")),
         notification_timeout_seconds=int(os.getenv("ALERT_NOTIFICATION_TIMEOUT", "30")),
         
+        # Sharding configuration
+        worker_id=os.getenv("ALERT_MONITOR_WORKER_ID", ""),
+        worker_heartbeat_ttl_seconds=int(os.getenv("ALERT_MONITOR_HEARTBEAT_TTL", "30")),
+
+        # Nightly portfolio value history job
+        portfolio_value_job_time=os.getenv("ALERT_PORTFOLIO_VALUE_JOB_TIME", "00:15"),
+
+        # Held asset price refresh
+        asset_price_refresh_minutes=int(os.getenv("ALERT_ASSET_PRICE_REFRESH_MINUTES", "0")),
+
+        # Price snapshot rollup and retention
+        price_rollup_enabled=os.getenv("ALERT_PRICE_ROLLUP_ENABLED", "true").lower() == "true",
+        price_snapshot_retention_days=int(os.getenv("ALERT_PRICE_SNAPSHOT_RETENTION_DAYS", "7")),
+        price_hourly_retention_days=int(os.getenv("ALERT_PRICE_HOURLY_RETENTION_DAYS", "90")),
+
+        # Metrics endpoint configuration
+        metrics_port=int(os.getenv("ALERT_MONITOR_METRICS_PORT", "0")),
+        metrics_host=os.getenv("ALERT_MONITOR_METRICS_HOST", "0.0.0.0"),
+        
         # Email configuration
         enable_email=os.getenv("ALERT_EMAIL_ENABLED", "true").lower() == "true",
         smtp_server=os.getenv("ALERT_SMTP_SERVER", "smtp.gmail.com"),
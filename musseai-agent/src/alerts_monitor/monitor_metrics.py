@@ -0,0 +1,263 @@
+"""
+Alert monitor metrics
+
+Fixed-bucket latency histograms for the phases of a check cycle, plus the
+Prometheus text exposition of the monitor status and a small HTTP server so the
+monitor process can be scraped without going through the web app.
+"""
+
+import bisect
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+METRIC_PREFIX = "musseai_alert_monitor"
+
+# Upper bounds in seconds, from single queries to a slow price API or SMTP server
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# Due-time lag ranges from a scheduler tick up to several check intervals
+DUE_LAG_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+class LatencyHistogram:
+    """Cumulative histogram with fixed upper bounds, in the Prometheus layout"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        value = max(0.0, value)
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+            self._max = max(self._max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            max_value = self._max
+        if not total:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else max_value
+                upper = min(upper, max_value)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return max_value
+
+    def snapshot(self) -> Dict:
+        """Get count, sum and cumulative bucket counts"""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total = self._count
+            max_value = self._max
+
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {
+            "count": total,
+            "sum": total_sum,
+            "max": max_value,
+            "buckets": dict(zip([*self.buckets, float("inf")], cumulative)),
+        }
+
+    def summary(self) -> Dict:
+        """Get count, mean and estimated percentiles for status reports"""
+        with self._lock:
+            total = self._count
+            total_sum = self._sum
+            max_value = self._max
+        return {
+            "count": total,
+            "mean_seconds": round(total_sum / total, 6) if total else None,
+            "p50_seconds": _round(self.quantile(0.5)),
+            "p95_seconds": _round(self.quantile(0.95)),
+            "p99_seconds": _round(self.quantile(0.99)),
+            "max_seconds": round(max_value, 6) if total else None,
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 6)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class PrometheusWriter:
+    """Accumulates metric families in the Prometheus text exposition format"""
+
+    def __init__(self, base_labels: Optional[Dict[str, str]] = None):
+        self.base_labels = base_labels or {}
+        self._lines: List[str] = []
+
+    def _header(self, name: str, metric_type: str, help_text: str):
+        self._lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        self._lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+    def _sample(self, name: str, labels: Dict[str, str], value: float):
+        all_labels = {**self.base_labels, **labels}
+        self._lines.append(
+            f"{METRIC_PREFIX}_{name}{_format_labels(all_labels)} {_format_value(value)}"
+        )
+
+    def scalar(
+        self,
+        name: str,
+        metric_type: str,
+        help_text: str,
+        samples: Iterable[tuple],
+    ):
+        """Add a counter or gauge family from (labels, value) samples"""
+        self._header(name, metric_type, help_text)
+        for labels, value in samples:
+            if value is not None:
+                self._sample(name, labels, value)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        histograms: Iterable[tuple],
+    ):
+        """Add a histogram family from (labels, LatencyHistogram) pairs"""
+        self._header(name, "histogram", help_text)
+        for labels, histogram in histograms:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                self._sample(
+                    f"{name}_bucket", {**labels, "le": _format_value(bound)}, count
+                )
+            self._sample(f"{name}_sum", labels, snapshot["sum"])
+            self._sample(f"{name}_count", labels, snapshot["count"])
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AlertMonitorMetrics/1.0"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        try:
+            if path == "/metrics":
+                body = self.server.render_metrics().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/status":
+                body = json.dumps(self.server.get_status(), default=str).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+        except Exception as e:
+            self.server.logger.error(f"Failed to render monitor metrics: {e}")
+            self.send_error(500)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(f"Metrics request: {format % args}")
+
+
+class MetricsServer:
+    """Serves /metrics (Prometheus text) and /status (JSON) from a daemon thread"""
+
+    def __init__(
+        self,
+        port: int,
+        render_metrics: Callable[[], str],
+        get_status: Callable[[], Dict],
+        host: str = "0.0.0.0",
+        logger: logging.Logger = logging.getLogger("portfolio_alert_monitor"),
+    ):
+        self.host = host
+        self.port = port
+        self.render_metrics = render_metrics
+        self.get_status = get_status
+        self.logger = logger
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Start serving, returns False if the port could not be bound"""
+        if self._server:
+            return True
+        try:
+            server = ThreadingHTTPServer((self.host, self.port), _MetricsRequestHandler)
+        except OSError as e:
+            self.logger.error(f"Failed to start metrics server on port {self.port}: {e}")
+            return False
+
+        server.daemon_threads = True
+        server.render_metrics = self.render_metrics
+        server.get_status = self.get_status
+        server.logger = self.logger
+        self._server = server
+        self._thread = threading.Thread(
+            target=server.serve_forever, daemon=True, name="AlertMonitorMetrics"
+        )
+        self._thread.start()
+        self.logger.info(f"Monitor metrics served on {self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
@@ -1,7 +1,26 @@
 import threading
+import time
+from collections import deque
 from datetime import datetime
 from typing import Dict, Optional
 
+from alerts_monitor.monitor_metrics import (
+    DUE_LAG_BUCKETS,
+    LatencyHistogram,
+    PrometheusWriter,
+)
+
+# Phases of one scheduled check, in execution order
+CHECK_PHASES = (
+    "active_alert_load",
+    "symbol_collection",
+    "price_fetch",
+    "evaluation",
+    "write_back",
+    "notification",
+)
+THROUGHPUT_WINDOW_SECONDS = 300
+
 # ========================================
 # Monitoring Status Manager
 # ========================================
@@ -26,6 +45,162 @@ class MonitoringStatusManager:
             },
         }
         self._lock = threading.Lock()
+        self._init_performance_metrics()
+
+    def _init_performance_metrics(self):
+        self.phase_latency = {phase: LatencyHistogram() for phase in CHECK_PHASES}
+        self.cycle_latency = LatencyHistogram()
+        self.alert_evaluation_latency = LatencyHistogram()
+        self.due_lag = LatencyHistogram(DUE_LAG_BUCKETS)
+        self.notification_latency = LatencyHistogram()
+        self.alerts_checked_total = 0
+        self.last_cycle = {}
+        self._checked_window = deque()  # (timestamp, alerts checked)
+
+    def record_phase(self, phase: str, seconds: float):
+        """Record the duration of one phase of a check cycle"""
+        histogram = self.phase_latency.get(phase)
+        if histogram is not None:
+            histogram.observe(seconds)
+
+    def record_cycle(self, alerts_checked: int, seconds: float, phases: Dict[str, float]):
+        """Record a completed check cycle and the alerts it evaluated"""
+        self.cycle_latency.observe(seconds)
+        if alerts_checked and "evaluation" in phases:
+            self.alert_evaluation_latency.observe(phases["evaluation"] / alerts_checked)
+
+        now = time.time()
+        with self._lock:
+            self.alerts_checked_total += alerts_checked
+            self._checked_window.append((now, alerts_checked))
+            while self._checked_window and (
+                self._checked_window[0][0] < now - THROUGHPUT_WINDOW_SECONDS
+            ):
+                self._checked_window.popleft()
+            self.last_cycle = {
+                "alerts_checked": alerts_checked,
+                "duration_seconds": round(seconds, 6),
+                "alerts_per_second": (
+                    round(alerts_checked / seconds, 3) if seconds > 0 else None
+                ),
+                "phases": {phase: round(value, 6) for phase, value in phases.items()},
+                "completed_at": datetime.utcnow().isoformat(),
+            }
+
+    def record_due_lag(self, seconds: float):
+        """Record the delay between an alert's due time and its evaluation"""
+        self.due_lag.observe(seconds)
+
+    def record_notification_latency(self, seconds: float):
+        """Record the delay between queueing a notification and its delivery"""
+        self.notification_latency.observe(seconds)
+
+    def get_throughput(self) -> float:
+        """Alerts evaluated per second over the throughput window"""
+        now = time.time()
+        with self._lock:
+            checked = sum(
+                count
+                for timestamp, count in self._checked_window
+                if timestamp >= now - THROUGHPUT_WINDOW_SECONDS
+            )
+            uptime = (datetime.utcnow() - self.status_data["uptime_start"]).total_seconds()
+        window = min(THROUGHPUT_WINDOW_SECONDS, max(uptime, 1.0))
+        return round(checked / window, 3)
+
+    def get_performance(self) -> Dict:
+        """Get latency percentiles, due lag and throughput"""
+        with self._lock:
+            alerts_checked_total = self.alerts_checked_total
+            last_cycle = dict(self.last_cycle)
+        return {
+            "alerts_checked_total": alerts_checked_total,
+            "alerts_per_second": self.get_throughput(),
+            "throughput_window_seconds": THROUGHPUT_WINDOW_SECONDS,
+            "last_cycle": last_cycle,
+            "cycle_latency": self.cycle_latency.summary(),
+            "phase_latency": {
+                phase: histogram.summary()
+                for phase, histogram in self.phase_latency.items()
+            },
+            "alert_evaluation_latency": self.alert_evaluation_latency.summary(),
+            "due_lag": self.due_lag.summary(),
+            "notification_latency": self.notification_latency.summary(),
+        }
+
+    def render_metrics(
+        self, queue_depths: Optional[Dict[str, int]] = None, labels: Optional[Dict] = None
+    ) -> str:
+        """Render counters, gauges and histograms in the Prometheus text format"""
+        status = self.get_status()
+        writer = PrometheusWriter(labels)
+        writer.scalar(
+            "checks_total", "counter", "Completed check cycles", [({}, status["total_checks"])]
+        )
+        writer.scalar(
+            "alerts_checked_total",
+            "counter",
+            "Alerts evaluated",
+            [({}, self.alerts_checked_total)],
+        )
+        writer.scalar(
+            "alerts_triggered_total",
+            "counter",
+            "Alerts triggered",
+            [({}, status["total_triggered"])],
+        )
+        writer.scalar(
+            "errors_total", "counter", "Failed check cycles", [({}, status["errors_count"])]
+        )
+        writer.scalar(
+            "notifications_total",
+            "counter",
+            "Notification deliveries by channel and outcome",
+            [
+                ({"method": method, "result": outcome}, counts[outcome])
+                for method, counts in status["notification_stats"].items()
+                for outcome in ("sent", "failed")
+            ],
+        )
+        writer.scalar(
+            "alerts_per_second",
+            "gauge",
+            f"Alerts evaluated per second over the last {THROUGHPUT_WINDOW_SECONDS}s",
+            [({}, self.get_throughput())],
+        )
+        writer.scalar(
+            "queue_depth",
+            "gauge",
+            "Items waiting in the monitor queues",
+            [({"queue": name}, depth) for name, depth in (queue_depths or {}).items()],
+        )
+        writer.scalar(
+            "uptime_seconds", "gauge", "Seconds since start", [({}, status["uptime_seconds"])]
+        )
+        writer.histogram(
+            "phase_duration_seconds",
+            "Duration of each phase of a check cycle",
+            [({"phase": phase}, h) for phase, h in self.phase_latency.items()],
+        )
+        writer.histogram(
+            "cycle_duration_seconds", "Duration of a check cycle", [({}, self.cycle_latency)]
+        )
+        writer.histogram(
+            "alert_evaluation_seconds",
+            "Mean evaluation time per alert in a check cycle",
+            [({}, self.alert_evaluation_latency)],
+        )
+        writer.histogram(
+            "due_lag_seconds",
+            "Delay between an alert's due time and its evaluation",
+            [({}, self.due_lag)],
+        )
+        writer.histogram(
+            "notification_delivery_seconds",
+            "Delay between queueing and delivering a notification",
+            [({}, self.notification_latency)],
+        )
+        return writer.render()
 
     def record_check(self, triggered_count: int = 0):
         """Record a completed alert check"""
@@ -88,3 +263,4 @@ class MonitoringStatusManager:
                     },
                 }
             )
+            self._init_performance_metrics()
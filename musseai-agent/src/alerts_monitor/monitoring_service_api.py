@@ -85,6 +85,13 @@ class AlertMonitoringService:
             }
         
         return self.monitor.get_monitoring_status()
+
+    def get_metrics(self) -> str:
+        """Get monitoring metrics in the Prometheus text format"""
+        if not self.monitor:
+            return ""
+
+        return self.monitor.render_metrics()
     
     # def check_user_alerts(self, user_id: str) -> Dict:
     #     """Manually trigger alert check for a specific user"""
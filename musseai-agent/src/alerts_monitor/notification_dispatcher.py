@@ -0,0 +1,256 @@
+"""
+Outbound notification queue
+
+The alert check cycle only enqueues notifications. Each channel (email, SMS,
+push, webhook) has its own worker thread, so a slow SMTP server or webhook only
+delays its own channel. Notifications of one user arriving within the batch
+window are sent as a single digest, and failed deliveries are retried with
+exponential backoff without blocking other deliveries.
+"""
+
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from alerts_monitor.notification_sender import NotificationSender
+from alerts_monitor.types import MonitoringConfig, NotificationResult
+from mysql.model import NotificationMethod
+
+MAX_RETRY_DELAY_SECONDS = 300
+
+
+@dataclass
+class NotificationJob:
+    """One notification of a triggered alert through one channel"""
+
+    method: str
+    alert: Dict
+    trigger_data: Dict
+    history_id: Optional[int] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+
+# Called with the final (job, result) pairs of a delivered or abandoned batch
+DeliveryCallback = Callable[[List[Tuple[NotificationJob, NotificationResult]]], None]
+
+
+class NotificationDispatcher:
+    """Per-channel notification workers with batching and retries"""
+
+    def __init__(
+        self,
+        sender: NotificationSender,
+        config: MonitoringConfig,
+        on_delivered: Optional[DeliveryCallback] = None,
+        logger: logging.Logger = logging.getLogger("notification_dispatcher"),
+    ):
+        self.sender = sender
+        self.config = config
+        self.on_delivered = on_delivered
+        self.logger = logger
+        self.channels = [method.value for method in NotificationMethod]
+        self._queues: Dict[str, queue.Queue] = {
+            method: queue.Queue(maxsize=config.notification_queue_size)
+            for method in self.channels
+        }
+        self._retry_counts: Dict[str, int] = defaultdict(int)
+        self._stats: Dict[str, Dict[str, int]] = {
+            method: {"sent": 0, "failed": 0, "retried": 0, "batches": 0}
+            for method in self.channels
+        }
+        self._stats_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+    def start(self):
+        """Start one worker thread per channel"""
+        if self._running:
+            return
+        self._running = True
+        self._threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(method,),
+                daemon=True,
+                name=f"Notification-{method}",
+            )
+            for method in self.channels
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop the workers after draining queued notifications"""
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def enqueue(
+        self,
+        alert: Dict,
+        trigger_data: Dict,
+        methods: List[str],
+        history_id: Optional[int] = None,
+    ) -> int:
+        """Queue the notifications of a triggered alert, returns how many were queued"""
+        queued = 0
+        rejected = []
+        for method in methods:
+            job = NotificationJob(method, alert, trigger_data, history_id)
+            if not self.sender.is_enabled(method):
+                rejected.append(
+                    (
+                        job,
+                        NotificationResult(
+                            method=method,
+                            success=False,
+                            error=f"Notification method {method} is not enabled or supported",
+                        ),
+                    )
+                )
+                continue
+            try:
+                self._queues[method].put_nowait(job)
+                queued += 1
+            except queue.Full:
+                rejected.append(
+                    (
+                        job,
+                        NotificationResult(
+                            method=method,
+                            success=False,
+                            error=f"Notification queue for {method} is full",
+                        ),
+                    )
+                )
+
+        if rejected:
+            self._finish(rejected)
+        return queued
+
+    def _worker(self, method: str):
+        """Collect bursts from one channel queue and deliver them"""
+        jobs_queue = self._queues[method]
+        retries: List[Tuple[float, int, NotificationJob]] = []
+        counter = itertools.count()
+
+        while self._running or not jobs_queue.empty():
+            now = time.time()
+            wait = min(1.0, max(0.0, retries[0][0] - now)) if retries else 1.0
+            batch = []
+            try:
+                batch.append(jobs_queue.get(timeout=wait))
+                # Hold the batch window open so bursts are digested together
+                window_end = time.time() + self.config.notification_batch_window_seconds
+                while True:
+                    remaining = window_end - time.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(jobs_queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            except queue.Empty:
+                pass
+
+            now = time.time()
+            while retries and retries[0][0] <= now:
+                batch.append(heapq.heappop(retries)[2])
+            with self._stats_lock:
+                self._retry_counts[method] = len(retries)
+
+            if not batch:
+                continue
+
+            for failed in self._deliver(method, batch):
+                failed.attempts += 1
+                delay = min(
+                    self.config.retry_delay_seconds * 2 ** (failed.attempts - 1),
+                    MAX_RETRY_DELAY_SECONDS,
+                )
+                heapq.heappush(retries, (time.time() + delay, next(counter), failed))
+
+        if retries:
+            self.logger.warning(
+                f"Dropping {len(retries)} pending {method} notification retries on shutdown"
+            )
+
+    def _max_attempts(self, method: str) -> int:
+        if method == NotificationMethod.WEBHOOK.value:
+            return self.config.webhook_retries + 1
+        return max(1, self.config.retry_attempts)
+
+    def _deliver(self, method: str, jobs: List[NotificationJob]) -> List[NotificationJob]:
+        """Send jobs grouped per user as digests, returns the jobs to retry"""
+        by_user: Dict[str, List[NotificationJob]] = defaultdict(list)
+        for job in jobs:
+            by_user[job.alert["user_id"]].append(job)
+
+        to_retry = []
+        finished = []
+        for user_jobs in by_user.values():
+            for start in range(0, len(user_jobs), self.config.notification_max_batch_size):
+                chunk = user_jobs[start : start + self.config.notification_max_batch_size]
+                try:
+                    result = self.sender.send_batch(
+                        method, [(job.alert, job.trigger_data) for job in chunk]
+                    )
+                except Exception as e:
+                    result = NotificationResult(method=method, success=False, error=str(e))
+
+                with self._stats_lock:
+                    self._stats[method]["batches"] += 1
+
+                if result.success:
+                    finished.extend((job, result) for job in chunk)
+                    continue
+
+                retry_chunk = []
+                for job in chunk:
+                    if job.attempts + 1 < self._max_attempts(method):
+                        retry_chunk.append(job)
+                    else:
+                        finished.append((job, result))
+                if retry_chunk:
+                    self.logger.warning(
+                        f"{method} delivery failed, retrying {len(retry_chunk)} notifications: {result.error}"
+                    )
+                to_retry.extend(retry_chunk)
+
+        with self._stats_lock:
+            self._stats[method]["retried"] += len(to_retry)
+        if finished:
+            self._finish(finished)
+        return to_retry
+
+    def _finish(self, deliveries: List[Tuple[NotificationJob, NotificationResult]]):
+        with self._stats_lock:
+            for job, result in deliveries:
+                if job.method in self._stats:
+                    self._stats[job.method]["sent" if result.success else "failed"] += 1
+
+        if self.on_delivered:
+            try:
+                self.on_delivered(deliveries)
+            except Exception as e:
+                self.logger.error(f"Notification delivery callback failed: {e}")
+
+    def get_stats(self) -> Dict:
+        """Get per-channel queue depth and delivery counters"""
+        with self._stats_lock:
+            return {
+                method: {
+                    **self._stats[method],
+                    "queued": self._queues[method].qsize(),
+                    "pending_retries": self._retry_counts[method],
+                }
+                for method in self.channels
+            }
@@ -1,12 +1,13 @@
 import logging
 import smtplib
-import time
+import threading
 from datetime import datetime
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from alerts_monitor.types import MonitoringConfig,  NotificationResult
 import requests
+from requests.adapters import HTTPAdapter
 from jinja2 import Template
 
 # Import from existing modules
@@ -25,6 +26,18 @@ class NotificationSender:
         self.config = config
         self.logger = logging.getLogger("notification_sender")
         
+        # Pooled HTTP connections for push and webhook deliveries
+        self.http_session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=max(4, config.max_concurrent_checks)
+        )
+        self.http_session.mount("https://", adapter)
+        self.http_session.mount("http://", adapter)
+        
+        # Persistent SMTP connection, reopened when the server drops it
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.Lock()
+        
         # Email templates
         self.email_template = Template("""
 <!DOCTYPE html>
@@ -65,6 +78,39 @@ class NotificationSender:
 </html>
         """)
         
+        self.digest_email_template = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background-color: #f8f9fa; padding: 20px; border-radius: 5px; }
+        .alert-info { background-color: #fff3cd; padding: 15px; border-left: 4px solid #ffc107; margin: 20px 0; }
+        .footer { margin-top: 30px; font-size: 12px; color: #666; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h2>🚨 {{ alerts|length }} Portfolio Alerts Triggered</h2>
+        <p><strong>User ID:</strong> {{ user_id }}</p>
+    </div>
+    {% for item in alerts %}
+    <div class="alert-info">
+        <h3>{{ item.alert_name }} ({{ item.alert_type }})</h3>
+        <p>{{ item.message }}</p>
+        <p><strong>Current Value:</strong> {{ item.current_value }} &middot;
+           <strong>Threshold Value:</strong> {{ item.threshold_value }} &middot;
+           <strong>Triggered:</strong> {{ item.triggered_at }}</p>
+    </div>
+    {% endfor %}
+    <div class="footer">
+        <p>This is an automated alert from your Portfolio Monitoring System.</p>
+        <p>To manage your alerts, please log in to your account.</p>
+    </div>
+</body>
+</html>
+        """)
+        
         self.sms_template = Template(
             "🚨 ALERT: {{ alert_name }}\n"
             "{{ message }}\n"
@@ -73,6 +119,58 @@ class NotificationSender:
             "Time: {{ triggered_at }}"
         )
     
+    def is_enabled(self, method: str) -> bool:
+        """Whether a notification method is supported and enabled"""
+        return {
+            NotificationMethod.EMAIL.value: self.config.enable_email,
+            NotificationMethod.SMS.value: self.config.enable_sms,
+            NotificationMethod.PUSH.value: self.config.enable_push,
+            NotificationMethod.WEBHOOK.value: self.config.enable_webhook,
+        }.get(method, False)
+    
+    def send_batch(self, method: str, items: List[Tuple[Dict, Dict]]) -> NotificationResult:
+        """Send several (alert, trigger_data) notifications of one user as a single digest"""
+        if len(items) == 1:
+            return self.send_notification(method, *items[0])
+        alert, trigger_data = self._build_digest(items)
+        return self.send_notification(method, alert, trigger_data)
+    
+    def _build_digest(self, items: List[Tuple[Dict, Dict]]) -> Tuple[Dict, Dict]:
+        """Combine the notifications of one user into one digest alert"""
+        first_alert = items[0][0]
+        alerts = [
+            {
+                "alert_id": alert["alert_id"],
+                "alert_name": alert["alert_name"],
+                "alert_type": alert["alert_type"],
+                "message": trigger_data["message"],
+                "current_value": trigger_data.get("current_value"),
+                "threshold_value": trigger_data.get("threshold_value"),
+                "triggered_at": trigger_data["triggered_at"],
+            }
+            for alert, trigger_data in items
+        ]
+        digest_alert = {
+            "alert_id": first_alert["alert_id"],
+            "user_id": first_alert["user_id"],
+            "alert_type": "DIGEST",
+            "alert_name": f"{len(items)} alerts triggered",
+        }
+        digest_trigger_data = {
+            "message": "\n".join(f"{a['alert_name']}: {a['message']}" for a in alerts),
+            "current_value": "N/A",
+            "threshold_value": "N/A",
+            "triggered_at": max(a["triggered_at"] for a in alerts),
+            "alerts": alerts,
+        }
+        return digest_alert, digest_trigger_data
+    
+    def close(self):
+        """Close pooled connections"""
+        with self._smtp_lock:
+            self._close_smtp()
+        self.http_session.close()
+    
     def send_notification(self, method: str, alert: Dict, trigger_data: Dict) -> NotificationResult:
         """Send notification using specified method"""
         try:
@@ -103,15 +201,21 @@ class NotificationSender:
         """Send email notification"""
         try:
             # Render email content
-            html_content = self.email_template.render(
-                alert_name=alert["alert_name"],
-                alert_type=alert["alert_type"],
-                message=trigger_data["message"],
-                current_value=trigger_data.get("current_value", "N/A"),
-                threshold_value=trigger_data.get("threshold_value", "N/A"),
-                triggered_at=trigger_data["triggered_at"],
-                user_id=alert["user_id"]
-            )
+            if trigger_data.get("alerts"):
+                html_content = self.digest_email_template.render(
+                    alerts=trigger_data["alerts"],
+                    user_id=alert["user_id"]
+                )
+            else:
+                html_content = self.email_template.render(
+                    alert_name=alert["alert_name"],
+                    alert_type=alert["alert_type"],
+                    message=trigger_data["message"],
+                    current_value=trigger_data.get("current_value", "N/A"),
+                    threshold_value=trigger_data.get("threshold_value", "N/A"),
+                    triggered_at=trigger_data["triggered_at"],
+                    user_id=alert["user_id"]
+                )
             
             # Create email message
             msg = MIMEMultipart('alternative')
@@ -123,11 +227,8 @@ class NotificationSender:
             html_part = MIMEText(html_content, 'html')
             msg.attach(html_part)
             
-            # Send email
-            with smtplib.SMTP(self.config.smtp_server, self.config.smtp_port) as server:
-                server.starttls()
-                server.login(self.config.smtp_username, self.config.smtp_password)
-                server.send_message(msg)
+            # Send email over the persistent connection
+            self._send_smtp_message(msg)
             
             self.logger.info(f"Email sent successfully for alert {alert['alert_id']}")
             return NotificationResult(
@@ -144,6 +245,35 @@ class NotificationSender:
                 error=str(e)
             )
     
+    def _send_smtp_message(self, msg: MIMEMultipart):
+        """Send a message, reconnecting once if the server closed the connection"""
+        with self._smtp_lock:
+            for attempt in range(2):
+                try:
+                    if self._smtp is None:
+                        server = smtplib.SMTP(
+                            self.config.smtp_server,
+                            self.config.smtp_port,
+                            timeout=self.config.notification_timeout_seconds
+                        )
+                        server.starttls()
+                        server.login(self.config.smtp_username, self.config.smtp_password)
+                        self._smtp = server
+                    self._smtp.send_message(msg)
+                    return
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    self._close_smtp()
+                    if attempt == 1:
+                        raise
+    
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+    
     def _send_sms(self, alert: Dict, trigger_data: Dict) -> NotificationResult:
         """Send SMS notification using Twilio"""
         try:
@@ -217,7 +347,7 @@ class NotificationSender:
             }
             
             # Send push notification
-            response = requests.post(
+            response = self.http_session.post(
                 "https://fcm.googleapis.com/fcm/send",
                 json=fcm_payload,
                 headers=headers,
@@ -268,37 +398,33 @@ class NotificationSender:
                     "triggered_at": trigger_data["triggered_at"]
                 }
             }
+            if trigger_data.get("alerts"):
+                webhook_payload["event"] = "alerts_triggered"
+                webhook_payload["alerts"] = trigger_data["alerts"]
             
-            # Send webhook with retries
-            for attempt in range(self.config.webhook_retries + 1):
-                try:
-                    response = requests.post(
-                        webhook_url,
-                        json=webhook_payload,
-                        timeout=self.config.webhook_timeout,
-                        headers={"Content-Type": "application/json"}
-                    )
-                    
-                    if response.status_code in [200, 201, 202]:
-                        self.logger.info(f"Webhook sent successfully for alert {alert['alert_id']}")
-                        return NotificationResult(
-                            method=NotificationMethod.WEBHOOK.value,
-                            success=True,
-                            response_data={
-                                "status_code": response.status_code,
-                                "webhook_url": webhook_url,
-                                "attempt": attempt + 1
-                            }
-                        )
-                    else:
-                        if attempt == self.config.webhook_retries:
-                            raise Exception(f"Webhook failed with status {response.status_code}")
-                        time.sleep(2 ** attempt)  # Exponential backoff
-                        
-                except requests.exceptions.Timeout:
-                    if attempt == self.config.webhook_retries:
-                        raise Exception("Webhook request timed out")
-                    time.sleep(2 ** attempt)
+            # Retries with backoff are handled by the notification dispatcher
+            try:
+                response = self.http_session.post(
+                    webhook_url,
+                    json=webhook_payload,
+                    timeout=self.config.webhook_timeout,
+                    headers={"Content-Type": "application/json"}
+                )
+            except requests.exceptions.Timeout:
+                raise Exception("Webhook request timed out")
+            
+            if response.status_code not in [200, 201, 202]:
+                raise Exception(f"Webhook failed with status {response.status_code}")
+            
+            self.logger.info(f"Webhook sent successfully for alert {alert['alert_id']}")
+            return NotificationResult(
+                method=NotificationMethod.WEBHOOK.value,
+                success=True,
+                response_data={
+                    "status_code": response.status_code,
+                    "webhook_url": webhook_url
+                }
+            )
                     
         except Exception as e:
             self.logger.error(f"Webhook send failed: {e}")
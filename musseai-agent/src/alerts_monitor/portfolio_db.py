@@ -1,10 +1,9 @@
 from datetime import datetime
 from typing import  Dict
 from mysql.db import get_db
+from mysql.portfolio_summary import query_user_portfolio_summary
 from mysql.model import (
     PortfolioSourceModel,
-    AssetModel,
-    PositionModel,
     TransactionModel,
     TransactionType,
 )
@@ -30,159 +29,7 @@ def get_user_portfolio_summary(user_id: str) -> Dict:
     """
     try:
         with get_db() as db:
-            # Get all active sources for user
-            sources = (
-                db.query(PortfolioSourceModel)
-                .filter(
-                    PortfolioSourceModel.user_id == user_id,
-                    PortfolioSourceModel.is_active == True,
-                )
-                .all()
-            )
-
-            if not sources:
-                return {
-                    "total_value": 0,
-                    "total_cost": 0,
-                    "total_pnl": 0,
-                    "total_pnl_percentage": 0,
-                    "source_count": 0,
-                    "asset_count": 0,
-                    "positions_by_source": [],
-                    "positions_by_asset": [],
-                    "allocation": [],
-                }
-
-            source_ids = [s.source_id for s in sources]
-
-            # Get all positions
-            positions = (
-                db.query(PositionModel)
-                .join(AssetModel)
-                .filter(
-                    PositionModel.source_id.in_(source_ids), PositionModel.quantity > 0
-                )
-                .all()
-            )
-
-            # Calculate totals and group by asset
-            total_value = 0
-            total_cost = 0
-            positions_by_source = {}
-            positions_by_asset = {}
-
-            for position in positions:
-                asset = position.asset
-                source = next(s for s in sources if s.source_id == position.source_id)
-
-                # Calculate position value
-                position_value = 0
-                position_cost = 0
-
-                if position.last_price:
-                    position_value = float(position.quantity * position.last_price)
-                    total_value += position_value
-
-                if position.avg_cost:
-                    position_cost = float(position.quantity * position.avg_cost)
-                    total_cost += position_cost
-
-                # Group by source
-                if source.source_id not in positions_by_source:
-                    positions_by_source[source.source_id] = {
-                        "source_name": source.source_name,
-                        "source_type": source.source_type.value,
-                        "total_value": 0,
-                        "position_count": 0,
-                    }
-
-                positions_by_source[source.source_id]["total_value"] += position_value
-                positions_by_source[source.source_id]["position_count"] += 1
-
-                # Group by asset
-                asset_key = f"{asset.symbol}_{asset.chain}"
-                if asset_key not in positions_by_asset:
-                    positions_by_asset[asset_key] = {
-                        "asset_id": asset.asset_id,
-                        "symbol": asset.symbol,
-                        "name": asset.name,
-                        "chain": asset.chain,
-                        "total_quantity": 0,
-                        "total_value": 0,
-                        "total_cost": 0,
-                        "sources": [],
-                    }
-
-                positions_by_asset[asset_key]["total_quantity"] += float(
-                    position.quantity
-                )
-                positions_by_asset[asset_key]["total_value"] += position_value
-                positions_by_asset[asset_key]["total_cost"] += position_cost
-                positions_by_asset[asset_key]["sources"].append(source.source_name)
-
-            # Calculate overall P&L
-            total_pnl = total_value - total_cost
-            total_pnl_percentage = (
-                (total_pnl / total_cost * 100) if total_cost > 0 else 0
-            )
-
-            # Calculate allocation
-            allocation = []
-            if total_value > 0:
-                for asset_key, asset_data in positions_by_asset.items():
-                    if asset_data["total_value"] > 0:
-                        allocation.append(
-                            {
-                                "asset": f"{asset_data['symbol']} ({asset_data['chain']})",
-                                "value": asset_data["total_value"],
-                                "percentage": (
-                                    asset_data["total_value"] / total_value * 100
-                                ),
-                                "quantity": asset_data["total_quantity"],
-                            }
-                        )
-
-                # Sort allocation by value
-                allocation.sort(key=lambda x: x["value"], reverse=True)
-
-            # Convert dictionaries to lists
-            positions_by_source_list = list(positions_by_source.values())
-            positions_by_asset_list = []
-
-            for asset_key, asset_data in positions_by_asset.items():
-                pnl = asset_data["total_value"] - asset_data["total_cost"]
-                pnl_percentage = (
-                    (pnl / asset_data["total_cost"] * 100)
-                    if asset_data["total_cost"] > 0
-                    else 0
-                )
-
-                positions_by_asset_list.append(
-                    {
-                        "asset_id": asset_data["asset_id"],
-                        "symbol": asset_data["symbol"],
-                        "name": asset_data["name"],
-                        "chain": asset_data["chain"],
-                        "total_quantity": asset_data["total_quantity"],
-                        "total_value": asset_data["total_value"],
-                        "total_cost": asset_data["total_cost"],
-                        "pnl": pnl,
-                        "pnl_percentage": pnl_percentage,
-                        "sources": list(set(asset_data["sources"])),
-                    }
-                )
-
-            return {
-                "total_value": total_value,
-                "total_cost": total_cost,
-                "total_pnl": total_pnl,
-                "total_pnl_percentage": total_pnl_percentage,
-                "source_count": len(sources),
-                "asset_count": len(positions_by_asset),
-                "positions_by_source": positions_by_source_list,
-                "positions_by_asset": positions_by_asset_list,
-                "allocation": allocation,
-            }
+            return query_user_portfolio_summary(db, user_id)
     except Exception as e:
         logger.error(f"Exception:{e}\n{traceback.format_exc()}")
         return {"error": f"Failed to get portfolio summary: {str(e)}"}
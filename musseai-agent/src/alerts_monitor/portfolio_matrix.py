@@ -0,0 +1,400 @@
+"""
+Vectorized evaluation of portfolio-level alerts
+
+Loads the positions of all users with portfolio alerts into a dense
+(users x assets) quantity matrix in one aggregated query and prices it with the
+cycle's price vector. Portfolio values, allocation weights, HHI concentration
+and top-N concentration of every user then come out of a few NumPy operations,
+and PORTFOLIO_VALUE, RISK, REBALANCING and VOLATILITY conditions are evaluated
+as array comparisons. Results use the same format and messages as the
+per-alert ``_evaluate_*_alert`` functions in ``alert_conditions``.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from mysql.db import get_db
+from mysql.model import AssetModel, PortfolioSourceModel, PositionModel
+
+BATCH_ALERT_TYPES = ("PORTFOLIO_VALUE", "RISK", "REBALANCING", "VOLATILITY")
+# Risk metrics derived from positions alone; others need the per-user snapshot
+BATCH_RISK_METRICS = ("concentration", "volatility", "var", "beta")
+
+
+def is_batch_evaluable(alert: Dict) -> bool:
+    """Whether an alert can be evaluated from the portfolio matrix"""
+    alert_type = alert.get("alert_type")
+    if alert_type not in BATCH_ALERT_TYPES:
+        return False
+    if alert_type == "RISK":
+        return (alert.get("conditions") or {}).get("metric") in BATCH_RISK_METRICS
+    return True
+
+
+@dataclass
+class PortfolioMatrix:
+    """Per-user portfolio aggregates computed from a users x assets matrix"""
+
+    user_index: Dict[str, int]
+    asset_index: Dict[str, int]  # "{symbol}_{chain}" -> column
+    values: np.ndarray  # (users, assets) position values in USD
+    total_values: np.ndarray  # (users,)
+    weights: np.ndarray  # (users, assets) allocation in percent
+    concentration: np.ndarray  # (users,) HHI x 100
+    largest_position: np.ndarray  # (users,) percent
+    top_3_concentration: np.ndarray  # (users,) percent
+    asset_counts: np.ndarray  # (users,)
+    volatility_scores: np.ndarray  # (users,)
+
+    @classmethod
+    def load(cls, user_ids: Iterable[str], price_data: Dict = None) -> "PortfolioMatrix":
+        """
+        Load the positions of several users and price them with the cycle's prices
+
+        Assets without a cycle price fall back to their stored last_price.
+        """
+        user_ids = sorted(set(user_ids))
+        user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+        rows = []
+        if user_ids:
+            with get_db() as db:
+                rows = (
+                    db.query(
+                        PortfolioSourceModel.user_id,
+                        AssetModel.symbol,
+                        AssetModel.chain,
+                        func.sum(PositionModel.quantity),
+                        func.sum(PositionModel.quantity * PositionModel.last_price),
+                    )
+                    .join(
+                        PositionModel,
+                        PositionModel.source_id == PortfolioSourceModel.source_id,
+                    )
+                    .join(AssetModel, AssetModel.asset_id == PositionModel.asset_id)
+                    .filter(
+                        PortfolioSourceModel.user_id.in_(user_ids),
+                        PortfolioSourceModel.is_active == True,
+                        PositionModel.quantity > 0,
+                    )
+                    .group_by(
+                        PortfolioSourceModel.user_id, AssetModel.symbol, AssetModel.chain
+                    )
+                    .all()
+                )
+
+        asset_index: Dict[str, int] = {}
+        asset_symbols: List[str] = []
+        for _, symbol, chain, _, _ in rows:
+            key = f"{symbol}_{chain}"
+            if key not in asset_index:
+                asset_index[key] = len(asset_index)
+                asset_symbols.append(symbol)
+
+        shape = (len(user_ids), len(asset_index))
+        quantities = np.zeros(shape)
+        stored_values = np.zeros(shape)
+        held = np.zeros(shape, dtype=bool)
+        if rows:
+            r = np.fromiter((user_index[row[0]] for row in rows), np.int64, len(rows))
+            c = np.fromiter(
+                (asset_index[f"{row[1]}_{row[2]}"] for row in rows), np.int64, len(rows)
+            )
+            quantities[r, c] = [float(row[3] or 0) for row in rows]
+            stored_values[r, c] = [float(row[4] or 0) for row in rows]
+            held[r, c] = True
+
+        prices = np.full(len(asset_symbols), np.nan)
+        for column, symbol in enumerate(asset_symbols):
+            price_info = (price_data or {}).get(symbol)
+            if price_info and price_info.get("price"):
+                prices[column] = float(price_info["price"])
+
+        values = np.where(np.isfinite(prices), quantities * prices, stored_values)
+        return cls.from_values(user_index, asset_index, values, held)
+
+    @classmethod
+    def from_values(
+        cls,
+        user_index: Dict[str, int],
+        asset_index: Dict[str, int],
+        values: np.ndarray,
+        held: Optional[np.ndarray] = None,
+    ) -> "PortfolioMatrix":
+        """Derive all per-user aggregates from a position value matrix"""
+        values = np.asarray(values, dtype=np.float64).reshape(
+            len(user_index), len(asset_index)
+        )
+        held = values > 0 if held is None else held
+        total_values = values.sum(axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weights = np.where(
+                total_values[:, None] > 0, values / total_values[:, None] * 100, 0.0
+            )
+        weights = np.where(values > 0, weights, 0.0)
+
+        concentration = np.clip(((weights / 100) ** 2).sum(axis=1) * 100, 0, 100)
+        if weights.shape[1]:
+            ranked = -np.sort(-weights, axis=1)
+            largest_position = ranked[:, 0]
+            top_3_concentration = ranked[:, :3].sum(axis=1)
+        else:
+            largest_position = np.zeros(len(user_index))
+            top_3_concentration = np.zeros(len(user_index))
+
+        # Same heuristic as _calculate_volatility_score
+        asset_counts = held.sum(axis=1)
+        volatility_scores = np.where(
+            asset_counts > 0, np.clip(10 + asset_counts * 2, 5, 50), 15.0
+        ).astype(np.float64)
+
+        return cls(
+            user_index=user_index,
+            asset_index=asset_index,
+            values=values,
+            total_values=total_values,
+            weights=weights,
+            concentration=concentration,
+            largest_position=largest_position,
+            top_3_concentration=top_3_concentration,
+            asset_counts=asset_counts,
+            volatility_scores=volatility_scores,
+        )
+
+
+def _empty_result() -> Dict:
+    return {
+        "triggered": False,
+        "current_value": None,
+        "threshold_value": None,
+        "message": "",
+        "distance_to_trigger": "",
+        "distance_percent": None,
+    }
+
+
+def _conditions_column(alerts: List[Dict], key: str, default) -> np.ndarray:
+    return np.array(
+        [float((a.get("conditions") or {}).get(key, default)) for a in alerts],
+        dtype=np.float64,
+    )
+
+
+def evaluate_portfolio_alerts(
+    alerts: List[Dict], matrix: PortfolioMatrix
+) -> Dict[int, Dict]:
+    """
+    Evaluate batch-evaluable portfolio alerts against a portfolio matrix
+
+    Returns:
+        Dict[int, Dict]: alert_id -> evaluation result (see _evaluate_alert_condition)
+    """
+    results: Dict[int, Dict] = {}
+    by_type: Dict[str, List[Dict]] = {}
+    for alert in alerts:
+        by_type.setdefault(alert["alert_type"], []).append(alert)
+
+    for alert_type, typed_alerts in by_type.items():
+        try:
+            rows = np.array(
+                [matrix.user_index[a["user_id"]] for a in typed_alerts], dtype=np.int64
+            )
+            if alert_type == "PORTFOLIO_VALUE":
+                evaluated = _evaluate_portfolio_value(typed_alerts, rows, matrix)
+            elif alert_type == "RISK":
+                evaluated = _evaluate_risk(typed_alerts, rows, matrix)
+            elif alert_type == "VOLATILITY":
+                evaluated = _evaluate_volatility(typed_alerts, rows, matrix)
+            elif alert_type == "REBALANCING":
+                evaluated = _evaluate_rebalancing(typed_alerts, rows, matrix)
+            else:
+                continue
+        except Exception as e:
+            evaluated = []
+            for _ in typed_alerts:
+                result = _empty_result()
+                result["message"] = f"Error: {str(e)}"
+                evaluated.append(result)
+
+        for alert, result in zip(typed_alerts, evaluated):
+            results[alert["alert_id"]] = result
+
+    return results
+
+
+def _evaluate_portfolio_value(
+    alerts: List[Dict], rows: np.ndarray, matrix: PortfolioMatrix
+) -> List[Dict]:
+    conditions = np.array([(a.get("conditions") or {}).get("condition") for a in alerts])
+    targets = _conditions_column(alerts, "target_value", 0)
+    change_thresholds = _conditions_column(alerts, "change_threshold", 10)
+    current = matrix.total_values[rows]
+
+    above = (conditions == "above") & (current > targets)
+    below = (conditions == "below") & (current < targets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # For percentage change the target doubles as baseline, as in the scalar path
+        change = (current - targets) / targets * 100
+        distance = np.abs((current - targets) / targets * 100)
+    changed = (
+        (conditions == "change_percent")
+        & (targets > 0)
+        & (np.abs(change) >= change_thresholds)
+    )
+    triggered = above | below | changed
+
+    results = []
+    for i in range(len(alerts)):
+        result = _empty_result()
+        current_value, target_value = float(current[i]), float(targets[i])
+        result["current_value"] = current_value
+        result["threshold_value"] = target_value
+        if above[i]:
+            result["message"] = (
+                f"Portfolio value ${current_value:.2f} exceeded target ${target_value}"
+            )
+        elif below[i]:
+            result["message"] = (
+                f"Portfolio value ${current_value:.2f} dropped below target ${target_value}"
+            )
+        elif changed[i]:
+            direction = "increased" if change[i] > 0 else "decreased"
+            result["message"] = (
+                f"Portfolio value {direction} by {abs(change[i]):.1f}% (threshold: {change_thresholds[i]}%)"
+            )
+        elif conditions[i] in ("above", "below") and np.isfinite(distance[i]):
+            direction = "above" if current_value > target_value else "below"
+            result["distance_percent"] = float(distance[i])
+            result["distance_to_trigger"] = f"{distance[i]:.1f}% {direction} target"
+        result["triggered"] = bool(triggered[i])
+        results.append(result)
+    return results
+
+
+def _evaluate_risk(
+    alerts: List[Dict], rows: np.ndarray, matrix: PortfolioMatrix
+) -> List[Dict]:
+    metrics = [(a.get("conditions") or {}).get("metric") for a in alerts]
+    thresholds = _conditions_column(alerts, "threshold", 0)
+    metric_values = {
+        "concentration": matrix.concentration[rows],
+        "volatility": matrix.volatility_scores[rows],
+        "var": matrix.volatility_scores[rows] * 1.65,  # 95% VaR approximation
+        "beta": np.ones(len(rows)),  # Simplified beta
+    }
+    current = np.array(
+        [
+            metric_values[metric][i] if metric in metric_values else np.nan
+            for i, metric in enumerate(metrics)
+        ]
+    )
+    return _threshold_results(
+        current,
+        thresholds,
+        lambda i, value: f"Risk metric '{metrics[i]}' at {value:.1f} exceeds threshold {thresholds[i]}",
+        lambda distance: f"{distance:.1f}% below threshold",
+        missing=lambda i: f"Risk metric '{metrics[i]}' not available",
+    )
+
+
+def _evaluate_volatility(
+    alerts: List[Dict], rows: np.ndarray, matrix: PortfolioMatrix
+) -> List[Dict]:
+    thresholds = _conditions_column(alerts, "threshold", 20)
+    return _threshold_results(
+        matrix.volatility_scores[rows],
+        thresholds,
+        lambda i, value: f"Portfolio volatility at {value:.1f}% exceeds {thresholds[i]}% threshold",
+        lambda distance: f"{distance:.1f}% below volatility threshold",
+    )
+
+
+def _threshold_results(
+    current: np.ndarray,
+    thresholds: np.ndarray,
+    triggered_message,
+    distance_message,
+    missing=None,
+) -> List[Dict]:
+    """Results of "current exceeds threshold" conditions"""
+    triggered = current > thresholds
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distance = (thresholds - current) / thresholds * 100
+
+    results = []
+    for i in range(len(current)):
+        result = _empty_result()
+        if not np.isfinite(current[i]):
+            result["message"] = missing(i) if missing else ""
+            results.append(result)
+            continue
+
+        value = float(current[i])
+        result["current_value"] = value
+        result["threshold_value"] = float(thresholds[i])
+        if triggered[i]:
+            result["triggered"] = True
+            result["message"] = triggered_message(i, value)
+        elif np.isfinite(distance[i]):
+            result["distance_percent"] = float(distance[i])
+            result["distance_to_trigger"] = distance_message(distance[i])
+        results.append(result)
+    return results
+
+
+def _evaluate_rebalancing(
+    alerts: List[Dict], rows: np.ndarray, matrix: PortfolioMatrix
+) -> List[Dict]:
+    thresholds = _conditions_column(alerts, "deviation_threshold", 5)
+
+    # Flatten every (alert, target asset) pair into parallel arrays
+    pair_alert, pair_column, pair_target, pair_asset = [], [], [], []
+    for i, alert in enumerate(alerts):
+        targets = (alert.get("conditions") or {}).get("target_allocations", {})
+        for asset_key, target_percent in targets.items():
+            pair_alert.append(i)
+            pair_column.append(matrix.asset_index.get(asset_key, -1))
+            pair_target.append(float(target_percent))
+            pair_asset.append(asset_key)
+
+    pair_alert = np.array(pair_alert, dtype=np.int64)
+    pair_column = np.array(pair_column, dtype=np.int64)
+    pair_target = np.array(pair_target, dtype=np.float64)
+
+    current_percent = np.zeros(len(pair_alert))
+    known = pair_column >= 0
+    current_percent[known] = matrix.weights[rows[pair_alert[known]], pair_column[known]]
+    deviation = np.abs(current_percent - pair_target)
+    deviating = deviation > thresholds[pair_alert]
+
+    max_deviation = np.zeros(len(alerts))
+    np.maximum.at(max_deviation, pair_alert, deviation)
+
+    deviating_assets: Dict[int, List[str]] = {}
+    for pair in np.flatnonzero(deviating):
+        deviating_assets.setdefault(int(pair_alert[pair]), []).append(pair_asset[pair])
+
+    results = []
+    for i in range(len(alerts)):
+        result = _empty_result()
+        result["current_value"] = float(max_deviation[i])
+        result["threshold_value"] = float(thresholds[i])
+        if i in deviating_assets:
+            result["triggered"] = True
+            result["message"] = (
+                f"Rebalancing needed: {', '.join(deviating_assets[i][:3])} deviate by up to {max_deviation[i]:.1f}%"
+            )
+        else:
+            if thresholds[i] > 0:
+                result["distance_percent"] = float(
+                    (thresholds[i] - max_deviation[i]) / thresholds[i] * 100
+                )
+            result["distance_to_trigger"] = (
+                f"All assets within {thresholds[i]}% of target allocation"
+            )
+        results.append(result)
+    return results
@@ -0,0 +1,218 @@
+"""
+Event-driven evaluation of PRICE alerts
+
+Keeps, per symbol, the "above" and "below" thresholds of all active PRICE alerts
+in sorted arrays. When a new price arrives, the alerts crossed between the
+previous and the new price are found by bisection, so a tick costs
+O(log n + triggered) instead of evaluating every alert.
+
+Alerts seen for the first time are checked once against the current price
+(``above``/``below`` fire while the condition holds); ``crosses_above`` and
+``crosses_below`` only fire on an actual crossing between two observed prices.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ABOVE_CONDITIONS = ("above", "crosses_above")
+BELOW_CONDITIONS = ("below", "crosses_below")
+CROSSING_CONDITIONS = ("crosses_above", "crosses_below")
+
+
+class _ThresholdBook:
+    """Sorted thresholds of one symbol and direction with their alert ids"""
+
+    def __init__(self, entries: List[Tuple[float, int, bool]]):
+        entries = sorted(entries)
+        self.thresholds = np.array([e[0] for e in entries], dtype=np.float64)
+        self.alert_ids = np.array([e[1] for e in entries], dtype=np.int64)
+        self.crossing = np.array([e[2] for e in entries], dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.thresholds)
+
+    def slice(self, start: int, end: int) -> List[Tuple[int, float]]:
+        return list(
+            zip(self.alert_ids[start:end].tolist(), self.thresholds[start:end].tolist())
+        )
+
+    def remove(self, alert_ids: List[int]):
+        keep = ~np.isin(self.alert_ids, alert_ids)
+        self.thresholds = self.thresholds[keep]
+        self.alert_ids = self.alert_ids[keep]
+        self.crossing = self.crossing[keep]
+
+
+class PriceTriggerIndex:
+    """Per-symbol sorted threshold index of PRICE alerts"""
+
+    def __init__(self):
+        self._alerts: Dict[int, Tuple[str, str, float]] = {}
+        self._above: Dict[str, _ThresholdBook] = {}
+        self._below: Dict[str, _ThresholdBook] = {}
+        self._last_prices: Dict[str, float] = {}
+        # Newly registered alerts still to be checked against the current price
+        self._pending: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(alert: Dict) -> Optional[Tuple[str, str, float]]:
+        """Get (symbol, condition, target_price) of an indexable PRICE alert"""
+        if alert.get("alert_type") != "PRICE":
+            return None
+        conditions = alert.get("conditions") or {}
+        symbol = conditions.get("asset_symbol")
+        condition = conditions.get("condition")
+        if not symbol or condition not in ABOVE_CONDITIONS + BELOW_CONDITIONS:
+            return None
+        try:
+            target_price = float(conditions.get("target_price", 0))
+        except (TypeError, ValueError):
+            return None
+        if target_price <= 0:
+            return None
+        return symbol.upper(), condition, target_price
+
+    def sync(self, alerts: List[Dict]):
+        """Make the index match the given active PRICE alerts"""
+        parsed = {}
+        for alert in alerts:
+            entry = self.parse(alert)
+            if entry is not None:
+                parsed[alert["alert_id"]] = entry
+
+        with self._lock:
+            if parsed == self._alerts:
+                return
+
+            changed = {
+                entry[0]
+                for alert_id, entry in parsed.items()
+                if self._alerts.get(alert_id) != entry
+            }
+            changed |= {
+                entry[0]
+                for alert_id, entry in self._alerts.items()
+                if parsed.get(alert_id) != entry
+            }
+
+            for alert_id, entry in parsed.items():
+                if self._alerts.get(alert_id) != entry:
+                    self._pending.setdefault(entry[0], set()).add(alert_id)
+            self._alerts = parsed
+
+            for symbol in changed:
+                self._rebuild(symbol)
+
+    def _rebuild(self, symbol: str):
+        """Rebuild the threshold books of one symbol"""
+        above, below = [], []
+        for alert_id, (alert_symbol, condition, target_price) in self._alerts.items():
+            if alert_symbol != symbol:
+                continue
+            entry = (target_price, alert_id, condition in CROSSING_CONDITIONS)
+            (above if condition in ABOVE_CONDITIONS else below).append(entry)
+
+        for books, entries in ((self._above, above), (self._below, below)):
+            if entries:
+                books[symbol] = _ThresholdBook(entries)
+            else:
+                books.pop(symbol, None)
+
+        pending = self._pending.get(symbol)
+        if pending:
+            pending &= {
+                alert_id
+                for alert_id, entry in self._alerts.items()
+                if entry[0] == symbol
+            }
+        if symbol not in self._above and symbol not in self._below:
+            self._pending.pop(symbol, None)
+            self._last_prices.pop(symbol, None)
+
+    def on_price(self, symbol: str, price: float) -> List[Dict]:
+        """
+        Process a price tick and return the alerts it triggers
+
+        Triggered alerts are removed from the index so they fire only once.
+
+        Returns:
+            List[Dict]: alert_id, symbol, condition, current_value and threshold_value
+        """
+        symbol = symbol.upper()
+        with self._lock:
+            above = self._above.get(symbol)
+            below = self._below.get(symbol)
+            if above is None and below is None:
+                return []
+
+            previous = self._last_prices.get(symbol)
+            self._last_prices[symbol] = price
+            hits: List[Tuple[int, float]] = []
+
+            if previous is not None and price > previous and above is not None:
+                # Thresholds with previous <= target < price were crossed upwards
+                start = np.searchsorted(above.thresholds, previous, side="left")
+                end = np.searchsorted(above.thresholds, price, side="left")
+                hits.extend(above.slice(start, end))
+            elif previous is not None and price < previous and below is not None:
+                # Thresholds with price < target <= previous were crossed downwards
+                start = np.searchsorted(below.thresholds, price, side="right")
+                end = np.searchsorted(below.thresholds, previous, side="right")
+                hits.extend(below.slice(start, end))
+
+            pending = self._pending.pop(symbol, set())
+            if pending:
+                hit_ids = {alert_id for alert_id, _ in hits}
+                for alert_id in pending - hit_ids:
+                    _, condition, target_price = self._alerts[alert_id]
+                    if (condition == "above" and price > target_price) or (
+                        condition == "below" and price < target_price
+                    ):
+                        hits.append((alert_id, target_price))
+
+            if not hits:
+                return []
+
+            triggered = []
+            for alert_id, target_price in hits:
+                condition = self._alerts[alert_id][1]
+                triggered.append(
+                    {
+                        "alert_id": alert_id,
+                        "symbol": symbol,
+                        "condition": condition,
+                        "current_value": price,
+                        "threshold_value": target_price,
+                    }
+                )
+                del self._alerts[alert_id]
+
+            hit_ids = [alert_id for alert_id, _ in hits]
+            for books in (self._above, self._below):
+                book = books.get(symbol)
+                if book is not None:
+                    book.remove(hit_ids)
+                    if not len(book):
+                        books.pop(symbol)
+            return triggered
+
+    def on_prices(self, price_data: Dict) -> List[Dict]:
+        """Process the prices of one batch quote fetch, see on_price"""
+        triggered = []
+        for symbol, price_info in price_data.items():
+            price = price_info.get("price") if isinstance(price_info, dict) else None
+            if price:
+                triggered.extend(self.on_price(symbol, float(price)))
+        return triggered
+
+    def get_stats(self) -> Dict:
+        """Get index size statistics"""
+        with self._lock:
+            return {
+                "indexed_alerts": len(self._alerts),
+                "symbols": len(set(self._above) | set(self._below)),
+                "pending_alerts": sum(len(p) for p in self._pending.values()),
+            }
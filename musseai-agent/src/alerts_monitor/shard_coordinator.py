@@ -0,0 +1,197 @@
+"""
+Shard coordination for running the alert monitor as several workers
+
+Each monitor process registers itself in Redis and heartbeats periodically.
+Users are assigned to live workers by consistent hashing on user_id, so when a
+worker joins or leaves only the users of its ring segments move. A short
+per-alert check lease keeps two workers from checking (and firing) the same
+alert while they briefly disagree on membership during a rebalance.
+
+Without a Redis connection the coordinator runs as a single shard that owns
+every user.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.redis_cache import _cache_backend
+
+KEY_PREFIX = "musseai:alert_monitor"
+WORKERS_KEY = f"{KEY_PREFIX}:workers"  # Sorted set, member=worker_id, score=heartbeat
+STATUS_KEY = f"{KEY_PREFIX}:status"  # Hash, field=worker_id, value=status JSON
+LEASE_KEY = f"{KEY_PREFIX}:lease"
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """Hash ring with virtual nodes"""
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 64):
+        self.virtual_nodes = virtual_nodes
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_ring_hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Get the node owning a key"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ShardCoordinator:
+    """Redis-backed membership, user partitioning and check leases"""
+
+    def __init__(
+        self,
+        worker_id: str = "",
+        heartbeat_ttl_seconds: int = 30,
+        virtual_nodes: int = 64,
+        logger: logging.Logger = logging.getLogger("portfolio_alert_monitor"),
+    ):
+        self.worker_id = (
+            worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        self.heartbeat_ttl_seconds = heartbeat_ttl_seconds
+        self.virtual_nodes = virtual_nodes
+        self.logger = logger
+        self._ring = ConsistentHashRing([self.worker_id], virtual_nodes)
+        self._lock = threading.Lock()
+        self.rebalance_count = 0
+
+    @property
+    def redis(self):
+        return _cache_backend.redis_client
+
+    @property
+    def workers(self) -> List[str]:
+        return list(self._ring.nodes)
+
+    def heartbeat(self, status: Optional[Dict] = None):
+        """Refresh this worker's membership, publish its status and rebalance if needed"""
+        client = self.redis
+        if client is None:
+            return
+
+        try:
+            now = time.time()
+            pipe = client.pipeline()
+            pipe.zadd(WORKERS_KEY, {self.worker_id: now})
+            # Drop workers that stopped heartbeating
+            pipe.zremrangebyscore(WORKERS_KEY, "-inf", now - self.heartbeat_ttl_seconds)
+            pipe.zrange(WORKERS_KEY, 0, -1)
+            if status is not None:
+                pipe.hset(
+                    STATUS_KEY,
+                    self.worker_id,
+                    json.dumps({**status, "heartbeat_at": now}, default=str),
+                )
+            members = pipe.execute()[2]
+            self._update_ring(members)
+        except Exception as e:
+            self.logger.warning(f"Shard heartbeat failed: {e}")
+
+    def leave(self):
+        """Remove this worker from the membership so others take over its users"""
+        client = self.redis
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline()
+            pipe.zrem(WORKERS_KEY, self.worker_id)
+            pipe.hdel(STATUS_KEY, self.worker_id)
+            pipe.execute()
+        except Exception as e:
+            self.logger.warning(f"Failed to leave shard membership: {e}")
+        with self._lock:
+            self._ring = ConsistentHashRing([self.worker_id], self.virtual_nodes)
+
+    def _update_ring(self, members: Iterable[str]):
+        members = set(members) | {self.worker_id}
+        with self._lock:
+            if members == set(self._ring.nodes):
+                return
+            previous = set(self._ring.nodes)
+            self._ring = ConsistentHashRing(members, self.virtual_nodes)
+            self.rebalance_count += 1
+        self.logger.info(
+            f"Shard membership changed: +{sorted(members - previous)} "
+            f"-{sorted(previous - members)}, {len(members)} workers"
+        )
+
+    def owns(self, user_id: str) -> bool:
+        """Whether this worker is responsible for a user's alerts"""
+        with self._lock:
+            ring = self._ring
+        return ring.owner(str(user_id)) == self.worker_id
+
+    def acquire_leases(self, alert_ids: Iterable, lease_seconds: float) -> Set:
+        """
+        Lease alerts for checking, returning the ones this worker may check
+
+        Leases expire on their own; a lease this worker still holds counts as acquired.
+        """
+        alert_ids = list(alert_ids)
+        client = self.redis
+        if client is None or not alert_ids:
+            return set(alert_ids)
+
+        lease_ms = max(1, int(lease_seconds * 1000))
+        try:
+            pipe = client.pipeline()
+            for alert_id in alert_ids:
+                pipe.set(f"{LEASE_KEY}:{alert_id}", self.worker_id, nx=True, px=lease_ms)
+            for alert_id in alert_ids:
+                pipe.get(f"{LEASE_KEY}:{alert_id}")
+            replies = pipe.execute()
+        except Exception as e:
+            # Without Redis the ring is the only guard, prefer checking over skipping
+            self.logger.warning(f"Failed to acquire check leases: {e}")
+            return set(alert_ids)
+
+        holders = replies[len(alert_ids):]
+        return {
+            alert_id
+            for alert_id, holder in zip(alert_ids, holders)
+            if holder == self.worker_id
+        }
+
+    def get_shard_statuses(self) -> Dict[str, Dict]:
+        """Get the last published status of every live worker"""
+        client = self.redis
+        if client is None:
+            return {}
+        try:
+            cutoff = time.time() - self.heartbeat_ttl_seconds
+            live = set(client.zrangebyscore(WORKERS_KEY, cutoff, "+inf"))
+            statuses = client.hgetall(STATUS_KEY)
+        except Exception as e:
+            self.logger.warning(f"Failed to read shard statuses: {e}")
+            return {}
+
+        result = {}
+        for worker_id, raw in statuses.items():
+            if worker_id not in live:
+                continue
+            try:
+                result[worker_id] = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+        return result
@@ -0,0 +1,104 @@
+"""
+User to held-symbols index for the alert monitor
+
+Keeps the distinct symbols each user holds so a monitoring cycle can resolve
+the symbols of every user with active alerts without one query per alert.
+Users are loaded in one aggregated query; afterwards only users whose positions
+changed (PositionModel.updated_at past the last seen watermark) are reloaded.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func
+
+from mysql.db import get_db
+from mysql.model import AssetModel, PortfolioSourceModel, PositionModel
+
+
+class UserSymbolIndex:
+    """Incrementally refreshed user_id -> held symbols index"""
+
+    def __init__(self, full_refresh_seconds: int = 600):
+        # Hard-deleted positions leave no updated_at trace, so the whole index
+        # is rebuilt periodically as well
+        self.full_refresh_seconds = full_refresh_seconds
+        self._symbols_by_user: Dict[str, Set[str]] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_full_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def get_symbols(self, user_ids: Iterable[str]) -> List[str]:
+        """Get the distinct held symbols of all given users"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return []
+
+        with self._lock:
+            with get_db() as db:
+                if time.time() - self._last_full_refresh >= self.full_refresh_seconds:
+                    self._symbols_by_user.clear()
+                    self._watermark = None
+                    self._last_full_refresh = time.time()
+
+                # Drop every changed user, not only the requested ones, as the
+                # watermark moves past all of them
+                for user_id in self._changed_users(db):
+                    self._symbols_by_user.pop(user_id, None)
+
+                stale = {u for u in user_ids if u not in self._symbols_by_user}
+                if stale:
+                    self._load_users(db, stale)
+
+            symbols = set()
+            for user_id in user_ids:
+                symbols |= self._symbols_by_user.get(user_id, set())
+            return sorted(symbols)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user (or everyone) so the next lookup reloads from the database"""
+        with self._lock:
+            if user_id is None:
+                self._symbols_by_user.clear()
+                self._watermark = None
+            else:
+                self._symbols_by_user.pop(user_id, None)
+
+    def _changed_users(self, db) -> Set[str]:
+        """Users whose positions changed since the watermark, advancing it"""
+        latest = db.query(func.max(PositionModel.updated_at)).scalar()
+        if self._watermark is None or latest is None:
+            self._watermark = latest
+            return set()
+        if latest <= self._watermark:
+            return set()
+
+        # TIMESTAMP has second resolution, include the watermark second itself
+        changed = (
+            db.query(PortfolioSourceModel.user_id)
+            .join(PositionModel, PositionModel.source_id == PortfolioSourceModel.source_id)
+            .filter(PositionModel.updated_at >= self._watermark)
+            .distinct()
+            .all()
+        )
+        self._watermark = latest
+        return {user_id for (user_id,) in changed}
+
+    def _load_users(self, db, user_ids: Set[str]):
+        """Load the held symbols of several users in one aggregated query"""
+        rows = (
+            db.query(PortfolioSourceModel.user_id, AssetModel.symbol)
+            .join(PositionModel, PositionModel.source_id == PortfolioSourceModel.source_id)
+            .join(AssetModel, AssetModel.asset_id == PositionModel.asset_id)
+            .filter(PortfolioSourceModel.user_id.in_(user_ids))
+            .filter(PositionModel.quantity > 0)  # Only positions with actual holdings
+            .distinct()
+            .all()
+        )
+
+        for user_id in user_ids:
+            self._symbols_by_user[user_id] = set()
+        for user_id, symbol in rows:
+            self._symbols_by_user[user_id].add(symbol)
@@ -14,6 +14,32 @@ class MonitoringConfig:
     check_interval_seconds: int = 60  # Default check every minute
     max_concurrent_checks: int = 10
     notification_timeout_seconds: int = 30
+    notification_batch_window_seconds: float = 2.0  # Bursts per user within this window become one digest
+    notification_max_batch_size: int = 20
+    notification_queue_size: int = 10000  # Per channel
+    symbol_index_full_refresh_seconds: int = 600  # Full rebuild of user->symbols index
+    adaptive_scheduling: bool = True  # Check alerts far from triggering less often
+    max_check_staleness_seconds: int = 900  # Upper bound between two checks of an alert
+
+    # Sharding across monitor workers (membership kept in Redis)
+    worker_id: str = ""  # Generated from host and pid when empty
+    worker_heartbeat_ttl_seconds: int = 30  # Workers silent this long leave the ring
+    shard_virtual_nodes: int = 64
+
+    # Nightly portfolio_value_daily job, local time of the monitor host; empty disables
+    portfolio_value_job_time: str = "00:15"
+
+    # Refresh of the latest price of every held asset of every user; 0 disables
+    asset_price_refresh_minutes: int = 0
+
+    # Hourly rollup of price_snapshots into hourly/daily OHLC bars, with retention
+    price_rollup_enabled: bool = True
+    price_snapshot_retention_days: int = 7  # Raw rows kept once rolled up; 0 keeps all
+    price_hourly_retention_days: int = 90  # Hourly bars kept once rolled up; 0 keeps all
+
+    # Prometheus scrape endpoint (/metrics) of the monitor process
+    metrics_port: int = 0  # Disabled when 0
+    metrics_host: str = "0.0.0.0"
     retry_attempts: int = 3
     retry_delay_seconds: int = 5
     enable_email: bool = True
@@ -53,6 +79,8 @@ class AlertCheckResult:
     message: str = ""
     error: Optional[str] = None
     check_timestamp: datetime = field(default_factory=datetime.utcnow)
+    distance_percent: Optional[float] = None  # Distance to trigger, percent
+    volatility: Optional[float] = None  # Recent daily volatility, percent
 
 
 @dataclass
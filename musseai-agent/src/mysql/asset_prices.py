@@ -0,0 +1,114 @@
+"""
+Bulk asset price updates
+
+A batch of (symbol, chain, price) updates is applied with a fixed number of
+statements whatever its size: one query resolves every pair to its asset, one
+multi-row INSERT writes the snapshots and one UPDATE ... CASE asset_id sets
+last_price on every position of those assets.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from mysql.model import (
+    AssetModel,
+    PortfolioSourceModel,
+    PositionModel,
+    PriceSnapshotModel,
+)
+
+
+def apply_price_updates(
+    db: Session, price_updates: List[Dict], timestamp: Optional[datetime] = None
+) -> Dict:
+    """
+    Store snapshots and position prices of many assets in three statements
+
+    Args:
+        db: Database session, committed by the caller
+        price_updates: Dicts with symbol, chain and price; the last update of
+            a pair wins
+        timestamp: Snapshot time, now when omitted
+
+    Returns:
+        Dict with success_count, updated_positions and errors
+    """
+    errors = []
+    prices: Dict[Tuple[str, str], Decimal] = {}
+    for update_item in price_updates:
+        try:
+            key = (update_item["symbol"].upper(), update_item["chain"].upper())
+            prices[key] = Decimal(str(update_item["price"]))
+        except Exception as e:
+            errors.append(
+                f"Error updating {update_item.get('symbol', 'unknown')}: {str(e)}"
+            )
+
+    if not prices:
+        return {"success_count": 0, "updated_positions": 0, "errors": errors}
+
+    assets = (
+        db.query(AssetModel.asset_id, AssetModel.symbol, AssetModel.chain)
+        .filter(tuple_(AssetModel.symbol, AssetModel.chain).in_(list(prices)))
+        .all()
+    )
+    asset_prices = {asset.asset_id: prices[(asset.symbol, asset.chain)] for asset in assets}
+
+    found = {(asset.symbol, asset.chain) for asset in assets}
+    errors.extend(
+        f"Asset {symbol} on {chain} not found"
+        for symbol, chain in prices
+        if (symbol, chain) not in found
+    )
+
+    if not asset_prices:
+        return {"success_count": 0, "updated_positions": 0, "errors": errors}
+
+    timestamp = timestamp or datetime.utcnow()
+    db.execute(
+        insert(PriceSnapshotModel),
+        [
+            {"asset_id": asset_id, "price": price, "timestamp": timestamp}
+            for asset_id, price in asset_prices.items()
+        ],
+    )
+
+    result = db.execute(
+        update(PositionModel)
+        .where(PositionModel.asset_id.in_(list(asset_prices)))
+        .values(last_price=case(asset_prices, value=PositionModel.asset_id))
+        .execution_options(synchronize_session=False)
+    )
+
+    return {
+        "success_count": len(asset_prices),
+        "updated_positions": result.rowcount,
+        "errors": errors,
+    }
+
+
+def query_held_assets(db: Session, user_id: Optional[str] = None) -> List:
+    """
+    Distinct assets held in active sources, of one user or of every user
+
+    Returns:
+        Rows with asset_id, symbol and chain
+    """
+    query = (
+        db.query(AssetModel.asset_id, AssetModel.symbol, AssetModel.chain)
+        .join(PositionModel, PositionModel.asset_id == AssetModel.asset_id)
+        .join(
+            PortfolioSourceModel,
+            PositionModel.source_id == PortfolioSourceModel.source_id,
+        )
+        .filter(
+            PortfolioSourceModel.is_active == True,
+            PositionModel.quantity > 0,
+        )
+    )
+    if user_id is not None:
+        query = query.filter(PortfolioSourceModel.user_id == user_id)
+    return query.distinct().all()
@@ -163,6 +163,111 @@ CREATE TABLE alert_history (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 COMMENT='Alert trigger history table';
 
+-- =============================================
+-- 8. Portfolio Value Daily Table
+-- =============================================
+DROP TABLE IF EXISTS portfolio_value_daily;
+CREATE TABLE portfolio_value_daily (
+    value_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id VARCHAR(100) NOT NULL COMMENT 'User identifier',
+    value_date DATE NOT NULL COMMENT 'Date',
+    total_value DECIMAL(30,8) NOT NULL DEFAULT 0 COMMENT 'End of day portfolio value',
+    net_flows DECIMAL(30,8) NOT NULL DEFAULT 0 COMMENT 'Deposits minus withdrawals of the day',
+    asset_values JSON NULL COMMENT 'End of day value per asset',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT 'Update time',
+
+    UNIQUE KEY unique_user_date (user_id, value_date),
+    INDEX idx_value_date (value_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Materialized daily portfolio values';
+
+-- =============================================
+-- 9. Price Snapshot Rollup Tables
+-- =============================================
+DROP TABLE IF EXISTS price_snapshots_hourly;
+CREATE TABLE price_snapshots_hourly (
+    rollup_id INT AUTO_INCREMENT PRIMARY KEY,
+    asset_id INT NOT NULL COMMENT 'Asset ID',
+    bucket_start TIMESTAMP NOT NULL COMMENT 'Start of the hour',
+    open DECIMAL(20,8) NOT NULL COMMENT 'First price of the hour',
+    high DECIMAL(20,8) NOT NULL COMMENT 'Highest price of the hour',
+    low DECIMAL(20,8) NOT NULL COMMENT 'Lowest price of the hour',
+    close DECIMAL(20,8) NOT NULL COMMENT 'Last price of the hour',
+    sample_count INT NOT NULL DEFAULT 0 COMMENT 'Number of raw snapshots',
+
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE KEY unique_asset_hour (asset_id, bucket_start),
+    INDEX idx_hourly_bucket (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Hourly OHLC rollup of price snapshots';
+
+DROP TABLE IF EXISTS price_snapshots_daily;
+CREATE TABLE price_snapshots_daily (
+    rollup_id INT AUTO_INCREMENT PRIMARY KEY,
+    asset_id INT NOT NULL COMMENT 'Asset ID',
+    bucket_start TIMESTAMP NOT NULL COMMENT 'Start of the day (UTC)',
+    open DECIMAL(20,8) NOT NULL COMMENT 'First price of the day',
+    high DECIMAL(20,8) NOT NULL COMMENT 'Highest price of the day',
+    low DECIMAL(20,8) NOT NULL COMMENT 'Lowest price of the day',
+    close DECIMAL(20,8) NOT NULL COMMENT 'Last price of the day',
+    sample_count INT NOT NULL DEFAULT 0 COMMENT 'Number of raw snapshots',
+
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE CASCADE,
+    UNIQUE KEY unique_asset_day (asset_id, bucket_start),
+    INDEX idx_daily_bucket (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Daily OHLC rollup of price snapshots';
+
+-- =============================================
+-- 10. Tax Lot Tables
+-- =============================================
+DROP TABLE IF EXISTS tax_lot_disposals;
+DROP TABLE IF EXISTS tax_lots;
+CREATE TABLE tax_lots (
+    lot_id INT AUTO_INCREMENT PRIMARY KEY,
+    source_id INT NOT NULL COMMENT 'Source ID',
+    asset_id INT NOT NULL COMMENT 'Asset ID',
+    method ENUM('FIFO', 'LIFO', 'HIFO') NOT NULL COMMENT 'Cost basis method',
+    transaction_id INT NOT NULL COMMENT 'Opening transaction ID',
+    acquired_at TIMESTAMP NOT NULL COMMENT 'Acquisition time',
+    quantity DECIMAL(30,18) NOT NULL COMMENT 'Acquired quantity',
+    remaining_quantity DECIMAL(30,18) NOT NULL COMMENT 'Quantity not yet disposed',
+    cost_per_unit DECIMAL(20,8) NULL COMMENT 'Cost per unit',
+    is_open BOOLEAN NOT NULL DEFAULT TRUE COMMENT 'Whether quantity remains',
+
+    FOREIGN KEY (source_id) REFERENCES portfolio_sources(source_id) ON DELETE CASCADE,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE RESTRICT,
+    FOREIGN KEY (transaction_id) REFERENCES transactions(transaction_id) ON DELETE CASCADE,
+    UNIQUE KEY unique_lot_method (transaction_id, method),
+    INDEX idx_lot_open_time (source_id, asset_id, method, is_open, acquired_at),
+    INDEX idx_lot_open_cost (source_id, asset_id, method, is_open, cost_per_unit)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Tax lots opened by buys and deposits, one set per cost basis method';
+
+CREATE TABLE tax_lot_disposals (
+    disposal_id INT AUTO_INCREMENT PRIMARY KEY,
+    source_id INT NOT NULL COMMENT 'Source ID',
+    asset_id INT NOT NULL COMMENT 'Asset ID',
+    method ENUM('FIFO', 'LIFO', 'HIFO') NOT NULL COMMENT 'Cost basis method',
+    transaction_id INT NOT NULL COMMENT 'Closing transaction ID',
+    transaction_type ENUM('BUY', 'SELL', 'DEPOSIT', 'WITHDRAW', 'TRANSFER') NOT NULL COMMENT 'Closing transaction type',
+    lot_transaction_id INT NULL COMMENT 'Opening transaction of the matched lot, NULL when no lot was left',
+    quantity DECIMAL(30,18) NOT NULL COMMENT 'Disposed quantity',
+    proceeds_per_unit DECIMAL(20,8) NULL COMMENT 'Proceeds per unit',
+    cost_per_unit DECIMAL(20,8) NULL COMMENT 'Cost per unit of the lot',
+    acquired_at TIMESTAMP NULL COMMENT 'Acquisition time of the lot',
+    disposed_at TIMESTAMP NOT NULL COMMENT 'Disposal time',
+
+    FOREIGN KEY (source_id) REFERENCES portfolio_sources(source_id) ON DELETE CASCADE,
+    FOREIGN KEY (asset_id) REFERENCES assets(asset_id) ON DELETE RESTRICT,
+    FOREIGN KEY (transaction_id) REFERENCES transactions(transaction_id) ON DELETE CASCADE,
+    FOREIGN KEY (lot_transaction_id) REFERENCES transactions(transaction_id) ON DELETE CASCADE,
+    INDEX idx_disposal_source_time (source_id, method, disposed_at),
+    INDEX idx_disposal_transaction (transaction_id),
+    INDEX idx_disposal_lot (lot_transaction_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Lot quantities closed by sells and withdrawals';
+
 -- =============================================
 -- Insert Initial Data
 -- =============================================
@@ -5,6 +5,7 @@ from sqlalchemy import (
     Integer,
     String,
     Boolean,
+    Date,
     DateTime,
     ForeignKey,
     Numeric,
@@ -39,6 +40,14 @@ class TransactionType(enum.Enum):
     TRANSFER = "TRANSFER"
 
 
+class CostBasisMethod(enum.Enum):
+    """成本计算方法枚举"""
+
+    FIFO = "FIFO"
+    LIFO = "LIFO"
+    HIFO = "HIFO"
+
+
 class PortfolioSourceModel(Base):
     """用户资产来源表"""
 
@@ -228,6 +237,176 @@ class PriceSnapshotModel(Base):
         {"comment": "价格快照表"},
     )
 
+
+class PriceSnapshotHourlyModel(Base):
+    """价格快照小时汇总表"""
+
+    __tablename__ = "price_snapshots_hourly"
+
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    asset_id = Column(
+        Integer,
+        ForeignKey("assets.asset_id", ondelete="CASCADE"),
+        nullable=False,
+        comment="资产ID",
+    )
+    bucket_start = Column(TIMESTAMP, nullable=False, comment="小时开始时间")
+    open = Column(Numeric(20, 8), nullable=False, comment="开盘价")
+    high = Column(Numeric(20, 8), nullable=False, comment="最高价")
+    low = Column(Numeric(20, 8), nullable=False, comment="最低价")
+    close = Column(Numeric(20, 8), nullable=False, comment="收盘价")
+    sample_count = Column(Integer, nullable=False, default=0, comment="快照数量")
+
+    # 约束和索引
+    __table_args__ = (
+        UniqueConstraint("asset_id", "bucket_start", name="unique_asset_hour"),
+        Index("idx_hourly_bucket", "bucket_start"),
+        {"comment": "价格快照小时汇总表"},
+    )
+
+
+class PriceSnapshotDailyModel(Base):
+    """价格快照日汇总表"""
+
+    __tablename__ = "price_snapshots_daily"
+
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    asset_id = Column(
+        Integer,
+        ForeignKey("assets.asset_id", ondelete="CASCADE"),
+        nullable=False,
+        comment="资产ID",
+    )
+    bucket_start = Column(TIMESTAMP, nullable=False, comment="日开始时间")
+    open = Column(Numeric(20, 8), nullable=False, comment="开盘价")
+    high = Column(Numeric(20, 8), nullable=False, comment="最高价")
+    low = Column(Numeric(20, 8), nullable=False, comment="最低价")
+    close = Column(Numeric(20, 8), nullable=False, comment="收盘价")
+    sample_count = Column(Integer, nullable=False, default=0, comment="快照数量")
+
+    # 约束和索引
+    __table_args__ = (
+        UniqueConstraint("asset_id", "bucket_start", name="unique_asset_day"),
+        Index("idx_daily_bucket", "bucket_start"),
+        {"comment": "价格快照日汇总表"},
+    )
+
+
+class TaxLotModel(Base):
+    """税务批次表"""
+
+    __tablename__ = "tax_lots"
+
+    lot_id = Column(Integer, primary_key=True, autoincrement=True)
+    source_id = Column(
+        Integer,
+        ForeignKey("portfolio_sources.source_id", ondelete="CASCADE"),
+        nullable=False,
+        comment="来源ID",
+    )
+    asset_id = Column(
+        Integer,
+        ForeignKey("assets.asset_id", ondelete="RESTRICT"),
+        nullable=False,
+        comment="资产ID",
+    )
+    method = Column(Enum(CostBasisMethod), nullable=False, comment="成本计算方法")
+    transaction_id = Column(
+        Integer,
+        ForeignKey("transactions.transaction_id", ondelete="CASCADE"),
+        nullable=False,
+        comment="开仓交易ID",
+    )
+    acquired_at = Column(TIMESTAMP, nullable=False, comment="取得时间")
+    quantity = Column(Numeric(30, 18), nullable=False, comment="取得数量")
+    remaining_quantity = Column(Numeric(30, 18), nullable=False, comment="剩余数量")
+    cost_per_unit = Column(Numeric(20, 8), nullable=True, comment="单位成本")
+    is_open = Column(Boolean, nullable=False, default=True, comment="是否未平仓")
+
+    # 约束和索引
+    __table_args__ = (
+        UniqueConstraint("transaction_id", "method", name="unique_lot_method"),
+        Index(
+            "idx_lot_open_time", "source_id", "asset_id", "method", "is_open", "acquired_at"
+        ),
+        Index(
+            "idx_lot_open_cost", "source_id", "asset_id", "method", "is_open", "cost_per_unit"
+        ),
+        {"comment": "税务批次表"},
+    )
+
+
+class TaxLotDisposalModel(Base):
+    """税务批次处置表"""
+
+    __tablename__ = "tax_lot_disposals"
+
+    disposal_id = Column(Integer, primary_key=True, autoincrement=True)
+    source_id = Column(
+        Integer,
+        ForeignKey("portfolio_sources.source_id", ondelete="CASCADE"),
+        nullable=False,
+        comment="来源ID",
+    )
+    asset_id = Column(
+        Integer,
+        ForeignKey("assets.asset_id", ondelete="RESTRICT"),
+        nullable=False,
+        comment="资产ID",
+    )
+    method = Column(Enum(CostBasisMethod), nullable=False, comment="成本计算方法")
+    transaction_id = Column(
+        Integer,
+        ForeignKey("transactions.transaction_id", ondelete="CASCADE"),
+        nullable=False,
+        comment="平仓交易ID",
+    )
+    transaction_type = Column(Enum(TransactionType), nullable=False, comment="平仓交易类型")
+    lot_transaction_id = Column(
+        Integer,
+        ForeignKey("transactions.transaction_id", ondelete="CASCADE"),
+        nullable=True,
+        comment="匹配批次的开仓交易ID，无可匹配批次时为空",
+    )
+    quantity = Column(Numeric(30, 18), nullable=False, comment="处置数量")
+    proceeds_per_unit = Column(Numeric(20, 8), nullable=True, comment="单位处置价格")
+    cost_per_unit = Column(Numeric(20, 8), nullable=True, comment="单位成本")
+    acquired_at = Column(TIMESTAMP, nullable=True, comment="批次取得时间")
+    disposed_at = Column(TIMESTAMP, nullable=False, comment="处置时间")
+
+    # 约束和索引
+    __table_args__ = (
+        Index("idx_disposal_source_time", "source_id", "method", "disposed_at"),
+        Index("idx_disposal_transaction", "transaction_id"),
+        Index("idx_disposal_lot", "lot_transaction_id"),
+        {"comment": "税务批次处置表"},
+    )
+
+
+class PortfolioValueDailyModel(Base):
+    """用户组合每日价值表"""
+
+    __tablename__ = "portfolio_value_daily"
+
+    value_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(100), nullable=False, comment="用户标识")
+    value_date = Column(Date, nullable=False, comment="日期")
+    total_value = Column(Numeric(30, 8), nullable=False, default=0, comment="日终组合价值")
+    net_flows = Column(
+        Numeric(30, 8), nullable=False, default=0, comment="当日净流入(充值-提现)"
+    )
+    asset_values = Column(JSON, nullable=True, comment="按资产的日终价值")
+    updated_at = Column(
+        TIMESTAMP, server_default=func.now(), onupdate=func.now(), comment="更新时间"
+    )
+
+    # 约束和索引
+    __table_args__ = (
+        UniqueConstraint("user_id", "value_date", name="unique_user_date"),
+        Index("idx_value_date", "value_date"),
+        {"comment": "用户组合每日价值表"},
+    )
+
 # ========================================
 # Alert Types and Models
 # ========================================
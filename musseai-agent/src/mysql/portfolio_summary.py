@@ -0,0 +1,181 @@
+"""
+User portfolio summary query
+
+Position value and cost are summed per (asset, source) in a single grouped
+statement joined with the asset columns, so building a summary never loads
+PositionModel rows or lazily fetches their assets one by one.
+"""
+from typing import Dict
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from mysql.model import AssetModel, PortfolioSourceModel, PositionModel
+
+
+def query_user_portfolio_summary(db: Session, user_id: str) -> Dict:
+    """Summarize a user's positions across all active sources"""
+    sources = (
+        db.query(PortfolioSourceModel)
+        .filter(
+            PortfolioSourceModel.user_id == user_id,
+            PortfolioSourceModel.is_active == True,
+        )
+        .all()
+    )
+
+    if not sources:
+        return {
+            "total_value": 0,
+            "total_cost": 0,
+            "total_pnl": 0,
+            "total_pnl_percentage": 0,
+            "source_count": 0,
+            "asset_count": 0,
+            "positions_by_source": [],
+            "positions_by_asset": [],
+            "allocation": [],
+        }
+
+    sources_by_id = {source.source_id: source for source in sources}
+
+    position_value = case(
+        (
+            PositionModel.last_price.isnot(None),
+            PositionModel.quantity * PositionModel.last_price,
+        ),
+        else_=0,
+    )
+    position_cost = case(
+        (
+            PositionModel.avg_cost.isnot(None),
+            PositionModel.quantity * PositionModel.avg_cost,
+        ),
+        else_=0,
+    )
+    rows = (
+        db.query(
+            AssetModel.asset_id,
+            AssetModel.symbol,
+            AssetModel.name,
+            AssetModel.chain,
+            PositionModel.source_id,
+            func.sum(PositionModel.quantity).label("quantity"),
+            func.sum(position_value).label("value"),
+            func.sum(position_cost).label("cost"),
+            func.count(PositionModel.position_id).label("position_count"),
+        )
+        .join(AssetModel, AssetModel.asset_id == PositionModel.asset_id)
+        .filter(
+            PositionModel.source_id.in_(list(sources_by_id)),
+            PositionModel.quantity > 0,
+        )
+        .group_by(
+            AssetModel.asset_id,
+            AssetModel.symbol,
+            AssetModel.name,
+            AssetModel.chain,
+            PositionModel.source_id,
+        )
+        .order_by(AssetModel.asset_id, PositionModel.source_id)
+        .all()
+    )
+
+    # Calculate totals and group by asset
+    total_value = 0
+    total_cost = 0
+    positions_by_source = {}
+    positions_by_asset = {}
+
+    for row in rows:
+        source = sources_by_id[row.source_id]
+        value = float(row.value or 0)
+        cost = float(row.cost or 0)
+        total_value += value
+        total_cost += cost
+
+        # Group by source
+        if source.source_id not in positions_by_source:
+            positions_by_source[source.source_id] = {
+                "source_name": source.source_name,
+                "source_type": source.source_type.value,
+                "total_value": 0,
+                "position_count": 0,
+            }
+
+        positions_by_source[source.source_id]["total_value"] += value
+        positions_by_source[source.source_id]["position_count"] += row.position_count
+
+        # Group by asset
+        asset_key = f"{row.symbol}_{row.chain}"
+        if asset_key not in positions_by_asset:
+            positions_by_asset[asset_key] = {
+                "asset_id": row.asset_id,
+                "symbol": row.symbol,
+                "name": row.name,
+                "chain": row.chain,
+                "total_quantity": 0,
+                "total_value": 0,
+                "total_cost": 0,
+                "sources": [],
+            }
+
+        positions_by_asset[asset_key]["total_quantity"] += float(row.quantity)
+        positions_by_asset[asset_key]["total_value"] += value
+        positions_by_asset[asset_key]["total_cost"] += cost
+        positions_by_asset[asset_key]["sources"].append(source.source_name)
+
+    # Calculate overall P&L
+    total_pnl = total_value - total_cost
+    total_pnl_percentage = (total_pnl / total_cost * 100) if total_cost > 0 else 0
+
+    # Calculate allocation
+    allocation = []
+    if total_value > 0:
+        for asset_data in positions_by_asset.values():
+            if asset_data["total_value"] > 0:
+                allocation.append(
+                    {
+                        "asset": f"{asset_data['symbol']} ({asset_data['chain']})",
+                        "value": asset_data["total_value"],
+                        "percentage": asset_data["total_value"] / total_value * 100,
+                        "quantity": asset_data["total_quantity"],
+                    }
+                )
+
+        # Sort allocation by value
+        allocation.sort(key=lambda x: x["value"], reverse=True)
+
+    positions_by_asset_list = []
+    for asset_data in positions_by_asset.values():
+        pnl = asset_data["total_value"] - asset_data["total_cost"]
+        pnl_percentage = (
+            (pnl / asset_data["total_cost"] * 100) if asset_data["total_cost"] > 0 else 0
+        )
+
+        positions_by_asset_list.append(
+            {
+                "asset_id": asset_data["asset_id"],
+                "symbol": asset_data["symbol"],
+                "name": asset_data["name"],
+                "chain": asset_data["chain"],
+                "total_quantity": asset_data["total_quantity"],
+                "total_value": asset_data["total_value"],
+                "total_cost": asset_data["total_cost"],
+                "pnl": pnl,
+                "pnl_percentage": pnl_percentage,
+                "sources": list(set(asset_data["sources"])),
+            }
+        )
+
+    return {
+        "total_value": total_value,
+        "total_cost": total_cost,
+        "total_pnl": total_pnl,
+        "total_pnl_percentage": total_pnl_percentage,
+        "source_count": len(sources),
+        "asset_count": len(positions_by_asset),
+        "positions_by_source": list(positions_by_source.values()),
+        "positions_by_asset": positions_by_asset_list,
+        "allocation": allocation,
+    }
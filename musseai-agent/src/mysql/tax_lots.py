@@ -0,0 +1,417 @@
+"""
+Persistent tax lot ledger
+
+Every buy or deposit opens one lot per cost basis method and every sell or
+withdrawal closes lot quantity in that method's order, leaving a disposal row
+per matched lot. Lots are kept per source and asset, so realized and
+unrealized PnL and tax reports read precomputed rows instead of replaying the
+transaction history.
+
+A transaction later than everything recorded for its source and asset is
+applied in place: the lots it closes are read in matching order from the
+(source, asset, method, is_open, ...) indexes, so selecting them is an index
+seek rather than a scan. A backdated or deleted transaction rebuilds the lots
+of its source and asset by replaying their transactions through heaps keyed
+by each method's order.
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from mysql.model import (
+    AssetModel,
+    CostBasisMethod,
+    TaxLotDisposalModel,
+    TaxLotModel,
+    TransactionModel,
+    TransactionType,
+)
+
+OPENING_TYPES = (TransactionType.BUY, TransactionType.DEPOSIT)
+CLOSING_TYPES = (TransactionType.SELL, TransactionType.WITHDRAW)
+LOT_TYPES = OPENING_TYPES + CLOSING_TYPES
+LOT_PAGE_SIZE = 16
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class _Lot:
+    """Open lot being matched in memory"""
+
+    transaction_id: int
+    acquired_at: datetime
+    quantity: Decimal
+    cost_per_unit: Optional[Decimal]
+    remaining_quantity: Decimal
+
+
+def _lot_order(method: CostBasisMethod, lot: _Lot) -> Tuple:
+    """Heap key of a lot, smallest first, matching the SQL order of _sql_order"""
+    if method == CostBasisMethod.FIFO:
+        return (lot.acquired_at, lot.transaction_id)
+    if method == CostBasisMethod.LIFO:
+        return (-(lot.acquired_at - _EPOCH).total_seconds(), -lot.transaction_id)
+    # HIFO, lots of unknown cost last
+    return (
+        lot.cost_per_unit is None,
+        -(lot.cost_per_unit or 0),
+        lot.acquired_at,
+        lot.transaction_id,
+    )
+
+
+def _sql_order(method: CostBasisMethod) -> List:
+    """ORDER BY of the open lots of a method, in matching order"""
+    if method == CostBasisMethod.FIFO:
+        return [TaxLotModel.acquired_at, TaxLotModel.transaction_id]
+    if method == CostBasisMethod.LIFO:
+        return [TaxLotModel.acquired_at.desc(), TaxLotModel.transaction_id.desc()]
+    # NULL sorts last in descending order on MySQL and SQLite
+    return [
+        TaxLotModel.cost_per_unit.desc(),
+        TaxLotModel.acquired_at,
+        TaxLotModel.transaction_id,
+    ]
+
+
+def _disposal(
+    tx, method: CostBasisMethod, quantity: Decimal, lot: Optional[_Lot]
+) -> Dict:
+    """Row of tax_lot_disposals for quantity of a closing transaction taken from a lot"""
+    return {
+        "source_id": tx.source_id,
+        "asset_id": tx.asset_id,
+        "method": method,
+        "transaction_id": tx.transaction_id,
+        "transaction_type": tx.transaction_type,
+        "lot_transaction_id": lot.transaction_id if lot else None,
+        "quantity": quantity,
+        "proceeds_per_unit": tx.price if tx.transaction_type == TransactionType.SELL else None,
+        "cost_per_unit": lot.cost_per_unit if lot else None,
+        "acquired_at": lot.acquired_at if lot else None,
+        "disposed_at": tx.transaction_time,
+    }
+
+
+def _lot_row(source_id: int, asset_id: int, method: CostBasisMethod, lot: _Lot) -> Dict:
+    """Row of tax_lots for a lot matched by a method"""
+    return {
+        "source_id": source_id,
+        "asset_id": asset_id,
+        "method": method,
+        "transaction_id": lot.transaction_id,
+        "acquired_at": lot.acquired_at,
+        "quantity": lot.quantity,
+        "remaining_quantity": lot.remaining_quantity,
+        "cost_per_unit": lot.cost_per_unit,
+        "is_open": lot.remaining_quantity > 0,
+    }
+
+
+def _close(
+    tx, method: CostBasisMethod, open_lots: Iterable[_Lot]
+) -> Tuple[List[_Lot], List[Dict]]:
+    """
+    Take a closing transaction's quantity from lots given in matching order
+
+    Returns:
+        The lots touched, with their remaining quantity reduced, and the
+        disposal rows, one without a lot for quantity no lot covered
+    """
+    needed = Decimal(tx.quantity)
+    touched, disposals = [], []
+    for lot in open_lots:
+        if needed <= 0:
+            break
+        taken = min(lot.remaining_quantity, needed)
+        lot.remaining_quantity -= taken
+        needed -= taken
+        touched.append(lot)
+        disposals.append(_disposal(tx, method, taken, lot))
+    if needed > 0:
+        disposals.append(_disposal(tx, method, needed, None))
+    return touched, disposals
+
+
+def _replay(transactions: List, method: CostBasisMethod) -> Tuple[List[_Lot], List[Dict]]:
+    """Match sorted transactions of one source and asset, O(log n) per lot taken"""
+    lots: List[_Lot] = []
+    disposals: List[Dict] = []
+    heap: List = []
+
+    def matching_order():
+        while heap:
+            lot = heap[0][-1]
+            yield lot
+            if lot.remaining_quantity <= 0:
+                heapq.heappop(heap)
+
+    for tx in transactions:
+        if tx.transaction_type in OPENING_TYPES:
+            lot = _Lot(
+                transaction_id=tx.transaction_id,
+                acquired_at=tx.transaction_time,
+                quantity=Decimal(tx.quantity),
+                cost_per_unit=tx.price,
+                remaining_quantity=Decimal(tx.quantity),
+            )
+            lots.append(lot)
+            heapq.heappush(heap, (*_lot_order(method, lot), lot))
+        else:
+            disposals.extend(_close(tx, method, matching_order())[1])
+    return lots, disposals
+
+
+def rebuild_tax_lots(db: Session, source_id: int, asset_id: int):
+    """Replace the lots and disposals of one source and asset by replaying its transactions"""
+    db.execute(
+        delete(TaxLotDisposalModel).where(
+            TaxLotDisposalModel.source_id == source_id,
+            TaxLotDisposalModel.asset_id == asset_id,
+        )
+    )
+    db.execute(
+        delete(TaxLotModel).where(
+            TaxLotModel.source_id == source_id, TaxLotModel.asset_id == asset_id
+        )
+    )
+
+    transactions = (
+        db.query(
+            TransactionModel.transaction_id,
+            TransactionModel.source_id,
+            TransactionModel.asset_id,
+            TransactionModel.transaction_type,
+            TransactionModel.quantity,
+            TransactionModel.price,
+            TransactionModel.transaction_time,
+        )
+        .filter(
+            TransactionModel.source_id == source_id,
+            TransactionModel.asset_id == asset_id,
+            TransactionModel.transaction_type.in_(LOT_TYPES),
+            TransactionModel.quantity > 0,
+        )
+        .order_by(TransactionModel.transaction_time, TransactionModel.transaction_id)
+        .all()
+    )
+    if not transactions:
+        return
+
+    lot_rows, disposal_rows = [], []
+    for method in CostBasisMethod:
+        lots, disposals = _replay(transactions, method)
+        lot_rows.extend(_lot_row(source_id, asset_id, method, lot) for lot in lots)
+        disposal_rows.extend(disposals)
+
+    if lot_rows:
+        db.execute(insert(TaxLotModel), lot_rows)
+    if disposal_rows:
+        db.execute(insert(TaxLotDisposalModel), disposal_rows)
+
+
+def apply_transaction_to_tax_lots(db: Session, transaction: TransactionModel):
+    """
+    Update the lots of a transaction's source and asset after it was flushed
+
+    Applied in place when nothing later is recorded for the pair, otherwise the
+    pair is rebuilt.
+    """
+    if transaction.transaction_type not in LOT_TYPES or not transaction.quantity > 0:
+        return
+
+    backdated = (
+        db.query(TransactionModel.transaction_id)
+        .filter(
+            TransactionModel.source_id == transaction.source_id,
+            TransactionModel.asset_id == transaction.asset_id,
+            TransactionModel.transaction_type.in_(LOT_TYPES),
+            TransactionModel.transaction_time > transaction.transaction_time,
+        )
+        .first()
+    )
+    if backdated:
+        rebuild_tax_lots(db, transaction.source_id, transaction.asset_id)
+        return
+
+    if transaction.transaction_type in OPENING_TYPES:
+        lot = _Lot(
+            transaction_id=transaction.transaction_id,
+            acquired_at=transaction.transaction_time,
+            quantity=Decimal(transaction.quantity),
+            cost_per_unit=transaction.price,
+            remaining_quantity=Decimal(transaction.quantity),
+        )
+        db.execute(
+            insert(TaxLotModel),
+            [
+                _lot_row(transaction.source_id, transaction.asset_id, method, lot)
+                for method in CostBasisMethod
+            ],
+        )
+        return
+
+    lot_updates, disposal_rows = [], []
+    for method in CostBasisMethod:
+        open_lots = (
+            db.query(
+                TaxLotModel.lot_id,
+                TaxLotModel.transaction_id,
+                TaxLotModel.acquired_at,
+                TaxLotModel.quantity,
+                TaxLotModel.cost_per_unit,
+                TaxLotModel.remaining_quantity,
+            )
+            .filter(
+                TaxLotModel.source_id == transaction.source_id,
+                TaxLotModel.asset_id == transaction.asset_id,
+                TaxLotModel.method == method,
+                TaxLotModel.is_open == True,
+            )
+            .order_by(*_sql_order(method))
+        )
+        lot_ids = {}
+
+        def matching_order():
+            # Pages double in size, so a sale spanning k lots costs O(log k) seeks
+            offset, page = 0, LOT_PAGE_SIZE
+            while True:
+                rows = open_lots.offset(offset).limit(page).all()
+                for row in rows:
+                    lot = _Lot(
+                        transaction_id=row.transaction_id,
+                        acquired_at=row.acquired_at,
+                        quantity=row.quantity,
+                        cost_per_unit=row.cost_per_unit,
+                        remaining_quantity=Decimal(row.remaining_quantity),
+                    )
+                    lot_ids[id(lot)] = row.lot_id
+                    yield lot
+                if len(rows) < page:
+                    return
+                offset += page
+                page *= 2
+
+        touched, disposals = _close(transaction, method, matching_order())
+        lot_updates.extend(
+            {
+                "lot_id": lot_ids[id(lot)],
+                "remaining_quantity": lot.remaining_quantity,
+                "is_open": lot.remaining_quantity > 0,
+            }
+            for lot in touched
+        )
+        disposal_rows.extend(disposals)
+
+    if lot_updates:
+        db.execute(update(TaxLotModel), lot_updates)
+    db.execute(insert(TaxLotDisposalModel), disposal_rows)
+
+
+def ensure_tax_lots(db: Session, source_ids: List[int]):
+    """Build the lots of source and asset pairs whose transactions predate the ledger"""
+    if not source_ids:
+        return
+    traded = {
+        (row.source_id, row.asset_id)
+        for row in db.query(TransactionModel.source_id, TransactionModel.asset_id)
+        .filter(
+            TransactionModel.source_id.in_(source_ids),
+            TransactionModel.transaction_type.in_(LOT_TYPES),
+            TransactionModel.quantity > 0,
+        )
+        .distinct()
+    }
+    if not traded:
+        return
+    recorded = {
+        (row.source_id, row.asset_id)
+        for model in (TaxLotModel, TaxLotDisposalModel)
+        for row in db.query(model.source_id, model.asset_id)
+        .filter(tuple_(model.source_id, model.asset_id).in_(list(traded)))
+        .distinct()
+    }
+    for source_id, asset_id in traded - recorded:
+        rebuild_tax_lots(db, source_id, asset_id)
+
+
+def query_disposals(
+    db: Session,
+    source_ids: List[int],
+    method: CostBasisMethod = CostBasisMethod.FIFO,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    transaction_types: Tuple = (TransactionType.SELL,),
+) -> List:
+    """
+    Lot disposals of sources in time order
+
+    Returns:
+        Rows of tax_lot_disposals columns with the asset symbol
+    """
+    query = (
+        db.query(
+            TaxLotDisposalModel.transaction_id,
+            TaxLotDisposalModel.transaction_type,
+            TaxLotDisposalModel.asset_id,
+            AssetModel.symbol,
+            TaxLotDisposalModel.lot_transaction_id,
+            TaxLotDisposalModel.quantity,
+            TaxLotDisposalModel.proceeds_per_unit,
+            TaxLotDisposalModel.cost_per_unit,
+            TaxLotDisposalModel.acquired_at,
+            TaxLotDisposalModel.disposed_at,
+        )
+        .join(AssetModel, TaxLotDisposalModel.asset_id == AssetModel.asset_id)
+        .filter(
+            TaxLotDisposalModel.source_id.in_(source_ids),
+            TaxLotDisposalModel.method == method,
+            TaxLotDisposalModel.transaction_type.in_(transaction_types),
+        )
+    )
+    if start is not None:
+        query = query.filter(TaxLotDisposalModel.disposed_at >= start)
+    if end is not None:
+        query = query.filter(TaxLotDisposalModel.disposed_at <= end)
+    return query.order_by(
+        TaxLotDisposalModel.disposed_at, TaxLotDisposalModel.disposal_id
+    ).all()
+
+
+def query_open_lots(
+    db: Session,
+    source_ids: List[int],
+    method: CostBasisMethod = CostBasisMethod.FIFO,
+) -> List:
+    """
+    Lots of sources with quantity left, oldest first
+
+    Returns:
+        Rows with source_id, asset_id, symbol, transaction_id, acquired_at,
+        remaining_quantity and cost_per_unit
+    """
+    return (
+        db.query(
+            TaxLotModel.source_id,
+            TaxLotModel.asset_id,
+            AssetModel.symbol,
+            TaxLotModel.transaction_id,
+            TaxLotModel.acquired_at,
+            TaxLotModel.remaining_quantity,
+            TaxLotModel.cost_per_unit,
+        )
+        .join(AssetModel, TaxLotModel.asset_id == AssetModel.asset_id)
+        .filter(
+            TaxLotModel.source_id.in_(source_ids),
+            TaxLotModel.method == method,
+            TaxLotModel.is_open == True,
+        )
+        .order_by(TaxLotModel.acquired_at, TaxLotModel.transaction_id)
+        .all()
+    )
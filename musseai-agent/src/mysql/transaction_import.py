@@ -0,0 +1,311 @@
+"""
+Streaming transaction import
+
+Rows are read from any iterable of dicts, typically a csv.DictReader over an
+open file, and processed in chunks so an export of any size is never held in
+memory. Each chunk is parsed and validated, its unseen (symbol, chain) pairs
+are resolved with one query into a cache shared by the whole import, and its
+valid rows are written with one executemany INSERT. Net quantity and cost per
+asset are accumulated along the way and applied to the source's positions in
+two bulk statements once the last chunk is written, after the tax lots of
+every imported asset are rebuilt.
+
+The whole import is one database transaction, committed after the positions
+are updated, so a failure leaves nothing behind and the file can be imported
+again as is. Row errors name the rejected field, never its value.
+"""
+import csv
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from loggers import logger
+from mysql.model import AssetModel, PositionModel, TransactionModel, TransactionType
+from mysql.tax_lots import rebuild_tax_lots
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# Direction of each transaction type on the held quantity, transfers leave it unchanged
+QUANTITY_DIRECTIONS = {
+    TransactionType.BUY: 1,
+    TransactionType.DEPOSIT: 1,
+    TransactionType.SELL: -1,
+    TransactionType.WITHDRAW: -1,
+}
+
+
+@dataclass
+class ImportReport:
+    """Progress and outcome of a transaction import"""
+
+    rows_read: int = 0
+    success_count: int = 0
+    error_count: int = 0
+    errors: List[str] = field(default_factory=list)
+    earliest_tx_time: Optional[datetime] = None
+    positions_updated: int = 0
+    # Set when the import stopped and was rolled back
+    failure: Optional[str] = None
+
+    def add_error(self, row_num: int, message: str):
+        """Count a rejected row, keeping the first MAX_REPORTED_ERRORS messages"""
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Row {row_num}: {message}")
+
+
+@dataclass
+class _PositionDelta:
+    """Net effect of the imported rows of one asset on its position"""
+
+    quantity: Decimal = Decimal("0")
+    bought_quantity: Decimal = Decimal("0")
+    bought_cost: Decimal = Decimal("0")
+
+
+def iter_csv_rows(stream) -> Iterable[Dict]:
+    """Rows of a CSV text stream as dicts keyed by its header"""
+    return csv.DictReader(stream)
+
+
+def _parse_field(row: Dict, name: str, parse: Callable, required: bool = True):
+    """
+    Parse one column of a row
+
+    Raises ValueError naming the column, without its value, so rejected rows
+    never echo file contents back to the caller.
+    """
+    value = row.get(name)
+    if not value:
+        if required:
+            raise ValueError(f"Missing {name}")
+        return None
+    try:
+        return parse(value)
+    except Exception:
+        raise ValueError(f"Invalid {name}") from None
+
+
+def _parse_row(row: Dict, date_format: str) -> Dict:
+    """Typed fields of one CSV row, raising on a missing or malformed value"""
+    fee = _parse_field(row, "fee", Decimal, required=False)
+    notes = row.get("notes") or ""
+    return {
+        "transaction_time": _parse_field(
+            row, "date", lambda value: datetime.strptime(value, date_format)
+        ),
+        "transaction_type": _parse_field(
+            row, "type", lambda value: TransactionType(value.strip().upper())
+        ),
+        "symbol": _parse_field(row, "symbol", lambda value: value.strip().upper()),
+        "chain": _parse_field(row, "chain", lambda value: value.strip().upper()),
+        "quantity": _parse_field(row, "quantity", Decimal),
+        "price": _parse_field(row, "price", Decimal, required=False),
+        "fee": fee if fee is not None else Decimal("0"),
+        "notes": f"CSV Import: {notes}" if notes else "CSV Import",
+    }
+
+
+def _resolve_assets(
+    db: Session, pairs: Iterable[Tuple[str, str]], cache: Dict[Tuple[str, str], Optional[int]]
+):
+    """Look up uncached (symbol, chain) pairs in one query, caching misses as None"""
+    missing = [pair for pair in set(pairs) if pair not in cache]
+    if not missing:
+        return
+    cache.update(dict.fromkeys(missing))
+    rows = (
+        db.query(AssetModel.asset_id, AssetModel.symbol, AssetModel.chain)
+        .filter(tuple_(AssetModel.symbol, AssetModel.chain).in_(missing))
+        .all()
+    )
+    cache.update({(row.symbol, row.chain): row.asset_id for row in rows})
+
+
+def _apply_position_deltas(
+    db: Session, source_id: int, deltas: Dict[int, _PositionDelta]
+) -> int:
+    """
+    Add the imported quantities to the source's positions
+
+    Average cost is blended with the priced buys and deposits of the import;
+    positions that do not exist yet are created.
+
+    Returns:
+        Number of positions updated or created
+    """
+    existing = {
+        row.asset_id: row
+        for row in db.query(
+            PositionModel.position_id,
+            PositionModel.asset_id,
+            PositionModel.quantity,
+            PositionModel.avg_cost,
+        )
+        .filter(
+            PositionModel.source_id == source_id,
+            PositionModel.asset_id.in_(list(deltas)),
+        )
+        .all()
+    }
+
+    updates, inserts = [], []
+    for asset_id, delta in deltas.items():
+        position = existing.get(asset_id)
+        held = Decimal(position.quantity or 0) if position else Decimal("0")
+        avg_cost = position.avg_cost if position else None
+
+        if delta.bought_quantity > 0 and (avg_cost is not None or held <= 0):
+            base = max(held, Decimal("0"))
+            avg_cost = (base * Decimal(avg_cost or 0) + delta.bought_cost) / (
+                base + delta.bought_quantity
+            )
+
+        values = {"quantity": max(held + delta.quantity, Decimal("0")), "avg_cost": avg_cost}
+        if position:
+            updates.append({"position_id": position.position_id, **values})
+        else:
+            inserts.append({"source_id": source_id, "asset_id": asset_id, **values})
+
+    if updates:
+        db.execute(update(PositionModel), updates)
+    if inserts:
+        db.execute(insert(PositionModel), inserts)
+    return len(updates) + len(inserts)
+
+
+def import_transactions(
+    db: Session,
+    source_id: int,
+    rows: Iterable[Dict],
+    date_format: str = "%Y-%m-%d %H:%M:%S",
+    update_positions: bool = True,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    on_progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """
+    Import transaction rows into a source chunk by chunk
+
+    Chunks are written as they are read and committed together with the tax
+    lots and positions after the last one. On a failure everything is rolled
+    back and the report tells how far the import got and why it stopped.
+
+    Args:
+        db: Database session
+        source_id: Source the transactions belong to, ownership checked by the caller
+        rows: Dicts with date, type, symbol, chain, quantity and optional
+            price, fee and notes, the first one being line 2 of the file
+        date_format: Format of the date column
+        update_positions: Apply the net quantities to the source's positions
+            after the last chunk, off for history-only imports
+        batch_size: Rows parsed and inserted per chunk
+        on_progress: Called with the report after every chunk
+
+    Returns:
+        ImportReport with counts, the first row errors, the earliest imported
+        transaction time and, if the import was rolled back, the failure
+    """
+    report = ImportReport()
+    try:
+        _import_chunks(
+            db,
+            source_id,
+            rows,
+            date_format,
+            update_positions,
+            batch_size,
+            on_progress,
+            report,
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(
+            f"Transaction import for source {source_id} failed after {report.rows_read} rows "
+            f"and was rolled back: {e}\n{traceback.format_exc()}"
+        )
+        report.failure = f"{type(e).__name__} after {report.rows_read} rows"
+        report.success_count = 0
+        report.positions_updated = 0
+        report.earliest_tx_time = None
+    return report
+
+
+def _import_chunks(
+    db: Session,
+    source_id: int,
+    rows: Iterable[Dict],
+    date_format: str,
+    update_positions: bool,
+    batch_size: int,
+    on_progress: Optional[Callable[[ImportReport], None]],
+    report: ImportReport,
+):
+    """Write the rows, rebuild the tax lots and update positions without committing"""
+    assets: Dict[Tuple[str, str], Optional[int]] = {}
+    imported_assets = set()
+    deltas: Dict[int, _PositionDelta] = {}
+    numbered = enumerate(rows, start=2)  # Line 1 is the header
+
+    while True:
+        chunk = list(islice(numbered, batch_size))
+        if not chunk:
+            break
+        report.rows_read += len(chunk)
+
+        parsed = []
+        for row_num, row in chunk:
+            try:
+                parsed.append((row_num, _parse_row(row, date_format)))
+            except ValueError as e:
+                report.add_error(row_num, str(e))
+            except Exception as e:
+                report.add_error(row_num, f"Invalid row ({type(e).__name__})")
+
+        _resolve_assets(db, [(tx["symbol"], tx["chain"]) for _, tx in parsed], assets)
+
+        records = []
+        for row_num, tx in parsed:
+            symbol, chain = tx.pop("symbol"), tx.pop("chain")
+            asset_id = assets[(symbol, chain)]
+            if asset_id is None:
+                report.add_error(row_num, "Asset not found")
+                continue
+            records.append({"source_id": source_id, "asset_id": asset_id, **tx})
+            imported_assets.add(asset_id)
+
+            direction = QUANTITY_DIRECTIONS.get(tx["transaction_type"])
+            if direction:
+                delta = deltas.setdefault(asset_id, _PositionDelta())
+                delta.quantity += direction * tx["quantity"]
+                if direction > 0 and tx["price"] is not None:
+                    delta.bought_quantity += tx["quantity"]
+                    delta.bought_cost += tx["quantity"] * tx["price"]
+
+            tx_time = tx["transaction_time"]
+            if report.earliest_tx_time is None or tx_time < report.earliest_tx_time:
+                report.earliest_tx_time = tx_time
+
+        if records:
+            db.execute(insert(TransactionModel), records)
+            report.success_count += len(records)
+
+        logger.info(
+            f"Transaction import for source {source_id}: {report.rows_read} rows read, "
+            f"{report.success_count} written, {report.error_count} rejected"
+        )
+        if on_progress:
+            on_progress(report)
+
+    for asset_id in imported_assets:
+        rebuild_tax_lots(db, source_id, asset_id)
+
+    if update_positions and deltas:
+        report.positions_updated = _apply_position_deltas(db, source_id, deltas)
@@ -6,7 +6,15 @@ from loggers import logger
 import traceback
 
 from .portfolio_overview import get_comprehensive_market_condition
+from utils.correlation_service import correlation_service
 from utils.enhance_multi_api_manager import api_manager
+from utils.technical_indicators import (
+    ema as ema_series,
+    indicator_engine,
+    macd as macd_series,
+    rsi as rsi_series,
+    support_resistance,
+)
 
 # ========================================
 # Market Analysis Tools
@@ -343,8 +351,18 @@ def analyze_market_conditions(asset_symbols: List[str] = None) -> Dict:
                                     "rsi_14d": rsi,
                                     "rsi_signal": rsi_signal,
                                     "macd": technical_indicators.get("macd", 0),
+                                    "macd_signal": technical_indicators.get(
+                                        "macd_signal", 0
+                                    ),
                                     "ema_20": technical_indicators.get("ema_20", 0),
                                     "ema_50": technical_indicators.get("ema_50", 0),
+                                    "bollinger_upper": technical_indicators.get(
+                                        "bollinger_upper", 0
+                                    ),
+                                    "bollinger_lower": technical_indicators.get(
+                                        "bollinger_lower", 0
+                                    ),
+                                    "atr_14": technical_indicators.get("atr_14", 0),
                                 },
                                 "key_levels": {
                                     "support": support_level,
@@ -531,19 +549,6 @@ def fetch_technical_indicators_enhanced(symbol):
                 ),
             }
 
-        # Calculate RSI (14-day)
-        rsi = calculate_rsi(prices, period=14)
-
-        # Calculate EMAs
-        ema_20 = calculate_ema(prices, period=20) if len(prices) >= 20 else prices[-1]
-        ema_50 = calculate_ema(prices, period=50) if len(prices) >= 50 else prices[-1]
-
-        # Calculate MACD
-        macd = calculate_macd(prices) if len(prices) >= 26 else 0
-
-        # Calculate support and resistance levels
-        support_level, resistance_level = calculate_support_resistance(prices)
-
         # Calculate average volume
         avg_volume_10d = (
             sum(volumes[-10:]) / 10
@@ -551,15 +556,9 @@ def fetch_technical_indicators_enhanced(symbol):
             else (volumes[-1] if volumes else 0)
         )
 
-        return {
-            "rsi_14": rsi,
-            "macd": macd,
-            "ema_20": ema_20,
-            "ema_50": ema_50,
-            "support_level": support_level,
-            "resistance_level": resistance_level,
-            "average_volume_10d": avg_volume_10d,
-        }
+        return calculate_technical_indicators(
+            symbol, historical_data, prices, avg_volume_10d
+        )
 
     except Exception as e:
         logger.warning(
@@ -577,62 +576,26 @@ def fetch_technical_indicators_enhanced(symbol):
 
 
 def calculate_asset_correlations_enhanced(asset_symbols):
-    """Enhanced version of calculate_asset_correlations using api_manager"""
-    try:
-
-        # Get historical price data for correlation calculation using batch method
-        historical_prices = {}
-
-        for symbol in asset_symbols:
-            try:
-                # Get 30-day price history using api_manager's multi-API fallback
-                data = api_manager.fetch_market_chart_multi_api(symbol, days="30")
-
-                if data and "prices" in data and len(data["prices"]) > 0:
-                    # Extract just the prices from the data
-                    prices = [price[1] for price in data["prices"]]
-                    historical_prices[symbol.upper()] = prices
-                else:
-                    logger.warning(f"No price data available for {symbol}")
+    """
+    Enhanced version of calculate_asset_correlations using the shared correlation service
 
-            except Exception as e:
-                logger.warning(
-                    f"Failed to get historical prices for {symbol}: {e}\n{traceback.format_exc()}"
-                )
+    Correlates 30-day daily returns aligned on their dates; the matrix of the
+    symbol universe is computed once per day and shared across requests.
+    """
+    try:
+        correlation_matrix, symbols = correlation_service.get_matrix(
+            asset_symbols, window_days=30
+        )
 
         # Calculate correlations if we have data for at least two assets
-        if len(historical_prices) > 1:
-            correlation_matrix = {}
-
-            # Ensure all price arrays have the same length
-            min_length = min(len(prices) for prices in historical_prices.values())
-            for symbol in historical_prices:
-                historical_prices[symbol] = historical_prices[symbol][:min_length]
-
-            # Calculate correlation between each pair of assets
-            for symbol1 in historical_prices:
-                correlation_matrix[symbol1] = {}
-                for symbol2 in historical_prices:
-                    if symbol1 != symbol2:
-                        try:
-                            correlation = np.corrcoef(
-                                historical_prices[symbol1], historical_prices[symbol2]
-                            )[0, 1]
-                            # Handle NaN values
-                            if np.isnan(correlation):
-                                correlation = 0.0
-                            correlation_matrix[symbol1][symbol2] = round(
-                                float(correlation), 3
-                            )
-                        except Exception as corr_error:
-                            logger.warning(
-                                f"Failed to calculate correlation between {symbol1} and {symbol2}: {corr_error}"
-                            )
-                            correlation_matrix[symbol1][symbol2] = 0.0
-                    else:
-                        correlation_matrix[symbol1][symbol2] = 1.0
-
-            return correlation_matrix
+        if len(symbols) > 1:
+            return {
+                symbol1: {
+                    symbol2: 1.0 if i == j else round(float(correlation_matrix[i, j]), 3)
+                    for j, symbol2 in enumerate(symbols)
+                }
+                for i, symbol1 in enumerate(symbols)
+            }
         else:
             return {"message": "Insufficient data to calculate correlations"}
 
@@ -733,31 +696,12 @@ def fetch_technical_indicators(symbol):
                 "average_volume_10d": 0,
             }
 
-        # Calculate RSI (14-day)
-        rsi = calculate_rsi(prices, period=14)
-
-        # Calculate EMAs
-        ema_20 = calculate_ema(prices, period=20) if len(prices) >= 20 else prices[-1]
-        ema_50 = calculate_ema(prices, period=50) if len(prices) >= 50 else prices[-1]
-
-        # Calculate MACD
-        macd = calculate_macd(prices) if len(prices) >= 26 else 0
-
-        # Calculate support and resistance levels
-        support_level, resistance_level = calculate_support_resistance(prices)
-
         # Calculate average volume
         avg_volume_10d = sum(volumes[-10:]) / 10 if len(volumes) >= 10 else volumes[-1]
 
-        return {
-            "rsi_14": rsi,
-            "macd": macd,
-            "ema_20": ema_20,
-            "ema_50": ema_50,
-            "support_level": support_level,
-            "resistance_level": resistance_level,
-            "average_volume_10d": avg_volume_10d,
-        }
+        return calculate_technical_indicators(
+            symbol, historical_data, prices, avg_volume_10d
+        )
 
     except Exception as e:
         logger.warning(
@@ -774,30 +718,53 @@ def fetch_technical_indicators(symbol):
         }
 
 
-def calculate_rsi(prices, period=14):
-    """Calculate the Relative Strength Index"""
-    if len(prices) <= period:
-        return 50  # Default to neutral if not enough data
+def calculate_technical_indicators(symbol, chart_data, prices, avg_volume_10d):
+    """
+    Calculate technical indicators from daily market chart data
 
-    # Calculate price changes
-    deltas = [prices[i] - prices[i - 1] for i in range(1, len(prices))]
+    The indicator engine caches the result per symbol, so a request for the
+    same window (first and last candle) is served from its cache and any other
+    window is computed in one vectorized pass.
+    """
+    timestamps = [int(price[0]) // 1000 for price in chart_data["prices"]]
+    volumes = [vol[1] for vol in chart_data.get("total_volumes") or []]
+    snapshot = indicator_engine.update(
+        symbol,
+        "1d",
+        timestamps,
+        prices,
+        volume=(
+            [np.nan if vol is None else vol for vol in volumes]
+            if len(volumes) == len(prices)
+            else None
+        ),
+    )
 
-    # Separate gains and losses
-    gains = [delta if delta > 0 else 0 for delta in deltas]
-    losses = [abs(delta) if delta < 0 else 0 for delta in deltas]
+    def value(indicator, default):
+        return default if np.isnan(indicator) else round(indicator, 2)
 
-    # Calculate average gain and loss
-    avg_gain = sum(gains[-period:]) / period
-    avg_loss = sum(losses[-period:]) / period
+    return {
+        "rsi_14": value(snapshot.rsi, 50),
+        "macd": value(snapshot.macd, 0),
+        "macd_signal": value(snapshot.macd_signal, 0),
+        "macd_histogram": value(snapshot.macd_histogram, 0),
+        "ema_20": value(snapshot.ema[20], prices[-1]),
+        "ema_50": value(snapshot.ema[50], prices[-1]),
+        "bollinger_upper": value(snapshot.bollinger_upper, 0),
+        "bollinger_lower": value(snapshot.bollinger_lower, 0),
+        "atr_14": value(snapshot.atr, 0),
+        "support_level": round(snapshot.support, 2),
+        "resistance_level": round(snapshot.resistance, 2),
+        "average_volume_10d": avg_volume_10d,
+    }
 
-    if avg_loss == 0:
-        return 100  # Prevent division by zero
 
-    # Calculate RS and RSI
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
+def calculate_rsi(prices, period=14):
+    """Calculate the Relative Strength Index"""
+    if len(prices) <= period:
+        return 50  # Default to neutral if not enough data
 
-    return round(rsi, 2)
+    return round(float(rsi_series(prices, period)[-1]), 2)
 
 
 def calculate_ema(prices, period):
@@ -805,17 +772,7 @@ def calculate_ema(prices, period):
     if len(prices) < period:
         return prices[-1]
 
-    # Start with SMA for the first EMA value
-    ema = sum(prices[:period]) / period
-
-    # Multiplier for weighting the EMA
-    multiplier = 2 / (period + 1)
-
-    # Calculate EMA for remaining prices
-    for price in prices[period:]:
-        ema = (price - ema) * multiplier + ema
-
-    return round(ema, 2)
+    return round(float(ema_series(prices, period)[-1]), 2)
 
 
 def calculate_macd(prices):
@@ -823,41 +780,12 @@ def calculate_macd(prices):
     if len(prices) < 26:
         return 0
 
-    # Calculate 12-day EMA
-    ema_12 = calculate_ema(prices, 12)
-
-    # Calculate 26-day EMA
-    ema_26 = calculate_ema(prices, 26)
-
-    # Calculate MACD line
-    macd_line = ema_12 - ema_26
-
-    return round(macd_line, 2)
+    return round(float(macd_series(prices)[0][-1]), 2)
 
 
 def calculate_support_resistance(prices):
     """Calculate basic support and resistance levels"""
-    if not prices or len(prices) < 7:
-        return 0, 0
-
-    # Get recent price range
-    recent_prices = prices[-30:] if len(prices) >= 30 else prices
-
-    # Simplistic approach - use recent lows/highs
-    lowest_price = min(recent_prices)
-    highest_price = max(recent_prices)
-    current_price = prices[-1]
-
-    # Support levels - look for recent lows below current price
-    support_candidates = [p for p in recent_prices if p < current_price]
-    support_level = max(support_candidates) if support_candidates else lowest_price
-
-    # Resistance levels - look for recent highs above current price
-    resistance_candidates = [p for p in recent_prices if p > current_price]
-    resistance_level = (
-        min(resistance_candidates) if resistance_candidates else highest_price
-    )
-
+    support_level, resistance_level = support_resistance(prices)
     return round(support_level, 2), round(resistance_level, 2)
 
 
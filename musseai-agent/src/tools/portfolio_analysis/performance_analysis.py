@@ -15,6 +15,11 @@ from loggers import logger
 import traceback
 
 from utils.enhance_multi_api_manager import api_manager
+from utils.portfolio_return_engine import get_return_series
+from utils.portfolio_value_history import (
+    compute_portfolio_values,
+    get_portfolio_value_series,
+)
 
 
 # ========================================
@@ -33,42 +38,33 @@ def calculate_portfolio_value_at_date(user_id: str, target_date: datetime) -> fl
     Returns:
         Portfolio value in USD
     """
-    try:
-        with get_db() as db:
-            # Get positions at the target date with asset information
-            positions_with_assets = (
-                db.query(PositionModel, AssetModel)
-                .join(
-                    PortfolioSourceModel,
-                    PositionModel.source_id == PortfolioSourceModel.source_id,
-                )
-                .join(AssetModel, PositionModel.asset_id == AssetModel.asset_id)
-                .filter(
-                    PortfolioSourceModel.user_id == user_id,
-                    PortfolioSourceModel.is_active == True,
-                    PositionModel.updated_at <= target_date,
-                    PositionModel.quantity > 0,
-                )
-                .all()
-            )
+    return calculate_portfolio_values_at_dates(user_id, [target_date])[0]
+
 
-            if not positions_with_assets:
-                return 0.0
+def calculate_portfolio_values_at_dates(
+    user_id: str, target_dates: List[datetime]
+) -> List[float]:
+    """
+    Calculate portfolio values at several dates with one position query and one price grid
 
-            total_value = 0.0
+    Args:
+        user_id: User identifier
+        target_dates: Dates to calculate values for
 
-            for position, asset in positions_with_assets:
-                # Get historical price for this asset at target date
-                asset_price = get_asset_price_at_date(asset.symbol, target_date)
-                if asset_price > 0:
-                    total_value += float(position.quantity) * asset_price
+    Returns:
+        Portfolio value in USD for each date
+    """
+    if not target_dates:
+        return []
 
-            return total_value
+    try:
+        values, _ = compute_portfolio_values(user_id, list(target_dates))
+        return [float(value) for value in values]
 
     except Exception as e:
         logger.error(f"Error calculating portfolio value at date: {e}")
         traceback.print_exc()
-        return 0.0
+        return [0.0] * len(target_dates)
 
 
 def get_asset_price_at_date(symbol: str, target_date: datetime) -> float:
@@ -427,6 +423,11 @@ def calculate_portfolio_performance(
                     (ending_value - starting_value - net_deposits) / starting_value
                 ) * 100
 
+            # Time- and money-weighted returns from the daily value series
+            series = get_return_series(
+                start_dt.date(), end_dt.date(), source_ids=source_ids
+            )
+
             return {
                 "period": {
                     "start": start_dt.isoformat(),
@@ -440,6 +441,12 @@ def calculate_portfolio_performance(
                 "unrealized_pnl": float(unrealized_pnl),
                 "total_pnl": float(realized_pnl + unrealized_pnl),
                 "total_return": float(total_return),
+                "time_weighted_return": series.time_weighted_return * 100,
+                "money_weighted_return": series.money_weighted_return * 100,
+                # Assets whose positions and transactions disagree, and assets the
+                # transactions take below zero, returns of those are unreliable
+                "mismatched_positions": series.mismatched_symbols,
+                "negative_holdings": series.negative_symbols,
                 "source_count": len(sources),
             }
 
@@ -631,21 +638,10 @@ def get_daily_portfolio_returns(
         List of daily returns as percentages
     """
     try:
-        returns = []
-        current_date = start_date
-        previous_value = None
-
-        while current_date <= end_date:
-            portfolio_value = calculate_portfolio_value_at_date(user_id, current_date)
-
-            if previous_value is not None and previous_value > 0:
-                daily_return = ((portfolio_value / previous_value) - 1) * 100
-                returns.append(daily_return)
-
-            previous_value = portfolio_value
-            current_date += timedelta(days=1)
-
-        return returns
+        # End of day values from the materialized daily history, missing days
+        # are backfilled by the return engine
+        series = get_portfolio_value_series(user_id, start_date.date(), end_date.date())
+        return [float(daily_return) for daily_return in series.daily_returns()]
 
     except Exception as e:
         logger.error(
@@ -931,18 +927,25 @@ def get_historical_performance(user_id: str, interval: str = "monthly") -> List[
                 24, int(730 / interval_days)
             )  # Up to 24 periods or 2 years max
 
+            # Values and net deposits of every day in the analyzed range at once
+            series = get_portfolio_value_series(
+                user_id,
+                (
+                    current_date - timedelta(days=periods_to_analyze * interval_days)
+                ).date(),
+                current_date.date(),
+            )
+
             for i in range(periods_to_analyze):
                 period_end = current_date - timedelta(days=i * interval_days)
                 period_start = period_end - timedelta(days=interval_days)
 
                 try:
                     # Calculate real portfolio values
-                    start_value = calculate_portfolio_value_at_date(
-                        user_id, period_start
-                    )
-                    end_value = calculate_portfolio_value_at_date(user_id, period_end)
-                    net_deposits = get_net_deposits_in_period(
-                        user_id, period_start, period_end
+                    start_value = series.value_at(period_start.date())
+                    end_value = series.value_at(period_end.date())
+                    net_deposits = series.net_flows_between(
+                        period_start.date(), period_end.date()
                     )
 
                     # Calculate time-weighted return
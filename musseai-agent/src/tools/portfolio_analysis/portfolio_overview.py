@@ -5,16 +5,26 @@ from datetime import datetime
 from langchain.agents import tool
 from mysql.db import get_db
 from mysql.model import (
+    AssetModel,
+    CostBasisMethod,
     PortfolioSourceModel,
     PositionModel,
     TransactionModel,
     TransactionType,
 )
+from mysql.tax_lots import ensure_tax_lots, query_disposals
 from loggers import logger
 import traceback
 from collections import defaultdict
 
 from utils.enhance_multi_api_manager import api_manager
+from utils.portfolio_return_engine import (
+    PortfolioLedger,
+    compute_return_series,
+    daily_moments,
+    get_return_series,
+)
+from utils.price_snapshot_rollup import get_price_bars
 
 
 
@@ -1274,66 +1284,30 @@ class TradeMatch:
         self.pnl = (sell_price - buy_price) * sell_quantity
 
 
-def match_trades_fifo(
-    buy_transactions: List[TransactionModel], sell_transactions: List[TransactionModel]
-) -> List[TradeMatch]:
+def trade_matches_from_disposals(disposals: List) -> List[TradeMatch]:
     """
-    Match buy and sell transactions using FIFO method
+    Turn sell disposals of the tax lot ledger into trade matches
+
+    Quantity sold without a matched lot, or from a lot or sale without a
+    price, has no known PnL and is skipped.
 
     Args:
-        buy_transactions: List of buy transactions sorted by time
-        sell_transactions: List of sell transactions sorted by time
+        disposals: Rows from query_disposals
 
     Returns:
         List of TradeMatch objects
     """
-    matches = []
-    buy_queue = [
-        (t.transaction_time, float(t.quantity), float(t.price or 0), t)
-        for t in buy_transactions
+    return [
+        TradeMatch(
+            float(d.cost_per_unit),
+            float(d.quantity),
+            float(d.proceeds_per_unit),
+            float(d.quantity),
+            d.disposed_at,
+        )
+        for d in disposals
+        if d.cost_per_unit is not None and d.proceeds_per_unit is not None
     ]
-    buy_queue.sort()  # Sort by time (FIFO)
-
-    for sell_tx in sorted(sell_transactions, key=lambda x: x.transaction_time):
-        remaining_sell_qty = float(sell_tx.quantity)
-        sell_price = float(sell_tx.price or 0)
-
-        while remaining_sell_qty > 0 and buy_queue:
-            buy_time, buy_qty, buy_price, buy_tx = buy_queue[0]
-
-            if buy_qty <= remaining_sell_qty:
-                # Full match of buy transaction
-                matches.append(
-                    TradeMatch(
-                        buy_price,
-                        buy_qty,
-                        sell_price,
-                        buy_qty,
-                        sell_tx.transaction_time,
-                    )
-                )
-                remaining_sell_qty -= buy_qty
-                buy_queue.pop(0)
-            else:
-                # Partial match of buy transaction
-                matches.append(
-                    TradeMatch(
-                        buy_price,
-                        remaining_sell_qty,
-                        sell_price,
-                        remaining_sell_qty,
-                        sell_tx.transaction_time,
-                    )
-                )
-                buy_queue[0] = (
-                    buy_time,
-                    buy_qty - remaining_sell_qty,
-                    buy_price,
-                    buy_tx,
-                )
-                remaining_sell_qty = 0
-
-    return matches
 
 
 def calculate_portfolio_daily_returns(
@@ -1371,13 +1345,7 @@ def calculate_portfolio_daily_returns(
             logger.info("Using position-based returns calculation")
             return returns_from_positions
 
-        # Method 3: Fallback to market-based estimation (no random data)
-        returns_from_market = calculate_returns_from_market_data(positions, period_days)
-        if returns_from_market:
-            logger.info("Using market-based returns calculation")
-            return returns_from_market
-
-        # Method 4: Use price snapshots if available
+        # Method 3: Use price snapshots if available
         returns_from_snapshots = calculate_returns_from_price_snapshots(
             positions, period_days
         )
@@ -1385,6 +1353,12 @@ def calculate_portfolio_daily_returns(
             logger.info("Using price snapshot-based returns calculation")
             return returns_from_snapshots
 
+        # Method 4: Fallback to market-based estimation (no random data)
+        returns_from_market = calculate_returns_from_market_data(positions, period_days)
+        if returns_from_market:
+            logger.info("Using market-based returns calculation")
+            return returns_from_market
+
         logger.warning("No reliable data source found for calculating daily returns")
         return []
 
@@ -1409,275 +1383,43 @@ def calculate_returns_from_price_snapshots(
         List[float]: Daily returns based on price snapshots
     """
     try:
-        from mysql.model import PriceSnapshotModel
-
-        with get_db() as db:
-            # Get unique asset IDs from positions
-            asset_ids = [p.asset_id for p in positions if p.quantity > 0]
-
-            if not asset_ids:
-                return []
-
-            # Calculate date range
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=period_days)
-
-            # Get price snapshots for all assets in the period
-            price_snapshots = (
-                db.query(PriceSnapshotModel)
-                .filter(
-                    PriceSnapshotModel.asset_id.in_(asset_ids),
-                    PriceSnapshotModel.timestamp >= start_date,
-                    PriceSnapshotModel.timestamp <= end_date,
-                )
-                .order_by(PriceSnapshotModel.timestamp)
-                .all()
-            )
-
-            if not price_snapshots:
-                logger.info("No price snapshots found for the period")
-                return []
-
-            # Group snapshots by date
-            snapshots_by_date = defaultdict(dict)
-            for snapshot in price_snapshots:
-                date_key = snapshot.timestamp.date()
-                snapshots_by_date[date_key][snapshot.asset_id] = float(snapshot.price)
-
-            # Calculate portfolio values for each date
-            daily_portfolio_values = []
-
-            for i in range(period_days):
-                date = (start_date + timedelta(days=i)).date()
-
-                if date in snapshots_by_date:
-                    portfolio_value = 0
-                    prices = snapshots_by_date[date]
-
-                    for position in positions:
-                        if position.asset_id in prices and position.quantity > 0:
-                            asset_value = (
-                                float(position.quantity) * prices[position.asset_id]
-                            )
-                            portfolio_value += asset_value
-
-                    daily_portfolio_values.append(portfolio_value)
-                else:
-                    # Use previous day's value if no data available
-                    if daily_portfolio_values:
-                        daily_portfolio_values.append(daily_portfolio_values[-1])
-                    else:
-                        daily_portfolio_values.append(0)
-
-            # Calculate daily returns
-            daily_returns = []
-            for i in range(1, len(daily_portfolio_values)):
-                if daily_portfolio_values[i - 1] > 0:
-                    daily_return = (
-                        daily_portfolio_values[i] - daily_portfolio_values[i - 1]
-                    ) / daily_portfolio_values[i - 1]
-                    daily_returns.append(daily_return)
-                else:
-                    daily_returns.append(0.0)
-
-            return daily_returns
-
-    except Exception as e:
-        logger.error(
-            f"Error calculating returns from price snapshots: {e}\n{traceback.format_exc()}"
-        )
-        return []
-
-
-def calculate_returns_from_transactions(
-    positions: List[PositionModel], period_days: int
-) -> List[float]:
-    """
-    Calculate returns based on actual transaction history
-    """
-    try:
-        with get_db() as db:
-            # Get all source IDs from positions
-            source_ids = list(set(p.source_id for p in positions))
-
-            # Calculate date range
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=period_days)
-
-            # Get transactions in the period
-            transactions = (
-                db.query(TransactionModel)
-                .filter(
-                    TransactionModel.source_id.in_(source_ids),
-                    TransactionModel.transaction_time >= start_date,
-                    TransactionModel.transaction_time <= end_date,
-                    TransactionModel.price.isnot(None),
-                )
-                .order_by(TransactionModel.transaction_time)
-                .all()
-            )
-
-            if not transactions:
-                return []
-
-            # Group transactions by day and calculate daily portfolio value changes
-            transactions_by_date = defaultdict(list)
-            for tx in transactions:
-                date_key = tx.transaction_time.date()
-                transactions_by_date[date_key].append(tx)
-
-            # Calculate current portfolio value
-            current_portfolio_value = sum(
-                float(p.quantity * p.last_price)
-                for p in positions
-                if p.last_price and p.quantity > 0
-            )
-
-            # Calculate daily returns based on transaction impact
-            daily_returns = []
-            portfolio_values = []
-
-            # Start with current value and work backwards
-            current_value = current_portfolio_value
-            portfolio_values.append(current_value)
-
-            # Process each day
-            for i in range(period_days):
-                date = (end_date - timedelta(days=i)).date()
-
-                if date in transactions_by_date:
-                    day_transactions = transactions_by_date[date]
-                    net_flow = 0
-
-                    for tx in day_transactions:
-                        if tx.price:
-                            transaction_value = float(tx.quantity * tx.price)
-                            if tx.transaction_type == TransactionType.BUY:
-                                net_flow += transaction_value
-                            elif tx.transaction_type == TransactionType.SELL:
-                                net_flow -= transaction_value
-
-                    # Adjust portfolio value by removing the net flow impact
-                    previous_value = current_value - net_flow
-
-                    if previous_value > 0 and current_value > 0:
-                        daily_return = (current_value - previous_value) / previous_value
-                        daily_returns.insert(0, daily_return)
-                    else:
-                        daily_returns.insert(0, 0.0)
-
-                    current_value = previous_value
-                else:
-                    # No transactions, assume no change
-                    daily_returns.insert(0, 0.0)
-
-                portfolio_values.insert(0, current_value)
-
-            # Return only the calculated returns (limit to reasonable length)
-            return daily_returns[: min(period_days, 30)]
-
-    except Exception as e:
-        logger.warning(
-            f"Failed to calculate returns from transactions: {e}\n{traceback.format_exc()}"
-        )
-        return []
-
-
-def calculate_returns_from_positions(
-    positions: List[PositionModel], period_days: int
-) -> List[float]:
-    """
-    Calculate returns based on current position performance
-    """
-    try:
-        if not positions:
+        ledger = _positions_ledger(positions)
+        if not ledger.symbols:
             return []
 
-        # Calculate portfolio-level metrics
-        total_cost = 0
-        total_current_value = 0
-        position_returns = []
-
-        with get_db() as db:
-            for position in positions:
-                if position.last_price and position.avg_cost and position.quantity > 0:
-                    position_cost = float(position.quantity * position.avg_cost)
-                    position_value = float(position.quantity * position.last_price)
+        end_date = datetime.utcnow().date()
+        moments = daily_moments(end_date - timedelta(days=period_days), end_date)
 
-                    total_cost += position_cost
-                    total_current_value += position_value
-
-                    # Calculate position return
-                    if position_cost > 0:
-                        position_return = (
-                            position_value - position_cost
-                        ) / position_cost
-
-                        # Get asset info for risk adjustment
-                        asset_info = get_asset_info(db, position.asset_id)
-                        asset_symbol = asset_info["symbol"]
-
-                        position_returns.append(
-                            {
-                                "return": position_return,
-                                "weight": (
-                                    position_value / total_current_value
-                                    if total_current_value > 0
-                                    else 0
-                                ),
-                                "symbol": asset_symbol,
-                                "volatility_factor": get_asset_volatility_factor(
-                                    asset_symbol
-                                ),
-                            }
-                        )
-
-        if not position_returns or total_cost == 0:
-            return []
+        # Daily bars where rolled up, finer tiers for the rest of the window
+        price_bars = get_price_bars(
+            ledger.asset_ids,
+            moments[0] - timedelta(days=1),
+            moments[-1],
+            resolution=timedelta(days=1),
+        )
 
-        # Calculate weighted average return
-        total_weight = sum(p["weight"] for p in position_returns)
-        if total_weight == 0:
+        if not price_bars:
+            logger.info("No price snapshots found for the period")
             return []
 
-        # Normalize weights
-        for p in position_returns:
-            p["weight"] = p["weight"] / total_weight
-
-        # Calculate overall portfolio return
-        weighted_return = sum(p["return"] * p["weight"] for p in position_returns)
-
-        # Distribute return over the period with realistic variation
-        daily_returns = []
-        for i in range(min(period_days, 30)):
-            # Create variation based on asset composition and market cycles
-            base_daily_return = weighted_return / period_days
-
-            # Add cyclical variation (weekly patterns)
-            weekly_cycle = np.sin(2 * np.pi * i / 7) * 0.1
-
-            # Add trend component
-            trend_component = (i / period_days - 0.5) * 0.05
-
-            # Add volatility based on asset composition
-            portfolio_volatility = sum(
-                p["weight"] * p["volatility_factor"] for p in position_returns
-            )
-            volatility_adjustment = portfolio_volatility * 0.02
-
-            # Combine components (no random elements)
-            daily_return = (
-                base_daily_return
-                * (1 + weekly_cycle + trend_component)
-                * volatility_adjustment
-            )
-            daily_returns.append(daily_return)
-
-        return daily_returns
+        # Last close of each day per asset, carried forward over days without one
+        days = [moment.date() for moment in moments]
+        columns = {asset_id: j for j, asset_id in enumerate(ledger.asset_ids)}
+        prices = np.full((len(days), len(columns)), np.nan)
+        first_day = days[0]
+        for bar in price_bars:
+            row = (bar.timestamp.date() - first_day).days
+            prices[max(row, 0), columns[bar.asset_id]] = bar.close
+        for i in range(1, len(days)):
+            missing = np.isnan(prices[i])
+            prices[i, missing] = prices[i - 1, missing]
+
+        series = compute_return_series(ledger, moments, np.nan_to_num(prices))
+        return [float(daily_return) for daily_return in series.daily_returns()]
 
     except Exception as e:
-        logger.warning(
-            f"Failed to calculate returns from positions: {e}\n{traceback.format_exc()}"
+        logger.error(
+            f"Error calculating returns from price snapshots: {e}\n{traceback.format_exc()}"
         )
         return []
 
@@ -2013,83 +1755,53 @@ def get_asset_info(db, asset_id: int) -> dict:
         }
 
 
+def _positions_ledger(positions: List[PositionModel]) -> PortfolioLedger:
+    """Ledger of the given positions summed per asset, without transactions"""
+    quantities = defaultdict(float)
+    for position in positions:
+        if position.quantity and position.quantity > 0:
+            quantities[position.asset_id] += float(position.quantity)
+
+    if not quantities:
+        return PortfolioLedger.from_holdings([])
+
+    with get_db() as db:
+        symbols = dict(
+            db.query(AssetModel.asset_id, AssetModel.symbol)
+            .filter(AssetModel.asset_id.in_(list(quantities)))
+            .all()
+        )
+    return PortfolioLedger.from_holdings(
+        [
+            (asset_id, symbols[asset_id], quantity)
+            for asset_id, quantity in quantities.items()
+            if asset_id in symbols
+        ]
+    )
+
+
 def calculate_returns_from_transactions(
     positions: List[PositionModel], period_days: int
 ) -> List[float]:
     """
-    Calculate returns based on actual transaction history
+    Calculate returns from holdings rebuilt out of the transaction history
+
+    Quantities at the end of each day are rolled back from the current
+    positions of the sources through their transactions, valued with
+    historical prices and adjusted for the value the transactions moved.
     """
     try:
-        with get_db() as db:
-            # Get all source IDs from positions
-            source_ids = list(set(p.source_id for p in positions))
-
-            # Calculate date range
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=period_days)
-
-            # Get transactions in the period
-            transactions = (
-                db.query(TransactionModel)
-                .filter(
-                    TransactionModel.source_id.in_(source_ids),
-                    TransactionModel.transaction_time >= start_date,
-                    TransactionModel.transaction_time <= end_date,
-                )
-                .order_by(TransactionModel.transaction_time)
-                .all()
-            )
-
-            if not transactions:
-                return []
-
-            # Group transactions by day and calculate daily portfolio value changes
-            daily_values = {}
-            current_portfolio_value = sum(
-                float(p.quantity * p.last_price)
-                for p in positions
-                if p.last_price and p.quantity > 0
-            )
+        source_ids = sorted(set(p.source_id for p in positions))
+        if not source_ids:
+            return []
 
-            # Work backwards from current value
-            portfolio_value = current_portfolio_value
-
-            # Group transactions by date
-            transactions_by_date = defaultdict(list)
-            for tx in reversed(transactions):  # Process most recent first
-                date_key = tx.transaction_time.date()
-                transactions_by_date[date_key].append(tx)
-
-            # Calculate daily returns based on transaction impact
-            daily_returns = []
-            prev_value = current_portfolio_value
-
-            for i in range(period_days):
-                date = (end_date - timedelta(days=i)).date()
-
-                if date in transactions_by_date:
-                    # Calculate portfolio value change due to transactions
-                    day_transactions = transactions_by_date[date]
-                    net_flow = 0
-
-                    for tx in day_transactions:
-                        if tx.transaction_type == TransactionType.BUY and tx.price:
-                            net_flow += float(tx.quantity * tx.price)
-                        elif tx.transaction_type == TransactionType.SELL and tx.price:
-                            net_flow -= float(tx.quantity * tx.price)
-
-                    # Adjust for net flow to get organic growth/decline
-                    if prev_value > 0:
-                        adjusted_return = (
-                            (prev_value - net_flow) - prev_value
-                        ) / prev_value
-                        daily_returns.insert(0, adjusted_return)
-                        prev_value = prev_value - net_flow
-                else:
-                    # No transactions, assume minimal change
-                    daily_returns.insert(0, 0.0)
-
-            return daily_returns[:period_days]
+        end_date = datetime.utcnow().date()
+        series = get_return_series(
+            end_date - timedelta(days=period_days), end_date, source_ids=source_ids
+        )
+        if not series.values.any():
+            return []
+        return [float(daily_return) for daily_return in series.daily_returns()]
 
     except Exception as e:
         logger.warning(
@@ -2102,51 +1814,20 @@ def calculate_returns_from_positions(
     positions: List[PositionModel], period_days: int
 ) -> List[float]:
     """
-    Calculate returns based on current position performance
+    Calculate returns of the current positions held over the whole period
     """
     try:
-        if not positions:
+        ledger = _positions_ledger(positions)
+        if not ledger.symbols:
             return []
 
-        # Calculate average return across positions
-        total_returns = []
-        total_weight = 0
-
-        for position in positions:
-            if position.last_price and position.avg_cost and position.quantity > 0:
-                # Ensure all calculations use consistent decimal types
-                last_price = float(position.last_price)
-                avg_cost = float(position.avg_cost)
-                quantity = float(position.quantity)
-                
-                # Calculate position return as float
-                position_return = (last_price - avg_cost) / avg_cost
-                position_value = quantity * last_price
-
-                # Now both are float types - safe to multiply
-                total_returns.append(position_return * position_value)
-                total_weight += position_value
-
-        if total_weight == 0:
+        end_date = datetime.utcnow().date()
+        series = compute_return_series(
+            ledger, daily_moments(end_date - timedelta(days=period_days), end_date)
+        )
+        if not series.values.any():
             return []
-
-        # Calculate weighted average return
-        avg_return = sum(total_returns) / total_weight
-
-        # Distribute return over the period (simplified approach)
-        daily_return = avg_return / period_days
-
-        # Create a more realistic return distribution
-        daily_returns = []
-        for i in range(min(period_days, 30)):  # Limit to reasonable period
-            # Vary the daily return slightly based on position (no random)
-            position_factor = (
-                i % 5
-            ) / 10 - 0.2  # Creates variation between -0.2 and 0.3
-            adjusted_daily_return = daily_return * (1 + position_factor * 0.1)
-            daily_returns.append(adjusted_daily_return)
-
-        return daily_returns
+        return [float(daily_return) for daily_return in series.daily_returns()]
 
     except Exception as e:
         logger.warning(
@@ -2155,7 +1836,6 @@ def calculate_returns_from_positions(
         return []
 
 
-
 def calculate_returns_from_market_data(
     positions: List[PositionModel], period_days: int
 ) -> List[float]:
@@ -2472,13 +2152,16 @@ def calculate_max_drawdown(daily_returns: List[float]) -> float:
 
 
 @tool
-def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
+def get_portfolio_metrics(
+    user_id: str, period_days: int = 30, cost_basis_method: str = "FIFO"
+) -> Dict:
     """
     Calculate key portfolio metrics for the specified period.
 
     Args:
         user_id (str): User identifier
         period_days (int): Number of days to analyze (default: 30)
+        cost_basis_method (str): Lot matching for realized PnL, FIFO, LIFO or HIFO (default: FIFO)
 
     Returns:
         Dict: Portfolio metrics including:
@@ -2510,24 +2193,18 @@ def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=period_days)
 
-            # Get all transactions (not just in period) for accurate cost basis
-            all_transactions = (
+            # Get transactions in the analysis period, cost basis comes from the tax lots
+            period_transactions = (
                 db.query(TransactionModel)
                 .filter(
                     TransactionModel.source_id.in_(source_ids),
+                    TransactionModel.transaction_time >= start_date,
                     TransactionModel.transaction_time <= end_date,
                 )
                 .order_by(TransactionModel.transaction_time)
                 .all()
             )
 
-            # Get transactions in the analysis period
-            period_transactions = [
-                t
-                for t in all_transactions
-                if start_date <= t.transaction_time <= end_date
-            ]
-
             # Get current positions
             positions = (
                 db.query(PositionModel)
@@ -2537,24 +2214,13 @@ def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
                 .all()
             )
 
-            # Group transactions by asset for trade matching
-            transactions_by_asset = defaultdict(lambda: {"buys": [], "sells": []})
-
-            for tx in all_transactions:
-                asset_key = tx.asset_id
-                if tx.transaction_type == TransactionType.BUY:
-                    transactions_by_asset[asset_key]["buys"].append(tx)
-                elif tx.transaction_type == TransactionType.SELL:
-                    transactions_by_asset[asset_key]["sells"].append(tx)
-
-            # Calculate realized PnL using trade matching
-            all_trade_matches = []
-            realized_pnl = 0.0
-
-            for asset_id, txs in transactions_by_asset.items():
-                matches = match_trades_fifo(txs["buys"], txs["sells"])
-                all_trade_matches.extend(matches)
-                realized_pnl += sum(match.pnl for match in matches)
+            # Calculate realized PnL from the precomputed lot disposals
+            method = CostBasisMethod(cost_basis_method.upper())
+            ensure_tax_lots(db, source_ids)
+            all_trade_matches = trade_matches_from_disposals(
+                query_disposals(db, source_ids, method, end=end_date)
+            )
+            realized_pnl = sum(match.pnl for match in all_trade_matches)
 
             # Filter matches for the analysis period
             period_matches = [
@@ -2642,8 +2308,18 @@ def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
                 else float("inf") if winning_matches else 0
             )
 
+            # Daily, time-weighted and money-weighted returns in one pass
+            return_series = get_return_series(
+                start_date.date(), end_date.date(), source_ids=source_ids
+            )
+            has_price_history = bool(return_series.values.any())
+            if has_price_history:
+                daily_returns = [float(r) for r in return_series.daily_returns()]
+            else:
+                # No historical prices, fall back to snapshots or market estimates
+                daily_returns = calculate_portfolio_daily_returns(positions, period_days)
+
             # Risk metrics calculation
-            daily_returns = calculate_portfolio_daily_returns(positions, period_days)
             volatility = calculate_portfolio_volatility(daily_returns)
             max_drawdown = calculate_max_drawdown(daily_returns)
 
@@ -2703,6 +2379,12 @@ def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
                     "period_total_pnl": period_total_pnl,
                     "total_return_percentage": total_return_pct,
                     "period_return_percentage": period_return_pct,
+                    "time_weighted_return_percentage": (
+                        return_series.time_weighted_return * 100
+                    ),
+                    "money_weighted_return_percentage": (
+                        return_series.money_weighted_return * 100
+                    ),
                 },
                 "risk_metrics": {
                     "volatility_annual": volatility,
@@ -2724,6 +2406,7 @@ def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
                 },
                 "asset_allocation": asset_allocation,
                 "data_quality": {
+                    "cost_basis_method": method.value,
                     "positions_with_prices": len(
                         [p for p in positions if p.last_price]
                     ),
@@ -2732,7 +2415,11 @@ def get_portfolio_metrics(user_id: str, period_days: int = 30) -> Dict:
                     ),
                     "total_positions": len(positions),
                     "price_data_availability": len(daily_returns),
-                    "note": "Volatility and drawdown calculations use simulated data. Implement historical price data for accurate metrics.",
+                    "note": (
+                        "Volatility and drawdown use daily returns of holdings rebuilt from the transaction history."
+                        if has_price_history
+                        else "Volatility and drawdown calculations use estimated data. Historical prices were not available."
+                    ),
                 },
             }
 
@@ -3,10 +3,10 @@ from datetime import datetime, timedelta
 from langchain.agents import tool
 from mysql.db import get_db
 from mysql.model import (
+    CostBasisMethod,
     PortfolioSourceModel,
-    TransactionModel,
-    TransactionType,
 )
+from mysql.tax_lots import ensure_tax_lots, query_disposals, query_open_lots
 from loggers import logger
 from utils.enhance_multi_api_manager import api_manager
 import traceback
@@ -723,7 +723,10 @@ def find_investment_opportunities(user_id: str, risk_tolerance: str = "MEDIUM")
 
 @tool
 def analyze_tax_implications(
-    user_id: str, tax_year: int = None, country: str = "US"
+    user_id: str,
+    tax_year: int = None,
+    country: str = "US",
+    cost_basis_method: str = "FIFO",
 ) -> Dict:
     """
     Analyze tax implications with real cost basis calculation and current tax rates.
@@ -732,6 +735,7 @@ def analyze_tax_implications(
         user_id (str): User identifier
         tax_year (int, optional): Tax year to analyze (default: current year)
         country (str): Country for tax rules (default: US)
+        cost_basis_method (str): Lot matching method, FIFO, LIFO or HIFO (default: FIFO)
 
     Returns:
         Dict: Enhanced tax analysis with real data and optimization strategies
@@ -753,23 +757,16 @@ def analyze_tax_implications(
 
             source_ids = [s.source_id for s in sources]
 
-            # Get transactions for the tax year
+            # Get lot disposals of sells in the tax year
             year_start = datetime(tax_year, 1, 1)
             year_end = datetime(tax_year, 12, 31, 23, 59, 59)
 
-            transactions = (
-                db.query(TransactionModel)
-                .filter(
-                    TransactionModel.source_id.in_(source_ids),
-                    TransactionModel.transaction_time >= year_start,
-                    TransactionModel.transaction_time <= year_end,
-                )
-                .order_by(TransactionModel.transaction_time)
-                .all()
+            method = CostBasisMethod(cost_basis_method.upper())
+            ensure_tax_lots(db, source_ids)
+            disposals = query_disposals(
+                db, source_ids, method, start=year_start, end=year_end
             )
 
-            # Enhanced cost basis calculation using FIFO method
-            cost_basis_tracker = {}  # {asset_symbol: [(quantity, price, date), ...]}
             realized_gains = 0
             realized_losses = 0
             short_term_gains = 0
@@ -778,112 +775,71 @@ def analyze_tax_implications(
             long_term_losses = 0
 
             taxable_events = []
-
-            # First pass: track all buy transactions for cost basis
-            for tx in transactions:
-                if tx.transaction_type == TransactionType.BUY and tx.price:
-                    asset_symbol = tx.asset.symbol
-                    if asset_symbol not in cost_basis_tracker:
-                        cost_basis_tracker[asset_symbol] = []
-
-                    cost_basis_tracker[asset_symbol].append(
+            unpriced_sales = []
+
+            # One taxable event per lot a sale was matched with, so every part
+            # of a sale gets the holding period of its own lot
+            for disposal in disposals:
+                quantity = float(disposal.quantity)
+                if disposal.proceeds_per_unit is None:
+                    # Sales without a price have unknown proceeds, listed apart
+                    unpriced_sales.append(
                         {
-                            "quantity": float(tx.quantity),
-                            "price": float(tx.price),
-                            "date": tx.transaction_time,
-                            "cost_per_unit": float(tx.price),
+                            "date": disposal.disposed_at.isoformat(),
+                            "asset": disposal.symbol,
+                            "quantity": quantity,
+                            "transaction_id": disposal.transaction_id,
                         }
                     )
+                    continue
+                proceeds = quantity * float(disposal.proceeds_per_unit)
 
-            # Second pass: calculate realized gains/losses on sells using FIFO
-            for tx in transactions:
-                if tx.transaction_type == TransactionType.SELL and tx.price:
-                    asset_symbol = tx.asset.symbol
-                    sell_quantity = float(tx.quantity)
-                    sell_price = float(tx.price)
-                    sell_date = tx.transaction_time
-
-                    remaining_to_sell = sell_quantity
-                    total_cost_basis = 0
-
-                    # Use FIFO to calculate cost basis
-                    if asset_symbol in cost_basis_tracker:
-                        lots_to_remove = []
-
-                        for i, lot in enumerate(cost_basis_tracker[asset_symbol]):
-                            if remaining_to_sell <= 0:
-                                break
-
-                            lot_quantity = lot["quantity"]
-                            lot_cost_per_unit = lot["cost_per_unit"]
-                            lot_date = lot["date"]
-
-                            if lot_quantity <= remaining_to_sell:
-                                # Use entire lot
-                                total_cost_basis += lot_quantity * lot_cost_per_unit
-                                remaining_to_sell -= lot_quantity
-                                lots_to_remove.append(i)
-                            else:
-                                # Use partial lot
-                                total_cost_basis += (
-                                    remaining_to_sell * lot_cost_per_unit
-                                )
-                                lot["quantity"] -= remaining_to_sell
-                                remaining_to_sell = 0
-
-                        # Remove used lots
-                        for i in reversed(lots_to_remove):
-                            cost_basis_tracker[asset_symbol].pop(i)
-
-                    # Calculate gain/loss
-                    proceeds = sell_quantity * sell_price
-                    if total_cost_basis == 0:
-                        # Fallback if no cost basis available
-                        total_cost_basis = proceeds * 0.8  # Assume 25% gain
-
-                    gain_loss = proceeds - total_cost_basis
-
-                    # Determine if short-term or long-term
-                    # For simplicity, use the oldest lot date if available
-                    holding_period_days = 365  # Default to long-term
-                    if (
-                        asset_symbol in cost_basis_tracker
-                        and cost_basis_tracker[asset_symbol]
-                    ):
-                        oldest_lot_date = min(
-                            lot["date"] for lot in cost_basis_tracker[asset_symbol]
-                        )
-                        holding_period_days = (sell_date - oldest_lot_date).days
+                if disposal.cost_per_unit is not None:
+                    total_cost_basis = quantity * float(disposal.cost_per_unit)
+                else:
+                    # Fallback if no cost basis available
+                    total_cost_basis = proceeds * 0.8  # Assume 25% gain
+
+                gain_loss = proceeds - total_cost_basis
+
+                # Sales without a matched lot count as held one year, short-term
+                holding_period_days = 365
+                if disposal.acquired_at is not None:
+                    holding_period_days = (
+                        disposal.disposed_at - disposal.acquired_at
+                    ).days
 
-                    is_long_term = holding_period_days > 365
+                is_long_term = holding_period_days > 365
 
-                    if gain_loss > 0:
-                        realized_gains += gain_loss
-                        if is_long_term:
-                            long_term_gains += gain_loss
-                        else:
-                            short_term_gains += gain_loss
+                if gain_loss > 0:
+                    realized_gains += gain_loss
+                    if is_long_term:
+                        long_term_gains += gain_loss
                     else:
-                        loss_amount = abs(gain_loss)
-                        realized_losses += loss_amount
-                        if is_long_term:
-                            long_term_losses += loss_amount
-                        else:
-                            short_term_losses += loss_amount
-
-                    taxable_events.append(
-                        {
-                            "date": tx.transaction_time.isoformat(),
-                            "asset": tx.asset.symbol,
-                            "quantity": float(tx.quantity),
-                            "proceeds": proceeds,
-                            "cost_basis": total_cost_basis,
-                            "gain_loss": gain_loss,
-                            "holding_period_days": holding_period_days,
-                            "type": "Long-term" if is_long_term else "Short-term",
-                            "transaction_id": tx.transaction_id,
-                        }
-                    )
+                        short_term_gains += gain_loss
+                else:
+                    loss_amount = abs(gain_loss)
+                    realized_losses += loss_amount
+                    if is_long_term:
+                        long_term_losses += loss_amount
+                    else:
+                        short_term_losses += loss_amount
+
+                taxable_events.append(
+                    {
+                        "date": disposal.disposed_at.isoformat(),
+                        "asset": disposal.symbol,
+                        "quantity": quantity,
+                        "proceeds": proceeds,
+                        "cost_basis": total_cost_basis,
+                        "gain_loss": gain_loss,
+                        "holding_period_days": holding_period_days,
+                        "type": "Long-term" if is_long_term else "Short-term",
+                        "transaction_id": disposal.transaction_id,
+                    }
+                )
+
+            sales_analyzed = len({event["transaction_id"] for event in taxable_events})
 
             # Enhanced tax calculations with current rates
             net_short_term = short_term_gains - short_term_losses
@@ -940,6 +896,7 @@ def analyze_tax_implications(
             from tools.tools_crypto_portfolios import get_user_portfolio_summary
 
             portfolio = get_user_portfolio_summary.invoke({"user_id": user_id})
+            open_lots = query_open_lots(db, source_ids, method)
 
             if isinstance(portfolio, dict) and "positions_by_asset" in portfolio:
                 losing_positions = [
@@ -991,11 +948,20 @@ def analyze_tax_implications(
 
                 # Strategy 2: Long-term holding optimization
                 if short_term_gains > long_term_gains and gaining_positions:
-                    near_long_term = []
-                    for pos in gaining_positions:
-                        # This would need transaction history to determine holding period
-                        # For now, suggest general strategy
-                        pass
+                    # Open lots of gaining assets within a month of long-term treatment
+                    gaining_symbols = {p["symbol"] for p in gaining_positions}
+                    now = datetime.utcnow()
+                    near_long_term = [
+                        {
+                            "asset": lot.symbol,
+                            "quantity": float(lot.remaining_quantity),
+                            "acquired_at": lot.acquired_at.isoformat(),
+                            "days_to_long_term": 366 - (now - lot.acquired_at).days,
+                        }
+                        for lot in open_lots
+                        if lot.symbol in gaining_symbols
+                        and 335 <= (now - lot.acquired_at).days <= 365
+                    ]
 
                     potential_savings = short_term_gains * (
                         short_term_tax_rate - long_term_tax_rate
@@ -1009,6 +975,7 @@ def analyze_tax_implications(
                                 "potential_tax_savings": potential_savings,
                                 "implementation": "Wait to sell positions until they qualify for long-term rates",
                                 "benefit": f"Save {(short_term_tax_rate - long_term_tax_rate) * 100:.1f}% on tax rate",
+                                "lots": near_long_term[:5],
                             }
                         )
 
@@ -1128,6 +1095,7 @@ def analyze_tax_implications(
                 "taxable_events": sorted(
                     taxable_events, key=lambda x: abs(x["gain_loss"]), reverse=True
                 )[:20],
+                "unpriced_sales": unpriced_sales[:20],
                 "optimization_strategies": strategies,
                 "important_dates": {
                     "tax_filing_deadline": f"{tax_year + 1}-04-15",
@@ -1160,15 +1128,18 @@ def analyze_tax_implications(
                     ),
                 },
                 "compliance_notes": [
-                    "This analysis uses FIFO cost basis method",
+                    f"This analysis uses {method.value} cost basis method",
                     "Wash sale rules may apply to some transactions",
                     "Consider state tax implications",
                     "Foreign account reporting may be required (FBAR/Form 8938)",
                     "Consult a tax professional for complex situations",
                 ],
                 "data_quality": {
-                    "transactions_analyzed": len(transactions),
-                    "cost_basis_method": "FIFO",
+                    "transactions_analyzed": sales_analyzed,
+                    "unpriced_sales_count": len(
+                        {sale["transaction_id"] for sale in unpriced_sales}
+                    ),
+                    "cost_basis_method": method.value,
                     "missing_cost_basis_count": sum(
                         1
                         for event in taxable_events
@@ -1176,14 +1147,14 @@ def analyze_tax_implications(
                     ),
                     "analysis_confidence": (
                         "HIGH"
-                        if len(transactions) > 0
+                        if sales_analyzed > 0
                         and sum(
                             1
                             for event in taxable_events
                             if event["cost_basis"] == event["proceeds"] * 0.8
                         )
                         == 0
-                        else "MEDIUM" if len(transactions) > 0 else "LOW"
+                        else "MEDIUM" if sales_analyzed > 0 else "LOW"
                     ),
                 },
                 "disclaimer": (
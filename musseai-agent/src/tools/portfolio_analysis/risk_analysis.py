@@ -12,7 +12,9 @@ from loggers import logger
 import traceback
 
 
+from utils.correlation_service import correlation_service
 from utils.enhance_multi_api_manager import api_manager
+from utils.monte_carlo_var import parametric_var, portfolio_var, simulate_var
 
 # ========================================
 # Configuration and Constants
@@ -33,6 +35,9 @@ ASSET_CATEGORIES = {
 # Risk configuration
 RISK_CONFIG = {
     "var_confidence_levels": [0.95, 0.99],
+    "var_horizons_days": [1, 10],
+    "var_simulations": 100_000,
+    "var_random_seed": 42,  # Fixed so repeated reports agree
     "correlation_threshold": 0.7,
     "high_risk_threshold": 70,
     "medium_risk_threshold": 40,
@@ -131,14 +136,18 @@ def calculate_portfolio_volatility(
 
 
 def calculate_correlation_matrix(
-    positions: List[Dict], historical_data: Dict
+    positions: List[Dict], historical_data: Dict, window_days: int = 90
 ) -> Tuple[np.ndarray, List[str]]:
     """
     Calculate actual correlation matrix using historical price data.
 
+    Returns are aligned on their dates and the matrix is sliced from the shared
+    correlation service, which computes each symbol universe once per day.
+
     Args:
         positions: List of portfolio positions
         historical_data: Historical price data
+        window_days: Correlation window in days
 
     Returns:
         Tuple: (correlation_matrix, asset_symbols)
@@ -146,7 +155,6 @@ def calculate_correlation_matrix(
     try:
         # Filter positions with available data
         valid_assets = []
-        returns_data = []
 
         for pos in positions[:20]:  # Limit to top 20 positions
             symbol = pos["symbol"].upper()
@@ -154,26 +162,17 @@ def calculate_correlation_matrix(
                 returns = historical_data[symbol]["returns"]
                 if returns and len(returns) > 30:  # Minimum 30 data points
                     valid_assets.append(symbol)
-                    returns_data.append(returns)
+
+        if len(valid_assets) >= 2:
+            correlation_matrix, valid_assets = correlation_service.get_matrix(
+                valid_assets, window_days=window_days, historical_data=historical_data
+            )
 
         if len(valid_assets) < 2:
             # Return identity matrix for single asset or no data
             n = max(2, len(valid_assets))
             return np.eye(n), valid_assets if valid_assets else ["BTC", "ETH"]
 
-        # Align return series
-        min_length = min(len(r) for r in returns_data)
-        aligned_returns = np.array([r[:min_length] for r in returns_data])
-
-        # Calculate correlation matrix
-        correlation_matrix = np.corrcoef(aligned_returns)
-
-        # Handle NaN values
-        correlation_matrix = np.nan_to_num(correlation_matrix, nan=0.0)
-
-        # Ensure diagonal is 1.0
-        np.fill_diagonal(correlation_matrix, 1.0)
-
         return correlation_matrix, valid_assets
 
     except Exception as e:
@@ -190,15 +189,17 @@ def calculate_var_monte_carlo(
     volatility: float,
     confidence_level: float = 0.95,
     num_simulations: int = 10000,
+    seed: int = None,
 ) -> float:
     """
-    Calculate Value at Risk using Monte Carlo simulation.
+    Calculate Value at Risk of a single-volatility portfolio using Monte Carlo simulation.
 
     Args:
         portfolio_value: Current portfolio value
         volatility: Portfolio volatility
         confidence_level: Confidence level (0.95 for 95%)
         num_simulations: Number of Monte Carlo simulations
+        seed: Random seed for reproducible results
 
     Returns:
         float: VaR value
@@ -207,30 +208,20 @@ def calculate_var_monte_carlo(
         if portfolio_value <= 0 or volatility <= 0:
             return 0.0
 
-        # Daily volatility
         daily_vol = volatility / np.sqrt(365)
-
-        # Generate random returns
-        random_returns = np.random.normal(0, daily_vol, num_simulations)
-
-        # Calculate portfolio values
-        portfolio_values = portfolio_value * (1 + random_returns)
-        portfolio_changes = portfolio_values - portfolio_value
-
-        # Calculate VaR
-        var_percentile = (1 - confidence_level) * 100
-        var_value = -np.percentile(portfolio_changes, var_percentile)
-
-        return max(0, var_value)
+        result = simulate_var(
+            np.array([portfolio_value]),
+            np.array([[daily_vol**2]]),
+            confidence_levels=(confidence_level,),
+            num_simulations=num_simulations,
+            seed=seed,
+        )
+        return result.get(1, confidence_level)[0]
 
     except Exception as e:
         logger.error(f"Error calculating VaR: {e}\n{traceback.format_exc()}")
         # Fallback to parametric VaR
-        from scipy import stats
-
-        z_score = stats.norm.ppf(confidence_level)
-        daily_vol = volatility / np.sqrt(365)
-        return portfolio_value * z_score * daily_vol
+        return parametric_var(portfolio_value, volatility, confidence_level)
 
 
 def assess_liquidity_risk(positions: List[Dict], market_data: Dict) -> Dict:
@@ -406,8 +397,8 @@ def analyze_portfolio_risk(user_id: str) -> Dict:
             historical_data = {}
             for symbol in symbols:
                 try:
-                    # 使用api_manager的多API fallback机制
-                    symbol_data = api_manager.fetch_with_fallback(symbol, days=90)
+                    # 优先读取本地价格历史存储，不足时使用多API fallback机制
+                    symbol_data = api_manager.get_price_history(symbol, days=90)
                     if symbol_data and symbol_data.get("prices"):
                         historical_data[symbol.upper()] = symbol_data
                         logger.debug(f"Successfully fetched data for {symbol}")
@@ -453,10 +444,30 @@ def analyze_portfolio_risk(user_id: str) -> Dict:
             )
             liquidity_assessment = assess_liquidity_risk(position_data, market_data)
 
-            # 计算VaR指标
-            var_95 = calculate_var_monte_carlo(total_value, portfolio_volatility, 0.95)
-            var_99 = calculate_var_monte_carlo(total_value, portfolio_volatility, 0.99)
-            cvar_95 = var_95 * 1.3
+            # 计算VaR指标（多资产相关蒙特卡洛，一次模拟覆盖所有期限和置信度）
+            var_result = portfolio_var(
+                position_data,
+                historical_data,
+                portfolio_volatility,
+                horizons=RISK_CONFIG["var_horizons_days"],
+                confidence_levels=RISK_CONFIG["var_confidence_levels"],
+                num_simulations=RISK_CONFIG["var_simulations"],
+                seed=RISK_CONFIG["var_random_seed"],
+            )
+            value_at_risk = {}
+            for horizon in var_result.horizons:
+                for level in var_result.confidence_levels:
+                    var_value, cvar_value = var_result.get(horizon, level)
+                    label = f"{round(level * 100)}_{horizon}day"
+                    value_at_risk[f"var_{label}"] = round(var_value, 2)
+                    value_at_risk[f"var_{label}_percentage"] = round(
+                        var_value / total_value * 100, 2
+                    )
+                    value_at_risk[f"cvar_{label}"] = round(cvar_value, 2)
+                    value_at_risk[f"cvar_{label}_percentage"] = round(
+                        cvar_value / total_value * 100, 2
+                    )
+            value_at_risk["simulations"] = var_result.num_simulations
 
             # 集中度风险分析
             max_position_value = max(pos["total_value"] for pos in position_data)
@@ -549,14 +560,7 @@ def analyze_portfolio_risk(user_id: str) -> Dict:
                     ),
                     "volatility_score": round(volatility_score, 1),
                 },
-                "value_at_risk": {
-                    "var_95_1day": round(var_95, 2),
-                    "var_95_1day_percentage": round((var_95 / total_value * 100), 2),
-                    "var_99_1day": round(var_99, 2),
-                    "var_99_1day_percentage": round((var_99 / total_value * 100), 2),
-                    "cvar_95_1day": round(cvar_95, 2),
-                    "cvar_95_1day_percentage": round((cvar_95 / total_value * 100), 2),
-                },
+                "value_at_risk": value_at_risk,
                 "concentration_risk": {
                     "herfindahl_index": round(herfindahl_index, 4),
                     "concentration_score": round(concentration_score, 1),
@@ -1067,50 +1071,28 @@ def analyze_asset_correlations(user_id: str, period_days: int = 90) -> Dict:
         historical_data = {}
         valid_assets = []
 
-        for pos in top_positions:
-            symbol = pos["symbol"].upper()
-            coin_id = symbol
-
-            if coin_id:
-                historical_data = {}
-                valid_assets = []
+        # Extract symbols for batch processing
+        symbols_to_fetch = [pos["symbol"].upper() for pos in top_positions]
 
-                # Extract symbols for batch processing
-                symbols_to_fetch = [pos["symbol"].upper() for pos in top_positions]
+        logger.info(
+            f"Fetching historical data for {len(symbols_to_fetch)} symbols over {period_days} days"
+        )
 
-                logger.info(
-                    f"Fetching historical data for {len(symbols_to_fetch)} symbols over {period_days} days"
-                )
+        for symbol in symbols_to_fetch:
+            try:
+                # 优先读取本地价格历史存储，不足时回退到 fetch_with_fallback
+                hist_data = api_manager.get_price_history(symbol, days=period_days)
+                if (
+                    hist_data and len(hist_data.get("returns") or []) > 30
+                ):  # Minimum data requirement
+                    historical_data[symbol] = hist_data
+                    valid_assets.append(symbol)
+                else:
+                    logger.warning(f"No historical data available for {symbol}")
+            except Exception as e:
+                logger.warning(f"Failed to fetch data for {symbol}: {e}")
+                continue
 
-                # Use improved batch fetching with multiple API fallbacks
-                # Primary: Use batch API call with cache
-                batch_historical_data={}
-                for symbol in symbols_to_fetch:
-                    try:
-                        # 使用 fetch_with_fallback 方法替代错误的 get_crypto_historical_data 调用
-                        symbol_data = api_manager.fetch_with_fallback(symbol, days=period_days)
-                        if symbol_data and symbol_data.get("prices"):
-                            batch_historical_data[symbol] = symbol_data
-                            logger.debug(f"Successfully fetched data for {symbol}")
-                        else:
-                            logger.warning(f"No data available for {symbol}")
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch data for {symbol}: {e}")
-                        continue
-
-                # Process batch results
-                for pos in top_positions:
-                    symbol = pos["symbol"].upper()
-
-                    if symbol in batch_historical_data:
-                        hist_data = batch_historical_data[symbol]
-                        if (
-                            hist_data and len(hist_data["returns"]) > 30
-                        ):  # Minimum data requirement
-                            historical_data[symbol] = hist_data
-                            valid_assets.append(symbol)
-                    else:
-                        logger.warning(f"No historical data available for {symbol}")
         if len(valid_assets) < 2:
             return {"error": "Insufficient historical data for correlation analysis"}
 
@@ -1118,6 +1100,7 @@ def analyze_asset_correlations(user_id: str, period_days: int = 90) -> Dict:
         correlation_matrix, assets = calculate_correlation_matrix(
             [pos for pos in top_positions if pos["symbol"].upper() in valid_assets],
             historical_data,
+            window_days=period_days,
         )
 
         # Create correlation pairs
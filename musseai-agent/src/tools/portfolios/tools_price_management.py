@@ -1,13 +1,10 @@
-from typing import List, Dict
-from decimal import Decimal
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from langchain.agents import tool
 from sqlalchemy import and_, func
 from mysql.db import get_db
 from mysql.model import (
-    PortfolioSourceModel,
     AssetModel,
-    PositionModel,
     TransactionModel,
     PriceSnapshotModel,
     SourceType,
@@ -16,6 +13,14 @@ from mysql.model import (
 from loggers import logger
 import traceback
 
+from mysql.asset_prices import apply_price_updates, query_held_assets
+from utils.price_snapshot_rollup import get_price_bars
+
+# Points a price history request aims for when choosing its snapshot tier
+HISTORY_MAX_POINTS = 500
+# Symbols per latest quote request
+PRICE_FETCH_BATCH_SIZE = 50
+
 # ========================================
 # Price Management Tools
 # ========================================
@@ -37,66 +42,16 @@ def update_asset_prices(price_updates: List[Dict]) -> Dict:
     """
     try:
         with get_db() as db:
-            success_count = 0
-            errors = []
-            updated_positions = 0
-
-            for update in price_updates:
-                try:
-                    # Find asset
-                    asset = (
-                        db.query(AssetModel)
-                        .filter(
-                            AssetModel.symbol == update["symbol"].upper(),
-                            AssetModel.chain == update["chain"].upper(),
-                        )
-                        .first()
-                    )
-
-                    if not asset:
-                        errors.append(
-                            f"Asset {update['symbol']} on {update['chain']} not found"
-                        )
-                        continue
-
-                    price = Decimal(str(update["price"]))
-
-                    # Create price snapshot
-                    snapshot = PriceSnapshotModel(
-                        asset_id=asset.asset_id,
-                        price=price,
-                        timestamp=datetime.utcnow(),
-                    )
-                    db.add(snapshot)
-
-                    # Update all positions for this asset
-                    positions = (
-                        db.query(PositionModel)
-                        .filter(PositionModel.asset_id == asset.asset_id)
-                        .all()
-                    )
-
-                    for position in positions:
-                        position.last_price = price
-                        updated_positions += 1
-
-                    success_count += 1
-
-                except Exception as e:
-                    logger.error(f"Exception:{e}\n{traceback.format_exc()}")
-                    errors.append(
-                        f"Error updating {update.get('symbol', 'unknown')}: {str(e)}"
-                    )
-
-            db.commit()
+            # Resolve, snapshot and update positions in three statements
+            result = apply_price_updates(db, price_updates)
 
-            return {
-                "success": True,
-                "message": f"Updated {success_count} asset prices",
-                "success_count": success_count,
-                "updated_positions": updated_positions,
-                "errors": errors if errors else None,
-            }
+        return {
+            "success": True,
+            "message": f"Updated {result['success_count']} asset prices",
+            "success_count": result["success_count"],
+            "updated_positions": result["updated_positions"],
+            "errors": result["errors"] if result["errors"] else None,
+        }
 
     except Exception as e:
         logger.error(f"Exception:{e}\n{traceback.format_exc()}")
@@ -115,8 +70,9 @@ def get_asset_price_history(symbol: str, chain: str, days: int = 7) -> List[Dict
 
     Returns:
         List[Dict]: Price history containing:
-            - timestamp: Price timestamp
-            - price: Price in USD
+            - timestamp: Price timestamp (bucket start for rolled up bars)
+            - price: Price in USD (close of the bar)
+            - open, high, low: Bar range, equal to price for raw snapshots
     """
     try:
         with get_db() as db:
@@ -132,32 +88,33 @@ def get_asset_price_history(symbol: str, chain: str, days: int = 7) -> List[Dict
 
             if not asset:
                 return []
-
-            # Calculate date range
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-
-            # Get price snapshots
-            snapshots = (
-                db.query(PriceSnapshotModel)
-                .filter(
-                    PriceSnapshotModel.asset_id == asset.asset_id,
-                    PriceSnapshotModel.timestamp >= start_date,
-                )
-                .order_by(PriceSnapshotModel.timestamp)
-                .all()
+            asset_id = asset.asset_id
+
+        # Calculate date range
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+
+        # Coarsest stored tier that still gives about HISTORY_MAX_POINTS points
+        price_bars = get_price_bars(
+            [asset_id],
+            start_date,
+            end_date,
+            resolution=timedelta(days=days) / HISTORY_MAX_POINTS,
+        )
+
+        result = []
+        for bar in price_bars:
+            result.append(
+                {
+                    "timestamp": bar.timestamp.isoformat(),
+                    "price": bar.close,
+                    "open": bar.open,
+                    "high": bar.high,
+                    "low": bar.low,
+                }
             )
 
-            result = []
-            for snapshot in snapshots:
-                result.append(
-                    {
-                        "timestamp": snapshot.timestamp.isoformat(),
-                        "price": float(snapshot.price),
-                    }
-                )
-
-            return result
+        return result
 
     except Exception as e:
         logger.error(f"Exception:{e}\n{traceback.format_exc()}")
@@ -343,52 +300,70 @@ def refresh_all_portfolio_asset_prices(user_id: str) -> Dict:
         Dict: 价格更新结果
     """
     try:
-        with get_db() as db:
-            # 获取用户所有活跃资产
-            user_assets = (
-                db.query(AssetModel)
-                .join(PositionModel)
-                .join(PortfolioSourceModel)
-                .filter(
-                    PortfolioSourceModel.user_id == user_id,
-                    PortfolioSourceModel.is_active == True,
-                    PositionModel.quantity > 0,
-                )
-                .distinct()
-                .all()
-            )
-
-            # Collect all unique symbols
-            symbols_to_fetch = list(set(asset.symbol for asset in user_assets))
-            symbols_string = ",".join(symbols_to_fetch)
-
-            # Batch fetch all prices at once
-            all_prices = fetch_price_from_api(symbols_string)
-
-            price_updates = []
-            for asset in user_assets:
-                current_price = all_prices.get(asset.symbol) if all_prices else None
-                if current_price:
-                    price_updates.append(
-                        {
-                            "symbol": asset.symbol,
-                            "chain": asset.chain,
-                            "price": current_price,
-                        }
-                    )
-
-            # 批量更新价格
-            if price_updates:
-                result = update_asset_prices.invoke({"price_updates": price_updates})
-                return {
+        result = refresh_held_asset_prices(user_id)
+        if result["price_updates"]:
+            return {
+                "success": True,
+                "message": f"Updated prices for {len(result['price_updates'])} assets",
+                "updated_assets": result["price_updates"],
+                "update_result": {
                     "success": True,
-                    "message": f"Updated prices for {len(price_updates)} assets",
-                    "updated_assets": price_updates,
-                    "update_result": result,
-                }
-            else:
-                return {"success": False, "message": "No assets found to update"}
+                    "success_count": result["success_count"],
+                    "updated_positions": result["updated_positions"],
+                    "errors": result["errors"] if result["errors"] else None,
+                },
+            }
+        else:
+            return {"success": False, "message": "No assets found to update"}
 
     except Exception as e:
         logger.error(f"Exception:{e}\\n{traceback.format_exc()}")
         return {"success": False, "message": f"Failed to refresh prices: {str(e)}"}
+
+
+def refresh_held_asset_prices(user_id: Optional[str] = None) -> Dict:
+    """
+    Fetch and store the latest price of every asset held in active sources
+
+    Symbols are deduplicated across chains and users and fetched in batches of
+    PRICE_FETCH_BATCH_SIZE, then all updates are applied in one bulk write.
+
+    Args:
+        user_id: Only refresh this user's assets, every user's when omitted
+
+    Returns:
+        Dict with the applied price_updates, success_count, updated_positions
+        and errors
+    """
+    with get_db() as db:
+        held_assets = [
+            (asset.symbol, asset.chain) for asset in query_held_assets(db, user_id)
+        ]
+
+    symbols = sorted(set(symbol for symbol, _ in held_assets))
+    all_prices = {}
+    for i in range(0, len(symbols), PRICE_FETCH_BATCH_SIZE):
+        batch = symbols[i : i + PRICE_FETCH_BATCH_SIZE]
+        all_prices.update(fetch_price_from_api(",".join(batch)) or {})
+
+    price_updates = [
+        {"symbol": symbol, "chain": chain, "price": all_prices[symbol]}
+        for symbol, chain in held_assets
+        if all_prices.get(symbol)
+    ]
+    if not price_updates:
+        return {
+            "price_updates": [],
+            "success_count": 0,
+            "updated_positions": 0,
+            "errors": [],
+        }
+
+    with get_db() as db:
+        result = apply_price_updates(db, price_updates)
+
+    logger.info(
+        f"Refreshed {result['success_count']} asset prices, "
+        f"{result['updated_positions']} positions updated"
+    )
+    return {"price_updates": price_updates, **result}
@@ -1,9 +1,13 @@
 from typing import List, Dict
+from io import StringIO
 from decimal import Decimal
 from datetime import datetime, timedelta
 from langchain.agents import tool
 from sqlalchemy import and_, func
 from mysql.db import get_db
+from mysql.portfolio_summary import query_user_portfolio_summary
+from mysql.tax_lots import apply_transaction_to_tax_lots, rebuild_tax_lots
+from mysql.transaction_import import import_transactions, iter_csv_rows
 from mysql.model import (
     PortfolioSourceModel,
     AssetModel,
@@ -15,6 +19,8 @@ from mysql.model import (
 )
 from loggers import logger
 import traceback
+from utils.portfolio_version import bump_portfolio_version
+from utils.portfolio_value_history import invalidate_portfolio_values
 
 from tools.portfolios.tools_price_management import (
     get_asset_price_history,
@@ -732,10 +738,14 @@ def update_position(
                 notes=notes,
             )
             db.add(transaction)
+            db.flush()
+            apply_transaction_to_tax_lots(db, transaction)
 
             db.commit()
             db.refresh(position)
             db.refresh(transaction)
+            bump_portfolio_version(user_id)
+            invalidate_portfolio_values(user_id)
 
             return {
                 "success": True,
@@ -877,159 +887,7 @@ def get_user_portfolio_summary(user_id: str) -> Dict:
     """
     try:
         with get_db() as db:
-            # Get all active sources for user
-            sources = (
-                db.query(PortfolioSourceModel)
-                .filter(
-                    PortfolioSourceModel.user_id == user_id,
-                    PortfolioSourceModel.is_active == True,
-                )
-                .all()
-            )
-
-            if not sources:
-                return {
-                    "total_value": 0,
-                    "total_cost": 0,
-                    "total_pnl": 0,
-                    "total_pnl_percentage": 0,
-                    "source_count": 0,
-                    "asset_count": 0,
-                    "positions_by_source": [],
-                    "positions_by_asset": [],
-                    "allocation": [],
-                }
-
-            source_ids = [s.source_id for s in sources]
-
-            # Get all positions
-            positions = (
-                db.query(PositionModel)
-                .join(AssetModel)
-                .filter(
-                    PositionModel.source_id.in_(source_ids), PositionModel.quantity > 0
-                )
-                .all()
-            )
-
-            # Calculate totals and group by asset
-            total_value = 0
-            total_cost = 0
-            positions_by_source = {}
-            positions_by_asset = {}
-
-            for position in positions:
-                asset = position.asset
-                source = next(s for s in sources if s.source_id == position.source_id)
-
-                # Calculate position value
-                position_value = 0
-                position_cost = 0
-
-                if position.last_price:
-                    position_value = float(position.quantity * position.last_price)
-                    total_value += position_value
-
-                if position.avg_cost:
-                    position_cost = float(position.quantity * position.avg_cost)
-                    total_cost += position_cost
-
-                # Group by source
-                if source.source_id not in positions_by_source:
-                    positions_by_source[source.source_id] = {
-                        "source_name": source.source_name,
-                        "source_type": source.source_type.value,
-                        "total_value": 0,
-                        "position_count": 0,
-                    }
-
-                positions_by_source[source.source_id]["total_value"] += position_value
-                positions_by_source[source.source_id]["position_count"] += 1
-
-                # Group by asset
-                asset_key = f"{asset.symbol}_{asset.chain}"
-                if asset_key not in positions_by_asset:
-                    positions_by_asset[asset_key] = {
-                        "asset_id": asset.asset_id,
-                        "symbol": asset.symbol,
-                        "name": asset.name,
-                        "chain": asset.chain,
-                        "total_quantity": 0,
-                        "total_value": 0,
-                        "total_cost": 0,
-                        "sources": [],
-                    }
-
-                positions_by_asset[asset_key]["total_quantity"] += float(
-                    position.quantity
-                )
-                positions_by_asset[asset_key]["total_value"] += position_value
-                positions_by_asset[asset_key]["total_cost"] += position_cost
-                positions_by_asset[asset_key]["sources"].append(source.source_name)
-
-            # Calculate overall P&L
-            total_pnl = total_value - total_cost
-            total_pnl_percentage = (
-                (total_pnl / total_cost * 100) if total_cost > 0 else 0
-            )
-
-            # Calculate allocation
-            allocation = []
-            if total_value > 0:
-                for asset_key, asset_data in positions_by_asset.items():
-                    if asset_data["total_value"] > 0:
-                        allocation.append(
-                            {
-                                "asset": f"{asset_data['symbol']} ({asset_data['chain']})",
-                                "value": asset_data["total_value"],
-                                "percentage": (
-                                    asset_data["total_value"] / total_value * 100
-                                ),
-                                "quantity": asset_data["total_quantity"],
-                            }
-                        )
-
-                # Sort allocation by value
-                allocation.sort(key=lambda x: x["value"], reverse=True)
-
-            # Convert dictionaries to lists
-            positions_by_source_list = list(positions_by_source.values())
-            positions_by_asset_list = []
-
-            for asset_key, asset_data in positions_by_asset.items():
-                pnl = asset_data["total_value"] - asset_data["total_cost"]
-                pnl_percentage = (
-                    (pnl / asset_data["total_cost"] * 100)
-                    if asset_data["total_cost"] > 0
-                    else 0
-                )
-
-                positions_by_asset_list.append(
-                    {
-                        "asset_id": asset_data["asset_id"],
-                        "symbol": asset_data["symbol"],
-                        "name": asset_data["name"],
-                        "chain": asset_data["chain"],
-                        "total_quantity": asset_data["total_quantity"],
-                        "total_value": asset_data["total_value"],
-                        "total_cost": asset_data["total_cost"],
-                        "pnl": pnl,
-                        "pnl_percentage": pnl_percentage,
-                        "sources": list(set(asset_data["sources"])),
-                    }
-                )
-
-            return {
-                "total_value": total_value,
-                "total_cost": total_cost,
-                "total_pnl": total_pnl,
-                "total_pnl_percentage": total_pnl_percentage,
-                "source_count": len(sources),
-                "asset_count": len(positions_by_asset),
-                "positions_by_source": positions_by_source_list,
-                "positions_by_asset": positions_by_asset_list,
-                "allocation": allocation,
-            }
+            return query_user_portfolio_summary(db, user_id)
     except Exception as e:
         logger.error(f"Exception:{e}\n{traceback.format_exc()}")
         return {"error": f"Failed to get portfolio summary: {str(e)}"}
@@ -1268,8 +1126,12 @@ def record_transaction(
             )
 
             db.add(transaction)
+            db.flush()
+            apply_transaction_to_tax_lots(db, transaction)
             db.commit()
             db.refresh(transaction)
+            bump_portfolio_version(user_id)
+            invalidate_portfolio_values(user_id, tx_time)
 
             return {
                 "success": True,
@@ -1431,7 +1293,7 @@ def get_transactions(
 @tool
 def delete_transaction(transaction_id: int, user_id: str) -> Dict:
     """
-    Delete a transaction record (does not affect current positions).
+    Delete a transaction record (does not affect current positions; the tax lots of its asset are rebuilt).
 
     Args:
         transaction_id (int): Transaction identifier
@@ -1468,8 +1330,14 @@ def delete_transaction(transaction_id: int, user_id: str) -> Dict:
             }
 
             # Delete transaction
+            tx_time = transaction.transaction_time
+            source_id, asset_id = transaction.source_id, transaction.asset_id
             db.delete(transaction)
+            db.flush()
+            rebuild_tax_lots(db, source_id, asset_id)
             db.commit()
+            bump_portfolio_version(user_id)
+            invalidate_portfolio_values(user_id, tx_time)
 
             return {
                 "success": True,
@@ -1531,6 +1399,8 @@ def sync_wallet_balances(source_id: int, user_id: str) -> Dict:
             # Update last sync timestamp
             source.last_sync_at = datetime.utcnow()
             db.commit()
+            bump_portfolio_version(user_id)
+            invalidate_portfolio_values(user_id)
 
             return {
                 "success": True,
@@ -1552,16 +1422,25 @@ def sync_wallet_balances(source_id: int, user_id: str) -> Dict:
 
 @tool
 def import_transactions_csv(
-    source_id: int, user_id: str, csv_data: str, date_format: str = "%Y-%m-%d %H:%M:%S"
+    source_id: int,
+    user_id: str,
+    csv_data: str,
+    date_format: str = "%Y-%m-%d %H:%M:%S",
+    update_positions: bool = True,
 ) -> Dict:
     """
     Import transactions from CSV data.
 
+    Rows are imported in batches within one database transaction; if the
+    import fails nothing is kept and the same data can be imported again.
+
     Args:
         source_id (int): Source identifier
         user_id (str): User identifier (for security check)
         csv_data (str): CSV formatted transaction data
         date_format (str): Date format in CSV (default: "%Y-%m-%d %H:%M:%S")
+        update_positions (bool): Add the imported quantities to the source's
+            positions (default: True, False for history-only imports)
 
     Expected CSV columns:
         - date: Transaction date
@@ -1577,10 +1456,10 @@ def import_transactions_csv(
         Dict: Import results with success/error counts
     """
     try:
-        with get_db() as db:
-            import csv
-            from io import StringIO
+        if not csv_data:
+            return {"success": False, "message": "csv_data is required"}
 
+        with get_db() as db:
             # Verify source ownership
             source = (
                 db.query(PortfolioSourceModel)
@@ -1597,70 +1476,37 @@ def import_transactions_csv(
                     "message": "Source not found or access denied",
                 }
 
-            # Parse CSV
-            csv_file = StringIO(csv_data)
-            reader = csv.DictReader(csv_file)
-
-            success_count = 0
-            error_count = 0
-            errors = []
-
-            for row_num, row in enumerate(
-                reader, start=2
-            ):  # Start at 2 to account for header
-                try:
-                    # Parse transaction data
-                    tx_date = datetime.strptime(row["date"], date_format)
-                    tx_type = row["type"].upper()
-                    symbol = row["symbol"].upper()
-                    chain = row["chain"].upper()
-                    quantity = Decimal(row["quantity"])
-                    price = Decimal(row["price"]) if row.get("price") else None
-                    fee = Decimal(row["fee"]) if row.get("fee") else Decimal("0")
-                    notes = row.get("notes", "")
-
-                    # Find asset
-                    asset = (
-                        db.query(AssetModel)
-                        .filter(AssetModel.symbol == symbol, AssetModel.chain == chain)
-                        .first()
-                    )
-
-                    if not asset:
-                        errors.append(
-                            f"Row {row_num}: Asset {symbol} on {chain} not found"
-                        )
-                        error_count += 1
-                        continue
-
-                    # Create transaction
-                    transaction = TransactionModel(
-                        source_id=source_id,
-                        transaction_type=TransactionType(tx_type),
-                        asset_id=asset.asset_id,
-                        quantity=quantity,
-                        price=price,
-                        fee=fee,
-                        transaction_time=tx_date,
-                        notes=f"CSV Import: {notes}" if notes else "CSV Import",
-                    )
-
-                    db.add(transaction)
-                    success_count += 1
+            report = import_transactions(
+                db,
+                source_id,
+                iter_csv_rows(StringIO(csv_data)),
+                date_format=date_format,
+                update_positions=update_positions,
+            )
 
-                except Exception as e:
-                    logger.error(f"Exception:{e}\n{traceback.format_exc()}")
-                    errors.append(f"Row {row_num}: {str(e)}")
-                    error_count += 1
+            if report.failure:
+                return {
+                    "success": False,
+                    "message": (
+                        f"Import failed ({report.failure}), no transactions were imported"
+                    ),
+                    "rows_read": report.rows_read,
+                    "success_count": 0,
+                    "error_count": report.error_count,
+                    "errors": report.errors[:10] if report.errors else None,
+                }
 
-            db.commit()
+            if report.success_count:
+                bump_portfolio_version(user_id)
+                invalidate_portfolio_values(user_id, report.earliest_tx_time)
 
             return {
                 "success": True,
-                "message": f"Import completed: {success_count} transactions imported",
-                "success_count": success_count,
-                "error_count": error_count,
-                "errors": errors[:10] if errors else None,  # Limit errors shown
+                "message": f"Import completed: {report.success_count} transactions imported",
+                "success_count": report.success_count,
+                "error_count": report.error_count,
+                "positions_updated": report.positions_updated,
+                "errors": report.errors[:10] if report.errors else None,  # Limit errors shown
             }
 
     except Exception as e:
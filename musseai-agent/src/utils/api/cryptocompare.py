@@ -10,6 +10,8 @@ from typing import Optional, Union, List
 import time
 
 from utils.api_decorators import api_call_with_cache_and_rate_limit
+from utils.ohlcv_series_cache import interval_seconds, ohlcv_series_cache
+from utils.price_history_store import price_history_store, rows_to_candles
 
 
 def getLatestQuoteRealTime(
@@ -424,6 +426,9 @@ def getKlineData(
     if logger is None:
         logger = logging.getLogger("cryptocompare_kline")
 
+    # Requests for the latest window are served from the series cache
+    incremental = to_timestamp is None and from_timestamp is None
+
     try:
         logger.info(
             f"Get kline data from CryptoCompare API. Symbol: {symbol}, Period: {period}, Limit: {limit}"
@@ -494,7 +499,6 @@ def getKlineData(
             )
 
         endpoint_info = period_mapping[period.lower()]
-        endpoint = endpoint_info["endpoint"]
         period_name = endpoint_info["period_name"]
         max_days = endpoint_info["max_days"]
 
@@ -586,29 +590,16 @@ def getKlineData(
 
         # Process each symbol
         try:
-            # Build API URL and parameters
-            base_url = f"https://min-api.cryptocompare.com/data/v2/{endpoint}"
-
-            params = {
-                "fsym": symbol,  # From symbol
-                "tsym": "USDT",  # To symbol (USD for standard pricing)
-                "limit": limit,
-                "toTs": to_timestamp,
-                "e": exchange,
-            }
-
-            # Add aggregate parameter for sub-hourly periods
-            if endpoint_info.get("aggregate", 1) > 1:
-                params["aggregate"] = endpoint_info["aggregate"]
-
-            if api_key:
-                params["api_key"] = api_key
-
-            # Make API request for this symbol
-            response = requests.get(base_url, params=params, timeout=30)
-            response.raise_for_status()
-
-            data = response.json()
+            if incremental:
+                # Latest window: reuse closed candles and fetch only the delta
+                data = _get_kline_history_incremental(
+                    symbol, endpoint_info, limit, exchange, api_key
+                )
+            else:
+                # Fixed range: closed candles are served from the local store
+                data = _get_kline_history_range(
+                    symbol, endpoint_info, limit, to_timestamp, exchange, api_key
+                )
 
             # **KEY FIX: Improved error handling - return immediately on API error**
             if data.get("Response") == "Error":
@@ -741,6 +732,199 @@ def getKlineData(
         )
 
 
+def _request_kline_history(
+    symbol: str,
+    endpoint_info: dict,
+    limit: int,
+    to_timestamp: int,
+    exchange: str,
+    api_key: Optional[str],
+) -> dict:
+    """Request raw kline history from CryptoCompare"""
+    base_url = f"https://min-api.cryptocompare.com/data/v2/{endpoint_info['endpoint']}"
+
+    params = {
+        "fsym": symbol,  # From symbol
+        "tsym": "USDT",  # To symbol (USD for standard pricing)
+        "limit": limit,
+        "toTs": to_timestamp,
+        "e": exchange,
+    }
+
+    # Add aggregate parameter for sub-hourly periods
+    if endpoint_info.get("aggregate", 1) > 1:
+        params["aggregate"] = endpoint_info["aggregate"]
+
+    if api_key:
+        params["api_key"] = api_key
+
+    # Make API request for this symbol
+    response = requests.get(base_url, params=params, timeout=30)
+    response.raise_for_status()
+
+    return response.json()
+
+
+_PERIOD_TO_SERIES_INTERVAL = {
+    "minute": "1m",
+    "15minute": "15m",
+    "hourly": "1h",
+    "daily": "1d",
+}
+
+
+def _get_kline_history_incremental(
+    symbol: str,
+    endpoint_info: dict,
+    limit: int,
+    exchange: str,
+    api_key: Optional[str],
+) -> dict:
+    """
+    Get the latest ``limit`` klines through the append-only series cache.
+
+    Returns data in the same shape as the CryptoCompare history response, or the
+    upstream error payload if nothing is cached and the API reports an error.
+    """
+    feed = f"cryptocompare_{exchange.lower()}_usdt"
+    interval = _PERIOD_TO_SERIES_INTERVAL[endpoint_info["period_name"]]
+    upstream = {"error": None, "conversion": None}
+
+    step = interval_seconds(interval)
+
+    def fetcher(since_ts: int, count: int) -> List[list]:
+        # CryptoCompare returns limit + 1 candles ending at toTs
+        data = _request_kline_history(
+            symbol,
+            endpoint_info,
+            min(max(count - 1, 1), 2000),
+            since_ts + (count - 1) * step,
+            exchange,
+            api_key,
+        )
+        if data.get("Response") == "Error":
+            upstream["error"] = data
+            raise ValueError(data.get("Message", f"Unknown error for symbol {symbol}"))
+
+        hist_data = data.get("Data", {}).get("Data", [])
+        if hist_data:
+            upstream["conversion"] = {
+                "conversionType": hist_data[-1].get("conversionType", ""),
+                "conversionSymbol": hist_data[-1].get("conversionSymbol", ""),
+            }
+        return [
+            row for row in _hist_data_to_rows(hist_data) if row[0] >= since_ts
+        ]
+
+    try:
+        candles = ohlcv_series_cache.get_candles(
+            feed, symbol, interval, limit, fetcher
+        )
+    except ValueError:
+        if upstream["error"] is not None:
+            return upstream["error"]
+        raise
+
+    if upstream["conversion"]:
+        ohlcv_series_cache.set_meta(feed, symbol, interval, upstream["conversion"])
+        conversion = upstream["conversion"]
+    else:
+        conversion = ohlcv_series_cache.get_meta(feed, symbol, interval)
+
+    return _kline_history_payload(candles, endpoint_info, conversion)
+
+
+def _get_kline_history_range(
+    symbol: str,
+    endpoint_info: dict,
+    limit: int,
+    to_timestamp: int,
+    exchange: str,
+    api_key: Optional[str],
+) -> dict:
+    """
+    Get ``limit`` + 1 klines ending at ``to_timestamp`` through the price history store.
+
+    Closed ranges already stored locally (e.g. replayed by backtests) are sliced
+    from the store; otherwise the range is requested and its closed candles are
+    merged into the store for later queries.
+    """
+    feed = f"cryptocompare_{exchange.lower()}_usdt"
+    interval = _PERIOD_TO_SERIES_INTERVAL[endpoint_info["period_name"]]
+    step = interval_seconds(interval)
+    current_open = int(time.time() // step) * step
+    end_ts = int(to_timestamp // step) * step
+    start_ts = end_ts - limit * step
+
+    if end_ts < current_open:
+        stored = price_history_store.range(
+            symbol, interval, start_ts, end_ts + step, feed=feed
+        )
+        # A complete slice has no gaps, so the row count matches the range
+        if len(stored) == limit + 1:
+            conversion = ohlcv_series_cache.get_meta(feed, symbol, interval)
+            return _kline_history_payload(stored.tolist(), endpoint_info, conversion)
+
+    data = _request_kline_history(
+        symbol, endpoint_info, limit, to_timestamp, exchange, api_key
+    )
+    if data.get("Response") == "Error":
+        return data
+
+    rows = [
+        row
+        for row in _hist_data_to_rows(data.get("Data", {}).get("Data", []))
+        if row[0] < current_open and any(row[1:5])
+    ]
+    if rows:
+        price_history_store.merge(feed, symbol, interval, rows_to_candles(rows))
+    return data
+
+
+def _hist_data_to_rows(hist_data: List[dict]) -> List[list]:
+    """Convert CryptoCompare candles into [time, open, high, low, close, volumefrom, volumeto] rows"""
+    return [
+        [
+            int(candle.get("time", 0)),
+            float(candle.get("open", 0)),
+            float(candle.get("high", 0)),
+            float(candle.get("low", 0)),
+            float(candle.get("close", 0)),
+            float(candle.get("volumefrom", 0)),
+            float(candle.get("volumeto", 0)),
+        ]
+        for candle in hist_data
+    ]
+
+
+def _kline_history_payload(
+    candles: List[list], endpoint_info: dict, conversion: dict
+) -> dict:
+    """Build a CryptoCompare history response from candle rows"""
+    return {
+        "Response": "Success",
+        "Data": {
+            "Aggregated": endpoint_info.get("aggregate", 1) > 1,
+            "TimeFrom": int(candles[0][0]) if candles else 0,
+            "TimeTo": int(candles[-1][0]) if candles else 0,
+            "Data": [
+                {
+                    "time": int(row[0]),
+                    "open": row[1],
+                    "high": row[2],
+                    "low": row[3],
+                    "close": row[4],
+                    "volumefrom": row[5],
+                    "volumeto": row[6],
+                    "conversionType": conversion.get("conversionType", ""),
+                    "conversionSymbol": conversion.get("conversionSymbol", ""),
+                }
+                for row in candles
+            ],
+        },
+    }
+
+
 def _get_period_seconds(period_name: str) -> int:
     """
     Helper function to get the number of seconds for each period type.
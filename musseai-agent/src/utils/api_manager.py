@@ -3,8 +3,6 @@ import requests
 import time
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-import numpy as np
-import pandas as pd
 from loggers import logger
 import traceback
 from utils.api_decorators import (
@@ -12,6 +10,12 @@ from utils.api_decorators import (
     api_call_with_cache_and_rate_limit_no_429_retry,
     APIRateLimitException,
 )
+from utils.ohlcv_series_cache import interval_seconds, ohlcv_series_cache
+from utils.price_history_store import price_history_store
+from utils.price_series import PriceSeries
+
+# Chart intervals backed by the shared candle series ("weekly" charts use daily points)
+CHART_SERIES_INTERVALS = {"hourly": "1h", "daily": "1d", "weekly": "1d"}
 
 
 class MultiAPIManager:
@@ -262,32 +266,78 @@ class MultiAPIManager:
     def fetch_historical_prices_binance(
         self, symbol: str, days: int = 90
     ) -> Optional[Dict]:
-        """Fetch historical prices from Binance"""
-        binance_symbol = f"{symbol.upper()}USDT"
+        """Fetch historical prices from Binance, reusing already fetched daily candles"""
+        candles = ohlcv_series_cache.get_candles(
+            "binance_usdt",
+            symbol,
+            "1d",
+            days,
+            lambda since_ts, count: self._fetch_binance_candles(
+                symbol, "1d", since_ts, count
+            ),
+        )
+        return self._process_candle_rows(candles)
+
+    def _fetch_binance_candles(
+        self, symbol: str, interval: str, since_ts: int, count: int
+    ) -> List[List[float]]:
+        """Fetch raw klines from Binance starting at since_ts (seconds)"""
+        if count > 1000:  # Binance limit, keep the newest candles
+            since_ts += (count - 1000) * interval_seconds(interval)
+            count = 1000
 
         url = f"{self.apis['binance']['base_url']}/klines"
         params = {
-            "symbol": binance_symbol,
-            "interval": "1d",
-            "limit": min(days, 1000),  # Binance limit
+            "symbol": f"{symbol.upper()}USDT",
+            "interval": interval,
+            "startTime": since_ts * 1000,
+            "limit": count,
         }
 
         response = requests.get(url, params=params, timeout=10)
         response.raise_for_status()
 
-        data = response.json()
-        return self._process_binance_data(data)
+        return [
+            [
+                int(kline[0]) // 1000,
+                float(kline[1]),
+                float(kline[2]),
+                float(kline[3]),
+                float(kline[4]),
+                float(kline[5]),
+                float(kline[7]),
+            ]
+            for kline in response.json()
+        ]
 
     # @api_call_with_cache_and_rate_limit(cache_duration=3600, rate_limit_interval=0.05)
     def fetch_historical_prices_cryptocompare(
         self, symbol: str, days: int = 90
     ) -> Optional[Dict]:
-        """Fetch historical prices from CryptoCompare"""
-        url = f"{self.apis['cryptocompare']['base_url']}/v2/histoday"
+        """Fetch historical prices from CryptoCompare, reusing already fetched daily candles"""
+        candles = ohlcv_series_cache.get_candles(
+            "cryptocompare_usd",
+            symbol,
+            "1d",
+            days,
+            lambda since_ts, count: self._fetch_cryptocompare_candles(
+                symbol, "1d", since_ts, count
+            ),
+        )
+        return self._process_candle_rows(candles)
+
+    def _fetch_cryptocompare_candles(
+        self, symbol: str, interval: str, since_ts: int, count: int
+    ) -> List[List[float]]:
+        """Fetch raw candles from CryptoCompare starting at since_ts (seconds)"""
+        endpoints = {"1m": "histominute", "1h": "histohour", "1d": "histoday"}
+        url = f"{self.apis['cryptocompare']['base_url']}/v2/{endpoints[interval]}"
         params = {
             "fsym": symbol.upper(),
             "tsym": "USD",
-            "limit": days,
+            # CryptoCompare returns limit + 1 candles ending at toTs
+            "limit": min(max(count - 1, 1), 2000),
+            "toTs": since_ts + (count - 1) * interval_seconds(interval),
             "aggregate": 1,
         }
 
@@ -295,7 +345,24 @@ class MultiAPIManager:
         response.raise_for_status()
 
         data = response.json()
-        return self._process_cryptocompare_data(data)
+        if data.get("Response") == "Error":
+            raise ValueError(
+                f"CryptoCompare error for {symbol}: {data.get('Message', 'Unknown error')}"
+            )
+
+        return [
+            [
+                int(item["time"]),
+                float(item.get("open", 0)),
+                float(item.get("high", 0)),
+                float(item.get("low", 0)),
+                float(item.get("close", 0)),
+                float(item.get("volumefrom", 0)),
+                float(item.get("volumeto", 0)),
+            ]
+            for item in data.get("Data", {}).get("Data", [])
+            if int(item["time"]) >= since_ts
+        ]
 
     @api_call_with_cache_and_rate_limit(
         cache_duration=3600,
@@ -333,6 +400,13 @@ class MultiAPIManager:
         """
         if max_global_retries is None:
             max_global_retries = self.default_max_global_retries
+
+        # A longer or finer stored window covers this request without upstream calls
+        stored = self._get_stored_price_history(symbol, days)
+        if stored:
+            logger.info(f"Serving {days}d history for {symbol} from price history store")
+            return stored
+
         logger.info(f"Starting enhanced API fallback for {symbol}")
 
         # Define API methods in priority order
@@ -431,94 +505,55 @@ class MultiAPIManager:
         )
         return None
 
-    def _process_coingecko_data(self, data: Dict) -> Dict:
-        """处理CoinGecko数据格式"""
-        prices = data.get("prices", [])
-        if not prices:
-            return {}
+    def get_price_history(self, symbol: str, days: int = 90) -> Optional[Dict]:
+        """
+        Get daily price history from the local price history store
+
+        Falls back to fetch_with_fallback when the store does not hold the full
+        window; candle-based providers fill the store on the way.
+        """
+        stored = self._get_stored_price_history(symbol, days)
+        if stored:
+            return stored
+        return self.fetch_with_fallback(symbol, days)
+
+    def _get_stored_price_history(self, symbol: str, days: int) -> Optional[Dict]:
+        """Derive a days window from stored (or finer resampled) daily candles"""
+        step = interval_seconds("1d")
+        end_ts = int(time.time() // step) * step
+        try:
+            candles = price_history_store.window(
+                symbol, "1d", end_ts - int(days) * step, end_ts
+            )
+        except (TypeError, ValueError):
+            return None
+        if candles is None:
+            return None
 
-        df = pd.DataFrame(prices, columns=["timestamp", "price"])
-        df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
-        df["returns"] = df["price"].pct_change().dropna()
+        result = PriceSeries.from_candles(candles).to_history_dict()
+        if result:
+            result["source"] = "price_history_store"
+        return result
 
-        return {
-            "prices": df["price"].tolist(),
-            "returns": df["returns"].tolist(),
-            "dates": df["date"].dt.strftime("%Y-%m-%d").tolist(),
-            "volatility": df["returns"].std() * np.sqrt(365),
-            "mean_return": df["returns"].mean() * 365,
-        }
+    def _process_coingecko_data(self, data: Dict) -> Dict:
+        """处理CoinGecko数据格式"""
+        return PriceSeries.from_coingecko(data).to_history_dict()
 
     def _process_coincap_data(self, data: Dict) -> Dict:
         """处理CoinCap数据格式"""
-        history = data.get("data", [])
-        if not history:
-            return {}
-
-        prices = [float(item["priceUsd"]) for item in history if item["priceUsd"]]
-        dates = [item["date"] for item in history]
-
-        if len(prices) < 2:
-            return {}
-
-        returns = [prices[i] / prices[i - 1] - 1 for i in range(1, len(prices))]
-
-        return {
-            "prices": prices,
-            "returns": returns,
-            "dates": dates,
-            "volatility": np.std(returns) * np.sqrt(365) if returns else 0,
-            "mean_return": np.mean(returns) * 365 if returns else 0,
-        }
+        return PriceSeries.from_coincap(data).to_history_dict()
 
     def _process_binance_data(self, data: List) -> Dict:
         """处理Binance数据格式"""
-        if not data:
-            return {}
+        return PriceSeries.from_binance_klines(data).to_history_dict()
 
-        prices = [float(kline[4]) for kline in data]  # Close price
-        dates = [
-            pd.to_datetime(int(kline[0]), unit="ms").strftime("%Y-%m-%d")
-            for kline in data
-        ]
-
-        if len(prices) < 2:
-            return {}
-
-        returns = [prices[i] / prices[i - 1] - 1 for i in range(1, len(prices))]
-
-        return {
-            "prices": prices,
-            "returns": returns,
-            "dates": dates,
-            "volatility": np.std(returns) * np.sqrt(365) if returns else 0,
-            "mean_return": np.mean(returns) * 365 if returns else 0,
-        }
+    def _process_candle_rows(self, candles: List[List[float]]) -> Dict:
+        """处理OHLCV蜡烛数据格式"""
+        return PriceSeries.from_candle_rows(candles).to_history_dict()
 
     def _process_cryptocompare_data(self, data: Dict) -> Dict:
         """处理CryptoCompare数据格式"""
-        history = data.get("Data", {}).get("Data", [])
-        if not history:
-            return {}
-
-        prices = [float(item["close"]) for item in history if item["close"]]
-        dates = [
-            pd.to_datetime(int(item["time"]), unit="s").strftime("%Y-%m-%d")
-            for item in history
-        ]
-
-        if len(prices) < 2:
-            return {}
-
-        returns = [prices[i] / prices[i - 1] - 1 for i in range(1, len(prices))]
-
-        return {
-            "prices": prices,
-            "returns": returns,
-            "dates": dates,
-            "volatility": np.std(returns) * np.sqrt(365) if returns else 0,
-            "mean_return": np.mean(returns) * 365 if returns else 0,
-        }
+        return PriceSeries.from_cryptocompare(data).to_history_dict()
 
     @api_call_with_cache_and_rate_limit_no_429_retry(
         cache_duration=86400 * 365, rate_limit_interval=1.2, api_name="coingecko"
@@ -1210,6 +1245,19 @@ class MultiAPIManager:
             # Map interval to Binance format
             binance_interval = self._map_interval_to_binance(interval)
 
+            if binance_interval in CHART_SERIES_INTERVALS.values():
+                # Epoch-aligned candles are shared with the history series cache
+                candles = ohlcv_series_cache.get_candle_array(
+                    "binance_usdt",
+                    symbol,
+                    binance_interval,
+                    self._chart_candle_count(days, binance_interval),
+                    lambda since_ts, count: self._fetch_binance_candles(
+                        symbol, binance_interval, since_ts, count
+                    ),
+                )
+                return self._candles_to_chart_data(candles, "volume")
+
             # Calculate limit based on days and interval
             days_int = int(days)
             limit = min(days_int, 1000)  # Binance limit
@@ -1243,6 +1291,19 @@ class MultiAPIManager:
         Fetch market chart data from CryptoCompare API
         """
         try:
+            series_interval = CHART_SERIES_INTERVALS.get(interval)
+            if series_interval:
+                candles = ohlcv_series_cache.get_candle_array(
+                    "cryptocompare_usd",
+                    symbol,
+                    series_interval,
+                    self._chart_candle_count(days, series_interval),
+                    lambda since_ts, count: self._fetch_cryptocompare_candles(
+                        symbol, series_interval, since_ts, count
+                    ),
+                )
+                return self._candles_to_chart_data(candles, "quote_volume")
+
             # Map interval to CryptoCompare endpoint
             endpoint = self._map_interval_to_cryptocompare_endpoint(interval)
 
@@ -1294,6 +1355,17 @@ class MultiAPIManager:
         if max_global_retries is None:
             max_global_retries = self.default_max_global_retries
 
+        # A longer or finer stored window covers this request without upstream calls
+        stored = self._get_stored_market_chart(symbol, days, interval)
+        if stored:
+            logger.info(
+                f"Serving {days}d {interval} chart for {symbol} from price history store"
+            )
+            stored.update(
+                {"symbol": symbol, "days": days, "interval": interval}
+            )
+            return stored
+
         logger.info(f"Starting multi-API market chart fetch for {symbol}")
 
         # Define API methods in priority order
@@ -2496,80 +2568,54 @@ class MultiAPIManager:
         mapping = {"hourly": "histohour", "daily": "histoday", "weekly": "histoday"}
         return mapping.get(interval, "histoday")
 
-    def _process_coingecko_chart_data(self, data: Dict) -> Dict:
-        """Process CoinGecko chart data format"""
-        prices = data.get("prices", [])
-        market_caps = data.get("market_caps", [])
-        volumes = data.get("total_volumes", [])
+    def _chart_candle_count(self, days: str, interval: str) -> int:
+        """Number of candles of an interval covering a days window"""
+        return max(int(days) * 86400 // interval_seconds(interval), 1)
 
-        return {
-            "prices": [[item[0], item[1]] for item in prices],
-            "market_caps": [[item[0], item[1]] for item in market_caps],
-            "total_volumes": [[item[0], item[1]] for item in volumes],
-        }
+    def _get_stored_market_chart(
+        self, symbol: str, days: str, interval: str
+    ) -> Optional[Dict]:
+        """Derive chart data from a stored (or finer resampled) window"""
+        series_interval = CHART_SERIES_INTERVALS.get(interval)
+        if not series_interval:
+            return None
 
-    def _process_coincap_chart_data(self, data: Dict) -> Dict:
-        """Process CoinCap chart data format"""
-        history = data.get("data", [])
+        step = interval_seconds(series_interval)
+        end_ts = int(time.time() // step) * step
+        try:
+            count = self._chart_candle_count(days, series_interval)
+        except (TypeError, ValueError):
+            return None
 
-        prices = []
-        market_caps = []
-        volumes = []
+        candles = price_history_store.window(
+            symbol, series_interval, end_ts - count * step, end_ts
+        )
+        if candles is None:
+            return None
 
-        for item in history:
-            timestamp = int(item.get("time", 0))
-            price = float(item.get("priceUsd", 0))
-            volume = float(item.get("volumeUsd24Hr", 0))
+        chart_data = self._candles_to_chart_data(candles, "quote_volume")
+        chart_data["source"] = "price_history_store"
+        return chart_data if self._validate_chart_data(chart_data) else None
 
-            prices.append([timestamp, price])
-            market_caps.append([timestamp, None])  # Not available in history
-            volumes.append([timestamp, volume])
+    def _candles_to_chart_data(self, candles, volume_field: str) -> Dict:
+        """Convert structured candles into the [timestamp_ms, value] chart format"""
+        return PriceSeries.from_candles(candles, volume_field).to_chart_dict()
 
-        return {
-            "prices": prices,
-            "market_caps": market_caps,
-            "total_volumes": volumes,
-        }
+    def _process_coingecko_chart_data(self, data: Dict) -> Dict:
+        """Process CoinGecko chart data format"""
+        return PriceSeries.from_coingecko(data).to_chart_dict()
+
+    def _process_coincap_chart_data(self, data: Dict) -> Dict:
+        """Process CoinCap chart data format"""
+        return PriceSeries.from_coincap(data).to_chart_dict()
 
     def _process_binance_chart_data(self, data: List) -> Dict:
         """Process Binance chart data format"""
-        prices = []
-        volumes = []
-
-        for kline in data:
-            timestamp = int(kline[0])
-            close_price = float(kline[4])
-            volume = float(kline[5])
-
-            prices.append([timestamp, close_price])
-            volumes.append([timestamp, volume])
-
-        return {
-            "prices": prices,
-            "market_caps": [[item[0], None] for item in prices],  # Not available
-            "total_volumes": volumes,
-        }
+        return PriceSeries.from_binance_klines(data).to_chart_dict()
 
     def _process_cryptocompare_chart_data(self, data: Dict) -> Dict:
         """Process CryptoCompare chart data format"""
-        history = data.get("Data", {}).get("Data", [])
-
-        prices = []
-        volumes = []
-
-        for item in history:
-            timestamp = int(item["time"]) * 1000  # Convert to milliseconds
-            close_price = float(item["close"])
-            volume = float(item.get("volumeto", 0))
-
-            prices.append([timestamp, close_price])
-            volumes.append([timestamp, volume])
-
-        return {
-            "prices": prices,
-            "market_caps": [[item[0], None] for item in prices],  # Not available
-            "total_volumes": volumes,
-        }
+        return PriceSeries.from_cryptocompare(data).to_chart_dict()
 
 
 @api_call_with_cache_and_rate_limit(
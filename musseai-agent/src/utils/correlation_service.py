@@ -0,0 +1,322 @@
+# src/utils/correlation_service.py
+"""
+Shared correlation matrices
+
+Daily returns of a symbol universe are aligned on one date index, with NaN
+where a symbol has no return, and the whole pairwise-complete Pearson matrix
+is computed at once from a handful of matrix products instead of one
+np.corrcoef call per pair on position-truncated series.
+
+Matrices are cached per (window, as-of date, universe). A request is served
+from any cached universe of the same window and date that contains all of its
+symbols, by slicing the submatrix. A miss computes the requested symbols
+together with DEFAULT_UNIVERSE, so portfolios built from the same major assets
+share one matrix per day. Matrices also go to the cache backend under their
+universe key, for other processes making the same request.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from loggers import logger
+import traceback
+from utils.redis_cache import _cache_backend
+
+CORRELATION_CACHE_DURATION = 86400  # Matrices are keyed by date
+MAX_CACHED_MATRICES = 64
+MIN_OVERLAP = 20  # Common returns needed before a pair is correlated
+FAILED_RETRY_SECONDS = 300  # Before symbols whose history failed to load are retried
+
+# Assets most portfolios hold, computed alongside every request
+DEFAULT_UNIVERSE = (
+    "BTC",
+    "ETH",
+    "SOL",
+    "BNB",
+    "XRP",
+    "ADA",
+    "DOGE",
+    "AVAX",
+    "DOT",
+    "LINK",
+)
+
+# loader(symbol, days) -> price history dict with "dates" and "returns"
+HistoryLoader = Callable[[str, int], Optional[Dict]]
+
+
+def align_returns(
+    historical_data: Dict, symbols: Sequence[str]
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Daily returns of symbols on the union of their dates
+
+    Args:
+        historical_data: Price history dicts by symbol, with "dates" and "returns"
+        symbols: Symbols to align, those without history are left out
+
+    Returns:
+        Tuple: (symbols included, datetime64[D] date index, dates x symbols
+        return matrix with NaN where a symbol has no return)
+    """
+    series = []
+    for symbol in symbols:
+        history = historical_data.get(symbol) or {}
+        returns, dates = history.get("returns") or [], history.get("dates") or []
+        if returns and len(dates) == len(returns) + 1:
+            # returns[i] is the change into dates[i + 1]
+            days = np.array(dates[1:], dtype="datetime64[D]")
+            series.append((symbol, days, np.asarray(returns, dtype=float)))
+
+    if not series:
+        return [], np.zeros(0, dtype="datetime64[D]"), np.zeros((0, 0))
+
+    index = np.unique(np.concatenate([days for _, days, _ in series]))
+    matrix = np.full((len(index), len(series)), np.nan)
+    for j, (_, days, returns) in enumerate(series):
+        matrix[np.searchsorted(index, days), j] = returns
+    return [symbol for symbol, _, _ in series], index, matrix
+
+
+def correlation_matrix(
+    returns: np.ndarray, min_overlap: int = MIN_OVERLAP
+) -> np.ndarray:
+    """
+    Pairwise-complete Pearson correlations of the columns of a return matrix
+
+    Each pair is correlated over the rows where both columns have a value,
+    the same as np.corrcoef on the pair's common rows. Pairs with fewer than
+    min_overlap common rows or without variance get 0.
+
+    Args:
+        returns: Rows x symbols matrix, NaN where missing
+        min_overlap: Minimum number of common rows per pair
+
+    Returns:
+        Symbols x symbols matrix with a unit diagonal
+    """
+    present = ~np.isnan(returns)
+    mask = present.astype(float)
+    values = np.where(present, returns, 0.0)
+
+    # Counts, sums and sums of squares of column i over the rows shared with column j
+    count = mask.T @ mask
+    sums = values.T @ mask
+    squares = (values * values).T @ mask
+    products = values.T @ values
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = products - sums * sums.T / count
+        variance = squares - sums * sums / count
+        correlation = covariance / np.sqrt(variance * variance.T)
+
+    valid = (count >= min_overlap) & np.isfinite(correlation)
+    correlation = np.clip(np.where(valid, correlation, 0.0), -1.0, 1.0)
+    np.fill_diagonal(correlation, 1.0)
+    return correlation
+
+
+@dataclass
+class CorrelationMatrix:
+    """Correlations of the symbols of a universe that had history"""
+
+    universe: Tuple[str, ...]
+    symbols: List[str]
+    matrix: np.ndarray
+    window_days: int
+    as_of: str
+    # Symbols whose history failed to load, retried by later requests
+    failed: Tuple[str, ...] = ()
+    computed_at: float = 0.0
+
+    def covers(self, symbols: Iterable[str]) -> bool:
+        """
+        Whether every symbol is in the universe
+
+        Symbols that failed to load only count until FAILED_RETRY_SECONDS have
+        passed, then the matrix is computed again.
+        """
+        retry = time.time() - self.computed_at >= FAILED_RETRY_SECONDS
+        return all(
+            symbol in self.universe and not (retry and symbol in self.failed)
+            for symbol in symbols
+        )
+
+    def submatrix(self, symbols: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+        """Correlations among the given symbols that have history, in their order"""
+        position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        included = [symbol for symbol in dict.fromkeys(symbols) if symbol in position]
+        rows = [position[symbol] for symbol in included]
+        return self.matrix[np.ix_(rows, rows)], included
+
+
+def _default_loader(symbol: str, days: int) -> Optional[Dict]:
+    from utils.enhance_multi_api_manager import api_manager
+
+    return api_manager.get_price_history(symbol, days=days)
+
+
+class CorrelationService:
+    """Correlation matrices computed once per universe, window and day"""
+
+    def __init__(
+        self,
+        loader: HistoryLoader = _default_loader,
+        default_universe: Sequence[str] = DEFAULT_UNIVERSE,
+        max_matrices: int = MAX_CACHED_MATRICES,
+    ):
+        self.loader = loader
+        self.default_universe = tuple(default_universe)
+        self.max_matrices = max_matrices
+        self._matrices: "OrderedDict[Tuple, CorrelationMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(window_days: int, as_of: str, universe: Tuple[str, ...]) -> str:
+        digest = hashlib.md5(",".join(universe).encode()).hexdigest()
+        return f"correlation:{window_days}:{as_of}:{digest}"
+
+    def _find(
+        self, symbols: Sequence[str], window_days: int, as_of: str
+    ) -> Optional[CorrelationMatrix]:
+        """Cached matrix of the window and date whose universe holds every symbol"""
+        wanted = set(symbols)
+        with self._lock:
+            for key, cached in reversed(self._matrices.items()):
+                if key[:2] == (window_days, as_of) and cached.covers(wanted):
+                    self._matrices.move_to_end(key)
+                    return cached
+        return None
+
+    def _store(self, cached: CorrelationMatrix):
+        with self._lock:
+            # Matrices of earlier days are not requested again
+            for key in [k for k in self._matrices if k[1] < cached.as_of]:
+                del self._matrices[key]
+            self._matrices[(cached.window_days, cached.as_of, cached.universe)] = cached
+            while len(self._matrices) > self.max_matrices:
+                self._matrices.popitem(last=False)
+
+    def _load_persisted(
+        self, universe: Tuple[str, ...], window_days: int, as_of: str
+    ) -> Optional[CorrelationMatrix]:
+        cached = _cache_backend.get(self._cache_key(window_days, as_of, universe))
+        if not cached or not isinstance(cached[0], dict):
+            return None
+        stored = cached[0]
+        try:
+            return CorrelationMatrix(
+                universe=universe,
+                symbols=list(stored["symbols"]),
+                matrix=np.asarray(stored["matrix"], dtype=float).reshape(
+                    len(stored["symbols"]), len(stored["symbols"])
+                ),
+                window_days=window_days,
+                as_of=as_of,
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _compute(
+        self,
+        universe: Tuple[str, ...],
+        window_days: int,
+        as_of: str,
+        historical_data: Dict,
+        min_overlap: int,
+    ) -> CorrelationMatrix:
+        histories = {}
+        failed = []
+        for symbol in universe:
+            history = historical_data.get(symbol)
+            if not history:
+                try:
+                    history = self.loader(symbol, window_days)
+                except Exception as e:
+                    logger.warning(f"Failed to load price history of {symbol}: {e}")
+                    history = None
+                if not history:
+                    failed.append(symbol)
+            if history:
+                histories[symbol] = history
+
+        symbols, index, returns = align_returns(histories, universe)
+        end = np.datetime64(as_of, "D")
+        in_window = (index > end - window_days) & (index <= end)
+        returns = returns[in_window]
+
+        # Symbols without a single return in the window are left out
+        observed = ~np.isnan(returns).all(axis=0)
+        symbols = [symbol for symbol, keep in zip(symbols, observed) if keep]
+        matrix = correlation_matrix(returns[:, observed], min_overlap)
+        return CorrelationMatrix(
+            universe, symbols, matrix, window_days, as_of, tuple(failed), time.time()
+        )
+
+    def get_matrix(
+        self,
+        symbols: Sequence[str],
+        window_days: int = 90,
+        historical_data: Optional[Dict] = None,
+        as_of: Optional[str] = None,
+        min_overlap: int = MIN_OVERLAP,
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        Correlation matrix of symbols over the window_days ending at as_of
+
+        Args:
+            symbols: Symbols to correlate
+            window_days: Length of the window in days
+            historical_data: Price history dicts already fetched by the caller,
+                other symbols of the universe are loaded with the loader
+            as_of: Last date of the window as YYYY-MM-DD, today (UTC) by default
+            min_overlap: Minimum number of common returns per pair, used when
+                the matrix is not cached yet
+
+        Returns:
+            Tuple: (correlation matrix, symbols with history in request order)
+        """
+        symbols = [symbol.upper() for symbol in symbols]
+        as_of = as_of or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+        cached = self._find(symbols, window_days, as_of)
+        if cached is None:
+            universe = tuple(sorted(set(symbols) | set(self.default_universe)))
+            cached = self._load_persisted(universe, window_days, as_of)
+            if cached is None:
+                try:
+                    cached = self._compute(
+                        universe, window_days, as_of, historical_data or {}, min_overlap
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Error computing correlation matrix: {e}\n{traceback.format_exc()}"
+                    )
+                    return np.eye(0), []
+                # A matrix missing symbols that failed to load is not shared,
+                # other processes retry them
+                if not cached.failed:
+                    _cache_backend.set(
+                        self._cache_key(window_days, as_of, universe),
+                        {"symbols": cached.symbols, "matrix": cached.matrix.tolist()},
+                        time.time(),
+                        CORRELATION_CACHE_DURATION,
+                    )
+            self._store(cached)
+
+        return cached.submatrix(symbols)
+
+    def clear(self):
+        """Drop the in-memory matrices"""
+        with self._lock:
+            self._matrices.clear()
+
+
+# Global correlation service instance
+correlation_service = CorrelationService()
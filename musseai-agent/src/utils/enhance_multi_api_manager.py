@@ -1,6 +1,6 @@
 import threading
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import numpy as np
 from loggers import logger
@@ -14,6 +14,8 @@ from utils.api_decorators import (
 )
 from utils.cache_refresh_scheduler import CacheRefreshScheduler
 from utils.optimized_batch_cache_api_manager import OptimizedBatchCacheAPIManager
+from utils.price_history_store import price_history_store
+from utils.price_series import PriceSeries
 from utils.redis_cache import _cache_backend
 from utils.smart_cache_invalidator import SmartCacheInvalidator
 
@@ -31,6 +33,41 @@ API_CONFIG = {
     "retry_delay": 2,
 }
 
+# Stored daily candles are only used for price lookups if the series is this recent
+HISTORY_STORE_MAX_STALENESS = 2 * 86400
+PRICE_SERIES_TTL = 3600  # Seconds a normalized per-symbol price series is reused
+
+
+def _to_epoch_seconds(dates) -> np.ndarray:
+    """
+    Convert datetimes or ISO date strings to float unix timestamps
+
+    Naive values are local time, as with datetime.timestamp().
+    """
+    values = []
+    for date in dates:
+        if not isinstance(date, datetime):
+            date = datetime.fromisoformat(str(date).replace("Z", "+00:00"))
+        values.append(date.timestamp())
+    return np.array(values, dtype=np.float64)
+
+
+def _nearest_prices(
+    timestamps: np.ndarray, prices: np.ndarray, targets: np.ndarray
+) -> np.ndarray:
+    """Pick the price with the closest timestamp for each target via binary search"""
+    right = np.clip(np.searchsorted(timestamps, targets), 1, len(timestamps) - 1)
+    left = right - 1
+    if len(timestamps) == 1:
+        return np.full(len(targets), prices[0])
+    use_left = (targets - timestamps[left]) <= (timestamps[right] - targets)
+    return np.where(use_left, prices[left], prices[right])
+
+
+def _covers(series: PriceSeries, earliest: Optional[float]) -> bool:
+    """Whether a price series starts at or before the earliest lookup"""
+    return earliest is None or (len(series) > 0 and series.timestamps[0] <= earliest)
+
 
 def historical_data_api(func):
     """Decorator combination for historical data APIs"""
@@ -74,6 +111,9 @@ class EnhancedMultiAPIManager(OptimizedBatchCacheAPIManager):
         # Initialize batch caching components
         self.cache_scheduler = CacheRefreshScheduler(self)
         self.cache_invalidator = SmartCacheInvalidator(self)
+        # Normalized per-symbol price series: symbol -> (built_at, series)
+        self._price_series: Dict[str, Tuple[float, PriceSeries]] = {}
+        self._price_series_lock = threading.Lock()
 
         # Start background processes
         self._initialize_caching_system()
@@ -406,16 +446,10 @@ class EnhancedMultiAPIManager(OptimizedBatchCacheAPIManager):
         try:
             logger.info(f"Getting price for {symbol} at {target_date} from batch cache")
 
-            historical_data = self._safe_fetch_historical_data(symbol)
-            if historical_data:
-                price = self._extract_price_from_cached_data(
-                    historical_data, target_date
-                )
-                if price > 0:
-                    logger.info(
-                        f"Found price {price} from historical data for {symbol}"
-                    )
-                    return price
+            price = float(self.get_prices_at_dates([symbol], [target_date])[0, 0])
+            if price > 0:
+                logger.info(f"Found price {price} from historical data for {symbol}")
+                return price
 
             # Step 3: Check traditional assets
             # traditional_data = self._safe_fetch_yahoo_data(symbol)
@@ -435,6 +469,155 @@ class EnhancedMultiAPIManager(OptimizedBatchCacheAPIManager):
             logger.debug(traceback.format_exc())
             return 0.0
 
+    def get_prices_at_dates(
+        self, symbols: List[str], dates: List[datetime]
+    ) -> np.ndarray:
+        """
+        Get historical prices for a whole dates x symbols grid
+
+        Each symbol's history is normalized once into sorted timestamp and price
+        arrays, so the grid costs one binary search per symbol.
+
+        Args:
+            symbols: Asset symbols (grid columns)
+            dates: Target dates (grid rows)
+
+        Returns:
+            Array of shape (len(dates), len(symbols)) with the closest price per
+            cell, 0.0 where a symbol has no history
+        """
+        targets = _to_epoch_seconds(dates)
+        grid = np.zeros((len(targets), len(symbols)))
+        if not len(targets):
+            return grid
+
+        columns = {}
+        for j, symbol in enumerate(symbols):
+            key = symbol.upper()
+            if key not in columns:
+                series = self._get_price_series(symbol, float(targets.min()))
+                columns[key] = (
+                    _nearest_prices(series.timestamps, series.prices, targets)
+                    if series is not None
+                    else None
+                )
+            if columns[key] is not None:
+                grid[:, j] = columns[key]
+        return grid
+
+    def _get_price_series(
+        self, symbol: str, earliest: Optional[float] = None
+    ) -> Optional[PriceSeries]:
+        """
+        Get the normalized price series of a symbol
+
+        Prefers the full daily close series of the price history store when it is
+        current and reaches back to the earliest target, otherwise normalizes the
+        fetched historical data.
+
+        Args:
+            symbol: Asset symbol
+            earliest: Earliest unix timestamp the series is looked up at
+        """
+        key = symbol.upper()
+        now = time.time()
+        with self._price_series_lock:
+            cached = self._price_series.get(key)
+        if (
+            cached
+            and now - cached[0] < PRICE_SERIES_TTL
+            and _covers(cached[1], earliest)
+        ):
+            return cached[1]
+
+        series = self._stored_price_series(symbol, now, earliest)
+        if series is None:
+            # Candle-based providers fill the history store while fetching
+            historical_data = self._safe_fetch_historical_data(symbol)
+            series = self._stored_price_series(symbol, now, earliest)
+            if series is None and historical_data:
+                series = self._normalize_price_series(historical_data)
+
+        if series is None:
+            return None
+
+        with self._price_series_lock:
+            self._price_series[key] = (now, series)
+        return series
+
+    def _stored_price_series(
+        self, symbol: str, now: float, earliest: Optional[float] = None
+    ) -> Optional[PriceSeries]:
+        """Daily close series of the price history store, if current and reaching back to earliest"""
+        candles = price_history_store.range(symbol, "1d")
+        if (
+            len(candles)
+            and now - int(candles["ts"][-1]) <= HISTORY_STORE_MAX_STALENESS
+            and (earliest is None or int(candles["ts"][0]) <= earliest)
+        ):
+            return PriceSeries.from_candles(candles)
+        return None
+
+    def _normalize_price_series(self, historical_data) -> Optional[PriceSeries]:
+        """
+        Normalize cached historical data into a time-sorted price series
+
+        Supports processed history ({"prices": [...], "dates": [...]}), lists of
+        {"timestamp"/"date", "price"} dicts and [timestamp, price] pairs.
+
+        Returns:
+            PriceSeries, or None if unusable
+        """
+        if isinstance(historical_data, dict) and "prices" in historical_data:
+            prices_data = historical_data["prices"]
+            dates = historical_data.get("dates")
+        elif isinstance(historical_data, list):
+            prices_data = historical_data
+            dates = None
+        else:
+            logger.warning("Unexpected cached data format")
+            return None
+
+        if not prices_data:
+            return None
+
+        if dates and isinstance(prices_data[0], (int, float)):
+            # Processed history: parallel prices and date strings
+            count = min(len(dates), len(prices_data))
+            timestamps = _to_epoch_seconds(dates[:count])
+            prices = np.asarray(prices_data[:count], dtype=np.float64)
+        else:
+            timestamps = []
+            prices = []
+            for price_item in prices_data:
+                try:
+                    if isinstance(price_item, dict):
+                        if "timestamp" in price_item:
+                            price_timestamp = price_item["timestamp"] / 1000
+                        elif isinstance(price_item.get("date"), (datetime, str)):
+                            price_timestamp = _to_epoch_seconds([price_item["date"]])[0]
+                        else:
+                            continue
+                        price_value = float(price_item["price"])
+                    elif isinstance(price_item, (list, tuple)) and len(price_item) >= 2:
+                        # [timestamp, price] format
+                        price_timestamp = (
+                            price_item[0] / 1000
+                            if price_item[0] > 1e10
+                            else price_item[0]
+                        )
+                        price_value = float(price_item[1])
+                    else:
+                        continue
+                    timestamps.append(price_timestamp)
+                    prices.append(price_value)
+                except (ValueError, TypeError, KeyError) as e:
+                    logger.debug(f"Error processing cached price item: {e}")
+                    continue
+
+        series = PriceSeries.from_arrays(timestamps, prices)
+        return series if len(series) else None
+
     def _extract_price_from_crypto_cache(
         self, crypto_data: Dict, target_date: datetime, symbol: str
     ) -> float:
@@ -648,64 +831,14 @@ class EnhancedMultiAPIManager(OptimizedBatchCacheAPIManager):
             Price at target date, or 0.0 if not found
         """
         try:
-            target_timestamp = target_date.timestamp()
-            closest_price = 0.0
-            min_diff = float("inf")
-
-            # Handle different cached data formats
-            prices_data = []
-
-            if "prices" in historical_data:
-                prices_data = historical_data["prices"]
-            elif isinstance(historical_data, list):
-                prices_data = historical_data
-            else:
-                logger.warning("Unexpected cached data format")
+            series = self._normalize_price_series(historical_data)
+            if series is None:
                 return 0.0
 
-            for price_item in prices_data:
-                try:
-                    # Handle different price item formats
-                    if isinstance(price_item, dict):
-                        if "timestamp" in price_item:
-                            price_timestamp = price_item["timestamp"] / 1000
-                            price_value = price_item["price"]
-                        elif "date" in price_item:
-                            if isinstance(price_item["date"], datetime):
-                                price_timestamp = price_item["date"].timestamp()
-                            elif isinstance(price_item["date"], str):
-                                # Parse date string
-                                date_obj = datetime.fromisoformat(
-                                    price_item["date"].replace("Z", "+00:00")
-                                )
-                                price_timestamp = date_obj.timestamp()
-                            else:
-                                continue
-                            price_value = price_item["price"]
-                        else:
-                            continue
-                    elif isinstance(price_item, (list, tuple)) and len(price_item) >= 2:
-                        # [timestamp, price] format
-                        price_timestamp = (
-                            price_item[0] / 1000
-                            if price_item[0] > 1e10
-                            else price_item[0]
-                        )
-                        price_value = price_item[1]
-                    else:
-                        continue
-
-                    diff = abs(price_timestamp - target_timestamp)
-
-                    if diff < min_diff:
-                        min_diff = diff
-                        closest_price = float(price_value)
-
-                except (ValueError, TypeError, KeyError) as e:
-                    logger.debug(f"Error processing cached price item: {e}")
-                    continue
-
-            return closest_price
+            targets = _to_epoch_seconds([target_date])
+            return float(
+                _nearest_prices(series.timestamps, series.prices, targets)[0]
+            )
 
         except Exception as e:
             logger.error(f"Error extracting price from cached data: {e}")
@@ -0,0 +1,306 @@
+# src/utils/ohlcv_series_cache.py
+"""
+Append-only OHLCV time-series cache
+
+Keeps one series of closed candles per (feed, symbol, interval). Closed candles
+never change upstream, so once fetched they are kept and only the delta since
+the last closed candle is requested again. Any ``days``/``limit`` window is
+served by slicing the shared series, so 30d, 90d and 365d requests for the same
+symbol reuse one underlying fetch.
+
+Closed candles live in the local price history store; only the coverage
+metadata goes to the cache backend. Fetchers return candle rows:
+    [open_time, open, high, low, close, volume, quote_volume]
+``open_time`` is a unix timestamp in seconds.
+"""
+import threading
+import time
+from typing import Callable, Dict, List
+import numpy as np
+from loggers import logger
+import traceback
+from utils.price_history_store import (
+    INTERVAL_SECONDS,
+    price_history_store,
+    rows_to_candles,
+)
+from utils.redis_cache import _cache_backend
+
+# Row column indexes
+TS, OPEN, HIGH, LOW, CLOSE, VOLUME, QUOTE_VOLUME = range(7)
+
+SERIES_CACHE_DURATION = 86400 * 3650  # Closed candles never expire
+DEFAULT_REFRESH_INTERVAL = 60  # Seconds before the forming candle is re-fetched
+DEFAULT_MAX_CANDLES = 20000  # Hard cap per series to bound disk and memory
+
+# fetcher(since_ts, count) -> the ``count`` candle rows opening at since_ts and
+# after; spans reaching the current period include the forming candle
+CandleFetcher = Callable[[int, int], List[List[float]]]
+
+
+def interval_seconds(interval: str) -> int:
+    """Get the length of an interval in seconds"""
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(
+            f"Unsupported interval '{interval}'. Supported: {list(INTERVAL_SECONDS)}"
+        )
+    return INTERVAL_SECONDS[interval]
+
+
+class OHLCVSeriesCache:
+    """Per-(feed, symbol, interval) store of closed candles with delta refresh"""
+
+    def __init__(
+        self,
+        store=price_history_store,
+        refresh_interval: int = DEFAULT_REFRESH_INTERVAL,
+        max_candles: int = DEFAULT_MAX_CANDLES,
+    ):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.max_candles = max_candles
+        self._series: Dict[str, Dict] = {}
+        self._series_lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _series_key(self, feed: str, symbol: str, interval: str) -> str:
+        return f"ohlcv_series_{feed}_{symbol.upper()}_{interval}"
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._series_lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _load(self, key: str) -> Dict:
+        """Load series metadata from memory, falling back to the cache backend"""
+        series = self._series.get(key)
+        if series is not None:
+            return series
+
+        series = {
+            "covered_from": None,
+            "forming": None,
+            "refreshed_at": 0,
+            "meta": {},
+        }
+        cached = _cache_backend.get(key)
+        if cached:
+            stored, _ = cached
+            if isinstance(stored, dict):
+                series["covered_from"] = stored.get("covered_from")
+                series["meta"] = stored.get("meta", {})
+
+        self._series[key] = series
+        return series
+
+    def _persist(self, key: str, series: Dict):
+        """Write series metadata back to the cache backend"""
+        _cache_backend.set(
+            key,
+            {
+                "covered_from": series["covered_from"],
+                "meta": series.get("meta", {}),
+            },
+            time.time(),
+            SERIES_CACHE_DURATION,
+        )
+
+    def _merge(
+        self,
+        feed: str,
+        symbol: str,
+        interval: str,
+        series: Dict,
+        rows: List[List[float]],
+        current_open: int,
+    ):
+        """Merge fetched rows into the store, splitting off the forming candle"""
+        candles = rows_to_candles(rows)
+        forming = candles[candles["ts"] >= current_open]
+        closed = candles[candles["ts"] < current_open]
+        # Skip placeholder candles reported before an asset was listed
+        listed = (
+            (closed["open"] != 0)
+            | (closed["high"] != 0)
+            | (closed["low"] != 0)
+            | (closed["close"] != 0)
+        )
+
+        self.store.merge(feed, symbol, interval, closed[listed])
+        self.store.truncate(feed, symbol, interval, self.max_candles)
+        if len(forming):
+            series["forming"] = forming[int(np.argmax(forming["ts"]))]
+        self._clamp_coverage(feed, symbol, interval, series)
+
+    def _clamp_coverage(self, feed: str, symbol: str, interval: str, series: Dict):
+        """Move the coverage start past candles dropped by truncation"""
+        stored = self.store.load(feed, symbol, interval)
+        if series["covered_from"] is not None and len(stored) >= self.max_candles:
+            series["covered_from"] = max(series["covered_from"], int(stored["ts"][0]))
+
+    def get_candle_array(
+        self,
+        feed: str,
+        symbol: str,
+        interval: str,
+        limit: int,
+        fetcher: CandleFetcher,
+        include_forming: bool = True,
+    ) -> np.ndarray:
+        """
+        Get the last ``limit`` closed candles, plus the forming candle if requested
+
+        Only candles missing from the stored series are requested from ``fetcher``:
+        a longer window only backfills the older span, and spans a finer stored
+        interval already covers are resampled instead of fetched.
+        Without the forming candle the result is a zero-copy view of the store.
+
+        Args:
+            feed: Upstream feed name (provider and quote currency), e.g. "cryptocompare_usd"
+            symbol: Asset symbol
+            interval: Candle interval, one of INTERVAL_SECONDS
+            limit: Number of closed candles to return
+            fetcher: Callable(since_ts, count) returning candle rows from upstream
+            include_forming: Whether to append the currently forming candle
+
+        Returns:
+            Structured candle array (CANDLE_DTYPE) sorted by open time
+        """
+        step = interval_seconds(interval)
+        key = self._series_key(feed, symbol, interval)
+
+        with self._lock_for(key):
+            series = self._load(key)
+            now = time.time()
+            current_open = int(now // step) * step
+            window_start = current_open - limit * step
+
+            stored = self.store.load(feed, symbol, interval)
+            covered_from = series["covered_from"]
+            if covered_from is None or not len(stored):
+                backfill_end = current_open
+            elif covered_from > window_start:
+                backfill_end = covered_from
+            else:
+                backfill_end = None
+
+            # (since_ts, count, is_backfill) spans requested from upstream
+            spans = []
+            fetch_all = False
+            if backfill_end is not None:
+                resampled = self.store.resample_window(
+                    feed, symbol, interval, window_start, backfill_end
+                )
+                if resampled is not None:
+                    logger.debug(
+                        f"Resampled {len(resampled)} {interval} candles for {symbol} ({feed})"
+                    )
+                    self.store.merge(feed, symbol, interval, resampled)
+                    self.store.truncate(feed, symbol, interval, self.max_candles)
+                    series["covered_from"] = window_start
+                    self._clamp_coverage(feed, symbol, interval, series)
+                    self._persist(key, series)
+                    stored = self.store.load(feed, symbol, interval)
+                elif backfill_end == current_open:
+                    # Nothing usable is stored, fetch the whole window with the forming candle
+                    spans.append((window_start, limit + 1, True))
+                    fetch_all = True
+                else:
+                    # Only the span older than the stored history is missing
+                    spans.append(
+                        (window_start, (backfill_end - window_start) // step, True)
+                    )
+
+            if not fetch_all:
+                last_closed = int(stored["ts"][-1]) if len(stored) else None
+                if last_closed is not None and last_closed + step < current_open:
+                    # New candles closed since the last refresh, fetch only the delta
+                    since_ts = last_closed + step
+                    spans.append((since_ts, (current_open - since_ts) // step + 1, False))
+                elif now - series["refreshed_at"] >= self.refresh_interval:
+                    # Nothing closed yet, only the forming candle needs refreshing
+                    spans.append((current_open, 1, False))
+
+            for since_ts, count, is_backfill in spans:
+                logger.debug(
+                    f"Fetching {count} {interval} candles for {symbol} ({feed}) since {since_ts}"
+                )
+                try:
+                    rows = fetcher(since_ts, count)
+                except Exception as e:
+                    logger.warning(
+                        f"Candle fetch failed for {symbol} ({feed}, {interval}): {e}\n{traceback.format_exc()}"
+                    )
+                    if not len(self.store.load(feed, symbol, interval)):
+                        raise
+                    continue
+
+                self._merge(feed, symbol, interval, series, rows, current_open)
+                if since_ts + (count - 1) * step >= current_open:
+                    series["refreshed_at"] = now
+                if is_backfill:
+                    series["covered_from"] = window_start
+                    self._clamp_coverage(feed, symbol, interval, series)
+                self._persist(key, series)
+
+            window = self.store.range(
+                symbol, interval, window_start, current_open, feed=feed
+            )
+            forming = series["forming"]
+            if include_forming and forming is not None and forming["ts"] == current_open:
+                window = np.concatenate([window, forming.reshape(1)])
+            return window
+
+    def get_candles(
+        self,
+        feed: str,
+        symbol: str,
+        interval: str,
+        limit: int,
+        fetcher: CandleFetcher,
+        include_forming: bool = True,
+    ) -> List[List[float]]:
+        """Get the candle window as rows, see get_candle_array"""
+        window = self.get_candle_array(
+            feed, symbol, interval, limit, fetcher, include_forming
+        )
+        return [list(row) for row in window.tolist()]
+
+    def set_meta(self, feed: str, symbol: str, interval: str, meta: Dict):
+        """Attach feed-specific metadata to a series (e.g. conversion info)"""
+        key = self._series_key(feed, symbol, interval)
+        with self._lock_for(key):
+            series = self._load(key)
+            series.setdefault("meta", {}).update(meta)
+            self._persist(key, series)
+
+    def get_meta(self, feed: str, symbol: str, interval: str) -> Dict:
+        """Get feed-specific metadata of a series"""
+        key = self._series_key(feed, symbol, interval)
+        with self._lock_for(key):
+            return dict(self._load(key).get("meta", {}))
+
+    def get_stats(self) -> Dict:
+        """Get in-memory series statistics"""
+        with self._series_lock:
+            return {
+                key: {
+                    "covered_from": series["covered_from"],
+                    "refreshed_at": series["refreshed_at"],
+                    "has_forming": series["forming"] is not None,
+                }
+                for key, series in self._series.items()
+            }
+
+    def invalidate(self, feed: str, symbol: str, interval: str):
+        """Drop a stored series"""
+        key = self._series_key(feed, symbol, interval)
+        with self._lock_for(key):
+            self._series.pop(key, None)
+            _cache_backend.delete(key)
+            self.store.delete(feed, symbol, interval)
+
+
+# Global series cache instance
+ohlcv_series_cache = OHLCVSeriesCache()
@@ -0,0 +1,448 @@
+# src/utils/portfolio_return_engine.py
+"""
+Vectorized portfolio return engine
+
+The holdings of a set of sources are rebuilt at every requested moment as a
+moments x assets quantity matrix: the net quantity of the whole ledger is the
+anchor and every transaction after a moment is rolled back from it, with one
+cumulative sum over the signed quantities, which is the ledger built forward.
+Assets without any transaction are held at their current position. Assets
+whose current position differs from their ledger (transactions recorded
+without updating positions, or positions edited without a transaction) are
+reported, as are holdings the ledger takes below zero.
+
+Prices come as a moments x assets grid from the price series cache of the API
+manager, so portfolio values are a row-wise dot product and daily,
+time-weighted and money-weighted returns are derived from the same arrays in
+one pass.
+
+Quantity changes recorded in the ledger are external cash flows valued at the
+transaction price, as the portfolio does not track the cash that funds them.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from loggers import logger
+from mysql.db import get_db
+from mysql.model import (
+    AssetModel,
+    PortfolioSourceModel,
+    PositionModel,
+    TransactionModel,
+    TransactionType,
+)
+from utils.enhance_multi_api_manager import api_manager
+
+# Direction of each transaction type on the held quantity, transfers move
+# assets between the user's own sources and leave the total unchanged
+QUANTITY_SIGNS = {
+    TransactionType.BUY: 1.0,
+    TransactionType.DEPOSIT: 1.0,
+    TransactionType.SELL: -1.0,
+    TransactionType.WITHDRAW: -1.0,
+}
+
+MWR_MAX_ITERATIONS = 50
+MWR_TOLERANCE = 1e-10
+QUANTITY_TOLERANCE = 1e-8  # Relative difference below which quantities match
+
+
+@dataclass
+class PortfolioLedger:
+    """Holdings per asset today and the signed quantity changes that led to them"""
+
+    asset_ids: List[int]
+    symbols: List[str]
+    quantities: np.ndarray
+    tx_times: np.ndarray
+    tx_assets: np.ndarray
+    tx_quantities: np.ndarray
+    tx_prices: np.ndarray
+    # Assets whose current position does not match their ledger
+    mismatched_symbols: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_holdings(cls, holdings: List[Tuple[int, str, float]]) -> "PortfolioLedger":
+        """Ledger of holdings without transactions, held constant over time"""
+        return cls(
+            asset_ids=[asset_id for asset_id, _, _ in holdings],
+            symbols=[symbol for _, symbol, _ in holdings],
+            quantities=np.array([quantity for _, _, quantity in holdings], dtype=float),
+            tx_times=np.zeros(0, dtype="datetime64[s]"),
+            tx_assets=np.zeros(0, dtype=int),
+            tx_quantities=np.zeros(0),
+            tx_prices=np.zeros(0),
+        )
+
+
+@dataclass
+class PortfolioReturnSeries:
+    """Holdings, values and returns of a portfolio at consecutive moments"""
+
+    moments: List[datetime]
+    symbols: List[str]
+    quantities: np.ndarray
+    prices: np.ndarray
+    values: np.ndarray
+    flows: np.ndarray
+    returns: np.ndarray
+    valid: np.ndarray
+    time_weighted_return: float
+    money_weighted_return: float
+    mismatched_symbols: List[str] = field(default_factory=list)
+    # Assets the ledger takes below zero at some moment, valued at zero there
+    negative_symbols: List[str] = field(default_factory=list)
+
+    def daily_returns(self) -> np.ndarray:
+        """Flow adjusted period returns as fractions, skipping periods after a zero value"""
+        return self.returns[self.valid]
+
+    def asset_values(self) -> List[Dict[str, float]]:
+        """Value per asset symbol at each moment"""
+        asset_symbols = sorted(set(self.symbols))
+        columns_to_assets = np.zeros((len(self.symbols), len(asset_symbols)))
+        columns_to_assets[
+            np.arange(len(self.symbols)),
+            [asset_symbols.index(symbol) for symbol in self.symbols],
+        ] = 1
+        asset_matrix = (self.quantities * self.prices) @ columns_to_assets
+        return [
+            {
+                symbol: round(float(value), 8)
+                for symbol, value in zip(asset_symbols, row)
+                if value
+            }
+            for row in asset_matrix
+        ]
+
+
+def _to_datetime64(moments) -> np.ndarray:
+    """Datetimes as datetime64[s], aware values converted to naive UTC"""
+    values = []
+    for moment in moments:
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        values.append(moment)
+    return np.array(values, dtype="datetime64[s]")
+
+
+def daily_moments(start: date, end: date) -> List[datetime]:
+    """End of every day from start to end, with now instead of the end of today"""
+    now = datetime.utcnow()
+    moments = [
+        datetime.combine(start + timedelta(days=i), time.max)
+        for i in range((end - start).days + 1)
+    ]
+    return [min(moment, now) for moment in moments if moment.date() <= now.date()]
+
+
+def load_ledger(
+    since: datetime,
+    user_id: Optional[str] = None,
+    source_ids: Optional[List[int]] = None,
+) -> PortfolioLedger:
+    """
+    Load current positions, ledger totals and the transactions after a moment
+
+    Positions are summed per asset across the user's active sources, or across
+    the given sources. The anchor of an asset is the net quantity of all its
+    transactions, or its current position when it has none.
+    """
+    with get_db() as db:
+        if source_ids is None:
+            source_ids = [
+                row.source_id
+                for row in db.query(PortfolioSourceModel.source_id)
+                .filter(
+                    PortfolioSourceModel.user_id == user_id,
+                    PortfolioSourceModel.is_active == True,
+                )
+                .all()
+            ]
+        if not source_ids:
+            return PortfolioLedger.from_holdings([])
+
+        holdings = (
+            db.query(
+                AssetModel.asset_id,
+                AssetModel.symbol,
+                PositionModel.quantity,
+            )
+            .join(AssetModel, PositionModel.asset_id == AssetModel.asset_id)
+            .filter(PositionModel.source_id.in_(source_ids))
+            .all()
+        )
+        totals = (
+            db.query(
+                AssetModel.asset_id,
+                AssetModel.symbol,
+                TransactionModel.transaction_type,
+                func.sum(TransactionModel.quantity).label("quantity"),
+            )
+            .join(AssetModel, TransactionModel.asset_id == AssetModel.asset_id)
+            .filter(
+                TransactionModel.source_id.in_(source_ids),
+                TransactionModel.transaction_type.in_(list(QUANTITY_SIGNS)),
+            )
+            .group_by(
+                AssetModel.asset_id,
+                AssetModel.symbol,
+                TransactionModel.transaction_type,
+            )
+            .all()
+        )
+        transactions = (
+            db.query(
+                AssetModel.asset_id,
+                AssetModel.symbol,
+                TransactionModel.transaction_type,
+                TransactionModel.quantity,
+                TransactionModel.price,
+                TransactionModel.transaction_time,
+            )
+            .join(AssetModel, TransactionModel.asset_id == AssetModel.asset_id)
+            .filter(
+                TransactionModel.source_id.in_(source_ids),
+                TransactionModel.transaction_type.in_(list(QUANTITY_SIGNS)),
+                TransactionModel.transaction_time > since,
+            )
+            .all()
+        )
+
+    columns: Dict[int, int] = {}
+    symbols: List[str] = []
+    for row in [*holdings, *totals, *transactions]:
+        if row.asset_id not in columns:
+            columns[row.asset_id] = len(columns)
+            symbols.append(row.symbol)
+
+    positions = np.zeros(len(columns))
+    np.add.at(
+        positions,
+        [columns[row.asset_id] for row in holdings],
+        [float(row.quantity or 0) for row in holdings],
+    )
+    ledger_totals = np.zeros(len(columns))
+    np.add.at(
+        ledger_totals,
+        [columns[row.asset_id] for row in totals],
+        [
+            QUANTITY_SIGNS[row.transaction_type] * float(row.quantity or 0)
+            for row in totals
+        ],
+    )
+    has_transactions = np.zeros(len(columns), dtype=bool)
+    has_transactions[[columns[row.asset_id] for row in totals]] = True
+
+    mismatched = ~np.isclose(
+        positions, ledger_totals, rtol=QUANTITY_TOLERANCE, atol=QUANTITY_TOLERANCE
+    )
+    mismatched_symbols = [symbol for symbol, bad in zip(symbols, mismatched) if bad]
+    if mismatched_symbols:
+        logger.warning(
+            f"Positions of {', '.join(mismatched_symbols)} do not match their "
+            f"transactions (sources {source_ids})"
+        )
+
+    return PortfolioLedger(
+        asset_ids=list(columns),
+        symbols=symbols,
+        quantities=np.where(has_transactions, ledger_totals, positions),
+        tx_times=_to_datetime64([row.transaction_time for row in transactions]),
+        tx_assets=np.array([columns[row.asset_id] for row in transactions], dtype=int),
+        tx_quantities=np.array(
+            [
+                QUANTITY_SIGNS[row.transaction_type] * float(row.quantity)
+                for row in transactions
+            ]
+        ),
+        tx_prices=np.array(
+            [float(row.price) if row.price else np.nan for row in transactions]
+        ),
+        mismatched_symbols=mismatched_symbols,
+    )
+
+
+def compute_return_series(
+    ledger: PortfolioLedger,
+    moments: List[datetime],
+    prices: Optional[np.ndarray] = None,
+) -> PortfolioReturnSeries:
+    """
+    Value a ledger at sorted moments and derive its returns
+
+    Args:
+        ledger: Holdings and transactions to value
+        moments: Valuation moments in ascending order
+        prices: Optional moments x assets price grid, fetched from the price
+            series cache when omitted
+
+    Returns:
+        PortfolioReturnSeries of the moments
+    """
+    count = len(moments)
+    assets = len(ledger.symbols)
+    if prices is None:
+        prices = (
+            api_manager.get_prices_at_dates(ledger.symbols, moments)
+            if assets and count
+            else np.zeros((count, assets))
+        )
+    if not count:
+        return PortfolioReturnSeries(
+            moments=[],
+            symbols=list(ledger.symbols),
+            quantities=np.zeros((0, assets)),
+            prices=prices,
+            values=np.zeros(0),
+            flows=np.zeros(0),
+            returns=np.zeros(0),
+            valid=np.zeros(0, dtype=bool),
+            time_weighted_return=0.0,
+            money_weighted_return=0.0,
+        )
+
+    # Row of the first moment each transaction counts in, count when after the last
+    rows = np.searchsorted(_to_datetime64(moments), ledger.tx_times, side="left")
+
+    changes = np.zeros((count + 1, assets))
+    np.add.at(changes, (rows, ledger.tx_assets), ledger.tx_quantities)
+    applied = np.cumsum(changes, axis=0)
+    # Roll back everything that happened after each moment from the anchor
+    quantities = ledger.quantities + applied[:count] - applied[count]
+    negative = (quantities < -QUANTITY_TOLERANCE).any(axis=0)
+    negative_symbols = [symbol for symbol, bad in zip(ledger.symbols, negative) if bad]
+    if negative_symbols:
+        logger.warning(
+            f"Transactions take holdings of {', '.join(negative_symbols)} below zero, "
+            "valuing them at zero there"
+        )
+    quantities = np.maximum(quantities, 0.0)
+
+    values = np.einsum("ij,ij->i", quantities, prices)
+
+    # Flows of the period ending at each moment, at the transaction price when known
+    flows = np.zeros(count + 1)
+    if len(rows):
+        fallback = prices[np.minimum(rows, count - 1), ledger.tx_assets]
+        tx_prices = np.where(np.isnan(ledger.tx_prices), fallback, ledger.tx_prices)
+        np.add.at(flows, rows, ledger.tx_quantities * tx_prices)
+    flows = flows[:count]
+
+    returns, valid, twr, mwr = returns_from_values(values, flows, moments)
+    return PortfolioReturnSeries(
+        moments=list(moments),
+        symbols=list(ledger.symbols),
+        quantities=quantities,
+        prices=prices,
+        values=values,
+        flows=flows,
+        returns=returns,
+        valid=valid,
+        time_weighted_return=twr,
+        money_weighted_return=mwr,
+        mismatched_symbols=list(ledger.mismatched_symbols),
+        negative_symbols=negative_symbols,
+    )
+
+
+def returns_from_values(
+    values: np.ndarray, flows: np.ndarray, moments: List[datetime]
+) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """
+    Derive period, time-weighted and money-weighted returns from a value series
+
+    Flows are treated as arriving at the end of their period, so a period
+    return is (V[i] - F[i]) / V[i - 1] - 1.
+
+    Returns:
+        Period returns (0 where the previous value is not positive), the mask of
+        valid periods, the time-weighted return and the money-weighted return,
+        all as fractions
+    """
+    if len(values) < 2:
+        return np.zeros(0), np.zeros(0, dtype=bool), 0.0, 0.0
+
+    previous = values[:-1]
+    valid = previous > 0
+    returns = np.zeros(len(previous))
+    returns[valid] = (values[1:][valid] - flows[1:][valid]) / previous[valid] - 1
+
+    twr = float(np.prod(1 + returns[valid]) - 1)
+    mwr = _money_weighted_return(values, flows, moments)
+    return returns, valid, twr, mwr
+
+
+def _money_weighted_return(
+    values: np.ndarray, flows: np.ndarray, moments: List[datetime]
+) -> float:
+    """
+    Internal rate of return over the whole span, solved by Newton's method
+
+    Falls back to the Modified Dietz return when the iteration does not converge.
+    """
+    seconds = _to_datetime64(moments).astype(np.int64).astype(float)
+    days = (seconds - seconds[0]) / 86400
+    span = days[-1]
+    begin, end = float(values[0]), float(values[-1])
+    period_flows = flows[1:]
+    net_flows = float(period_flows.sum())
+
+    # Modified Dietz, each flow weighted by the share of the span it was invested
+    weights = (span - days[1:]) / span if span > 0 else np.zeros(len(period_flows))
+    invested = begin + float(np.dot(weights, period_flows))
+    if invested <= 0:
+        return 0.0
+    dietz = (end - begin - net_flows) / invested
+    if span <= 0:
+        return dietz
+
+    # Daily rate r with begin * (1+r)^T + sum F_i * (1+r)^(T-t_i) = end
+    horizons = span - days[1:]
+    rate = (1 + dietz) ** (1 / span) - 1 if dietz > -1 else 0.0
+    for _ in range(MWR_MAX_ITERATIONS):
+        growth = 1 + rate
+        if growth <= 0:
+            break
+        compounded = period_flows * growth**horizons
+        error = begin * growth**span + compounded.sum() - end
+        slope = begin * span * growth ** (span - 1) + float(
+            np.dot(horizons, compounded) / growth
+        )
+        if slope == 0:
+            break
+        step = error / slope
+        rate -= step
+        if abs(step) < MWR_TOLERANCE:
+            return float((1 + rate) ** span - 1)
+    return float(dietz)
+
+
+def get_return_series(
+    start: date,
+    end: Optional[date] = None,
+    user_id: Optional[str] = None,
+    source_ids: Optional[List[int]] = None,
+) -> PortfolioReturnSeries:
+    """
+    Daily return series of a user's active sources, or of the given sources
+
+    Args:
+        start: First day
+        end: Last day, today when omitted
+        user_id: User whose active sources are valued
+        source_ids: Sources to value instead of the user's
+
+    Returns:
+        PortfolioReturnSeries with one moment per day
+    """
+    moments = daily_moments(start, end or datetime.utcnow().date())
+    if not moments:
+        return compute_return_series(PortfolioLedger.from_holdings([]), [])
+
+    ledger = load_ledger(moments[0], user_id=user_id, source_ids=source_ids)
+    return compute_return_series(ledger, moments)
@@ -0,0 +1,320 @@
+# src/utils/portfolio_value_history.py
+"""
+Materialized daily portfolio values
+
+portfolio_value_daily holds one row per user and closed day with the end of
+day portfolio value, the day's net deposits and the value per asset, so
+performance, return and risk analysis read one range of rows instead of
+repricing the portfolio for every date they need.
+
+Rows are written by the nightly job of the alert monitor for the previous day
+and backfilled in one batch for any closed day a read finds missing. A
+transaction dated in the past drops the rows from its date on so they are
+rebuilt with it, a change to current positions drops all of the user's rows.
+Today's value is always computed live and never stored.
+"""
+import traceback
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects.mysql import insert
+
+from loggers import logger
+from mysql.db import get_db
+from mysql.model import (
+    PortfolioSourceModel,
+    PortfolioValueDailyModel,
+    TransactionModel,
+    TransactionType,
+)
+from utils.portfolio_return_engine import compute_return_series, load_ledger
+from utils.redis_cache import _cache_backend
+
+NIGHTLY_LOCK_PREFIX = "musseai:portfolio_value_daily:nightly"
+
+
+@dataclass
+class PortfolioValueSeries:
+    """End of day values of one user over consecutive days"""
+
+    dates: List[date]
+    values: np.ndarray
+    net_flows: np.ndarray
+    asset_values: List[Dict[str, float]] = field(default_factory=list)
+
+    def value_at(self, day: date) -> float:
+        """Value at the end of the last day on or before the given one"""
+        index = _last_index_on_or_before(self.dates, day)
+        return float(self.values[index]) if index >= 0 else 0.0
+
+    def net_flows_between(self, start: date, end: date) -> float:
+        """Net deposits of the days after start up to and including end"""
+        mask = np.array([start < day <= end for day in self.dates], dtype=bool)
+        return float(self.net_flows[mask].sum()) if len(mask) else 0.0
+
+    def daily_returns(self) -> np.ndarray:
+        """
+        Day over day returns in percent, skipping days after a zero value
+
+        Each day's net deposits are taken out of its end value, as in the
+        period returns of the historical performance.
+        """
+        previous = self.values[:-1]
+        current = self.values[1:] - self.net_flows[1:]
+        valid = previous > 0
+        return (current[valid] / previous[valid] - 1) * 100
+
+
+def _last_index_on_or_before(dates: List[date], day: date) -> int:
+    index = -1
+    for i, current in enumerate(dates):
+        if current > day:
+            break
+        index = i
+    return index
+
+
+def _end_of_day(day: date) -> datetime:
+    return datetime.combine(day, time.max)
+
+
+def _day_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def compute_portfolio_values(
+    user_id: str, moments: List[datetime]
+) -> Tuple[np.ndarray, List[Dict[str, float]]]:
+    """
+    Price a user's holdings at several moments with the return engine
+
+    Holdings at each moment are rebuilt from the transaction ledger, or held
+    at the current position for assets without transactions, then valued
+    against one price grid.
+
+    Returns:
+        Total value per moment and the value per asset symbol per moment
+    """
+    if not moments:
+        return np.zeros(0), []
+
+    order = sorted(range(len(moments)), key=lambda i: moments[i])
+    sorted_moments = [moments[i] for i in order]
+    series = compute_return_series(
+        load_ledger(sorted_moments[0], user_id=user_id), sorted_moments
+    )
+
+    # Back to the order the moments were given in
+    values = np.zeros(len(moments))
+    values[order] = series.values
+    sorted_asset_values = series.asset_values()
+    asset_values: List[Dict[str, float]] = [{} for _ in moments]
+    for position, index in enumerate(order):
+        asset_values[index] = sorted_asset_values[position]
+    return values, asset_values
+
+
+def _net_flows_by_day(db, user_id: str, start: date, end: date) -> Dict[date, float]:
+    """Deposits minus withdrawals per day, in one grouped query"""
+    amount = TransactionModel.quantity * func.coalesce(TransactionModel.price, 0)
+    day = func.date(TransactionModel.transaction_time)
+    rows = (
+        db.query(
+            day.label("day"),
+            func.sum(
+                case(
+                    (TransactionModel.transaction_type == TransactionType.DEPOSIT, amount),
+                    else_=-amount,
+                )
+            ).label("net_flows"),
+        )
+        .join(
+            PortfolioSourceModel,
+            TransactionModel.source_id == PortfolioSourceModel.source_id,
+        )
+        .filter(
+            PortfolioSourceModel.user_id == user_id,
+            PortfolioSourceModel.is_active == True,
+            TransactionModel.transaction_type.in_(
+                [TransactionType.DEPOSIT, TransactionType.WITHDRAW]
+            ),
+            TransactionModel.transaction_time >= datetime.combine(start, time.min),
+            TransactionModel.transaction_time <= _end_of_day(end),
+        )
+        .group_by(day)
+        .all()
+    )
+    return {
+        row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day)): float(
+            row.net_flows or 0
+        )
+        for row in rows
+    }
+
+
+def materialize_portfolio_values(user_id: str, days: Iterable[date]) -> List[Dict]:
+    """
+    Compute and store the end of day rows of closed days
+
+    Existing rows of those days are updated in place. Days from today on are
+    skipped.
+
+    Returns:
+        The stored rows
+    """
+    today = datetime.utcnow().date()
+    days = sorted({day for day in days if day < today})
+    if not days:
+        return []
+
+    values, asset_values = compute_portfolio_values(
+        user_id, [_end_of_day(day) for day in days]
+    )
+
+    with get_db() as db:
+        flows = _net_flows_by_day(db, user_id, days[0], days[-1])
+        rows = [
+            {
+                "user_id": user_id,
+                "value_date": day,
+                "total_value": round(float(value), 8),
+                "net_flows": round(flows.get(day, 0.0), 8),
+                "asset_values": assets,
+            }
+            for day, value, assets in zip(days, values, asset_values)
+        ]
+        # Upsert, a concurrent backfill of the same days must not hit unique_user_date
+        statement = insert(PortfolioValueDailyModel).values(rows)
+        db.execute(
+            statement.on_duplicate_key_update(
+                total_value=statement.inserted.total_value,
+                net_flows=statement.inserted.net_flows,
+                asset_values=statement.inserted.asset_values,
+            )
+        )
+    return rows
+
+
+def invalidate_portfolio_values(user_id: str, since: Optional[datetime] = None):
+    """
+    Drop the stored rows affected by a change dated at the given time
+
+    Without a time every row of the user is dropped, for changes to current
+    positions that past holdings are rebuilt from.
+    """
+    conditions = [PortfolioValueDailyModel.user_id == user_id]
+    if since is not None:
+        since_day = since.date() if isinstance(since, datetime) else since
+        if since_day >= datetime.utcnow().date():
+            return
+        conditions.append(PortfolioValueDailyModel.value_date >= since_day)
+    try:
+        with get_db() as db:
+            db.execute(delete(PortfolioValueDailyModel).where(*conditions))
+    except Exception as e:
+        logger.error(f"Failed to invalidate portfolio value history of {user_id}: {e}")
+
+
+def get_portfolio_value_series(
+    user_id: str, start: date, end: Optional[date] = None
+) -> PortfolioValueSeries:
+    """
+    Get the end of day values of every day in a range
+
+    Stored rows are read in one query, missing closed days are backfilled in
+    one batch and today, if in range, is valued live.
+    """
+    today = datetime.utcnow().date()
+    end = min(end or today, today)
+    days = _day_range(start, end) if start <= end else []
+    if not days:
+        return PortfolioValueSeries([], np.zeros(0), np.zeros(0), [])
+
+    with get_db() as db:
+        stored = (
+            db.query(
+                PortfolioValueDailyModel.value_date,
+                PortfolioValueDailyModel.total_value,
+                PortfolioValueDailyModel.net_flows,
+                PortfolioValueDailyModel.asset_values,
+            )
+            .filter(
+                PortfolioValueDailyModel.user_id == user_id,
+                PortfolioValueDailyModel.value_date >= start,
+                PortfolioValueDailyModel.value_date <= end,
+            )
+            .all()
+        )
+    rows = {
+        row.value_date: (float(row.total_value), float(row.net_flows), row.asset_values or {})
+        for row in stored
+    }
+
+    missing = [day for day in days if day < today and day not in rows]
+    if missing:
+        for row in materialize_portfolio_values(user_id, missing):
+            rows[row["value_date"]] = (
+                row["total_value"],
+                row["net_flows"],
+                row["asset_values"],
+            )
+
+    if days[-1] == today:
+        values, asset_values = compute_portfolio_values(user_id, [datetime.utcnow()])
+        with get_db() as db:
+            flows = _net_flows_by_day(db, user_id, today, today)
+        rows[today] = (float(values[0]), flows.get(today, 0.0), asset_values[0])
+
+    return PortfolioValueSeries(
+        dates=days,
+        values=np.array([rows[day][0] for day in days]),
+        net_flows=np.array([rows[day][1] for day in days]),
+        asset_values=[rows[day][2] for day in days],
+    )
+
+
+def materialize_previous_day(day: Optional[date] = None) -> int:
+    """
+    Nightly job: store the previous day's row of every user with an active source
+
+    A Redis lock makes sure only one monitor worker runs it per day.
+
+    Returns:
+        Number of users materialized
+    """
+    day = day or datetime.utcnow().date() - timedelta(days=1)
+    client = _cache_backend.redis_client
+    if client is not None:
+        try:
+            if not client.set(
+                f"{NIGHTLY_LOCK_PREFIX}:{day.isoformat()}", "1", nx=True, ex=86400
+            ):
+                logger.info(f"Portfolio values of {day} already materialized")
+                return 0
+        except Exception as e:
+            logger.warning(f"Failed to take the nightly portfolio value lock: {e}")
+
+    with get_db() as db:
+        user_ids = [
+            row.user_id
+            for row in db.query(PortfolioSourceModel.user_id)
+            .filter(PortfolioSourceModel.is_active == True)
+            .distinct()
+            .all()
+        ]
+
+    materialized = 0
+    for user_id in user_ids:
+        try:
+            materialize_portfolio_values(user_id, [day])
+            materialized += 1
+        except Exception as e:
+            logger.error(
+                f"Failed to materialize portfolio value of {user_id} on {day}: {e}\n{traceback.format_exc()}"
+            )
+
+    logger.info(f"Materialized portfolio values of {day} for {materialized} users")
+    return materialized
@@ -0,0 +1,61 @@
+# src/utils/portfolio_version.py
+"""
+Per-user portfolio data version counters
+
+Every write to a user's transactions or positions bumps the user's version, so
+values derived from that data (e.g. alert performance metrics) can be memoized
+by version and recomputed only when the data actually changed. Counters live
+in Redis to be shared between the agent and the alert monitor processes, with
+an in-process fallback when Redis is unavailable.
+"""
+import threading
+from typing import Dict, Iterable
+
+from loggers import logger
+from utils.redis_cache import _cache_backend
+
+VERSION_KEY_PREFIX = "musseai:portfolio_version"
+
+_local_versions: Dict[str, int] = {}
+_local_lock = threading.Lock()
+
+
+def _version_key(user_id: str) -> str:
+    return f"{VERSION_KEY_PREFIX}:{user_id}"
+
+
+def bump_portfolio_version(user_id: str) -> int:
+    """Mark a user's transactions/positions as changed, returns the new version"""
+    with _local_lock:
+        _local_versions[user_id] = _local_versions.get(user_id, 0) + 1
+        local_version = _local_versions[user_id]
+
+    client = _cache_backend.redis_client
+    if client is not None:
+        try:
+            return int(client.incr(_version_key(user_id)))
+        except Exception as e:
+            logger.warning(f"Failed to bump portfolio version for {user_id}: {e}")
+    return local_version
+
+
+def get_portfolio_versions(user_ids: Iterable[str]) -> Dict[str, int]:
+    """Get the current versions of several users in one round trip"""
+    user_ids = list(user_ids)
+    client = _cache_backend.redis_client
+    if client is not None and user_ids:
+        try:
+            values = client.mget([_version_key(user_id) for user_id in user_ids])
+            return {
+                user_id: int(value or 0) for user_id, value in zip(user_ids, values)
+            }
+        except Exception as e:
+            logger.warning(f"Failed to read portfolio versions: {e}")
+
+    with _local_lock:
+        return {user_id: _local_versions.get(user_id, 0) for user_id in user_ids}
+
+
+def get_portfolio_version(user_id: str) -> int:
+    """Get the current version of a user's transactions/positions"""
+    return get_portfolio_versions([user_id])[user_id]
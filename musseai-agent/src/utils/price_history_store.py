@@ -0,0 +1,382 @@
+# src/utils/price_history_store.py
+"""
+Local columnar price-history store
+
+Stores closed OHLCV candles per (feed, symbol, interval) as NumPy structured
+arrays on local disk and memory-maps them on read, so range queries and as-of
+lookups slice the mapped file directly instead of re-parsing JSON price lists.
+
+Layout:
+    $PRICE_HISTORY_DIR/<feed>/<SYMBOL>_<interval>.npy
+
+Windows missing from a series can be derived from a finer stored interval of
+the same feed (e.g. daily candles resampled from hourly ones).
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from loggers import logger
+import traceback
+
+CANDLE_DTYPE = np.dtype(
+    [
+        ("ts", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<f8"),
+        ("quote_volume", "<f8"),
+    ]
+)
+
+INTERVAL_SECONDS = {
+    "1m": 60,
+    "15m": 900,
+    "1h": 3600,
+    "1d": 86400,
+    "1w": 604800,
+}
+
+# Intervals whose candles align to the unix epoch and can be built by resampling.
+# Weekly candles are exchange-aligned (e.g. Monday opens) and are never derived.
+RESAMPLE_TARGETS = {"15m", "1h", "1d"}
+
+# Feeds consulted, in order, when a lookup does not name a feed
+DEFAULT_FEED_PRIORITY = ["cryptocompare_usd", "binance_usdt", "cryptocompare_cccagg_usdt"]
+
+DEFAULT_STORE_DIR = Path(__file__).parent.parent.parent / "data" / "price_history"
+
+
+def rows_to_candles(rows: Sequence[Sequence[float]]) -> np.ndarray:
+    """Convert candle rows [ts, o, h, l, c, v, quote_v] into a structured array"""
+    candles = np.zeros(len(rows), dtype=CANDLE_DTYPE)
+    if not len(rows):
+        return candles
+
+    matrix = np.asarray(rows, dtype=np.float64)
+    for i, name in enumerate(CANDLE_DTYPE.names):
+        if i < matrix.shape[1]:
+            candles[name] = matrix[:, i]
+    return candles
+
+
+def resample_candles(
+    candles: np.ndarray, step: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate sorted candles into buckets of ``step`` seconds
+
+    Returns:
+        Tuple of the resampled candles and the number of source candles per bucket
+    """
+    if not len(candles):
+        return np.zeros(0, dtype=CANDLE_DTYPE), np.zeros(0, dtype=np.int64)
+
+    buckets = candles["ts"] // step * step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(candles)]
+
+    resampled = np.zeros(len(starts), dtype=CANDLE_DTYPE)
+    resampled["ts"] = buckets[starts]
+    resampled["open"] = candles["open"][starts]
+    resampled["high"] = np.maximum.reduceat(candles["high"], starts)
+    resampled["low"] = np.minimum.reduceat(candles["low"], starts)
+    resampled["close"] = candles["close"][ends - 1]
+    resampled["volume"] = np.add.reduceat(candles["volume"], starts)
+    resampled["quote_volume"] = np.add.reduceat(candles["quote_volume"], starts)
+    return resampled, ends - starts
+
+
+class PriceHistoryStore:
+    """Memory-mapped per-symbol candle files with range and as-of queries"""
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = Path(base_dir or os.getenv("PRICE_HISTORY_DIR", DEFAULT_STORE_DIR))
+        self._arrays: Dict[str, Tuple[float, np.ndarray]] = {}
+        self._memory_only: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+
+    def _path(self, feed: str, symbol: str, interval: str) -> Path:
+        return self.base_dir / feed / f"{symbol.upper()}_{interval}.npy"
+
+    def load(self, feed: str, symbol: str, interval: str) -> np.ndarray:
+        """Get the stored candles of a series as a read-only memory-mapped array"""
+        path = self._path(feed, symbol, interval)
+        key = str(path)
+
+        with self._lock:
+            if key in self._memory_only:
+                return self._memory_only[key]
+
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                return np.zeros(0, dtype=CANDLE_DTYPE)
+
+            cached = self._arrays.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+            try:
+                candles = np.load(path, mmap_mode="r")
+            except Exception as e:
+                logger.warning(f"Failed to map price history {path}: {e}")
+                return np.zeros(0, dtype=CANDLE_DTYPE)
+
+            self._arrays[key] = (mtime, candles)
+            return candles
+
+    def merge(
+        self, feed: str, symbol: str, interval: str, candles: np.ndarray
+    ) -> np.ndarray:
+        """Merge new closed candles into a series, newer rows win on equal timestamps"""
+        if not len(candles):
+            return self.load(feed, symbol, interval)
+
+        with self._write_lock:
+            existing = self.load(feed, symbol, interval)
+            combined = np.concatenate(
+                [np.asarray(existing), candles.astype(CANDLE_DTYPE)]
+            )
+            # Keep the last occurrence of every timestamp
+            _, last_index = np.unique(combined["ts"][::-1], return_index=True)
+            merged = combined[::-1][last_index]
+
+            self._write(feed, symbol, interval, merged)
+            return self.load(feed, symbol, interval)
+
+    def truncate(self, feed: str, symbol: str, interval: str, max_candles: int):
+        """Keep only the newest max_candles rows of a series"""
+        with self._write_lock:
+            existing = self.load(feed, symbol, interval)
+            if len(existing) > max_candles:
+                self._write(feed, symbol, interval, np.array(existing[-max_candles:]))
+
+    def _write(self, feed: str, symbol: str, interval: str, candles: np.ndarray):
+        """Atomically replace a series file, keeping it in memory if the disk is unavailable"""
+        path = self._path(feed, symbol, interval)
+        key = str(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, candles)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._arrays.pop(key, None)
+                self._memory_only.pop(key, None)
+        except Exception as e:
+            logger.warning(
+                f"Failed to persist price history {path}, keeping it in memory: {e}\n{traceback.format_exc()}"
+            )
+            with self._lock:
+                self._memory_only[key] = candles
+
+    def delete(self, feed: str, symbol: str, interval: str):
+        """Remove a stored series"""
+        path = self._path(feed, symbol, interval)
+        key = str(path)
+        with self._lock:
+            self._arrays.pop(key, None)
+            self._memory_only.pop(key, None)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def feeds(self) -> List[str]:
+        """List known feeds, preferred feeds first"""
+        feeds = list(DEFAULT_FEED_PRIORITY)
+        if self.base_dir.exists():
+            feeds.extend(
+                feed_dir.name
+                for feed_dir in sorted(self.base_dir.iterdir())
+                if feed_dir.is_dir() and feed_dir.name not in DEFAULT_FEED_PRIORITY
+            )
+        return feeds
+
+    def resolve_feed(self, symbol: str, interval: str) -> Optional[str]:
+        """Find the preferred feed that has data for a symbol"""
+        for feed in self.feeds():
+            if len(self.load(feed, symbol, interval)):
+                return feed
+        return None
+
+    def resample_window(
+        self, feed: str, symbol: str, interval: str, start_ts: int, end_ts: int
+    ) -> Optional[np.ndarray]:
+        """
+        Build the closed window [start_ts, end_ts) from a finer stored interval
+
+        Only finer series that fill every bucket of the window are used, so a
+        derived candle never hides a gap in the source data.
+
+        Returns:
+            Resampled candles, or None if no finer series covers the window
+        """
+        if interval not in RESAMPLE_TARGETS:
+            return None
+
+        step = INTERVAL_SECONDS[interval]
+        expected = (end_ts - start_ts) // step
+        if expected <= 0 or start_ts % step:
+            return None
+
+        # Coarsest source first, it has the fewest rows to aggregate
+        finer = sorted(
+            (
+                (name, seconds)
+                for name, seconds in INTERVAL_SECONDS.items()
+                if seconds < step and step % seconds == 0
+            ),
+            key=lambda item: -item[1],
+        )
+        for source_interval, source_step in finer:
+            source = self.range(symbol, source_interval, start_ts, end_ts, feed=feed)
+            if len(source) != expected * (step // source_step):
+                continue
+            resampled, counts = resample_candles(source, step)
+            if len(resampled) == expected and np.all(counts == step // source_step):
+                return resampled
+        return None
+
+    def window(
+        self,
+        symbol: str,
+        interval: str,
+        start_ts: int,
+        end_ts: int,
+        feed: Optional[str] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Get the complete closed window [start_ts, end_ts) of a series
+
+        Stored candles of the interval are sliced directly; otherwise the window
+        is resampled from a finer interval of the same feed.
+
+        Args:
+            symbol: Asset symbol
+            interval: Candle interval
+            start_ts: Inclusive start, aligned to the interval (unix seconds)
+            end_ts: Exclusive end, aligned to the interval (unix seconds)
+            feed: Feed to read, None to try every feed in priority order
+
+        Returns:
+            Candles without gaps, or None if the store cannot cover the window
+        """
+        expected = (end_ts - start_ts) // INTERVAL_SECONDS[interval]
+        for candidate in [feed] if feed else self.feeds():
+            candles = self.range(symbol, interval, start_ts, end_ts, feed=candidate)
+            if len(candles) == expected:
+                return candles
+
+            resampled = self.resample_window(
+                candidate, symbol, interval, start_ts, end_ts
+            )
+            if resampled is not None:
+                return resampled
+        return None
+
+    def range(
+        self,
+        symbol: str,
+        interval: str,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        feed: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        Get candles with start_ts <= ts < end_ts as a zero-copy view
+
+        Args:
+            symbol: Asset symbol
+            interval: Candle interval, e.g. "1d"
+            start_ts: Inclusive start (unix seconds), None for the beginning
+            end_ts: Exclusive end (unix seconds), None for the end
+            feed: Feed to read, None to use the preferred available feed
+
+        Returns:
+            Structured array view with CANDLE_DTYPE fields
+        """
+        feed = feed or self.resolve_feed(symbol, interval)
+        if feed is None:
+            return np.zeros(0, dtype=CANDLE_DTYPE)
+
+        candles = self.load(feed, symbol, interval)
+        ts = candles["ts"]
+        lo = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, side="left"))
+        hi = len(ts) if end_ts is None else int(np.searchsorted(ts, end_ts, side="left"))
+        return candles[lo:hi]
+
+    def asof(
+        self,
+        symbol: str,
+        interval: str,
+        ts: int,
+        feed: Optional[str] = None,
+        max_staleness: Optional[int] = None,
+    ) -> Optional[np.void]:
+        """
+        Get the last candle opened at or before ts
+
+        Args:
+            symbol: Asset symbol
+            interval: Candle interval
+            ts: Lookup time (unix seconds)
+            feed: Feed to read, None to use the preferred available feed
+            max_staleness: Reject matches older than this many seconds
+
+        Returns:
+            Candle record or None if no candle qualifies
+        """
+        feed = feed or self.resolve_feed(symbol, interval)
+        if feed is None:
+            return None
+
+        candles = self.load(feed, symbol, interval)
+        idx = int(np.searchsorted(candles["ts"], ts, side="right")) - 1
+        if idx < 0:
+            return None
+
+        candle = candles[idx]
+        if max_staleness is not None and ts - int(candle["ts"]) > max_staleness:
+            return None
+        return candle
+
+    def covers(
+        self, feed: str, symbol: str, interval: str, start_ts: int, end_ts: int
+    ) -> bool:
+        """Check whether stored candles span [start_ts, end_ts]"""
+        candles = self.load(feed, symbol, interval)
+        if not len(candles):
+            return False
+        return int(candles["ts"][0]) <= start_ts and int(candles["ts"][-1]) >= end_ts
+
+    def list_series(self) -> List[Dict]:
+        """List stored series with their row counts and time span"""
+        series = []
+        if not self.base_dir.exists():
+            return series
+
+        for path in sorted(self.base_dir.glob("*/*.npy")):
+            symbol, _, interval = path.stem.rpartition("_")
+            candles = self.load(path.parent.name, symbol, interval)
+            series.append(
+                {
+                    "feed": path.parent.name,
+                    "symbol": symbol,
+                    "interval": interval,
+                    "candles": len(candles),
+                    "first_ts": int(candles["ts"][0]) if len(candles) else None,
+                    "last_ts": int(candles["ts"][-1]) if len(candles) else None,
+                }
+            )
+        return series
+
+
+# Global price history store instance
+price_history_store = PriceHistoryStore()
@@ -0,0 +1,182 @@
+# src/utils/price_series.py
+"""
+Canonical in-memory price series
+
+Provider responses (CoinGecko, CoinCap, Binance, CryptoCompare) and stored
+candles are parsed straight into one compact NumPy-backed type. Consumers derive
+the legacy dict formats from it:
+    - history: {"prices", "returns", "dates", "volatility", "mean_return"}
+    - chart:   {"prices", "market_caps", "total_volumes"} as [timestamp_ms, value]
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+
+ANNUALIZATION_DAYS = 365
+
+
+def _column(items: List[dict], key: str, scale: float = 1.0) -> np.ndarray:
+    """Extract one numeric field of a list of dicts, missing or empty values become NaN"""
+    return np.fromiter(
+        (
+            float(value) * scale if value not in (None, "") else np.nan
+            for value in (item.get(key) for item in items)
+        ),
+        dtype=np.float64,
+        count=len(items),
+    )
+
+
+@dataclass
+class PriceSeries:
+    """Time-sorted prices with volumes and market caps (NaN where unavailable)"""
+
+    timestamps: np.ndarray  # int64 unix seconds
+    prices: np.ndarray  # float64
+    volumes: np.ndarray  # float64
+    market_caps: np.ndarray  # float64
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps,
+        prices,
+        volumes=None,
+        market_caps=None,
+        drop_missing_prices: bool = True,
+    ) -> "PriceSeries":
+        """Build a series from parallel arrays, sorted by time"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        nan = np.full(len(prices), np.nan)
+        volumes = nan if volumes is None else np.asarray(volumes, dtype=np.float64)
+        market_caps = (
+            nan if market_caps is None else np.asarray(market_caps, dtype=np.float64)
+        )
+
+        if drop_missing_prices:
+            # Providers report 0 / empty prices for periods before listing
+            keep = np.isfinite(prices) & (prices != 0)
+            if not keep.all():
+                timestamps, prices = timestamps[keep], prices[keep]
+                volumes, market_caps = volumes[keep], market_caps[keep]
+
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, prices = timestamps[order], prices[order]
+            volumes, market_caps = volumes[order], market_caps[order]
+
+        return cls(timestamps.astype(np.int64), prices, volumes, market_caps)
+
+    @classmethod
+    def empty(cls) -> "PriceSeries":
+        return cls.from_arrays([], [])
+
+    @classmethod
+    def from_coingecko(cls, data: Dict) -> "PriceSeries":
+        """Parse a CoinGecko market_chart response ([ms, value] pairs)"""
+        prices = np.asarray(data.get("prices") or [], dtype=np.float64).reshape(-1, 2)
+        count = len(prices)
+
+        def values(key: str) -> Optional[np.ndarray]:
+            pairs = np.asarray(data.get(key) or [], dtype=np.float64).reshape(-1, 2)
+            return pairs[:, 1] if len(pairs) == count else None
+
+        return cls.from_arrays(
+            prices[:, 0] / 1000,
+            prices[:, 1],
+            values("total_volumes"),
+            values("market_caps"),
+        )
+
+    @classmethod
+    def from_coincap(cls, data: Dict) -> "PriceSeries":
+        """Parse a CoinCap assets/{id}/history response"""
+        history = data.get("data") or []
+        return cls.from_arrays(
+            _column(history, "time", 0.001),
+            _column(history, "priceUsd"),
+            _column(history, "volumeUsd24Hr"),
+        )
+
+    @classmethod
+    def from_binance_klines(cls, data: List) -> "PriceSeries":
+        """Parse raw Binance klines, close price and base asset volume"""
+        if not data:
+            return cls.empty()
+        klines = np.asarray([kline[:6] for kline in data], dtype=np.float64)
+        return cls.from_arrays(klines[:, 0] / 1000, klines[:, 4], klines[:, 5])
+
+    @classmethod
+    def from_cryptocompare(cls, data: Dict) -> "PriceSeries":
+        """Parse a CryptoCompare v2 histo* response, close price and quote volume"""
+        history = (data.get("Data") or {}).get("Data") or []
+        return cls.from_arrays(
+            _column(history, "time"),
+            _column(history, "close"),
+            _column(history, "volumeto"),
+        )
+
+    @classmethod
+    def from_candles(
+        cls, candles: np.ndarray, volume_field: str = "quote_volume"
+    ) -> "PriceSeries":
+        """Build a series from structured candles (CANDLE_DTYPE) using close prices"""
+        return cls.from_arrays(
+            candles["ts"], candles["close"], candles[volume_field]
+        )
+
+    @classmethod
+    def from_candle_rows(
+        cls, rows: List[List[float]], volume_index: int = 6
+    ) -> "PriceSeries":
+        """Build a series from [ts, open, high, low, close, volume, quote_volume] rows"""
+        if not len(rows):
+            return cls.empty()
+        matrix = np.asarray(rows, dtype=np.float64)
+        return cls.from_arrays(matrix[:, 0], matrix[:, 4], matrix[:, volume_index])
+
+    def returns(self) -> np.ndarray:
+        """Simple period returns"""
+        if len(self.prices) < 2:
+            return np.zeros(0)
+        return self.prices[1:] / self.prices[:-1] - 1
+
+    def dates(self) -> List[str]:
+        """UTC dates as YYYY-MM-DD strings"""
+        return np.datetime_as_string(
+            self.timestamps.astype("datetime64[s]"), unit="D"
+        ).tolist()
+
+    def to_history_dict(self) -> Dict:
+        """Processed history format used by fetch_with_fallback consumers"""
+        if len(self) < 2:
+            return {}
+
+        returns = self.returns()
+        return {
+            "prices": self.prices.tolist(),
+            "returns": returns.tolist(),
+            "dates": self.dates(),
+            "volatility": float(np.std(returns) * np.sqrt(ANNUALIZATION_DAYS)),
+            "mean_return": float(np.mean(returns) * ANNUALIZATION_DAYS),
+        }
+
+    def to_chart_dict(self) -> Dict:
+        """Market chart format with [timestamp_ms, value] pairs, None where unavailable"""
+        timestamps = (self.timestamps * 1000).tolist()
+
+        def pairs(values: np.ndarray) -> List[list]:
+            return [
+                [ts, value if value == value else None]  # NaN -> None
+                for ts, value in zip(timestamps, values.tolist())
+            ]
+
+        return {
+            "prices": pairs(self.prices),
+            "market_caps": pairs(self.market_caps),
+            "total_volumes": pairs(self.volumes),
+        }
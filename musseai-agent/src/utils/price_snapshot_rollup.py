@@ -0,0 +1,460 @@
+# src/utils/price_snapshot_rollup.py
+"""
+Rollup and retention tiers of price snapshots
+
+update_asset_prices writes one price_snapshots row per asset and call. The
+rollup job of the alert monitor folds closed hours of those raw rows into
+hourly OHLC bars (price_snapshots_hourly) and closed days of hourly bars into
+daily ones (price_snapshots_daily), then prunes raw rows and hourly bars past
+their retention once they are rolled up. The latest raw row of every asset is
+always kept so its current price stays available.
+
+get_price_bars reads a range from the coarsest tier whose bucket fits the
+requested resolution and fills the part not rolled up yet from the finer tiers.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert
+
+from loggers import logger
+from mysql.db import get_db
+from mysql.model import (
+    PriceSnapshotDailyModel,
+    PriceSnapshotHourlyModel,
+    PriceSnapshotModel,
+)
+from utils.redis_cache import _cache_backend
+
+ROLLUP_LOCK_PREFIX = "musseai:price_snapshots:rollup"
+EPOCH = datetime(1970, 1, 1)
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+INSTANT = timedelta(microseconds=1)
+
+# Raw rows are rolled up one day at a time to bound memory on a first run
+ROLLUP_CHUNK = DAY
+
+DEFAULT_RAW_RETENTION_DAYS = 7
+DEFAULT_HOURLY_RETENTION_DAYS = 90
+
+
+class PriceBar(NamedTuple):
+    """OHLC price of an asset over a bucket, a raw snapshot has all four equal"""
+
+    asset_id: int
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+
+
+@dataclass(frozen=True)
+class _Tier:
+    name: str
+    model: type
+    bucket: timedelta
+    time_column: str = "bucket_start"
+
+
+# Coarsest first
+ROLLUP_TIERS = (
+    _Tier("1d", PriceSnapshotDailyModel, DAY),
+    _Tier("1h", PriceSnapshotHourlyModel, HOUR),
+)
+RAW_TIER = _Tier("raw", PriceSnapshotModel, timedelta(0), "timestamp")
+
+
+def _floor(moment: datetime, bucket: timedelta) -> datetime:
+    step = int(bucket.total_seconds())
+    if not step:
+        return moment
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % step)
+
+
+def _epochs(moments) -> np.ndarray:
+    return np.array(moments, dtype="datetime64[s]").astype(np.int64)
+
+
+def _aggregate(
+    asset_ids: np.ndarray,
+    epochs: np.ndarray,
+    opens: np.ndarray,
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    counts: np.ndarray,
+    bucket: timedelta,
+) -> List[Dict]:
+    """
+    Fold rows sorted by asset and time into one OHLC bar per asset and bucket
+
+    Group boundaries are found once and every column is reduced with reduceat.
+    """
+    if not len(asset_ids):
+        return []
+
+    step = int(bucket.total_seconds())
+    buckets = epochs - epochs % step
+    boundaries = (asset_ids[1:] != asset_ids[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.flatnonzero(np.r_[True, boundaries])
+    ends = np.r_[starts[1:], len(asset_ids)] - 1
+
+    high = np.maximum.reduceat(highs, starts)
+    low = np.minimum.reduceat(lows, starts)
+    count = np.add.reduceat(counts, starts)
+    return [
+        {
+            "asset_id": int(asset_ids[start]),
+            "bucket_start": EPOCH + timedelta(seconds=int(buckets[start])),
+            "open": round(float(opens[start]), 8),
+            "high": round(float(high[i]), 8),
+            "low": round(float(low[i]), 8),
+            "close": round(float(closes[end]), 8),
+            "sample_count": int(count[i]),
+        }
+        for i, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+
+def _replace_bars(db, model, start: datetime, end: datetime, rows: List[Dict]):
+    db.execute(
+        delete(model).where(model.bucket_start >= start, model.bucket_start < end)
+    )
+    if rows:
+        db.execute(insert(model), rows)
+
+
+def _watermark(db, model) -> Optional[datetime]:
+    """Start of the latest bar of a tier"""
+    return db.query(func.max(model.bucket_start)).scalar()
+
+
+def _next_bucket_start(db, model, source_time, bucket: timedelta) -> Optional[datetime]:
+    """Bucket of the first source row after the latest bar of a tier, None if none"""
+    latest = _watermark(db, model)
+    query = db.query(func.min(source_time))
+    if latest is not None:
+        query = query.filter(source_time >= latest + bucket)
+    first = query.scalar()
+    return _floor(first, bucket) if first is not None else None
+
+
+def _rollup_hours(db, start: datetime, end: datetime) -> int:
+    """Build the hourly bars of [start, end) from raw snapshots"""
+    rows = (
+        db.query(
+            PriceSnapshotModel.asset_id,
+            PriceSnapshotModel.price,
+            PriceSnapshotModel.timestamp,
+        )
+        .filter(
+            PriceSnapshotModel.timestamp >= start,
+            PriceSnapshotModel.timestamp < end,
+        )
+        .order_by(PriceSnapshotModel.asset_id, PriceSnapshotModel.timestamp)
+        .all()
+    )
+    prices = np.array([float(row.price) for row in rows])
+    bars = _aggregate(
+        np.array([row.asset_id for row in rows], dtype=np.int64),
+        _epochs([row.timestamp for row in rows]),
+        prices,
+        prices,
+        prices,
+        prices,
+        np.ones(len(rows), dtype=np.int64),
+        HOUR,
+    )
+    _replace_bars(db, PriceSnapshotHourlyModel, start, end, bars)
+    return len(bars)
+
+
+def _rollup_days(db, start: datetime, end: datetime) -> int:
+    """Build the daily bars of [start, end) from hourly bars"""
+    model = PriceSnapshotHourlyModel
+    rows = (
+        db.query(
+            model.asset_id,
+            model.bucket_start,
+            model.open,
+            model.high,
+            model.low,
+            model.close,
+            model.sample_count,
+        )
+        .filter(model.bucket_start >= start, model.bucket_start < end)
+        .order_by(model.asset_id, model.bucket_start)
+        .all()
+    )
+    bars = _aggregate(
+        np.array([row.asset_id for row in rows], dtype=np.int64),
+        _epochs([row.bucket_start for row in rows]),
+        np.array([float(row.open) for row in rows]),
+        np.array([float(row.high) for row in rows]),
+        np.array([float(row.low) for row in rows]),
+        np.array([float(row.close) for row in rows]),
+        np.array([row.sample_count for row in rows], dtype=np.int64),
+        DAY,
+    )
+    _replace_bars(db, PriceSnapshotDailyModel, start, end, bars)
+    return len(bars)
+
+
+def rollup_price_snapshots(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Roll closed hours of raw snapshots and closed days of hourly bars up
+
+    Each tier continues after its latest bar, so the job is incremental and
+    can be rerun safely.
+
+    Returns:
+        Number of hourly and daily bars written
+    """
+    now = now or datetime.utcnow()
+    hour_end = _floor(now, HOUR)
+    day_end = _floor(now, DAY)
+    written = {"hourly": 0, "daily": 0}
+
+    with get_db() as db:
+        hour_start = _next_bucket_start(
+            db, PriceSnapshotHourlyModel, PriceSnapshotModel.timestamp, HOUR
+        )
+    while hour_start is not None and hour_start < hour_end:
+        chunk_end = min(hour_start + ROLLUP_CHUNK, hour_end)
+        with get_db() as db:
+            written["hourly"] += _rollup_hours(db, hour_start, chunk_end)
+        hour_start = chunk_end
+
+    with get_db() as db:
+        day_start = _next_bucket_start(
+            db, PriceSnapshotDailyModel, PriceSnapshotHourlyModel.bucket_start, DAY
+        )
+        if day_start is not None and day_start < day_end:
+            written["daily"] = _rollup_days(db, day_start, day_end)
+
+    return written
+
+
+def prune_price_snapshots(
+    raw_retention_days: int = DEFAULT_RAW_RETENTION_DAYS,
+    hourly_retention_days: int = DEFAULT_HOURLY_RETENTION_DAYS,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Delete raw rows and hourly bars past their retention
+
+    Only rows already covered by the next tier are deleted, and the latest raw
+    row of every asset is kept. A retention of 0 or less keeps the tier.
+
+    Returns:
+        Number of raw rows and hourly bars deleted
+    """
+    now = now or datetime.utcnow()
+    deleted = {"raw": 0, "hourly": 0}
+
+    with get_db() as db:
+        latest_hour = _watermark(db, PriceSnapshotHourlyModel)
+        latest_day = _watermark(db, PriceSnapshotDailyModel)
+
+        if raw_retention_days > 0 and latest_hour is not None:
+            cutoff = min(now - timedelta(days=raw_retention_days), latest_hour + HOUR)
+            latest_ids = [
+                row[0]
+                for row in db.query(func.max(PriceSnapshotModel.snapshot_id))
+                .group_by(PriceSnapshotModel.asset_id)
+                .all()
+            ]
+            deleted["raw"] = db.execute(
+                delete(PriceSnapshotModel).where(
+                    PriceSnapshotModel.timestamp < cutoff,
+                    PriceSnapshotModel.snapshot_id.notin_(latest_ids),
+                )
+            ).rowcount
+
+        if hourly_retention_days > 0 and latest_day is not None:
+            cutoff = min(now - timedelta(days=hourly_retention_days), latest_day + DAY)
+            deleted["hourly"] = db.execute(
+                delete(PriceSnapshotHourlyModel).where(
+                    PriceSnapshotHourlyModel.bucket_start < cutoff
+                )
+            ).rowcount
+
+    return deleted
+
+
+def run_price_snapshot_rollup(
+    raw_retention_days: int = DEFAULT_RAW_RETENTION_DAYS,
+    hourly_retention_days: int = DEFAULT_HOURLY_RETENTION_DAYS,
+) -> Optional[Dict[str, int]]:
+    """
+    Hourly job: roll snapshots up, then apply retention
+
+    A Redis lock makes sure only one monitor worker runs it per hour.
+
+    Returns:
+        Rows written and deleted per tier, None if another worker had the lock
+    """
+    now = datetime.utcnow()
+    client = _cache_backend.redis_client
+    if client is not None:
+        try:
+            lock_key = f"{ROLLUP_LOCK_PREFIX}:{_floor(now, HOUR).isoformat()}"
+            if not client.set(lock_key, "1", nx=True, ex=3600):
+                logger.info("Price snapshot rollup already ran this hour")
+                return None
+        except Exception as e:
+            logger.warning(f"Failed to take the price snapshot rollup lock: {e}")
+
+    written = rollup_price_snapshots(now)
+    deleted = prune_price_snapshots(raw_retention_days, hourly_retention_days, now)
+
+    logger.info(
+        f"Rolled up {written['hourly']} hourly and {written['daily']} daily price bars, "
+        f"pruned {deleted['raw']} raw snapshots and {deleted['hourly']} hourly bars"
+    )
+    return {
+        "hourly_bars": written["hourly"],
+        "daily_bars": written["daily"],
+        "pruned_raw": deleted["raw"],
+        "pruned_hourly": deleted["hourly"],
+    }
+
+
+def _tier_order(resolution: timedelta) -> List[_Tier]:
+    """
+    Tiers in the order they fill a range
+
+    Tiers fine enough for the resolution come first, coarsest first. Coarser
+    tiers follow, finest first, for periods whose finer rows were pruned.
+    """
+    tiers = [*ROLLUP_TIERS, RAW_TIER]
+    sufficient = [tier for tier in tiers if tier.bucket <= resolution]
+    fallback = [tier for tier in reversed(tiers) if tier.bucket > resolution]
+    return sufficient + fallback
+
+
+def _subtract(
+    gaps: List[Tuple[datetime, datetime]], start: datetime, end: datetime
+) -> Tuple[List[Tuple[datetime, datetime]], List[Tuple[datetime, datetime]]]:
+    """Split gaps into the parts inside [start, end) and the parts left over"""
+    covered, remaining = [], []
+    for gap_start, gap_end in gaps:
+        low, high = max(gap_start, start), min(gap_end, end)
+        if low >= high:
+            remaining.append((gap_start, gap_end))
+            continue
+        covered.append((low, high))
+        if gap_start < low:
+            remaining.append((gap_start, low))
+        if high < gap_end:
+            remaining.append((high, gap_end))
+    return covered, remaining
+
+
+def get_price_bars(
+    asset_ids: List[int],
+    start: datetime,
+    end: Optional[datetime] = None,
+    resolution: timedelta = timedelta(0),
+) -> List[PriceBar]:
+    """
+    Get price bars of assets over a range at the coarsest sufficient tier
+
+    Every part of the range is read from the coarsest tier with a bucket no
+    longer than the resolution that holds it. Parts no such tier holds, like
+    the current hour or periods whose raw rows were pruned, are read from the
+    closest tier that does.
+
+    Args:
+        asset_ids: Assets to read
+        start: Range start
+        end: Range end, now when omitted
+        resolution: Largest acceptable bucket, 0 for raw snapshots
+
+    Returns:
+        Bars in ascending time order, stamped with the start of their bucket
+    """
+    end = end or datetime.utcnow()
+    if not asset_ids or start > end:
+        return []
+
+    bars: List[PriceBar] = []
+    gaps = [(start, end + INSTANT)]
+    with get_db() as db:
+        for tier in _tier_order(resolution):
+            if not gaps:
+                break
+            time_column = getattr(tier.model, tier.time_column)
+            first, last = (
+                db.query(func.min(time_column), func.max(time_column))
+                .filter(
+                    tier.model.asset_id.in_(asset_ids),
+                    time_column >= _floor(start, tier.bucket),
+                    time_column <= end,
+                )
+                .one()
+            )
+            if first is None:
+                continue
+
+            # A bar holds its whole bucket, a raw row only its own moment
+            covered, gaps = _subtract(gaps, first, last + max(tier.bucket, INSTANT))
+            for low, high in covered:
+                bars.extend(_read_tier(db, tier, asset_ids, low, high))
+
+    bars.sort(key=lambda bar: (bar.timestamp, bar.asset_id))
+    return bars
+
+
+def _read_tier(
+    db, tier: _Tier, asset_ids: List[int], start: datetime, end: datetime
+) -> List[PriceBar]:
+    """Bars of a tier whose bucket starts in [start, end), raw rows in [start, end)"""
+    model = tier.model
+    if not tier.bucket:
+        rows = (
+            db.query(model.asset_id, model.price, model.timestamp)
+            .filter(
+                model.asset_id.in_(asset_ids),
+                model.timestamp >= start,
+                model.timestamp < end,
+            )
+            .all()
+        )
+        return [
+            PriceBar(row.asset_id, row.timestamp, *([float(row.price)] * 4))
+            for row in rows
+        ]
+
+    rows = (
+        db.query(
+            model.asset_id,
+            model.bucket_start,
+            model.open,
+            model.high,
+            model.low,
+            model.close,
+        )
+        .filter(
+            model.asset_id.in_(asset_ids),
+            model.bucket_start >= _floor(start, tier.bucket),
+            model.bucket_start < end,
+        )
+        .all()
+    )
+    return [
+        PriceBar(
+            row.asset_id,
+            row.bucket_start,
+            float(row.open),
+            float(row.high),
+            float(row.low),
+            float(row.close),
+        )
+        for row in rows
+    ]
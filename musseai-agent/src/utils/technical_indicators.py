@@ -0,0 +1,347 @@
+# src/utils/technical_indicators.py
+"""
+Vectorized technical indicators with per-series caching
+
+Indicator functions take whole NumPy arrays and return one value per candle,
+NaN until enough candles are available:
+    - sma, ema, rsi, macd, bollinger_bands, atr, support_resistance
+
+IndicatorEngine computes the indicators of a candle window in one vectorized
+pass and caches the result per (symbol, interval). Recursive indicators (EMAs,
+MACD signal, ATR) are seeded at the first candle of the window, so a result is
+only reused for a window with the same first candle, length and last candle;
+the result never depends on what the process saw before. Callers send a
+sliding window, so a window that moved on is recomputed in full.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+EMA_PERIODS = (12, 20, 26, 50)
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BOLLINGER_PERIOD, BOLLINGER_WIDTH = 20, 2.0
+SUPPORT_RESISTANCE_LOOKBACK = 30
+VOLUME_PERIOD = 10
+
+MAX_SERIES = 256
+
+# Largest block of an exponential recursion solved in closed form, as the
+# exponent of its decay powers; rounding does not grow with the block, the
+# bound only keeps the powers far from overflow
+_EWM_BLOCK_EXPONENT = 100.0
+
+
+def _ewm(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """
+    y[t] = (1 - alpha) * y[t - 1] + alpha * values[t], starting from y[-1] = initial
+
+    Solved in closed form over blocks short enough for the decay powers to stay
+    in range, one cumulative sum per block.
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.empty(len(values))
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[:] = values
+        return result
+
+    block = max(1, int(_EWM_BLOCK_EXPONENT / -np.log(decay)))
+    powers = decay ** np.arange(min(block, len(values)) + 1)
+    previous = initial
+    for start in range(0, len(values), block):
+        chunk = values[start : start + block]
+        n = len(chunk)
+        # decay^(t - j) = decay^t / decay^j
+        weighted = np.cumsum(chunk / powers[:n])
+        result[start : start + n] = (
+            powers[1 : n + 1] * previous + alpha * powers[:n] * weighted
+        )
+        previous = result[start + n - 1]
+    return result
+
+
+def _seeded_ewm(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """Exponential average seeded with the simple average of the first period values"""
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+    seed = values[:period].mean()
+    result[period - 1] = seed
+    result[period:] = _ewm(values[period:], alpha, seed)
+    return result
+
+
+def _rolling(values: np.ndarray, period: int, reducer) -> np.ndarray:
+    """reducer over each trailing window of period values, NaN before the first"""
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) >= period:
+        result[period - 1 :] = reducer(sliding_window_view(values, period), axis=1)
+    return result
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average"""
+    return _rolling(values, period, np.mean)
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average seeded with the SMA of the first period values"""
+    return _seeded_ewm(values, period, 2.0 / (period + 1))
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """Relative Strength Index from the average gain and loss of the last changes"""
+    close = np.asarray(close, dtype=float)
+    result = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return result
+
+    deltas = np.diff(close)
+    gains = _rolling(np.maximum(deltas, 0.0), period, np.sum)[period - 1 :]
+    losses = _rolling(np.maximum(-deltas, 0.0), period, np.sum)[period - 1 :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + gains / losses)
+    result[period:] = np.where(losses == 0, 100.0, values)
+    return result
+
+
+def macd(
+    close: np.ndarray,
+    fast: int = MACD_FAST,
+    slow: int = MACD_SLOW,
+    signal: int = MACD_SIGNAL,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = _signal_line(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def _signal_line(line: np.ndarray, signal: int = MACD_SIGNAL) -> np.ndarray:
+    """EMA of a MACD line from its first defined value"""
+    result = np.full(len(line), np.nan)
+    defined = np.flatnonzero(~np.isnan(line))
+    if len(defined):
+        result[defined[0] :] = ema(line[defined[0] :], signal)
+    return result
+
+
+def bollinger_bands(
+    close: np.ndarray, period: int = BOLLINGER_PERIOD, width: float = BOLLINGER_WIDTH
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Middle, upper and lower bands: SMA and width population standard deviations"""
+    middle = sma(close, period)
+    deviation = _rolling(close, period, np.std)
+    return middle, middle + width * deviation, middle - width * deviation
+
+
+def true_range(
+    high: Optional[np.ndarray], low: Optional[np.ndarray], close: np.ndarray
+) -> np.ndarray:
+    """
+    True range of each candle
+
+    Without highs and lows (close-only series) it is the absolute change of the close.
+    """
+    close = np.asarray(close, dtype=float)
+    previous = np.r_[close[:1], close[:-1]]
+    if high is None or low is None:
+        return np.abs(close - previous)
+    high, low = np.asarray(high, dtype=float), np.asarray(low, dtype=float)
+    return np.maximum.reduce(
+        [high - low, np.abs(high - previous), np.abs(low - previous)]
+    )
+
+
+def atr(
+    high: Optional[np.ndarray],
+    low: Optional[np.ndarray],
+    close: np.ndarray,
+    period: int = ATR_PERIOD,
+) -> np.ndarray:
+    """Average True Range with Wilder smoothing, from the second candle on"""
+    result = np.full(len(close), np.nan)
+    ranges = true_range(high, low, close)[1:]
+    result[1:] = _seeded_ewm(ranges, period, 1.0 / period)
+    return result
+
+
+def support_resistance(
+    close: np.ndarray, lookback: int = SUPPORT_RESISTANCE_LOOKBACK
+) -> Tuple[float, float]:
+    """
+    Nearest recent close below and above the last close
+
+    Falls back to the lowest and highest close of the lookback window when
+    none is below or above; (0, 0) with fewer than 7 closes.
+    """
+    close = np.asarray(close, dtype=float)
+    if len(close) < 7:
+        return 0.0, 0.0
+    recent = close[-lookback:]
+    current = close[-1]
+    below, above = recent[recent < current], recent[recent > current]
+    support = below.max() if len(below) else recent.min()
+    resistance = above.min() if len(above) else recent.max()
+    return float(support), float(resistance)
+
+
+@dataclass
+class IndicatorSnapshot:
+    """Indicator values at the last candle of a series, NaN where not enough candles"""
+
+    timestamp: int
+    close: float
+    rsi: float
+    ema: Dict[int, float]
+    sma_20: float
+    macd: float
+    macd_signal: float
+    macd_histogram: float
+    bollinger_upper: float
+    bollinger_middle: float
+    bollinger_lower: float
+    atr: float
+    support: float
+    resistance: float
+    average_volume: float
+
+
+def _snapshot(
+    timestamps: np.ndarray,
+    close: np.ndarray,
+    high: Optional[np.ndarray],
+    low: Optional[np.ndarray],
+    volume: Optional[np.ndarray],
+) -> IndicatorSnapshot:
+    """Indicator values at the last candle, window indicators read from the tail"""
+    ema_values = {period: ema(close, period) for period in EMA_PERIODS}
+    line = ema_values[MACD_FAST] - ema_values[MACD_SLOW]
+    signal_line = _signal_line(line)
+
+    relative_strength = np.nan
+    if len(close) > RSI_PERIOD:
+        relative_strength = rsi(close[-(RSI_PERIOD + 1) :])[-1]
+
+    middle = deviation = np.nan
+    if len(close) >= BOLLINGER_PERIOD:
+        window = close[-BOLLINGER_PERIOD:]
+        middle, deviation = window.mean(), window.std()
+
+    recent_volume = np.array([]) if volume is None else volume[-VOLUME_PERIOD:]
+    recent_volume = recent_volume[~np.isnan(recent_volume)]
+    support, resistance = support_resistance(close[-SUPPORT_RESISTANCE_LOOKBACK:])
+
+    return IndicatorSnapshot(
+        timestamp=int(timestamps[-1]),
+        close=float(close[-1]),
+        rsi=float(relative_strength),
+        ema={period: float(values[-1]) for period, values in ema_values.items()},
+        sma_20=float(middle),
+        macd=float(line[-1]),
+        macd_signal=float(signal_line[-1]),
+        macd_histogram=float(line[-1] - signal_line[-1]),
+        bollinger_upper=float(middle + BOLLINGER_WIDTH * deviation),
+        bollinger_middle=float(middle),
+        bollinger_lower=float(middle - BOLLINGER_WIDTH * deviation),
+        atr=float(atr(high, low, close)[-1]),
+        support=support,
+        resistance=resistance,
+        average_volume=float(recent_volume.mean()) if len(recent_volume) else np.nan,
+    )
+
+
+def _candle_key(values) -> Tuple:
+    """Candle fields as a comparable tuple, NaN as None"""
+    return tuple(None if value != value else float(value) for value in values)
+
+
+class IndicatorEngine:
+    """Indicator snapshots cached per (symbol, interval) and candle window"""
+
+    def __init__(self, max_series: int = MAX_SERIES):
+        self.max_series = max_series
+        # (symbol, interval) -> (window key, snapshot)
+        self._snapshots: "OrderedDict[Tuple[str, str], Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(
+        self,
+        symbol: str,
+        interval: str,
+        timestamps,
+        close,
+        high=None,
+        low=None,
+        volume=None,
+    ) -> Optional[IndicatorSnapshot]:
+        """
+        Indicator values at the last of the given candles
+
+        Args:
+            symbol: Asset symbol
+            interval: Candle interval, e.g. "1d"
+            timestamps: Candle open times, ascending
+            close: Close prices
+            high, low: High and low prices, close-to-close ranges are used without them
+            volume: Volumes, NaN when not given
+
+        Returns:
+            IndicatorSnapshot, None without candles
+        """
+        if not len(timestamps):
+            return None
+        has_range = high is not None and low is not None
+        timestamps = np.asarray(timestamps, dtype=float)
+        close = np.asarray(close, dtype=float)
+        high = np.asarray(high, dtype=float) if has_range else None
+        low = np.asarray(low, dtype=float) if has_range else None
+        volume = None if volume is None else np.asarray(volume, dtype=float)
+
+        # Recursive indicators are seeded at the first candle, so the window is
+        # identified by its first candle and its (possibly still forming) last one
+        window = (
+            float(timestamps[0]),
+            len(timestamps),
+            _candle_key(
+                (
+                    timestamps[-1],
+                    close[-1],
+                    high[-1] if has_range else np.nan,
+                    low[-1] if has_range else np.nan,
+                    np.nan if volume is None else volume[-1],
+                )
+            ),
+        )
+        key = (symbol.upper(), interval)
+
+        with self._lock:
+            cached = self._snapshots.get(key)
+            if cached is not None and cached[0] == window:
+                self._snapshots.move_to_end(key)
+                return cached[1]
+
+        snapshot = _snapshot(timestamps, close, high, low, volume)
+        with self._lock:
+            self._snapshots[key] = (window, snapshot)
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_series:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, symbol: str, interval: str):
+        """Drop a cached snapshot"""
+        with self._lock:
+            self._snapshots.pop((symbol.upper(), interval), None)
+
+
+# Global indicator engine instance
+indicator_engine = IndicatorEngine()
@@ -0,0 +1,193 @@
+"""
+Benchmark the user portfolio summary
+
+Compares the previous ORM implementation (every PositionModel loaded, lazy
+position.asset per row, linear source lookup) with the grouped SQL aggregate
+of query_user_portfolio_summary, for a synthetic user with 500 positions
+across 20 sources. Runs against a temporary SQLite database unless
+DATABASE_URL is set.
+
+Usage (from musseai-agent/):
+    PYTHONPATH=src python tests/benchmarks/bench_portfolio_summary.py [positions] [sources] [repeat]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from typing import Callable, Dict
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_portfolio_summary.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_file}")
+
+from sqlalchemy import event  # noqa: E402
+
+from mysql.db import Base, SessionLocal, engine  # noqa: E402
+from mysql.model import (  # noqa: E402
+    AssetModel,
+    PortfolioSourceModel,
+    PositionModel,
+    SourceType,
+)
+from mysql.portfolio_summary import query_user_portfolio_summary  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def populate(positions: int, sources: int):
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            PortfolioSourceModel.__table__,
+            AssetModel.__table__,
+            PositionModel.__table__,
+        ],
+    )
+    rng = random.Random(7)
+    db = SessionLocal()
+    try:
+        source_rows = [
+            PortfolioSourceModel(
+                user_id=USER_ID,
+                source_type=SourceType.WALLET if i % 2 else SourceType.EXCHANGE,
+                source_name=f"source-{i}",
+                source_config={},
+                is_active=True,
+            )
+            for i in range(sources)
+        ]
+        asset_count = max(1, positions // sources * 2)
+        asset_rows = [
+            AssetModel(symbol=f"TK{i}", name=f"Token {i}", chain="ETH")
+            for i in range(asset_count)
+        ]
+        db.add_all(source_rows + asset_rows)
+        db.flush()
+
+        pairs = rng.sample(
+            [(s.source_id, a.asset_id) for s in source_rows for a in asset_rows],
+            positions,
+        )
+        db.add_all(
+            PositionModel(
+                source_id=source_id,
+                asset_id=asset_id,
+                quantity=Decimal(str(round(rng.uniform(0.01, 100), 6))),
+                avg_cost=Decimal(str(round(rng.uniform(0.5, 500), 4))),
+                last_price=Decimal(str(round(rng.uniform(0.5, 500), 4))),
+            )
+            for source_id, asset_id in pairs
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# Previous implementation, kept here as the benchmark baseline
+
+
+def legacy_summary(db, user_id: str) -> Dict:
+    sources = (
+        db.query(PortfolioSourceModel)
+        .filter(
+            PortfolioSourceModel.user_id == user_id,
+            PortfolioSourceModel.is_active == True,
+        )
+        .all()
+    )
+    source_ids = [s.source_id for s in sources]
+    positions = (
+        db.query(PositionModel)
+        .join(AssetModel)
+        .filter(PositionModel.source_id.in_(source_ids), PositionModel.quantity > 0)
+        .all()
+    )
+
+    total_value = 0
+    total_cost = 0
+    positions_by_source = {}
+    positions_by_asset = {}
+    for position in positions:
+        asset = position.asset
+        source = next(s for s in sources if s.source_id == position.source_id)
+        position_value = 0
+        position_cost = 0
+        if position.last_price:
+            position_value = float(position.quantity * position.last_price)
+            total_value += position_value
+        if position.avg_cost:
+            position_cost = float(position.quantity * position.avg_cost)
+            total_cost += position_cost
+
+        by_source = positions_by_source.setdefault(
+            source.source_id, {"total_value": 0, "position_count": 0}
+        )
+        by_source["total_value"] += position_value
+        by_source["position_count"] += 1
+
+        by_asset = positions_by_asset.setdefault(
+            f"{asset.symbol}_{asset.chain}",
+            {"total_quantity": 0, "total_value": 0, "total_cost": 0},
+        )
+        by_asset["total_quantity"] += float(position.quantity)
+        by_asset["total_value"] += position_value
+        by_asset["total_cost"] += position_cost
+
+    return {
+        "total_value": total_value,
+        "total_cost": total_cost,
+        "asset_count": len(positions_by_asset),
+        "position_count": sum(s["position_count"] for s in positions_by_source.values()),
+    }
+
+
+def run(func: Callable, repeat: int):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    best = float("inf")
+    result = None
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            # Fresh session per run so identity map caching does not hide lazy loads
+            db = SessionLocal()
+            try:
+                started = time.perf_counter()
+                result = func(db, USER_ID)
+                best = min(best, time.perf_counter() - started)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return best * 1000, len(statements), result
+
+
+def main():
+    positions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sources = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    populate(positions, sources)
+
+    legacy_ms, legacy_queries, legacy = run(legacy_summary, repeat)
+    sql_ms, sql_queries, summary = run(query_user_portfolio_summary, repeat)
+
+    position_count = sum(s["position_count"] for s in summary["positions_by_source"])
+    assert position_count == legacy["position_count"] == positions
+    assert summary["asset_count"] == legacy["asset_count"]
+    assert abs(summary["total_value"] - legacy["total_value"]) < 1e-6 * legacy["total_value"]
+    assert abs(summary["total_cost"] - legacy["total_cost"]) < 1e-6 * legacy["total_cost"]
+
+    print(f"{positions} positions across {sources} sources, best of {repeat} runs")
+    print(f"{'implementation':<16}{'ms':>10}{'queries':>10}")
+    print(f"{'legacy ORM':<16}{legacy_ms:>10.2f}{legacy_queries:>10}")
+    print(f"{'SQL aggregate':<16}{sql_ms:>10.2f}{sql_queries:>10}")
+    print(f"speedup: {legacy_ms / sql_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark provider response normalization
+
+Compares the previous per-row / pandas DataFrame processing with the NumPy
+based PriceSeries normalization for synthetic provider payloads.
+
+Usage (from musseai-agent/):
+    PYTHONPATH=src python tests/benchmarks/bench_price_series.py [points] [repeat]
+"""
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from utils.price_series import PriceSeries
+
+
+def make_payloads(points: int) -> Dict:
+    start = 1_600_000_000
+    times = [start + i * 86400 for i in range(points)]
+    closes = (20000 + np.cumsum(np.random.default_rng(7).normal(0, 100, points))).tolist()
+    return {
+        "coingecko": {
+            "prices": [[t * 1000, c] for t, c in zip(times, closes)],
+            "market_caps": [[t * 1000, c * 1.9e7] for t, c in zip(times, closes)],
+            "total_volumes": [[t * 1000, c * 1e4] for t, c in zip(times, closes)],
+        },
+        "coincap": {
+            "data": [
+                {
+                    "priceUsd": str(c),
+                    "time": t * 1000,
+                    "date": datetime.utcfromtimestamp(t).isoformat() + ".000Z",
+                    "volumeUsd24Hr": str(c * 1e4),
+                }
+                for t, c in zip(times, closes)
+            ]
+        },
+        "binance": [
+            [t * 1000, str(c), str(c + 5), str(c - 5), str(c), "123.4", t * 1000 + 86399999, "1e6"]
+            for t, c in zip(times, closes)
+        ],
+        "cryptocompare": {
+            "Data": {
+                "Data": [
+                    {"time": t, "open": c, "high": c + 5, "low": c - 5, "close": c, "volumefrom": 1.0, "volumeto": c}
+                    for t, c in zip(times, closes)
+                ]
+            }
+        },
+    }
+
+
+# Previous implementations, kept here as the benchmark baseline
+
+
+def legacy_coingecko(data: Dict) -> Dict:
+    df = pd.DataFrame(data["prices"], columns=["timestamp", "price"])
+    df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
+    df["returns"] = df["price"].pct_change().dropna()
+    return {
+        "prices": df["price"].tolist(),
+        "returns": df["returns"].tolist(),
+        "dates": df["date"].dt.strftime("%Y-%m-%d").tolist(),
+        "volatility": df["returns"].std() * np.sqrt(365),
+        "mean_return": df["returns"].mean() * 365,
+    }
+
+
+def _legacy_summary(prices: List[float], dates: List[str]) -> Dict:
+    returns = [prices[i] / prices[i - 1] - 1 for i in range(1, len(prices))]
+    return {
+        "prices": prices,
+        "returns": returns,
+        "dates": dates,
+        "volatility": np.std(returns) * np.sqrt(365) if returns else 0,
+        "mean_return": np.mean(returns) * 365 if returns else 0,
+    }
+
+
+def legacy_coincap(data: Dict) -> Dict:
+    history = data["data"]
+    prices = [float(item["priceUsd"]) for item in history if item["priceUsd"]]
+    return _legacy_summary(prices, [item["date"] for item in history])
+
+
+def legacy_binance(data: List) -> Dict:
+    prices = [float(kline[4]) for kline in data]
+    dates = [pd.to_datetime(int(kline[0]), unit="ms").strftime("%Y-%m-%d") for kline in data]
+    return _legacy_summary(prices, dates)
+
+
+def legacy_cryptocompare(data: Dict) -> Dict:
+    history = data["Data"]["Data"]
+    prices = [float(item["close"]) for item in history if item["close"]]
+    dates = [pd.to_datetime(int(item["time"]), unit="s").strftime("%Y-%m-%d") for item in history]
+    return _legacy_summary(prices, dates)
+
+
+def timeit(func: Callable, payload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(payload)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    payloads = make_payloads(points)
+
+    cases = [
+        ("coingecko", legacy_coingecko, lambda d: PriceSeries.from_coingecko(d).to_history_dict()),
+        ("coincap", legacy_coincap, lambda d: PriceSeries.from_coincap(d).to_history_dict()),
+        ("binance", legacy_binance, lambda d: PriceSeries.from_binance_klines(d).to_history_dict()),
+        ("cryptocompare", legacy_cryptocompare, lambda d: PriceSeries.from_cryptocompare(d).to_history_dict()),
+    ]
+
+    print(f"{points} points, best of {repeat} runs (ms)")
+    print(f"{'provider':<15}{'legacy':>10}{'numpy':>10}{'speedup':>10}")
+    for name, legacy, vectorized in cases:
+        legacy_ms = timeit(legacy, payloads[name], repeat)
+        vectorized_ms = timeit(vectorized, payloads[name], repeat)
+        print(f"{name:<15}{legacy_ms:>10.2f}{vectorized_ms:>10.2f}{legacy_ms / vectorized_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
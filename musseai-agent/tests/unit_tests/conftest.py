@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from mysql.db import Base
+from mysql.model import (
+    AssetModel,
+    PortfolioSourceModel,
+    PriceSnapshotDailyModel,
+    PriceSnapshotHourlyModel,
+    PriceSnapshotModel,
+    TaxLotDisposalModel,
+    TaxLotModel,
+    TransactionModel,
+)
+
+TABLES = [
+    model.__table__
+    for model in (
+        PortfolioSourceModel,
+        AssetModel,
+        TransactionModel,
+        TaxLotModel,
+        TaxLotDisposalModel,
+        PriceSnapshotModel,
+        PriceSnapshotHourlyModel,
+        PriceSnapshotDailyModel,
+    )
+]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=TABLES)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake_get_db(session_factory):
+    """get_db replacement bound to the test database"""
+
+    @contextmanager
+    def get_db():
+        session = session_factory()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    return get_db
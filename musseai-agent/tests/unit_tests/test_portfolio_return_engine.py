@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.portfolio_return_engine import (
+    PortfolioLedger,
+    compute_return_series,
+    returns_from_values,
+)
+
+DAYS = [datetime(2024, 1, 1, 23, 59, 59) + timedelta(days=i) for i in range(3)]
+
+
+def ledger(quantities, transactions=()):
+    """Ledger of one column per quantity, transactions as (day, asset, quantity, price)"""
+    return PortfolioLedger(
+        asset_ids=list(range(len(quantities))),
+        symbols=[f"A{i}" for i in range(len(quantities))],
+        quantities=np.array(quantities, dtype=float),
+        tx_times=np.array(
+            [DAYS[0] + timedelta(days=day) for day, _, _, _ in transactions],
+            dtype="datetime64[s]",
+        ),
+        tx_assets=np.array([asset for _, asset, _, _ in transactions], dtype=int),
+        tx_quantities=np.array([quantity for _, _, quantity, _ in transactions]),
+        tx_prices=np.array(
+            [np.nan if price is None else price for _, _, _, price in transactions]
+        ),
+    )
+
+
+def test_constant_holdings():
+    prices = np.array([[100.0], [110.0], [121.0]])
+    series = compute_return_series(ledger([2]), DAYS, prices)
+
+    assert series.values == pytest.approx([200, 220, 242])
+    assert series.daily_returns() == pytest.approx([0.1, 0.1])
+    assert series.time_weighted_return == pytest.approx(0.21)
+    assert series.money_weighted_return == pytest.approx(0.21)
+
+
+def test_transactions_are_rolled_back_from_the_anchor():
+    # Bought 1 at 105 during the second day, 2 held now
+    prices = np.array([[100.0], [110.0], [121.0]])
+    series = compute_return_series(ledger([2], [(0.5, 0, 1.0, 105.0)]), DAYS, prices)
+
+    assert series.quantities[:, 0] == pytest.approx([1, 2, 2])
+    assert series.flows == pytest.approx([0, 105, 0])
+    assert series.daily_returns() == pytest.approx([(220 - 105) / 100 - 1, 0.1])
+
+
+def test_flow_without_price_uses_the_price_grid():
+    prices = np.array([[100.0], [110.0], [121.0]])
+    series = compute_return_series(ledger([2], [(0.5, 0, 1.0, None)]), DAYS, prices)
+
+    assert series.flows == pytest.approx([0, 110, 0])
+
+
+def test_negative_holdings_are_valued_at_zero():
+    # A buy of more than is held now takes the first day below zero
+    prices = np.array([[10.0, 1.0], [10.0, 1.0], [10.0, 1.0]])
+    series = compute_return_series(
+        ledger([1, 5], [(0.5, 0, 2.0, 10.0)]), DAYS, prices
+    )
+
+    assert series.negative_symbols == ["A0"]
+    assert series.quantities[0] == pytest.approx([0, 5])
+
+
+def test_returns_skip_periods_after_a_zero_value():
+    values = np.array([0.0, 100.0, 150.0])
+    flows = np.array([0.0, 100.0, 0.0])
+    returns, valid, twr, _ = returns_from_values(values, flows, DAYS)
+
+    assert valid.tolist() == [False, True]
+    assert returns == pytest.approx([0, 0.5])
+    assert twr == pytest.approx(0.5)
+
+
+def test_no_moments():
+    series = compute_return_series(ledger([1]), [], np.zeros((0, 1)))
+
+    assert len(series.values) == 0
+    assert series.time_weighted_return == 0.0
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from mysql.model import (
+    AssetModel,
+    PriceSnapshotDailyModel,
+    PriceSnapshotHourlyModel,
+    PriceSnapshotModel,
+)
+from utils import price_snapshot_rollup
+from utils.price_snapshot_rollup import (
+    get_price_bars,
+    prune_price_snapshots,
+    rollup_price_snapshots,
+)
+
+DAY = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def asset_id(db, fake_get_db, monkeypatch):
+    monkeypatch.setattr(price_snapshot_rollup, "get_db", fake_get_db)
+    asset = AssetModel(symbol="BTC", name="Bitcoin", chain="BTC")
+    db.add(asset)
+    db.commit()
+    return asset.asset_id
+
+
+def snapshot(db, asset_id, minutes, price):
+    db.add(
+        PriceSnapshotModel(
+            asset_id=asset_id, price=price, timestamp=DAY + timedelta(minutes=minutes)
+        )
+    )
+    db.commit()
+
+
+def bars(db, model):
+    return [
+        (row.bucket_start, row.open, row.high, row.low, row.close, row.sample_count)
+        for row in db.query(model).order_by(model.bucket_start)
+    ]
+
+
+def test_rollup_builds_closed_buckets(db, asset_id):
+    for minutes, price in [(10, 1), (40, 3), (65, 2), (24 * 60 + 30, 5)]:
+        snapshot(db, asset_id, minutes, price)
+
+    written = rollup_price_snapshots(DAY + timedelta(days=1, hours=2))
+
+    assert written == {"hourly": 3, "daily": 1}
+    assert bars(db, PriceSnapshotHourlyModel) == [
+        (DAY, 1, 3, 1, 3, 2),
+        (DAY + timedelta(hours=1), 2, 2, 2, 2, 1),
+        (DAY + timedelta(days=1), 5, 5, 5, 5, 1),
+    ]
+    assert bars(db, PriceSnapshotDailyModel) == [(DAY, 1, 3, 1, 2, 3)]
+
+
+def test_rollup_continues_after_the_watermark(db, asset_id):
+    snapshot(db, asset_id, 10, 1)
+    snapshot(db, asset_id, 24 * 60 + 30, 5)
+    now = DAY + timedelta(days=1, hours=2)
+    rollup_price_snapshots(now)
+    hourly = bars(db, PriceSnapshotHourlyModel)
+
+    # Nothing new closed: a rerun writes nothing and keeps the bars
+    assert rollup_price_snapshots(now) == {"hourly": 0, "daily": 0}
+    assert bars(db, PriceSnapshotHourlyModel) == hourly
+
+    # The current hour is not rolled up until it closes
+    snapshot(db, asset_id, 24 * 60 + 125, 7)
+    assert rollup_price_snapshots(now + timedelta(minutes=30)) == {
+        "hourly": 0,
+        "daily": 0,
+    }
+
+    written = rollup_price_snapshots(DAY + timedelta(days=2, minutes=1))
+    assert written == {"hourly": 1, "daily": 1}
+    assert bars(db, PriceSnapshotHourlyModel) == [
+        *hourly,
+        (DAY + timedelta(days=1, hours=2), 7, 7, 7, 7, 1),
+    ]
+    assert bars(db, PriceSnapshotDailyModel) == [
+        (DAY, 1, 1, 1, 1, 1),
+        (DAY + timedelta(days=1), 5, 7, 5, 7, 2),
+    ]
+
+
+def test_prune_keeps_unrolled_and_latest_rows(db, asset_id):
+    for minutes, price in [(10, 1), (70, 2), (130, 3)]:
+        snapshot(db, asset_id, minutes, price)
+    rollup_price_snapshots(DAY + timedelta(hours=2))
+
+    deleted = prune_price_snapshots(
+        raw_retention_days=1, now=DAY + timedelta(days=30)
+    )
+
+    # Raw rows of the open hour are not rolled up yet and stay
+    assert deleted["raw"] == 2
+    remaining = db.query(PriceSnapshotModel.price).all()
+    assert [float(price) for (price,) in remaining] == [3]
+
+
+def test_price_bars_fill_from_finer_tiers(db, asset_id):
+    for minutes, price in [(10, 1), (70, 2), (130, 3)]:
+        snapshot(db, asset_id, minutes, price)
+    rollup_price_snapshots(DAY + timedelta(hours=2))
+
+    result = get_price_bars(
+        [asset_id], DAY, DAY + timedelta(hours=3), resolution=timedelta(hours=1)
+    )
+
+    assert [(bar.timestamp, bar.close) for bar in result] == [
+        (DAY, 1),
+        (DAY + timedelta(hours=1), 2),
+        (DAY + timedelta(hours=2, minutes=10), 3),
+    ]
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from mysql.model import (
+    AssetModel,
+    CostBasisMethod,
+    PortfolioSourceModel,
+    SourceType,
+    TaxLotDisposalModel,
+    TaxLotModel,
+    TransactionModel,
+    TransactionType,
+)
+from mysql.tax_lots import apply_transaction_to_tax_lots, rebuild_tax_lots
+
+BUY, SELL = TransactionType.BUY, TransactionType.SELL
+DEPOSIT, WITHDRAW = TransactionType.DEPOSIT, TransactionType.WITHDRAW
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def pair(db):
+    source = PortfolioSourceModel(
+        user_id="user",
+        source_type=SourceType.WALLET,
+        source_name="wallet",
+        source_config={},
+    )
+    asset = AssetModel(symbol="BTC", name="Bitcoin", chain="BTC")
+    db.add_all([source, asset])
+    db.flush()
+    return source.source_id, asset.asset_id
+
+
+def record(db, pair, transaction_type, quantity, price, day):
+    """Add a transaction and apply it to the lots in place"""
+    tx = TransactionModel(
+        source_id=pair[0],
+        asset_id=pair[1],
+        transaction_type=transaction_type,
+        quantity=Decimal(str(quantity)),
+        price=None if price is None else Decimal(str(price)),
+        transaction_time=START + timedelta(days=day),
+    )
+    db.add(tx)
+    db.flush()
+    apply_transaction_to_tax_lots(db, tx)
+    return tx.transaction_id
+
+
+def lots(db, method):
+    return sorted(
+        (row.transaction_id, row.remaining_quantity, row.is_open)
+        for row in db.query(TaxLotModel).filter(TaxLotModel.method == method)
+    )
+
+
+def disposals(db, method):
+    rows = (
+        db.query(TaxLotDisposalModel)
+        .filter(TaxLotDisposalModel.method == method)
+        .order_by(TaxLotDisposalModel.disposal_id)
+    )
+    return [
+        (row.transaction_id, row.lot_transaction_id, row.quantity, row.cost_per_unit)
+        for row in rows
+    ]
+
+
+def ledger(db):
+    return {
+        method: (lots(db, method), disposals(db, method)) for method in CostBasisMethod
+    }
+
+
+SCENARIOS = {
+    "partial": [(BUY, 1, 100, 0), (BUY, 2, 200, 1), (SELL, 1.5, 300, 2)],
+    "exact": [(BUY, 1, 100, 0), (BUY, 1, 200, 1), (SELL, 1, 300, 2), (SELL, 1, 300, 3)],
+    "unmatched": [(BUY, 1, 100, 0), (SELL, 3, 300, 1), (BUY, 1, 150, 2)],
+    "null cost": [
+        (DEPOSIT, 1, None, 0),
+        (BUY, 1, 50, 1),
+        (BUY, 1, 100, 2),
+        (WITHDRAW, 1, None, 3),
+        (SELL, 1.5, 120, 4),
+    ],
+    "backdated": [(BUY, 2, 100, 2), (SELL, 1, 150, 3), (BUY, 1, 50, 0), (SELL, 1, 90, 1)],
+    "many lots": [(BUY, 1, 100 + (i * 37) % 50, i) for i in range(40)]
+    + [(SELL, 25.5, 200, 40), (BUY, 3, 120, 41), (SELL, 10, 210, 42)],
+}
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_in_place_matches_rebuild(db, pair, name):
+    for transaction in SCENARIOS[name]:
+        record(db, pair, *transaction)
+    in_place = ledger(db)
+
+    rebuild_tax_lots(db, *pair)
+    rebuilt = ledger(db)
+
+    for method in CostBasisMethod:
+        assert in_place[method][0] == rebuilt[method][0], method
+        # Disposal ids differ, the order within a closing transaction must not
+        assert sorted(in_place[method][1], key=lambda row: row[0]) == sorted(
+            rebuilt[method][1], key=lambda row: row[0]
+        ), method
+
+
+def test_partial_and_exact_exhaustion(db, pair):
+    first = record(db, pair, BUY, 1, 100, 0)
+    second = record(db, pair, BUY, 2, 200, 1)
+    sell = record(db, pair, SELL, 1.5, 300, 2)
+
+    # FIFO exhausts the first lot exactly and takes part of the second
+    assert lots(db, CostBasisMethod.FIFO) == [
+        (first, 0, False),
+        (second, Decimal("1.5"), True),
+    ]
+    assert disposals(db, CostBasisMethod.FIFO) == [
+        (sell, first, 1, 100),
+        (sell, second, Decimal("0.5"), 200),
+    ]
+    # LIFO and HIFO take part of the second lot only
+    for method in (CostBasisMethod.LIFO, CostBasisMethod.HIFO):
+        assert lots(db, method) == [(first, 1, True), (second, Decimal("0.5"), True)]
+        assert disposals(db, method) == [(sell, second, Decimal("1.5"), 200)]
+
+
+def test_unmatched_sell(db, pair):
+    buy = record(db, pair, BUY, 1, 100, 0)
+    sell = record(db, pair, SELL, 3, 300, 1)
+
+    for method in CostBasisMethod:
+        assert lots(db, method) == [(buy, 0, False)]
+        assert disposals(db, method) == [(sell, buy, 1, 100), (sell, None, 2, None)]
+
+
+def test_hifo_takes_unknown_cost_last(db, pair):
+    deposit = record(db, pair, DEPOSIT, 1, None, 0)
+    cheap = record(db, pair, BUY, 1, 50, 1)
+    dear = record(db, pair, BUY, 1, 100, 2)
+    sell = record(db, pair, SELL, 2.5, 120, 3)
+
+    expected = [
+        (sell, dear, 1, 100),
+        (sell, cheap, 1, 50),
+        (sell, deposit, Decimal("0.5"), None),
+    ]
+    assert disposals(db, CostBasisMethod.HIFO) == expected
+
+    rebuild_tax_lots(db, *pair)
+    assert disposals(db, CostBasisMethod.HIFO) == expected